@@ -1,15 +1,242 @@
-from tkinter import Tk, ttk, END, filedialog, messagebox
+from tkinter import Tk, Toplevel, StringVar, TclError, ttk, END, filedialog, messagebox
 import os
 import sys
+import threading
 import calendar
-from datetime import date
-from utils import (
-    is_outlook_installed,
-    get_config,
-    set_config,
-    get_flagged_emails_in_month,
-    get_flagged_emails_in_month_pst,
-)
+from datetime import date, datetime
+from utils.browse import BROWSE_COLUMNS, MailBrowser
+from utils.config import flush_config, get_config, set_config
+from utils.worker import OutlookWorker
+
+# Outlook, SQLite and the export pipeline are imported by the functions that
+# use them, mostly on the worker thread, so the first window paints without
+# waiting for them.
+
+# How often the Tk loop drains events from the Outlook worker
+WORKER_POLL_MS = 50
+
+# Seconds between checks for debounced flag changes while watching
+WATCH_INTERVAL = 0.25
+
+# Seconds quit() gives a running job to reach its next cancellation check
+WORKER_STOP_SECONDS = 5
+
+# Treeview rows in the email browser; only these many items ever exist
+BROWSER_ROWS = 20
+
+# Rows scrolled per mouse wheel notch in the email browser
+WHEEL_ROWS = 3
+
+# Per-thread state of the worker jobs, see get_sync_index
+_worker_state = threading.local()
+
+# [Export] target in config.ini -> label in the "Save As" list
+EXPORT_TARGETS = {
+    "pst": "Outlook PST",
+    "archive": "Compressed archive (.mailarc)",
+}
+
+
+def check_outlook_installed(job):
+    """Worker job: connect to Outlook, True if it is available"""
+    from utils.outlook import is_outlook_installed
+
+    return is_outlook_installed()
+
+
+def get_sync_index():
+    """The calling thread's SyncIndex, opened on first use
+
+    Jobs run on the worker thread, so every scan and export shares the one
+    SQLite connection, which belongs to that thread.
+    """
+    sync_index = getattr(_worker_state, "sync_index", None)
+    if sync_index is None:
+        from utils.index import SyncIndex
+
+        sync_index = _worker_state.sync_index = SyncIndex()
+    return sync_index
+
+
+def scan_flagged_emails(job, start_date=None, end_date=None):
+    """Worker job: sync and return the flagged emails for the date range,
+    and when the sync started"""
+    from utils.outlook import sync_flagged_emails_in_month
+
+    sync_index = get_sync_index()
+    scanned_at = datetime.now()
+    return (
+        (sync_index,)
+        + sync_flagged_emails_in_month(sync_index, start_date, end_date)
+        + (scanned_at,)
+    )
+
+
+def export_flagged_emails(
+    job,
+    sync_index,
+    flagged_emails,
+    start_date,
+    end_date,
+    batch_size,
+    target="pst",
+    attachments=False,
+):
+    """Worker job: copy flagged emails into the PST or archive, batch by batch
+
+    Checkpointed in the journal, so an export interrupted by a crash or an
+    Outlook restart picks up where it stopped on the next try. Copied emails
+    are added to the full-text search index, and a finished export writes
+    the billing summaries of flagged_emails, the emails left checked, next
+    to the PST or archive, and with attachments saves their attachments
+    there too. Progress includes how many Outlook calls were retried while
+    Outlook was busy.
+    """
+    from utils.journal import ExportJournal
+    from utils.outlook import (
+        export_flagged_attachments,
+        export_flagged_emails_to_archive,
+        export_flagged_emails_to_pst,
+        throttle,
+        write_flagged_emails_report,
+    )
+    from utils.pipeline import items_per_second
+    from utils.search import SearchIndex
+
+    retried = throttle.retried
+    options = dict(
+        progress=lambda position, total, subject, stats: job.report(
+            position=position,
+            total=total,
+            subject=subject,
+            rate=items_per_second(stats),
+            retries=throttle.retried - retried,
+        ),
+        cancelled=lambda: job.cancelled,
+        batch_size=batch_size,
+    )
+    with ExportJournal(sync_index.path) as journal, SearchIndex() as search_index:
+        options.update(journal=journal, search_index=search_index)
+        if target == "archive":
+            summary = export_flagged_emails_to_archive(
+                flagged_emails, start_date, end_date, **options
+            )
+        else:
+            summary = export_flagged_emails_to_pst(
+                sync_index, flagged_emails, start_date, end_date, **options
+            )
+
+    if not summary["cancelled"]:
+        try:
+            summary["report"] = write_flagged_emails_report(
+                summary["path"], start_date, end_date, flagged_emails=flagged_emails
+            )
+        except Exception as e:
+            # The export itself succeeded
+            print(f"Error: {e}")
+
+    if attachments and not summary["cancelled"]:
+        try:
+            summary["attachments"] = export_flagged_attachments(
+                summary["path"],
+                start_date,
+                end_date,
+                progress=lambda position, total, subject: job.report(
+                    position=position,
+                    total=total,
+                    subject=subject,
+                    rate=0.0,
+                    stage="attachments",
+                ),
+                cancelled=lambda: job.cancelled,
+                flagged_emails=flagged_emails,
+            )
+        except Exception as e:
+            print(f"Error: {e}")
+    return summary
+
+
+class FlagWatchJob:
+    """Repeating worker job that keeps the flagged emails current
+
+    The first call subscribes to the Inbox's events (see utils.watch); later
+    calls apply debounced batches of flag changes and report the new
+    MailTable. stop() ends it at the next call, as does the worker stopping.
+    """
+
+    def __init__(self, flagged_emails, start_date, end_date, scanned_at=None):
+        self.flagged_emails = flagged_emails
+        self.start_date = start_date
+        self.end_date = end_date
+        self.scanned_at = scanned_at
+        self.watcher = None
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def __call__(self, job):
+        if self.stopped or job.cancelled:
+            if self.watcher is not None:
+                self.watcher.stop()
+            return False
+        if self.watcher is None:
+            from utils.outlook import watch_flagged_emails
+
+            self.watcher = watch_flagged_emails(
+                self.flagged_emails,
+                self.start_date,
+                self.end_date,
+                scanned_at=self.scanned_at,
+            )
+            return True
+        batch = self.watcher.apply_if_due()
+        if batch and (batch["added"] or batch["cleared"] or batch["deleted"]):
+            job.report(flagged_emails=self.watcher.flagged_emails(), **batch)
+        return True
+
+
+def get_batch_size():
+    """Emails copied per batch, from [Export] batch_size in config.ini"""
+    from utils.pipeline import DEFAULT_BATCH_SIZE
+
+    try:
+        return get_config("Export", "batch_size", int)
+    except (FileNotFoundError, KeyError, ValueError):
+        return DEFAULT_BATCH_SIZE
+
+
+def get_export_target():
+    """"pst" or "archive", from [Export] target in config.ini"""
+    try:
+        target = get_config("Export", "target")
+    except (FileNotFoundError, KeyError):
+        return "pst"
+    return target if target in EXPORT_TARGETS else "pst"
+
+
+def get_export_attachments():
+    """Whether exports save attachments, from [Export] attachments"""
+    try:
+        return get_config("Export", "attachments", bool)
+    except (FileNotFoundError, KeyError, ValueError):
+        return False
+
+
+def get_watch_enabled():
+    """Whether to follow flag changes live, from [Watch] enabled in config.ini"""
+    try:
+        return get_config("Watch", "enabled", bool)
+    except (FileNotFoundError, KeyError, ValueError):
+        return False
+
+
+def get_profile_path():
+    """Where to write the Outlook call profile, from [Debug] profile, or None"""
+    try:
+        return get_config("Debug", "profile") or None
+    except (FileNotFoundError, KeyError):
+        return None
 
 
 def browse_folder(form_entry: ttk.Entry):
@@ -19,6 +246,205 @@ def browse_folder(form_entry: ttk.Entry):
     set_config("Folder", "output_folder", folder_selected)
 
 
+class EmailBrowserWindow:
+    """Window to review the flagged emails and uncheck ones not to export
+
+    The Treeview holds only BROWSER_ROWS items. Scrolling moves an offset
+    into the utils.browse.MailBrowser view and rewrites those items' values
+    from its cached pages, so 50,000 emails scroll like 20 and nothing is
+    read from Outlook. on_changed() is called when checks change and
+    on_export() by the Export Selected button, which set_export_enabled()
+    disables while an export runs.
+    """
+
+    def __init__(self, root, browser, on_changed, on_export):
+        self.browser = browser
+        self.on_changed = on_changed
+        self.offset = 0
+        # Row number shown in each Treeview item, None past the end
+        self.slots = [None] * BROWSER_ROWS
+
+        self.window = Toplevel(root)
+        self.window.title("Flagged Emails")
+        self.window.geometry("900x560")
+
+        frame = ttk.Frame(self.window, padding=10)
+        frame.pack(expand=True, fill="both")
+
+        filter_frame = ttk.Frame(frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter by sender or subject").pack(side="left")
+        self.filter_text = StringVar(self.window)
+        self.filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_text)
+        self.filter_entry.pack(side="left", fill="x", expand=True, padx=(5, 0))
+        self.filter_text.trace_add("write", self.on_filter)
+
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(expand=True, fill="both")
+        self.tree = ttk.Treeview(
+            tree_frame,
+            columns=("checked",) + tuple(BROWSE_COLUMNS),
+            show="headings",
+            height=BROWSER_ROWS,
+            selectmode="browse",
+        )
+        self.tree.heading("checked", text="Export")
+        self.tree.column("checked", width=60, stretch=False, anchor="center")
+        for name, heading in BROWSE_COLUMNS.items():
+            self.tree.heading(name, command=lambda name=name: self.sort(name))
+        self.tree.column("ReceivedTime", width=130, stretch=False)
+        self.tree.column("SenderEmailAddress", width=220)
+        self.tree.column("Subject", width=380)
+        self.tree.column("Size", width=80, stretch=False, anchor="e")
+        for slot in range(BROWSER_ROWS):
+            self.tree.insert("", END, iid=str(slot))
+        self.tree.pack(side="left", expand=True, fill="both")
+
+        self.scrollbar = ttk.Scrollbar(
+            tree_frame, orient="vertical", command=self.on_scrollbar
+        )
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<Button-1>", self.on_click)
+        self.tree.bind("<space>", self.on_space)
+        self.tree.bind("<MouseWheel>", self.on_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(WHEEL_ROWS))
+        self.tree.bind("<Up>", lambda event: self.move_focus(-1))
+        self.tree.bind("<Down>", lambda event: self.move_focus(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll_by(-BROWSER_ROWS))
+        self.tree.bind("<Next>", lambda event: self.scroll_by(BROWSER_ROWS))
+
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(fill="x", pady=(5, 0))
+        self.selected_label = ttk.Label(button_frame, text="")
+        self.selected_label.pack(side="left")
+        ttk.Button(button_frame, text="Close", command=self.close).pack(
+            side="right", padx=(5, 0)
+        )
+        self.export_button = ttk.Button(
+            button_frame, text="Export Selected", command=lambda: on_export()
+        )
+        self.export_button.pack(side="right", padx=(5, 0))
+        ttk.Button(
+            button_frame, text="Uncheck All", command=lambda: self.check_all(False)
+        ).pack(side="right", padx=(5, 0))
+        ttk.Button(
+            button_frame, text="Check All", command=lambda: self.check_all(True)
+        ).pack(side="right", padx=(5, 0))
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.update_headings()
+        self.render()
+
+    def exists(self):
+        return self.window is not None
+
+    def set_export_enabled(self, enabled):
+        self.export_button.config(state="normal" if enabled else "disabled")
+
+    def close(self):
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+
+    def render(self):
+        """Show BROWSER_ROWS rows of the view from offset"""
+        total = len(self.browser)
+        self.offset = max(0, min(self.offset, total - BROWSER_ROWS))
+        rows = self.browser.rows(self.offset, BROWSER_ROWS)
+        for slot in range(BROWSER_ROWS):
+            if slot < len(rows):
+                index, checked, values = rows[slot]
+                self.slots[slot] = index
+                check = "☑" if checked else "☐"
+                self.tree.item(str(slot), values=(check,) + values)
+            else:
+                self.slots[slot] = None
+                self.tree.item(str(slot), values=())
+        if total:
+            self.scrollbar.set(
+                self.offset / total, min(1.0, (self.offset + BROWSER_ROWS) / total)
+            )
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.selected_label.config(
+            text=f"{self.browser.selected_count} of {len(self.browser.table)} "
+            f"selected, {total} shown"
+        )
+
+    def scroll_by(self, rows):
+        self.offset += rows
+        self.render()
+        return "break"
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.browser))
+            self.render()
+        elif unit == "pages":
+            self.scroll_by(int(amount) * BROWSER_ROWS)
+        else:
+            self.scroll_by(int(amount))
+
+    def on_wheel(self, event):
+        # Windows reports 120 per notch
+        return self.scroll_by(-(event.delta // 120) * WHEEL_ROWS)
+
+    def move_focus(self, step):
+        focus = self.tree.focus()
+        slot = int(focus) + step if focus else 0
+        if 0 <= slot < BROWSER_ROWS:
+            self.tree.focus(str(slot))
+            self.tree.selection_set(str(slot))
+        else:
+            # Past the first or last item: the rows move under the focus
+            self.scroll_by(step)
+        return "break"
+
+    def toggle_slot(self, slot):
+        index = self.slots[slot]
+        if index is not None:
+            self.browser.toggle(index)
+            self.render()
+            self.on_changed()
+
+    def on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return None
+        if self.tree.identify_column(event.x) == "#1":
+            self.toggle_slot(int(self.tree.identify_row(event.y)))
+            return "break"
+        return None
+
+    def on_space(self, event):
+        if self.tree.focus():
+            self.toggle_slot(int(self.tree.focus()))
+        return "break"
+
+    def check_all(self, checked):
+        self.browser.check_all(checked)
+        self.render()
+        self.on_changed()
+
+    def sort(self, name):
+        self.browser.sort(name)
+        self.offset = 0
+        self.update_headings()
+        self.render()
+
+    def update_headings(self):
+        for name, heading in BROWSE_COLUMNS.items():
+            if name == self.browser.sort_column:
+                heading += " ▼" if self.browser.descending else " ▲"
+            self.tree.heading(name, text=heading)
+
+    def on_filter(self, *args):
+        self.browser.filter(self.filter_text.get())
+        self.offset = 0
+        self.render()
+
+
 class MainWindow:
     _flagged_emails_in_month = []
     _start_of_month = None
@@ -28,12 +454,59 @@ class MainWindow:
         self,
         root,
         title: str = "Rad Law Group. APLC - Email Exporter",
-        height: int = 360,
+        height: int = 460,
         width: int = 240,
     ):
         self.root = root
         self.style = ttk.Style(self.root)
 
+        # Before any widget exists, so the first paint is already themed
+        self.load_theme()
+
+        self.root.title(title)
+        self.root.geometry(f"{width}x{height}")
+
+        # Set the window icon
+        self.set_window_icon()
+
+        # Create main frame
+        self.main_frame = ttk.Frame(root, padding=20)
+        self.main_frame.pack(expand=True, fill="both")
+
+        # Create loading widgets
+        self.create_loading_widgets()
+
+        # Main widgets are built the first time the main interface is shown
+        self.main_widgets_created = False
+
+        # Opt-in: count and time every Outlook call, written out on quit
+        self.profile_path = get_profile_path()
+        self.profiler = None
+        if self.profile_path:
+            from utils.outlook import enable_profiling
+
+            self.profiler = enable_profiling()
+
+        # All Outlook work runs on this thread so the Tk loop never blocks
+        self.worker = OutlookWorker().start()
+        self._job_handlers = {}
+        # Set while flag changes are followed live ([Watch] enabled)
+        self.flag_watch = None
+        # What the email browser shows and which emails are unchecked; kept
+        # when its window closes so the Export button honours the checks
+        self.mail_browser = None
+        self.browser_window = None
+        # One export at a time; both Export buttons are disabled meanwhile
+        self.exporting = False
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+
+        # Closing the window stops the worker and saves like the Quit button
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+
+        # Don't automatically start Outlook check - wait for user to click connect button
+
+    def load_theme(self):
+        """Source forest-light.tcl and switch to it, else keep Tk's theme"""
         # Import the tcl file
         try:
             # Try to find the tcl file in the PyInstaller bundle
@@ -50,25 +523,55 @@ class MainWindow:
             print(f"Error loading theme: {e}")
 
         # Set the theme with the theme_use method
-        self.style.theme_use("forest-light")
-
-        self.root.title(title)
-        self.root.geometry(f"{width}x{height}")
-
-        # Set the window icon
-        self.set_window_icon()
-
-        # Create main frame
-        self.main_frame = ttk.Frame(root, padding=20)
-        self.main_frame.pack(expand=True, fill="both")
-
-        # Create loading widgets
-        self.create_loading_widgets()
-
-        # Create main widgets (initially hidden)
-        self.create_main_widgets()
+        try:
+            self.style.theme_use("forest-light")
+        except TclError as e:
+            # Missing or broken theme files; the default theme still works
+            print(f"Error loading theme: {e}")
 
-        # Don't automatically start Outlook check - wait for user to click connect button
+    def run_in_worker(
+        self,
+        name,
+        function,
+        *args,
+        on_done=None,
+        on_error=None,
+        on_progress=None,
+        on_cancelled=None,
+    ):
+        """Run function(job, *args) on the Outlook worker and route its events
+
+        Returns the job id, e.g. for worker.cancel().
+        """
+        job_id = self.worker.submit(name, function, *args)
+        self._job_handlers[job_id] = {
+            "done": on_done,
+            "error": on_error,
+            "progress": on_progress,
+            "cancelled": on_cancelled,
+        }
+        return job_id
+
+    def poll_worker(self):
+        """Deliver worker events to their handlers on the Tk thread"""
+        events = self.worker.poll(limit=None)
+
+        # Only the latest progress event of a batch is worth drawing
+        latest_progress = {}
+        for event in events:
+            if event.kind == "progress":
+                latest_progress[event.job_id] = event
+
+        for event in events:
+            if event.kind == "progress" and latest_progress[event.job_id] is not event:
+                continue
+            handler = self._job_handlers.get(event.job_id, {}).get(event.kind)
+            if handler is not None:
+                handler(event.payload)
+            if event.kind in ("done", "error", "cancelled"):
+                self._job_handlers.pop(event.job_id, None)
+
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
 
     def set_window_icon(self):
         """Set the window icon to the RLG logo"""
@@ -183,6 +686,8 @@ class MainWindow:
 
     def create_main_widgets(self):
         """Create main application widgets (initially hidden)"""
+        self.main_widgets_created = True
+
         # Welcome label
         self.welcome_label = ttk.Label(
             self.main_frame, text="Email Exporter", font=("Arial", 16, "bold")
@@ -221,6 +726,26 @@ class MainWindow:
         )
         self.folder_form_button.pack(side="right", padx=(5, 0))
 
+        # What to export into
+        self.target_form_label = ttk.Label(self.folder_form_frame, text="Save As")
+        self.target_form_label.pack(anchor="w", pady=(10, 0))
+
+        self.target_combobox = ttk.Combobox(
+            self.folder_form_frame,
+            state="readonly",
+            values=list(EXPORT_TARGETS.values()),
+        )
+        self.target_combobox.pack(fill="x", pady=(5, 0))
+        self.target_combobox.set(EXPORT_TARGETS[get_export_target()])
+        self.target_combobox.bind("<<ComboboxSelected>>", self.save_target_to_config)
+
+        # Opens the email browser
+        self.review_button = ttk.Button(
+            self.main_frame,
+            text="Review Emails",
+            command=self.show_email_browser,
+        )
+
         # Export button
         self.export_button = ttk.Button(
             self.main_frame,
@@ -230,15 +755,39 @@ class MainWindow:
 
         # Quit button
         self.quit_button = ttk.Button(
-            self.main_frame, text="Quit", command=self.root.destroy
+            self.main_frame, text="Quit", command=self.quit
         )
 
+    def quit(self):
+        # The worker unsubscribes from Outlook's events as it stops
+        self.stop_watching()
+        # Lets a running export checkpoint its batch before the app exits
+        self.worker.stop(WORKER_STOP_SECONDS)
+        flush_config()
+        if self.profiler is not None:
+            try:
+                self.profiler.dump(self.profile_path)
+                print(self.profiler.format_report())
+            except OSError as e:
+                print(f"Error: {e}")
+        self.root.destroy()
+
     def save_email_to_config(self, event=None):
         """Save the folder to config when user finishes editing"""
         folder = self.email_form_entry.get().strip()
         if folder:
             set_config("Email", "primary_email", folder)
 
+    def selected_target(self):
+        label = self.target_combobox.get()
+        for target, target_label in EXPORT_TARGETS.items():
+            if target_label == label:
+                return target
+        return "pst"
+
+    def save_target_to_config(self, event=None):
+        set_config("Export", "target", self.selected_target())
+
     def start_outlook_connection(self):
         """Start the Outlook connection process"""
         # Validate folder input
@@ -281,8 +830,8 @@ class MainWindow:
         # Show loading widgets
         self.create_loading_widgets_for_connection()
 
-        # Start Outlook check after a short delay
-        self.root.after(500, self.check_outlook)
+        # Start Outlook check; it runs on the worker so the spinner keeps moving
+        self.check_outlook()
 
     def create_loading_widgets_for_connection(self):
         """Create loading widgets for Outlook connection"""
@@ -302,18 +851,27 @@ class MainWindow:
         self.progress.start()
 
     def check_outlook(self):
-        """Check Outlook connection on main thread"""
-        try:
-            self.outlook_available = is_outlook_installed()
-            if not self.outlook_available:
-                self.error_message = "Outlook is not installed or not accessible"
-        except Exception as e:
-            self.outlook_available = False
-            self.error_message = str(e)
+        """Check Outlook connection on the worker thread"""
+        self.run_in_worker(
+            "connect",
+            check_outlook_installed,
+            on_done=self.on_outlook_checked,
+            on_error=self.on_outlook_check_failed,
+        )
+
+    def on_outlook_checked(self, outlook_available):
+        self.outlook_available = outlook_available
+        if not self.outlook_available:
+            self.error_message = "Outlook is not installed or not accessible"
 
         # Show result immediately
         self.show_result()
 
+    def on_outlook_check_failed(self, error):
+        self.outlook_available = False
+        self.error_message = str(error)
+        self.show_result()
+
     def show_result(self):
         """Show the result of the Outlook check"""
         if self.outlook_available:
@@ -335,32 +893,65 @@ class MainWindow:
         self.loading_label.config(text="Checking flagged emails...")
         self.progress.start()  # Ensure progress bar is running
 
-        try:
-            # Use stored date values if available, otherwise use default
-            if hasattr(self, "extract_start_date") and hasattr(
-                self, "extract_end_date"
-            ):
-                # Use the stored date objects directly
-                (
-                    self._flagged_emails_in_month,
-                    self._start_of_month,
-                    self._end_of_month,
-                ) = get_flagged_emails_in_month(
-                    self.extract_start_date, self.extract_end_date
-                )
-            else:
-                # Use default if no date values are set
-                (
-                    self._flagged_emails_in_month,
-                    self._start_of_month,
-                    self._end_of_month,
-                ) = get_flagged_emails_in_month()
-
-            self.status_label.config(text="Ready to export")
-            self.root.after(500, self.show_main_interface)
-        except Exception as e:
-            self.status_label.config(text=f"Error loading emails: {str(e)}")
-            self.root.after(2000, self.show_main_interface)
+        # Use stored date values if available, otherwise use default
+        self.run_in_worker(
+            "scan",
+            scan_flagged_emails,
+            getattr(self, "extract_start_date", None),
+            getattr(self, "extract_end_date", None),
+            on_done=self.on_flagged_emails_loaded,
+            on_error=self.on_flagged_emails_failed,
+        )
+
+    def on_flagged_emails_loaded(self, result):
+        (
+            self.sync_index,
+            self._flagged_emails_in_month,
+            self._start_of_month,
+            self._end_of_month,
+            scanned_at,
+        ) = result
+
+        self.status_label.config(text="Ready to export")
+        self.root.after(500, self.show_main_interface)
+        if self.mail_browser is not None:
+            self.mail_browser.load(self._flagged_emails_in_month)
+
+        self.stop_watching()
+        if get_watch_enabled():
+            self.flag_watch = FlagWatchJob(
+                self._flagged_emails_in_month,
+                self._start_of_month,
+                self._end_of_month,
+                scanned_at,
+            )
+            job_id = self.worker.every("watch", WATCH_INTERVAL, self.flag_watch)
+            self._job_handlers[job_id] = {
+                "progress": self.on_flagged_emails_changed,
+                "error": self.on_watch_failed,
+            }
+
+    def stop_watching(self):
+        if self.flag_watch is not None:
+            self.flag_watch.stop()
+            self.flag_watch = None
+
+    def on_flagged_emails_changed(self, payload):
+        self._flagged_emails_in_month = payload["flagged_emails"]
+        if self.mail_browser is not None:
+            self.mail_browser.load(self._flagged_emails_in_month)
+            if self.browser_window is not None and self.browser_window.exists():
+                self.browser_window.render()
+        if self.main_widgets_created:
+            self.update_flagged_emails_count()
+
+    def on_watch_failed(self, error):
+        # The count stays as last known; the next scan starts a new watch
+        self.flag_watch = None
+
+    def on_flagged_emails_failed(self, error):
+        self.status_label.config(text=f"Error loading emails: {str(error)}")
+        self.root.after(2000, self.show_main_interface)
 
     def show_main_interface(self):
         """Hide loading widgets and show main interface"""
@@ -373,15 +964,50 @@ class MainWindow:
         self.status_label.pack_forget()
 
         # Show main widgets
+        if not self.main_widgets_created:
+            self.create_main_widgets()
         self.connection_status.pack(pady=10)
-        self.flagged_emails_count_label.config(
-            text=f"Total flagged emails between {self._start_of_month.strftime('%d %B %Y')} and {self._end_of_month.strftime('%d %B %Y')}: {len(self._flagged_emails_in_month)}"
-        )
+        self.update_flagged_emails_count()
         self.flagged_emails_count_label.pack(pady=10)
         self.folder_form_frame.pack(pady=10, fill="x")
+        self.review_button.pack(pady=(10, 0))
         self.export_button.pack(pady=10)
         self.quit_button.pack(pady=5)
 
+    def update_flagged_emails_count(self):
+        text = f"Total flagged emails between {self._start_of_month.strftime('%d %B %Y')} and {self._end_of_month.strftime('%d %B %Y')}: {len(self._flagged_emails_in_month)}"
+        if self.mail_browser is not None and self.mail_browser.unchecked:
+            text += f" ({self.mail_browser.selected_count} selected)"
+        self.flagged_emails_count_label.config(text=text)
+
+    def show_email_browser(self):
+        """Open the email browser, or bring it to the front"""
+        if self.browser_window is not None and self.browser_window.exists():
+            self.browser_window.window.lift()
+            return
+        if self.mail_browser is None:
+            self.mail_browser = MailBrowser(self._flagged_emails_in_month)
+        self.browser_window = EmailBrowserWindow(
+            self.root,
+            self.mail_browser,
+            on_changed=self.update_flagged_emails_count,
+            on_export=self.export_emails_with_progress,
+        )
+        self.browser_window.set_export_enabled(not self.exporting)
+
+    def set_exporting(self, exporting):
+        """Disable both Export buttons while an export runs"""
+        self.exporting = exporting
+        self.export_button.config(state="disabled" if exporting else "normal")
+        if self.browser_window is not None and self.browser_window.exists():
+            self.browser_window.set_export_enabled(not exporting)
+
+    def selected_flagged_emails(self):
+        """The flagged emails left checked in the email browser"""
+        if self.mail_browser is None:
+            return self._flagged_emails_in_month
+        return self.mail_browser.selection()
+
     def show_error(self):
         """Show error message and exit"""
         messagebox.showerror(
@@ -392,15 +1018,22 @@ class MainWindow:
 
     def export_emails_with_progress(self):
         """Export flagged emails with progress window"""
+        if self.exporting:
+            # Another export is still queued or running
+            return
         if not self._flagged_emails_in_month:
             messagebox.showinfo("Export", "No flagged emails found for this month.")
             return
+        flagged_emails = self.selected_flagged_emails()
+        if not len(flagged_emails):
+            messagebox.showinfo("Export", "No flagged emails are checked for export.")
+            return
 
         # Create progress window
         progress_window = self.create_progress_window()
 
         # Start the copy process
-        self.copy_emails_with_progress(self._flagged_emails_in_month, progress_window)
+        self.copy_emails_with_progress(flagged_emails, progress_window)
 
     def create_progress_window(self):
         """Create a progress window for the export process"""
@@ -433,7 +1066,13 @@ class MainWindow:
         details_label = ttk.Label(frame, text="", font=("Arial", 9))
         details_label.pack(pady=5)
 
+        # Cancel button stops the export after the current email; its
+        # command is set once the export job is queued
+        cancel_button = ttk.Button(frame, text="Cancel")
+        cancel_button.pack(pady=5)
+
         # Store references
+        progress_window.cancel_button = cancel_button
         progress_window.progress_bar = progress_bar
         progress_window.status_label = status_label
         progress_window.progress_label = progress_label
@@ -442,82 +1081,117 @@ class MainWindow:
         return progress_window
 
     def copy_emails_with_progress(self, flagged_emails_in_month, progress_window):
-        """Copy emails with progress updates"""
-        try:
-            # Get the flagged emails PST folder
-            flagged_emails_root = get_flagged_emails_in_month_pst(
-                self._start_of_month, self._end_of_month
-            )
+        """Copy emails on the worker, updating the progress window as it goes"""
+        # Update progress bar
+        progress_window.progress_bar["maximum"] = len(flagged_emails_in_month)
+        self.set_exporting(True)
+
+        job_id = self.run_in_worker(
+            "export",
+            export_flagged_emails,
+            self.sync_index,
+            flagged_emails_in_month,
+            self._start_of_month,
+            self._end_of_month,
+            get_batch_size(),
+            self.selected_target(),
+            get_export_attachments(),
+            on_progress=lambda progress: self.show_export_progress(
+                progress_window, **progress
+            ),
+            on_done=lambda summary: self.show_export_complete(
+                progress_window, summary
+            ),
+            on_cancelled=lambda summary: self.show_export_cancelled(
+                progress_window, summary
+            ),
+            on_error=lambda error: self.show_export_error(progress_window, error),
+        )
 
-            # Change name
-            flagged_emails_root.Name = f"Flagged Emails {self._start_of_month.strftime('%m-%d-%y')} - {self._end_of_month.strftime('%m-%d-%y')}.pst"
-
-            existing_emails_in_store = set()
-
-            # Get existing emails - use Subject + ReceivedTime for more reliable duplicate detection
-            for email in flagged_emails_root.Items:
-                # Create a unique identifier using Subject and ReceivedTime
-                email_id = f"{email.Subject}_{email.ReceivedTime.strftime('%Y-%m-%d %H:%M:%S')}"
-                existing_emails_in_store.add(email_id)
-
-            total_emails = len(flagged_emails_in_month)
-            copy_count = 0
-            skip_count = 0
-
-            # Update progress bar
-            progress_window.progress_bar["maximum"] = total_emails
-
-            for i, flagged_email in enumerate(flagged_emails_in_month):
-                # Update progress
-                progress_window.progress_bar["value"] = i + 1
-                progress_window.progress_label.config(
-                    text=f"Processing email {i + 1} of {total_emails}"
-                )
-
-                # Update status
-                flagged_email_id = f"{flagged_email.Subject}_{flagged_email.ReceivedTime.strftime('%Y-%m-%d %H:%M:%S')}"
-                if flagged_email_id in existing_emails_in_store:
-                    progress_window.status_label.config(
-                        text=f"Skipping: {flagged_email.Subject[:60]}..."
-                    )
-                    progress_window.details_label.config(
-                        text=f"Already exists in PST folder"
-                    )
-                    skip_count += 1
-                else:
-                    progress_window.status_label.config(
-                        text=f"Copying: {flagged_email.Subject[:60]}..."
-                    )
-                    progress_window.details_label.config(
-                        text=f"Moving to {flagged_emails_root.Name}"
-                    )
-                    flagged_email.Copy().Move(flagged_emails_root)
-                    copy_count += 1
-
-                # Update the GUI
-                progress_window.update()
-
-            # Show completion message
-            progress_window.progress_label.config(text="Export completed!")
+        def cancel():
+            self.worker.cancel(job_id)
+
+        progress_window.cancel_button.config(command=cancel)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+
+    def show_export_progress(
+        self,
+        progress_window,
+        position,
+        total,
+        subject,
+        rate,
+        stage="copy",
+        retries=0,
+    ):
+        # Update progress
+        progress_window.progress_bar["value"] = position
+        progress_window.progress_label.config(
+            text=f"Processing email {position} of {total}"
+        )
+        if stage == "attachments":
+            progress_window.progress_bar["maximum"] = total
             progress_window.status_label.config(
-                text=f"Copied {copy_count} emails, skipped {skip_count} duplicates"
-            )
-            progress_window.details_label.config(
-                text=f"Total processed: {total_emails} emails"
+                text=f"Saving attachments: {subject[:60]}..."
             )
+            return
+
+        # Update status
+        progress_window.status_label.config(text=f"Copying: {subject[:60]}...")
+        destination = (
+            "archive" if self.selected_target() == "archive" else "PST folder"
+        )
+        details = f"Moving to {destination} ({rate:.1f} emails/s)"
+        if retries:
+            details += f", Outlook busy: {retries} calls retried"
+        progress_window.details_label.config(text=details)
+
+    def show_export_complete(self, progress_window, summary):
+        self.set_exporting(False)
+        progress_window.cancel_button.pack_forget()
+
+        # Show completion message
+        progress_window.progress_label.config(text="Export completed!")
+        progress_window.progress_bar["value"] = summary["total"]
+        progress_window.status_label.config(
+            text=f"Copied {summary['copied']} emails, skipped {summary['skipped']} duplicates"
+        )
+        progress_window.details_label.config(
+            text=f"Total processed: {summary['total']} emails"
+        )
+
+        # Close progress window after 3 seconds
+        progress_window.after(3000, progress_window.destroy)
 
-            # Close progress window after 3 seconds
-            progress_window.after(3000, progress_window.destroy)
+        # Show completion message
+        if "archive" in summary:
+            destination, file_line = "archive", f"Archive file: {summary['archive']}"
+        else:
+            destination, file_line = "PST", f"PST file: {summary['pst']}"
+        if "report" in summary:
+            file_line += "\nSummaries: " + os.path.basename(summary["report"][-1])
+        if "attachments" in summary:
+            file_line += "\nAttachments: " + os.path.basename(
+                summary["attachments"]["path"]
+            )
+        messagebox.showinfo(
+            "Export Complete",
+            f"Successfully exported {summary['copied']} emails to {destination}.\nSkipped {summary['skipped']} duplicates.\nFailed {summary['failed']} emails.\n\n{file_line}",
+        )
 
-            # Show completion message
+    def show_export_cancelled(self, progress_window, summary):
+        self.set_exporting(False)
+        progress_window.destroy()
+        if summary:
             messagebox.showinfo(
-                "Export Complete",
-                f"Successfully exported {copy_count} emails to PST.\nSkipped {skip_count} duplicates.\n\nPST file: {flagged_emails_root.Name}",
+                "Export Cancelled",
+                f"Export cancelled after copying {summary['copied']} emails.\nRun the export again to continue where it stopped.",
             )
 
-        except Exception as e:
-            progress_window.destroy()
-            messagebox.showerror("Export Error", f"Error during export: {str(e)}")
+    def show_export_error(self, progress_window, error):
+        self.set_exporting(False)
+        progress_window.destroy()
+        messagebox.showerror("Export Error", f"Error during export: {str(error)}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import pytest
+
+
+@pytest.fixture
+def tk_root():
+    """A Tk root window; tests using it are skipped without a display"""
+    tkinter = pytest.importorskip("tkinter")
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        pytest.skip(f"Tk is unavailable: {e}")
+    yield root
+    try:
+        root.destroy()
+    except tkinter.TclError:
+        pass  # Already destroyed, e.g. by MainWindow.quit()
@@ -0,0 +1,161 @@
+import os
+from datetime import datetime
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from types import SimpleNamespace
+
+import pytest
+
+from utils.archive import MailArchive
+from utils.fake import FakeAttachment, FakeAttachments, FakeMailItem
+from utils.mime import OL_CC, OL_TO, message_from_item
+
+
+def email(number, sender="Client {number} <client{number}@example.com>"):
+    message = EmailMessage()
+    message["Subject"] = f"Email {number}"
+    message["From"] = sender.format(number=number)
+    message["Date"] = "Tue, 03 Mar 2026 09:00:00 +0000"
+    message["Message-ID"] = f"<{number}@example.com>"
+    message.set_content(f"Body {number}\n" * 50)
+    return message
+
+
+def crash(archive):
+    """Leave archive as a process that died before committing would"""
+    archive._writer.flush()
+    archive._pending = []
+    archive.close()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "flagged.mailarc")
+
+
+def test_message_from_item_keeps_recipients_html_and_attachments():
+    attachment = FakeAttachment("contract.pdf", Size=3000, seed=7)
+    link = FakeAttachment("share.lnk")
+    link.Type = 4  # A link to a file share, with no content
+    item = FakeMailItem(
+        "Contract",
+        datetime(2026, 3, 3, 9, 0),
+        SenderEmailAddress="client@example.com",
+        Body="See attached",
+        HTMLBody="<p>See <b>attached</b></p>",
+        Recipients=[
+            SimpleNamespace(Type=OL_TO, Name="Partner", Address="partner@firm.com"),
+            SimpleNamespace(Type=OL_CC, Name="", Address="assistant@firm.com"),
+            SimpleNamespace(Type=3, Name="Hidden", Address="bcc@firm.com"),
+        ],
+    )
+    item.Attachments = FakeAttachments([attachment, link])
+
+    message = BytesParser(policy=policy.default).parsebytes(
+        message_from_item(item).as_bytes()
+    )
+
+    assert message["To"] == "Partner <partner@firm.com>"
+    assert message["Cc"] == "assistant@firm.com"
+    assert "bcc@firm.com" not in message.as_string()
+    assert message.get_body(("plain",)).get_content().strip() == "See attached"
+    assert "<b>attached</b>" in message.get_body(("html",)).get_content()
+    attachments = list(message.iter_attachments())
+    assert [part.get_filename() for part in attachments] == ["contract.pdf"]
+    assert attachments[0].get_content_type() == "application/pdf"
+    assert attachments[0].get_content() == b"".join(attachment.chunks())
+
+
+def test_message_from_item_falls_back_to_display_names():
+    item = FakeMailItem("Hello", To="Partner One; Partner Two", CC="")
+
+    message = message_from_item(item)
+
+    assert len(message["To"].addresses) == 2
+    assert "Partner One" in message["To"] and "Partner Two" in message["To"]
+    assert message["Cc"] is None
+    assert not message.is_multipart()
+
+
+def test_senders_are_indexed_by_address(path):
+    with MailArchive(path) as archive:
+        archive.add_message(email(1))
+        archive.commit()
+
+        assert [entry.sender for entry in archive.search()] == ["client1@example.com"]
+        assert len(archive.search(sender="client1@example.com")) == 1
+
+
+def test_rebuilt_index_matches_the_original(path):
+    with MailArchive(path) as archive:
+        for number in range(5):
+            archive.add_message(email(number))
+        archive.commit()
+        before = archive.search()
+
+        assert archive.rebuild_index() == 5
+
+        assert archive.search() == before
+
+
+def test_uncommitted_frames_are_recovered(path):
+    archive = MailArchive(path)
+    for number in range(3):
+        archive.add_message(email(number))
+    archive.commit()
+    for number in range(3, 5):
+        archive.add_message(email(number))
+    crash(archive)
+
+    with MailArchive(path) as archive:
+        assert archive.recovered == 2
+        assert len(archive) == 5
+        # Recovered rows are indexed like committed ones
+        assert len(archive.search(sender="client4@example.com")) == 1
+        assert archive.message(archive.search(subject="Email 4")[0])["Subject"] == (
+            "Email 4"
+        )
+
+
+def test_torn_final_frame_is_cut_off(path):
+    archive = MailArchive(path)
+    for number in range(3):
+        archive.add_message(email(number))
+    archive.commit()
+    archive.add_message(email(3))
+    last_offset = archive._end
+    archive.add_message(email(4))
+    crash(archive)
+    # The process died while the last frame was being written
+    os.truncate(path, last_offset + (os.path.getsize(path) - last_offset) // 2)
+
+    with MailArchive(path) as archive:
+        assert archive.recovered == 1
+        assert len(archive) == 4
+        assert os.path.getsize(path) == last_offset
+        # Appends continue from the cut, and the torn email can be added again
+        assert archive.add_message(email(4))
+        archive.commit()
+
+    with MailArchive(path) as archive:
+        assert archive.recovered == 0
+        assert [entry.subject for entry in archive.search()] == [
+            f"Email {number}" for number in range(5)
+        ]
+        assert archive.message(archive.search(subject="Email 4")[0])["From"] == (
+            "Client 4 <client4@example.com>"
+        )
+
+
+def test_torn_header_is_cut_off(path):
+    with MailArchive(path) as archive:
+        archive.add_message(email(0))
+    end = os.path.getsize(path)
+    with open(path, "ab") as archive_file:
+        archive_file.write(b"MARC\x01\x02")
+
+    with MailArchive(path) as archive:
+        assert archive.recovered == 0
+        assert len(archive) == 1
+        assert os.path.getsize(path) == end
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import timedelta
+from email.message import EmailMessage
+
+from utils import outlook
+from utils.attachments import AttachmentStore, save_attachments
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeAttachment, FakeFolder, FakeNamespace
+from utils.index import SyncIndex
+
+LAST_DAY = FIRST_DAY + timedelta(days=6)
+
+
+def test_attachments_are_saved_from_the_exported_scan(tmp_path, monkeypatch):
+    inbox = generate_mailbox(300, flag_ratio=0.5, days=7)
+    for number, email in enumerate(inbox.Items):
+        if number % 3 == 0:
+            # The same contract on every third email
+            email.Attachments.Add(FakeAttachment("contract.pdf", 4096, seed=1))
+            email.Attachments.Add(FakeAttachment(f"{number}.txt", 100, seed=number))
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    with SyncIndex(str(tmp_path / "sync_index.db")) as index:
+        flagged_emails, _, _ = outlook.sync_flagged_emails_in_month(
+            index, FIRST_DAY, LAST_DAY, inbox
+        )
+    opened = []
+
+    def resolve(entry_id):
+        opened.append(entry_id)
+        return namespace.GetItemFromID(entry_id)
+
+    # No Outlook session: nothing may be scanned again
+    monkeypatch.setattr(outlook, "session", None)
+
+    summary = outlook.export_flagged_attachments(
+        str(tmp_path / "March.pst"),
+        FIRST_DAY,
+        LAST_DAY,
+        resolve=resolve,
+        flagged_emails=flagged_emails,
+    )
+
+    with_attachments = [
+        email.EntryID
+        for email in inbox.Items
+        if email.Attachments.Count and email.EntryID in flagged_emails.column("EntryID")
+    ]
+    assert sorted(opened) == sorted(with_attachments)
+    assert summary["emails"] == len(with_attachments)
+    assert summary["files"] == 2 * len(with_attachments)
+    assert summary["blobs_written"] == len(with_attachments) + 1
+
+
+def test_mime_attachments_are_saved_decoded(tmp_path):
+    content = bytes(range(256)) * 5000
+    message = EmailMessage()
+    message["Subject"] = "Contract"
+    message.set_content("See attached")
+    message.add_attachment(content, "application", "pdf", filename="contract.pdf")
+
+    with AttachmentStore(str(tmp_path / "attachments")) as store:
+        saved = save_attachments(store, message)
+        with open(store.blob_path(saved[0]["sha256"]), "rb") as blob_file:
+            assert blob_file.read() == content
+
+    assert saved == [
+        {
+            "file_name": "contract.pdf",
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "size": len(content),
+        }
+    ]
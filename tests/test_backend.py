@@ -0,0 +1,149 @@
+import mailbox
+import os
+from datetime import date
+from email.message import EmailMessage
+
+import pytest
+
+from utils.archive import FINGERPRINT_HEADER
+from utils.backend import LocalBackend, MailBackend, export_folder
+from utils.query import build_flagged_filter
+
+START = date(2026, 3, 1)
+END = date(2026, 3, 31)
+
+
+def message(subject, sender, date_header=None, message_id=None, flagged=True):
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    if date_header:
+        message["Date"] = date_header
+    if message_id:
+        message["Message-ID"] = message_id
+    if flagged:
+        message["X-Flagged"] = "yes"
+    message.set_content(f"Body of {subject}")
+    return message
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "mail").mkdir()
+    inbox = mailbox.Maildir(str(tmp_path / "mail" / "Inbox"))
+    for email in (
+        message(
+            "Has an id",
+            "client1@example.com",
+            "Tue, 03 Mar 2026 09:00:00 +0000",
+            "<one@example.com>",
+        ),
+        # No Message-ID, and a display name the copy keeps in From
+        message(
+            "No id",
+            "Client Two <client2@example.com>",
+            "Wed, 04 Mar 2026 10:30:00 -0500",
+        ),
+        message("No id, no date", "client3@example.com"),
+        message(
+            "Not flagged",
+            "client4@example.com",
+            "Thu, 05 Mar 2026 11:00:00 +0000",
+            flagged=False,
+        ),
+    ):
+        inbox.add(email)
+    # Undated mail is dated by its file; keep it inside the range
+    stamp = 1772712000  # 2026-03-05
+    for directory, _, files in os.walk(str(tmp_path / "mail" / "Inbox")):
+        for name in files:
+            os.utime(os.path.join(directory, name), (stamp, stamp))
+    return str(tmp_path / "mail")
+
+
+def test_mail_backend_is_abstract():
+    with pytest.raises(TypeError):
+        MailBackend()
+
+
+def test_export_folder_copies_the_flagged_mail(root, tmp_path):
+    archive_path = str(tmp_path / "out.mbox")
+
+    summary = export_folder(LocalBackend(root), "Inbox", archive_path, START, END)
+
+    assert (summary["total"], summary["copied"]) == (3, 3)
+    archive = mailbox.mbox(archive_path)
+    assert sorted(str(email["Subject"]) for email in archive) == [
+        "Has an id",
+        "No id",
+        "No id, no date",
+    ]
+    assert all(email[FINGERPRINT_HEADER] for email in archive)
+
+
+@pytest.mark.parametrize("archive_name", ["out.mbox", "out"])
+def test_rerun_copies_nothing_again(root, tmp_path, archive_name):
+    archive_path = str(tmp_path / archive_name)
+    export_folder(LocalBackend(root), "Inbox", archive_path, START, END)
+
+    summary = export_folder(LocalBackend(root), "Inbox", archive_path, START, END)
+
+    assert (summary["copied"], summary["skipped"]) == (0, 3)
+    if archive_name.endswith(".mbox"):
+        assert len(mailbox.mbox(archive_path)) == 3
+    else:
+        assert len(mailbox.Maildir(archive_path)) == 3
+
+
+def test_messages_not_written_by_the_export_fall_back_to_headers(root, tmp_path):
+    archive_path = str(tmp_path / "out.mbox")
+    archive = mailbox.mbox(archive_path)
+    archive.add(
+        message(
+            "Has an id",
+            "client1@example.com",
+            "Tue, 03 Mar 2026 09:00:00 +0000",
+            "<one@example.com>",
+        )
+    )
+    archive.close()
+
+    summary = export_folder(LocalBackend(root), "Inbox", archive_path, START, END)
+
+    assert (summary["copied"], summary["skipped"]) == (2, 1)
+
+
+def test_rows_carry_the_bare_sender_address_and_attachments(root):
+    inbox = mailbox.Maildir(os.path.join(root, "Inbox"))
+    with_attachment = message(
+        "Contract", "Client Five <client5@example.com>", "Fri, 06 Mar 2026 09:00:00"
+    )
+    with_attachment.add_attachment(b"%PDF", "application", "pdf", filename="a.pdf")
+    inbox.add(with_attachment)
+    backend = LocalBackend(root)
+
+    rows = {row.Subject: row for row in backend.query("Inbox")}
+
+    assert rows["No id"].SenderEmailAddress == "client2@example.com"
+    assert rows["Contract"].HasAttachments is True
+    assert rows["No id"].HasAttachments is False
+    flagged_from = build_flagged_filter(START, END, senders=["client2@example.com"])
+    assert [row.Subject for row in backend.query("Inbox", flagged_from)] == ["No id"]
+
+
+def test_archived_mail_without_an_id_is_matched_by_sender_address(root, tmp_path):
+    archive_path = str(tmp_path / "out.mbox")
+    archive = mailbox.mbox(archive_path)
+    # Copied by another tool: no fingerprint header, From with a display name
+    archive.add(
+        message(
+            "No id",
+            "Client Two <client2@example.com>",
+            "Wed, 04 Mar 2026 10:30:00 -0500",
+        )
+    )
+    archive.close()
+
+    summary = export_folder(LocalBackend(root), "Inbox", archive_path, START, END)
+
+    assert (summary["copied"], summary["skipped"]) == (2, 1)
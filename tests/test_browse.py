@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.browse import MailBrowser
+from utils.fake import FakeFolder, FakeMailItem
+from utils.table import get_table
+
+FIRST = datetime(2026, 3, 2, 9)
+SENDERS = ["a@acme.com", "b@Acme.com", "c@other.org"]
+
+
+@pytest.fixture
+def flagged_emails():
+    folder = FakeFolder(
+        "Inbox",
+        [
+            FakeMailItem(
+                f"Invoice {number}" if number % 2 else f"Retainer {number}",
+                FIRST + timedelta(hours=number),
+                2,
+                SENDERS[number % 3],
+                Size=1024 * (number + 1),
+            )
+            for number in range(250)
+        ],
+    )
+    return get_table(folder)
+
+
+def test_rows_are_formatted_a_page_at_a_time(flagged_emails):
+    browser = MailBrowser(flagged_emails, page_size=100)
+
+    rows = browser.rows(95, 10)
+
+    assert [index for index, _, _ in rows] == list(range(95, 105))
+    assert all(checked for _, checked, _ in rows)
+    assert rows[0][2] == ("2026-03-06 08:00", "c@other.org", "Invoice 95", "96 KB")
+    assert sorted(browser._pages) == [0, 1]
+
+
+def test_filter_matches_sender_or_subject_in_any_case(flagged_emails):
+    browser = MailBrowser(flagged_emails)
+
+    browser.filter("ACME")
+    assert len(browser) == 167
+    browser.filter("acme.com inv")
+    assert len(browser) == 0
+    browser.filter("invoice 1")
+    assert {values[2] for _, _, values in browser.rows(0, 1000)} == {
+        f"Invoice {number}"
+        for number in range(250)
+        if number % 2 and str(number).startswith("1")
+    }
+    browser.filter("")
+    assert len(browser) == len(flagged_emails)
+
+
+def test_sort_flips_on_repeat_and_keeps_the_filter(flagged_emails):
+    browser = MailBrowser(flagged_emails)
+    browser.filter("other.org")
+
+    browser.sort("Size")
+    sizes = [flagged_emails[index].Size for index, _, _ in browser.rows(0, 1000)]
+    assert sizes == sorted(sizes)
+    browser.sort("Size")
+    sizes = [flagged_emails[index].Size for index, _, _ in browser.rows(0, 1000)]
+    assert sizes == sorted(sizes, reverse=True)
+    assert len(browser) == 83
+
+
+def test_unchecked_emails_are_left_out_of_the_selection(flagged_emails):
+    browser = MailBrowser(flagged_emails)
+    browser.filter("other.org")
+    browser.check_all(False)
+    browser.toggle(2)
+
+    selection = browser.selection()
+
+    assert browser.selected_count == len(flagged_emails) - 82
+    assert len(selection) == browser.selected_count
+    assert "c@other.org" in selection.column("SenderEmailAddress")
+    # A newer scan keeps what was unchecked
+    browser.load(flagged_emails.take(range(100)))
+    assert browser.selected_count == 100 - 32
+
+
+def test_browser_window_renders_and_filters(tk_root, flagged_emails):
+    import gui
+
+    changes = []
+    window = gui.EmailBrowserWindow(
+        tk_root, MailBrowser(flagged_emails), lambda: changes.append(1), lambda: None
+    )
+    try:
+        first = window.tree.item("0", "values")
+        assert first[0] == "☑"
+        assert first[3] == "Retainer 0"
+
+        window.filter_text.set("other.org")
+        assert window.tree.item("0", "values")[2] == "c@other.org"
+        assert window.selected_label.cget("text") == "250 of 250 selected, 83 shown"
+
+        window.toggle_slot(0)
+        assert window.tree.item("0", "values")[0] == "☐"
+        assert window.selected_label.cget("text") == "249 of 250 selected, 83 shown"
+        assert changes == [1]
+
+        window.scroll_by(1000)
+        assert window.offset == 83 - gui.BROWSER_ROWS
+        assert window.slots[-1] is not None
+    finally:
+        window.close()
+
+
+def test_only_one_export_is_queued(tk_root, flagged_emails, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import gui
+
+    main_window = gui.MainWindow(tk_root)
+    try:
+        queued = []
+        monkeypatch.setattr(
+            main_window, "run_in_worker", lambda *args, **options: queued.append(args)
+        )
+        main_window._flagged_emails_in_month = flagged_emails
+        main_window._start_of_month = FIRST.date()
+        main_window._end_of_month = FIRST.date()
+        # The other main widgets need a config.ini
+        main_window.export_button = gui.ttk.Button(main_window.main_frame)
+        main_window.show_email_browser()
+
+        main_window.export_emails_with_progress()
+        # E.g. Export Selected pressed before its window saw the first export
+        main_window.export_emails_with_progress()
+
+        assert len(queued) == 1
+        assert main_window.browser_window.export_button.instate(["disabled"])
+    finally:
+        main_window.worker.stop(1)
@@ -0,0 +1,174 @@
+import json
+import mailbox
+import os
+from datetime import timedelta
+from email.message import EmailMessage
+
+import pytest
+
+from utils import outlook
+from utils.__main__ import main
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeFolder, FakeNamespace
+from utils.journal import ExportJournal
+
+LAST_DAY = FIRST_DAY + timedelta(days=6)
+RANGE = ["--start", FIRST_DAY.isoformat(), "--end", LAST_DAY.isoformat()]
+
+
+@pytest.fixture
+def inbox(tmp_path, monkeypatch):
+    # No config.ini here, so every setting comes from the command line
+    monkeypatch.chdir(tmp_path)
+    inbox = generate_mailbox(200, flag_ratio=0.5, days=7)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    monkeypatch.setattr(outlook, "connect_outlook", lambda: namespace)
+    monkeypatch.setattr(outlook, "session", None)
+    return inbox
+
+
+def run(*argv):
+    code = main(list(argv) + ["--summary", "summary.json"])
+    with open("summary.json") as summary_file:
+        return code, json.load(summary_file)
+
+
+def flagged_count(inbox):
+    return sum(
+        email.FlagStatus == 2 and FIRST_DAY <= email.ReceivedTime.date() <= LAST_DAY
+        for email in inbox.Items
+    )
+
+
+def test_export_writes_a_summary_per_mailbox(inbox):
+    code, summary = run("export", "--mailbox", MAILBOX, "--output", "out", *RANGE)
+
+    assert code == 0
+    assert summary["ok"] is True
+    assert summary["start"] == FIRST_DAY.isoformat()
+    assert summary["end"] == LAST_DAY.isoformat()
+    assert {"started_at", "seconds", "throttle", "output"} <= set(summary)
+    (result,) = summary["mailboxes"]
+    assert result["mailbox"] == MAILBOX
+    assert list(result["phases"]) == ["connect", "scan", "export", "report"]
+    assert result["flagged"] == result["copied"] == flagged_count(inbox)
+    assert result["failed"] == 0
+    assert os.path.dirname(result["path"]) == os.path.join("out", MAILBOX)
+    assert len(result["report"]) == 4
+    # Checkpointed in the journal
+    assert result["pending"] == 0
+
+
+def test_stream_export_copies_without_the_journal(inbox):
+    code, summary = run(
+        "export", "--mailbox", MAILBOX, "--output", "out", "--stream", *RANGE
+    )
+
+    (result,) = summary["mailboxes"]
+    assert code == 0
+    assert list(result["phases"]) == ["connect", "export", "report"]
+    assert result["flagged"] == result["scanned"] == result["copied"]
+    assert result["copied"] == flagged_count(inbox)
+    assert "first_item_seconds" in result
+    assert "pending" not in result
+    with ExportJournal() as journal:
+        assert journal.counts(ExportJournal.job_for(result["path"])) == {}
+
+
+def test_failed_mailbox_fails_the_run(inbox):
+    code, summary = run(
+        "export",
+        "--mailbox",
+        MAILBOX,
+        "--mailbox",
+        "nobody@example.com",
+        "--output",
+        "out",
+        "--no-report",
+        *RANGE,
+    )
+
+    assert code == 1
+    assert summary["ok"] is False
+    first, second = summary["mailboxes"]
+    assert first["ok"] is True
+    assert second["ok"] is False
+    assert "nobody@example.com" in second["error"]
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (["--output", "out"], "No --mailbox given"),
+        (["--mailbox", MAILBOX], "No --output given"),
+        (
+            ["--mailbox", MAILBOX, "--output", "out", "--format", "mailarc"]
+            + ["--shard-by", "month"],
+            "--shard-by writes PSTs",
+        ),
+        (
+            ["--mailbox", MAILBOX, "--output", "out", "--stream"]
+            + ["--scan-workers", "2"],
+            "--stream scans as it copies",
+        ),
+    ],
+)
+def test_export_refuses_incomplete_or_conflicting_options(inbox, argv, message):
+    with pytest.raises(SystemExit, match=message):
+        main(["export"] + argv)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--stream", "--shard-by", "month"],
+        ["--shard-by", "0"],
+        ["--start", "March"],
+        ["--format", "zip"],
+    ],
+)
+def test_export_rejects_bad_arguments(inbox, argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["export", "--mailbox", MAILBOX, "--output", "out"] + argv)
+
+    assert exit_info.value.code == 2
+    assert "usage:" in capsys.readouterr().err
+
+
+def message(subject, date_header, flagged=True):
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = "Client <client@example.com>"
+    message["Date"] = date_header
+    if flagged:
+        message["X-Flagged"] = "yes"
+    message.set_content(f"Body of {subject}")
+    return message
+
+
+def test_archive_exports_local_mail_without_outlook(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(outlook, "session", None)
+    (tmp_path / "mail").mkdir()
+    inbox = mailbox.Maildir(str(tmp_path / "mail" / "Inbox"))
+    inbox.add(message("Retainer", "Tue, 03 Mar 2026 09:00:00 +0000"))
+    inbox.add(message("Invoice", "Wed, 04 Mar 2026 10:00:00 +0000"))
+    inbox.add(message("Lunch", "Wed, 04 Mar 2026 12:00:00 +0000", flagged=False))
+    inbox.add(message("February", "Fri, 27 Feb 2026 09:00:00 +0000"))
+    argv = ["archive", "--source", "mail", "--folder", "Inbox"]
+    argv += ["--output", "flagged.mbox", "--start", "2026-03-01", "--end", "2026-03-31"]
+
+    code, summary = run(*argv)
+
+    assert code == 0
+    assert summary["ok"] is True
+    (export,) = summary["exports"]
+    assert export["folder"] == "Inbox"
+    assert export["copied"] == 2
+    assert sorted(email["Subject"] for email in mailbox.mbox("flagged.mbox")) == [
+        "Invoice",
+        "Retainer",
+    ]
+    # A rerun finds both in the archive already
+    _, summary = run(*argv)
+    assert summary["exports"][0]["copied"] == 0
@@ -0,0 +1,185 @@
+import configparser
+import os
+import time
+
+import pytest
+
+from utils.config import ConfigStore
+
+CONFIG = """\
+[Email]
+primary_email = partner@radlawgroup.com
+
+[Folder]
+output_folder = D:/Billing
+
+[Folder:associate@radlawgroup.com]
+output_folder = D:/Associates
+
+[Export]
+batch_size = 50
+attachments = yes
+"""
+
+WRITE_DELAY = 0.05
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def read(path):
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    return parser
+
+
+def edit(path, text):
+    """Rewrite path as another program would, with a newer mtime"""
+    with open(path, "w") as config_file:
+        config_file.write(text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def wait_for_write(store, writes=1, timeout=5):
+    deadline = time.monotonic() + timeout
+    while store.writes < writes and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_values_are_read_once_and_converted(path):
+    store = ConfigStore(path)
+
+    assert store.get("Email", "primary_email") == "partner@radlawgroup.com"
+    assert store.get("Export", "batch_size", int) == 50
+    assert store.get("Export", "attachments", bool) is True
+    assert store.get("Export", "retries", int, default=3) == 3
+    with pytest.raises(KeyError):
+        store.get("Export", "retries")
+    with pytest.raises(KeyError):
+        store.get("Watch", "enabled")
+    assert store.loads == 1
+
+
+def test_missing_file(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.ini"))
+
+    with pytest.raises(FileNotFoundError):
+        store.get("Email", "primary_email")
+    with pytest.raises(FileNotFoundError):
+        store.set("Email", "primary_email", "a@x.com")
+    assert store.get("Email", "primary_email", default=None) is None
+
+
+def test_profile_sections_override_the_shared_one(path):
+    store = ConfigStore(path, write_delay=WRITE_DELAY)
+
+    assert store.get("Folder", "output_folder") == "D:/Billing"
+    assert (
+        store.get("Folder", "output_folder", profile="associate@radlawgroup.com")
+        == "D:/Associates"
+    )
+    # No override for this profile
+    assert store.get("Folder", "output_folder", profile="a@x.com") == "D:/Billing"
+
+    store.set("Folder", "output_folder", "E:/A", profile="a@x.com")
+    store.flush()
+
+    assert store.get("Folder", "output_folder", profile="a@x.com") == "E:/A"
+    assert store.get("Folder", "output_folder") == "D:/Billing"
+    assert read(path)["Folder:a@x.com"]["output_folder"] == "E:/A"
+
+
+def test_a_burst_of_changes_is_written_once(path):
+    store = ConfigStore(path, write_delay=WRITE_DELAY)
+
+    for number in range(20):
+        store.set("Folder", "output_folder", f"D:/Billing/{number}")
+        # Served from memory at once
+        assert store.get("Folder", "output_folder") == f"D:/Billing/{number}"
+    assert read(path)["Folder"]["output_folder"] == "D:/Billing"
+
+    wait_for_write(store)
+    time.sleep(WRITE_DELAY * 2)
+
+    assert store.writes == 1
+    assert read(path)["Folder"]["output_folder"] == "D:/Billing/19"
+    # The rest of the file is kept
+    assert read(path)["Export"]["batch_size"] == "50"
+
+
+def test_unchanged_values_are_not_written(path):
+    store = ConfigStore(path, write_delay=WRITE_DELAY)
+
+    store.set("Export", "batch_size", 50)
+    store.flush()
+
+    assert store.writes == 0
+
+
+def test_write_replaces_the_file_atomically(path, monkeypatch):
+    store = ConfigStore(path, write_delay=60)
+    store.set("Export", "batch_size", 100)
+    replaced = []
+
+    def failing_replace(source, destination):
+        replaced.append((source, destination))
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        store.flush()
+
+    [(temporary_path, destination)] = replaced
+    assert destination == path
+    assert os.path.dirname(temporary_path) == os.path.dirname(path)
+    # Neither the file nor a leftover temporary file was touched
+    with open(path) as config_file:
+        assert config_file.read() == CONFIG
+    assert os.listdir(os.path.dirname(path)) == ["config.ini"]
+
+    monkeypatch.undo()
+    store.flush()
+    assert read(path)["Export"]["batch_size"] == "100"
+    assert store.writes == 1
+
+
+def test_outside_edits_are_picked_up_once_the_interval_passes(path):
+    store = ConfigStore(path, check_interval=60)
+    assert store.get("Export", "batch_size", int) == 50
+
+    edit(path, CONFIG.replace("batch_size = 50", "batch_size = 75"))
+
+    assert store.get("Export", "batch_size", int) == 50
+    store.refresh(force=True)
+    assert store.get("Export", "batch_size", int) == 75
+    assert store.loads == 2
+
+    store.check_interval = 0
+    edit(path, CONFIG.replace("batch_size = 50", "batch_size = 80"))
+    assert store.get("Export", "batch_size", int) == 80
+    # Unchanged since, so not parsed again
+    store.get("Export", "batch_size", int)
+    assert store.loads == 3
+
+
+def test_pending_changes_win_over_a_stale_file(path):
+    store = ConfigStore(path, check_interval=0, write_delay=60)
+    store.set("Folder", "output_folder", "E:/Billing")
+
+    # Edited on disk before the change was written
+    edit(path, CONFIG.replace("batch_size = 50", "batch_size = 75"))
+
+    assert store.get("Export", "batch_size", int) == 75
+    assert store.get("Folder", "output_folder") == "E:/Billing"
+
+    store.flush()
+
+    on_disk = read(path)
+    assert on_disk["Folder"]["output_folder"] == "E:/Billing"
+    assert on_disk["Export"]["batch_size"] == "75"
+    assert store.writes == 1
@@ -0,0 +1,167 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeFolder, FakeMailItem, FakeNamespace, SlowProxy
+from utils.fingerprint import fingerprint_row, folder_fingerprints
+from utils.index import SyncIndex
+from utils.outlook import (
+    ScanStats,
+    get_flagged_emails_in_month,
+    get_store_fingerprints,
+    iter_flagged_emails,
+)
+from utils.pipeline import PstTarget, export_rows
+from utils.table import FETCH_BATCH_SIZE, get_table
+
+DAYS = 7
+LAST_DAY = FIRST_DAY + timedelta(days=DAYS - 1)
+PST_PATH = "C:\\Exports\\Flagged Emails.pst"
+
+
+@pytest.fixture
+def mailbox():
+    # Many emails without a Message-ID, which dedupe by content hash
+    inbox = generate_mailbox(1000, flag_ratio=0.5, days=DAYS, missing_id_rate=0.3)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, LAST_DAY, folder=inbox
+    )
+    return namespace, flagged_emails
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SyncIndex(str(tmp_path / "sync_index.db")) as index:
+        yield index
+
+
+def test_fallback_fingerprint_ignores_size():
+    email = FakeMailItem(
+        "No id", datetime(2026, 1, 1, 9, 30), SenderEmailAddress="a@example.com"
+    )
+    email.InternetMessageID = ""
+    copy = FakeMailItem.Copy(email)
+    # Outlook grows an item's Size when it is copied into a PST
+    copy.Size += 512
+
+    assert fingerprint_row(copy) == fingerprint_row(email)
+
+
+def test_export_copies_every_flagged_email_once(mailbox):
+    namespace, flagged_emails = mailbox
+    pst = FakeFolder("Flagged Emails")
+
+    summary = export_rows(
+        flagged_emails,
+        PstTarget(pst, namespace.GetItemFromID),
+        folder_fingerprints(pst),
+    )
+
+    expected = set(map(fingerprint_row, flagged_emails))
+    contents = Counter(map(fingerprint_row, get_table(pst)))
+    assert set(contents) == expected
+    assert max(contents.values()) == 1
+    assert summary["copied"] == len(expected)
+    assert summary["skipped"] == len(flagged_emails) - len(expected)
+
+
+def test_rerun_against_the_pst_copies_nothing(mailbox):
+    namespace, flagged_emails = mailbox
+    pst = FakeFolder("Flagged Emails")
+    export_rows(
+        flagged_emails,
+        PstTarget(pst, namespace.GetItemFromID),
+        folder_fingerprints(pst),
+    )
+    for email in pst.Items:
+        email.Size += 512
+    count = len(pst.Items)
+
+    summary = export_rows(
+        flagged_emails,
+        PstTarget(pst, namespace.GetItemFromID),
+        folder_fingerprints(pst),
+    )
+
+    assert summary["copied"] == 0
+    assert len(pst.Items) == count
+
+
+def test_existing_empty_pst_is_fingerprinted_once(index):
+    calls = Counter()
+    pst = SlowProxy(FakeFolder("Flagged Emails"), calls=calls)
+
+    for _ in range(3):
+        assert len(get_store_fingerprints(index, PST_PATH, pst, False)) == 0
+
+    assert calls["GetTable"] == 1
+    assert index.has_store(PST_PATH)
+
+
+def test_new_pst_is_never_fingerprinted(index):
+    calls = Counter()
+    pst = SlowProxy(FakeFolder("Flagged Emails"), calls=calls)
+    index.add_fingerprints(PST_PATH, [1, 2, 3])
+
+    assert len(get_store_fingerprints(index, PST_PATH, pst, True)) == 0
+    assert len(get_store_fingerprints(index, PST_PATH, pst, False)) == 0
+    assert calls["GetTable"] == 0
+
+
+def test_known_pst_is_answered_from_the_index(index, mailbox):
+    namespace, flagged_emails = mailbox
+    calls = Counter()
+    pst = SlowProxy(FakeFolder("Flagged Emails"), calls=calls)
+
+    existing_fingerprints = get_store_fingerprints(index, PST_PATH, pst, True)
+    export_rows(
+        flagged_emails,
+        PstTarget(pst, namespace.GetItemFromID),
+        existing_fingerprints,
+        record=lambda fingerprints: index.add_fingerprints(PST_PATH, fingerprints),
+    )
+    calls.clear()
+
+    known = get_store_fingerprints(index, PST_PATH, pst, False)
+
+    assert set(known) == set(map(fingerprint_row, flagged_emails))
+    assert calls["GetTable"] == 0
+
+
+def test_fingerprinting_a_pst_takes_a_few_round_trips():
+    inbox = generate_mailbox(20_000, flag_ratio=0, days=DAYS)
+    calls = Counter()
+
+    fingerprints = folder_fingerprints(SlowProxy(inbox, calls=calls))
+
+    assert len(fingerprints) > 19_000
+    # One table, read in bulk; never one round trip per email
+    assert calls["GetTable"] == 1
+    assert sum(calls.values()) < len(fingerprints) / 100
+
+
+def test_streamed_scan_yields_the_first_row_before_the_scan_ends():
+    inbox = generate_mailbox(5000, flag_ratio=0.5, days=DAYS)
+    calls = Counter()
+    # Each GetArray of 1000 rows takes 0.1s, as long tables do in Outlook
+    folder = SlowProxy(inbox, calls=calls, row_latency=0.0001)
+    stats = ScanStats()
+
+    rows = iter_flagged_emails(FIRST_DAY, LAST_DAY, folder=folder, stats=stats)
+    first = next(rows)
+
+    assert calls["GetTable"] == calls["GetArray"] == 1
+    assert stats.count == 1
+    assert stats.seconds is None
+    assert first.FlagStatus == 2
+
+    rest = list(rows)
+
+    flagged = len(get_flagged_emails_in_month(FIRST_DAY, LAST_DAY, folder=inbox)[0])
+    assert stats.count == len(rest) + 1 == flagged
+    assert calls["GetArray"] == -(-flagged // FETCH_BATCH_SIZE)
+    assert stats.first_item_seconds < stats.seconds / 2
+    assert stats.as_dict()["scanned"] == flagged
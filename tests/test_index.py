@@ -0,0 +1,137 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from utils.fake import FakeFolder, FakeMailItem, SlowProxy
+from utils.index import SyncIndex
+from utils.journal import ExportJournal
+
+START = date(2026, 3, 1)
+END = date(2026, 3, 31)
+FLAGGED = 2
+
+
+@pytest.fixture
+def inbox():
+    emails = [
+        FakeMailItem(f"email {number}", datetime(2026, 3, 1 + number), FLAGGED)
+        for number in range(10)
+    ] + [
+        FakeMailItem("unflagged", datetime(2026, 3, 20), 0),
+        FakeMailItem("february", datetime(2026, 2, 27), FLAGGED),
+    ]
+    for email in emails:
+        # Untouched since received, not since the test created them
+        email.LastModificationTime = email.ReceivedTime
+    return FakeFolder("Inbox", emails)
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SyncIndex(str(tmp_path / "sync_index.db")) as index:
+        yield index
+
+
+def subjects(index, folder):
+    return [row.Subject for row in index.flagged_emails(folder, START, END)]
+
+
+def email(folder, subject):
+    return next(item for item in folder.Items if item.Subject == subject)
+
+
+def test_first_sync_loads_the_flagged_mail_of_the_range(index, inbox):
+    assert index.watermark(SyncIndex.scope_for(inbox, START, END)) is None
+
+    result = index.sync(inbox, START, END)
+
+    assert result == {"updated": 10, "cleared": 0, "deleted": 0}
+    assert subjects(index, inbox) == [f"email {number}" for number in range(10)]
+    assert index.watermark(SyncIndex.scope_for(inbox, START, END)) is not None
+
+
+def test_flag_added_between_syncs(index, inbox):
+    index.sync(inbox, START, END)
+
+    email(inbox, "unflagged").MarkAsTask()
+    result = index.sync(inbox, START, END)
+
+    assert result == {"updated": 1, "cleared": 0, "deleted": 0}
+    assert "unflagged" in subjects(index, inbox)
+
+
+def test_flag_cleared_between_syncs(index, inbox):
+    index.sync(inbox, START, END)
+
+    email(inbox, "email 3").ClearTaskFlag()
+    result = index.sync(inbox, START, END)
+
+    assert result == {"updated": 0, "cleared": 1, "deleted": 0}
+    assert "email 3" not in subjects(index, inbox)
+
+
+def test_email_deleted_between_syncs(index, inbox):
+    index.sync(inbox, START, END)
+
+    email(inbox, "email 5").Delete()
+    result = index.sync(inbox, START, END)
+
+    assert result == {"updated": 0, "cleared": 0, "deleted": 1}
+    assert "email 5" not in subjects(index, inbox)
+    assert len(subjects(index, inbox)) == 9
+
+
+def test_repeat_sync_reads_only_changed_rows(index, inbox):
+    index.sync(inbox, START, END)
+    calls = Counter()
+
+    result = index.sync(SlowProxy(inbox, calls=calls), START, END)
+
+    assert result == {"updated": 0, "cleared": 0, "deleted": 0}
+    # One GetTable for the changed items; deletions are ruled out by a count
+    assert calls["GetTable"] == 1
+    assert calls["Count"] == 1
+
+
+def test_changes_older_than_the_watermark_are_not_read_again(index, inbox):
+    index.sync(inbox, START, END, now=datetime.now() + timedelta(hours=1))
+
+    email(inbox, "unflagged").MarkAsTask()
+    result = index.sync(inbox, START, END)
+
+    # Marked before the (future) watermark, so not seen as changed
+    assert result["updated"] == 0
+
+
+def test_scopes_are_independent(index, inbox):
+    index.sync(inbox, START, END)
+    index.sync(inbox, date(2026, 2, 1), date(2026, 2, 28))
+
+    assert subjects(index, inbox) == [f"email {number}" for number in range(10)]
+    assert [
+        row.Subject
+        for row in index.flagged_emails(inbox, date(2026, 2, 1), date(2026, 2, 28))
+    ] == ["february"]
+
+
+def test_store_fingerprints(index):
+    assert not index.has_store("C:\\Exports\\March.pst")
+
+    index.add_fingerprints("C:\\Exports\\March.pst", [1, 2, 3])
+    index.add_fingerprints("c:/exports/march.pst", [3, 4])
+
+    assert index.has_store("C:/Exports/MARCH.pst")
+    assert set(index.store_fingerprints("C:\\Exports\\March.pst")) == {1, 2, 3, 4}
+    index.forget_store("C:\\Exports\\March.pst")
+    assert not index.has_store("C:\\Exports\\March.pst")
+
+
+def test_store_paths_are_keyed_like_the_journal(index):
+    index.add_fingerprints("C:/Exports/Old/../March.pst", [1])
+
+    assert index.has_store("C:/Exports//March.pst")
+    assert set(index.store_fingerprints("c:/exports/./march.pst")) == {1}
+    assert ExportJournal.job_for("C:/Exports/Old/../March.pst") == (
+        ExportJournal.job_for("C:/Exports//March.pst")
+    )
@@ -0,0 +1,119 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeFolder, FakeNamespace
+from utils.instrument import InstrumentedProxy, Profiler, unwrap
+from utils.outlook import get_flagged_emails_in_month
+from utils.session import OutlookSession
+from utils.table import FETCH_BATCH_SIZE, MAIL_COLUMNS
+
+LAST_DAY = FIRST_DAY + timedelta(days=6)
+
+
+@pytest.fixture
+def namespace():
+    inbox = generate_mailbox(5000, flag_ratio=0.5, days=7)
+    return FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+
+
+@pytest.fixture
+def profiler():
+    return Profiler()
+
+
+@pytest.fixture
+def session(namespace, profiler):
+    return OutlookSession(lambda: namespace, MAILBOX, profiler=profiler)
+
+
+def test_scan_makes_a_round_trip_per_batch_not_per_email(session, profiler):
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, LAST_DAY, folder=session.inbox
+    )
+
+    batches = -(-len(flagged_emails) // FETCH_BATCH_SIZE)
+    assert len(flagged_emails) > 2000
+    assert profiler.calls("GetTable()") == 1
+    assert profiler.calls("GetArray()") == batches
+    assert profiler.calls("EndOfTable") == batches + 1
+    assert profiler.calls("Subject") == 0
+    assert profiler.calls("Folders()") == 2
+    assert profiler.calls("Add()") == len(MAIL_COLUMNS)
+    # 4 for the mailbox and Inbox lookups, GetTable, Columns and RemoveAll,
+    # then Columns and Add per column and EndOfTable and GetArray per batch:
+    # nothing grows with the number of emails but the batches
+    setup = 4 + 3 + 2 * len(MAIL_COLUMNS)
+    assert profiler.round_trips() <= setup + 2 * batches + 1
+
+
+def test_iterating_records_each_step(session, profiler):
+    folders = list(session.namespace.Folders)
+
+    assert [folder.Name for folder in folders] == [MAILBOX]
+    # One step per folder and the StopIteration
+    assert profiler.calls("Folders[]") == 2
+    assert profiler.calls("Folders") == 1
+    assert profiler.calls("Name") == 1
+    assert isinstance(folders[0], InstrumentedProxy)
+
+
+def test_setting_a_property_is_a_round_trip(session, profiler, namespace):
+    inbox = session.inbox
+
+    inbox.Name = "Renamed"
+    other = session.namespace.Folders(MAILBOX)
+    inbox.Parent = other
+
+    assert profiler.calls("Name=") == 1
+    assert profiler.calls("Parent=") == 1
+    target = unwrap(inbox)
+    assert target.Name == "Renamed"
+    # Stored unwrapped, never as a proxy
+    assert target.Parent is namespace.Folders(MAILBOX)
+
+
+def test_plain_values_are_not_wrapped(session):
+    email = session.inbox.Items.Item(1)
+
+    assert isinstance(email, InstrumentedProxy)
+    assert type(email.Subject) is str
+    assert type(email.Size) is int
+    assert isinstance(email.Attachments, InstrumentedProxy)
+
+
+def test_report_dump_and_format(session, profiler, tmp_path):
+    get_flagged_emails_in_month(FIRST_DAY, LAST_DAY, folder=session.inbox)
+    path = tmp_path / "profile.json"
+
+    profiler.dump(str(path))
+    text = profiler.format_report(limit=3)
+
+    with open(path) as report_file:
+        report = json.load(report_file)
+    assert report["round_trips"] == profiler.round_trips()
+    get_array = report["calls"]["GetArray()"]
+    assert get_array["calls"] == profiler.calls("GetArray()")
+    assert len(get_array["slowest_ms"]) <= 5
+    assert get_array["slowest_ms"] == sorted(get_array["slowest_ms"], reverse=True)
+    # Most expensive first
+    seconds = [stats["seconds"] for stats in report["calls"].values()]
+    assert seconds == sorted(seconds, reverse=True)
+
+    lines = text.splitlines()
+    assert lines[0].startswith(f"{profiler.round_trips()} Outlook calls")
+    assert lines[1].split() == "call count total s mean ms max ms".split()
+    assert len(lines) == 2 + 3
+    assert lines[2].split()[0] == next(iter(report["calls"]))
+
+    profiler.reset()
+    assert profiler.round_trips() == 0
+    assert profiler.report()["calls"] == {}
+
+
+def test_unprofiled_session_is_not_wrapped(namespace):
+    session = OutlookSession(lambda: namespace, MAILBOX)
+
+    assert session.namespace is namespace
@@ -0,0 +1,163 @@
+import random
+from collections import Counter
+
+import pytest
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import Crash, FakeFolder, FakeNamespace, SlowProxy
+from utils.fingerprint import fingerprint_row
+from utils.index import SyncIndex
+from utils.journal import (
+    COMMITTED,
+    SKIPPED,
+    ExportJournal,
+    export_with_journal,
+)
+from utils.outlook import get_flagged_emails_in_month
+from utils.pipeline import PstTarget
+from utils.session import OutlookSession
+from utils.table import get_table
+
+
+def pst_contents(namespace):
+    if not namespace.Stores:
+        return Counter()
+    return Counter(map(fingerprint_row, get_table(namespace.Stores[0].GetRootFolder())))
+
+
+def export(namespace, index_path, pst_path, flagged_emails, connect):
+    session = OutlookSession(connect, MAILBOX)
+    with SyncIndex(index_path) as index, ExportJournal(index_path) as journal:
+        root = session.open_pst(pst_path)
+        return export_with_journal(
+            journal,
+            journal.job_for(pst_path),
+            flagged_emails,
+            PstTarget(root, session.get_item),
+            index.store_fingerprints(pst_path),
+            record=lambda fingerprints: index.add_fingerprints(pst_path, fingerprints),
+            batch_size=20,
+        )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_export_crashing_at_random_copies_every_email_exactly_once(tmp_path, seed):
+    inbox = generate_mailbox(400, flag_ratio=0.5, days=1, seed=seed)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, FIRST_DAY, folder=inbox
+    )
+    generator = random.Random(seed)
+    index_path = str(tmp_path / "index.db")
+    pst_path = str(tmp_path / "export.pst")
+
+    crashes = 0
+    for _ in range(1000):
+        # A restarted app: fresh session, index and journal every run
+        try:
+            summary = export(
+                namespace,
+                index_path,
+                pst_path,
+                flagged_emails,
+                lambda: SlowProxy(namespace, crash_rate=0.005, random=generator),
+            )
+        except Crash:
+            crashes += 1
+            continue
+        if summary["pending"] == 0:
+            break
+
+    copies = pst_contents(namespace)
+    assert crashes > 0
+    assert set(copies) == {fingerprint_row(row) for row in flagged_emails}
+    assert max(copies.values()) == 1
+
+
+def test_interrupted_batch_is_recovered_from_the_target(tmp_path):
+    inbox = generate_mailbox(100, flag_ratio=1.0, days=1, seed=0)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, FIRST_DAY, folder=inbox
+    )
+    index_path = str(tmp_path / "index.db")
+    pst_path = str(tmp_path / "export.pst")
+
+    class CrashAfterCopy(PstTarget):
+        copies = 0
+
+        def copy_batch(self, rows):
+            failed = super().copy_batch(rows)
+            CrashAfterCopy.copies += 1
+            if CrashAfterCopy.copies == 2:
+                raise Crash("after the second batch was copied")
+            return failed
+
+    session = OutlookSession(lambda: namespace, MAILBOX)
+    with ExportJournal(index_path) as journal, pytest.raises(Crash):
+        export_with_journal(
+            journal,
+            journal.job_for(pst_path),
+            flagged_emails,
+            CrashAfterCopy(session.open_pst(pst_path), session.get_item),
+            set(),
+            batch_size=20,
+        )
+    assert sum(pst_contents(namespace).values()) == 40
+
+    summary = export(namespace, index_path, pst_path, flagged_emails, lambda: namespace)
+
+    assert summary["recovered"] == 20
+    assert summary["resumed"] == len(flagged_emails) - 40
+    assert summary["copied"] == len(flagged_emails) - 40
+    assert sum(pst_contents(namespace).values()) == len(flagged_emails)
+    with ExportJournal(index_path) as journal:
+        counts = journal.counts(journal.job_for(pst_path))
+    assert counts == {COMMITTED: len(flagged_emails)}
+
+
+def test_resume_skips_emails_no_longer_flagged(tmp_path):
+    inbox = generate_mailbox(100, flag_ratio=1.0, days=1, seed=0)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, FIRST_DAY, folder=inbox
+    )
+    index_path = str(tmp_path / "index.db")
+    pst_path = str(tmp_path / "export.pst")
+
+    class CrashInSecondBatch(PstTarget):
+        copies = 0
+
+        def copy_item(self, item):
+            CrashInSecondBatch.copies += 1
+            if CrashInSecondBatch.copies > 20:
+                raise Crash("during the second batch")
+            super().copy_item(item)
+
+    session = OutlookSession(lambda: namespace, MAILBOX)
+    with ExportJournal(index_path) as journal, pytest.raises(Crash):
+        export_with_journal(
+            journal,
+            journal.job_for(pst_path),
+            flagged_emails,
+            CrashInSecondBatch(session.open_pst(pst_path), session.get_item),
+            set(),
+            batch_size=20,
+        )
+
+    # The flags of the last 30 emails were cleared before the next export
+    still_flagged = list(flagged_emails)[:-30]
+    summary = export(namespace, index_path, pst_path, still_flagged, lambda: namespace)
+
+    assert summary["dropped"] == 30
+    assert summary["resumed"] == len(flagged_emails) - 20 - 30
+    assert set(pst_contents(namespace)) == set(map(fingerprint_row, still_flagged))
+    with ExportJournal(index_path) as journal:
+        counts = journal.counts(journal.job_for(pst_path))
+    assert counts == {COMMITTED: len(still_flagged), SKIPPED: 30}
+
+    # Flagged again: the skipped entries are planned and copied after all
+    summary = export(namespace, index_path, pst_path, flagged_emails, lambda: namespace)
+
+    assert summary["copied"] == 30
+    assert set(pst_contents(namespace)) == set(map(fingerprint_row, flagged_emails))
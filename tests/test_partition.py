@@ -0,0 +1,102 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeComError, FakeFolder, FakeNamespace, SlowProxy
+from utils.outlook import get_flagged_emails_in_month
+from utils.partition import PartitionedScan, plan_partitions
+
+LAST_DAY = FIRST_DAY + timedelta(days=364)
+
+
+@pytest.fixture(scope="module")
+def namespace():
+    inbox = generate_mailbox(15000, days=365, seed=3)
+    return FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+
+
+@pytest.fixture(scope="module")
+def expected(namespace):
+    inbox = namespace.Folders(MAILBOX).Folders("Inbox")
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, LAST_DAY, folder=inbox
+    )
+    ordered = sorted(flagged_emails, key=lambda row: row.ReceivedTime)
+    return [row.EntryID for row in ordered]
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_partitions_return_the_same_emails_in_order(namespace, expected, workers):
+    flagged_emails, summary = PartitionedScan(
+        lambda: SlowProxy(namespace), f"{MAILBOX}/Inbox", workers
+    ).scan(FIRST_DAY, LAST_DAY)
+
+    assert list(flagged_emails.column("EntryID")) == expected
+    assert sum(partition["rows"] for partition in summary["partitions"]) == len(
+        expected
+    )
+    if workers > 1:
+        assert len(summary["partitions"]) > 1
+
+
+def test_rejected_calls_are_retried_without_losing_rows(namespace, expected):
+    generator = random.Random(0)
+    flagged_emails, summary = PartitionedScan(
+        lambda: SlowProxy(namespace, random=generator, error_rate=0.01),
+        f"{MAILBOX}/Inbox",
+        4,
+        retries=10,
+    ).scan(FIRST_DAY, LAST_DAY)
+
+    assert list(flagged_emails.column("EntryID")) == expected
+    assert sum(partition["attempts"] for partition in summary["partitions"]) > len(
+        summary["partitions"]
+    )
+
+
+def test_scan_gives_up_after_retries(namespace):
+    scan = PartitionedScan(
+        lambda: SlowProxy(namespace, random=random.Random(0), error_rate=1.0),
+        f"{MAILBOX}/Inbox",
+        2,
+        retries=1,
+    )
+    with pytest.raises(FakeComError):
+        scan.scan(FIRST_DAY, LAST_DAY)
+
+
+def test_plan_covers_the_range_in_whole_days():
+    start, end = date(2026, 1, 1), date(2026, 12, 31)
+    received_times = [
+        datetime(2026, 1, 1, 12) + timedelta(days=day)
+        for day in (40, 100, 100, 250, 300)
+    ]
+
+    partitions = plan_partitions(start, end, 6000, received_times, min_size=1000)
+
+    assert partitions[0].start == start
+    assert partitions[-1].end == end
+    for before, after in zip(partitions, partitions[1:]):
+        assert after.start == before.end + timedelta(days=1)
+    # The two samples on day 100 cannot split that day
+    assert len(partitions) == 5
+    assert sum(partition.estimate for partition in partitions) == 6000
+
+
+def test_small_scans_partition_down_to_min_partition_size():
+    inbox = generate_mailbox(1000, days=365, seed=3)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+
+    def scan(**options):
+        return PartitionedScan(
+            lambda: SlowProxy(namespace), f"{MAILBOX}/Inbox", 4, **options
+        ).scan(FIRST_DAY, LAST_DAY)
+
+    # Fewer flagged emails than MIN_PARTITION_SIZE: one partition
+    single, summary = scan()
+    assert len(summary["partitions"]) == 1
+    flagged_emails, summary = scan(min_partition_size=len(single) // 4)
+    assert len(summary["partitions"]) == 4
+    assert list(flagged_emails.column("EntryID")) == list(single.column("EntryID"))
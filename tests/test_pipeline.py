@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+import pytest
+
+from utils.fake import FakeFolder, FakeMailItem, FakeNamespace
+from utils.pipeline import CopyPipeline, CopyTarget, PstTarget
+
+Row = namedtuple("Row", ["EntryID", "Subject"])
+
+
+class FlakyTarget(CopyTarget):
+    """Fails each row the first failures[row] times it is copied"""
+
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.copied = []
+
+    def copy_batch(self, rows):
+        failed = []
+        for row in rows:
+            if self.failures.get(row.EntryID, 0):
+                self.failures[row.EntryID] -= 1
+                failed.append((row, OSError(f"{row.EntryID} failed")))
+            else:
+                self.copied.append(row.EntryID)
+        return failed
+
+
+def rows(count):
+    return [Row(str(number), f"email {number}") for number in range(count)]
+
+
+def test_copy_target_requires_copy_batch():
+    class NoCopy(CopyTarget):
+        pass
+
+    with pytest.raises(TypeError):
+        NoCopy()
+
+
+def test_pst_target_copies_into_the_folder():
+    source = FakeFolder("Inbox", [FakeMailItem("one"), FakeMailItem("two")])
+    namespace = FakeNamespace([source])
+    pst = FakeFolder("Flagged Emails")
+    items = list(source.Items)
+
+    failed = PstTarget(pst, namespace.GetItemFromID).copy_batch(
+        [Row(item.EntryID, item.Subject) for item in items]
+    )
+
+    assert failed == []
+    assert [item.Subject for item in pst.Items] == ["one", "two"]
+    assert list(source.Items) == items
+
+
+def test_retry_passes_back_off():
+    target = FlakyTarget({"3": 2, "7": 1})
+    sleeps = []
+    pipeline = CopyPipeline(
+        target, batch_size=4, max_retries=3, retry_delay=0.5, sleep=sleeps.append
+    )
+
+    copied, cancelled = pipeline.run(rows(10))
+
+    assert (copied, cancelled) == (10, False)
+    assert sorted(target.copied, key=int) == [str(number) for number in range(10)]
+    assert sleeps == [0.5, 1.0]
+    assert [stats.attempt for stats in pipeline.batches] == [0, 0, 0, 1, 2]
+    assert pipeline.failed == []
+
+
+def test_failures_left_after_the_last_retry_are_reported():
+    target = FlakyTarget({"1": 5})
+    sleeps = []
+    pipeline = CopyPipeline(target, max_retries=2, sleep=sleeps.append)
+
+    copied, _ = pipeline.run(rows(3))
+
+    assert copied == 2
+    assert [row.EntryID for row, _ in pipeline.failed] == ["1"]
+    assert sleeps == [1.0, 2.0]
+
+
+def test_no_wait_without_failures():
+    sleeps = []
+    pipeline = CopyPipeline(FlakyTarget({}), batch_size=2, sleep=sleeps.append)
+
+    assert pipeline.run(rows(5)) == (5, False)
+    assert sleeps == []
+    assert [stats.size for stats in pipeline.batches] == [2, 2, 1]
+
+
+def test_cancel_stops_between_batches():
+    target = FlakyTarget({})
+    pipeline = CopyPipeline(target, batch_size=2, sleep=lambda seconds: None)
+
+    copied, cancelled = pipeline.run(rows(10), lambda: len(target.copied) >= 4)
+
+    assert (copied, cancelled) == (4, True)
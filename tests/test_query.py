@@ -0,0 +1,177 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from utils.fake import FakeFolder, FakeMailItem
+from utils.query import (
+    build_changed_filter,
+    build_flagged_filter,
+    month_ranges,
+    parse_filter,
+    quote,
+)
+
+FLAGGED = 2
+
+
+def matching(filter, emails):
+    predicate = parse_filter(filter)
+    return [email.Subject for email in emails if predicate(email)]
+
+
+def test_flagged_filter_text():
+    assert build_flagged_filter(date(2026, 3, 1), date(2026, 3, 31)) == (
+        "[FlagStatus] = 2 AND "
+        "[ReceivedTime] >= '03/01/2026 12:00 AM' AND "
+        "[ReceivedTime] < '04/01/2026 12:00 AM'"
+    )
+    assert build_flagged_filter() == "[FlagStatus] = 2"
+
+
+def test_end_bound_is_midnight_after_the_last_day():
+    emails = [
+        FakeMailItem("day before", datetime(2026, 2, 28, 23, 59), FLAGGED),
+        FakeMailItem("first minute", datetime(2026, 3, 1, 0, 0), FLAGGED),
+        FakeMailItem("last minute", datetime(2026, 3, 31, 23, 59, 59), FLAGGED),
+        FakeMailItem("next midnight", datetime(2026, 4, 1, 0, 0), FLAGGED),
+        FakeMailItem("not flagged", datetime(2026, 3, 15, 12, 0), 0),
+    ]
+
+    march = build_flagged_filter(date(2026, 3, 1), date(2026, 3, 31))
+
+    assert matching(march, emails) == ["first minute", "last minute"]
+
+
+def test_single_day_range():
+    emails = [
+        FakeMailItem("morning", datetime(2026, 3, 5, 8, 0), FLAGGED),
+        FakeMailItem("next day", datetime(2026, 3, 6, 0, 0), FLAGGED),
+    ]
+
+    one_day = build_flagged_filter(date(2026, 3, 5), date(2026, 3, 5))
+
+    assert matching(one_day, emails) == ["morning"]
+
+
+def test_open_bounds():
+    emails = [
+        FakeMailItem("old", datetime(2020, 1, 1), FLAGGED),
+        FakeMailItem("new", datetime(2030, 1, 1), FLAGGED),
+    ]
+
+    assert matching(build_flagged_filter(start=date(2026, 1, 1)), emails) == ["new"]
+    assert matching(build_flagged_filter(end=date(2026, 1, 1)), emails) == ["old"]
+
+
+def test_com_datetimes_with_a_timezone_compare_as_local_time():
+    # pywin32 returns ReceivedTime with a tzinfo that Restrict ignores
+    utc = timezone.utc
+    emails = [
+        FakeMailItem("in", datetime(2026, 3, 31, 23, 0, tzinfo=utc), FLAGGED),
+        FakeMailItem("out", datetime(2026, 4, 1, 0, 0, tzinfo=utc), FLAGGED),
+    ]
+
+    march = build_flagged_filter(date(2026, 3, 1), date(2026, 3, 31))
+
+    assert matching(march, emails) == ["in"]
+
+
+def test_quote_doubles_single_quotes():
+    assert quote("o'brien@example.com") == "'o''brien@example.com'"
+    assert quote("") == "''"
+
+
+def test_senders_and_categories_are_quoted_and_or_ed():
+    filter = build_flagged_filter(
+        date(2026, 3, 1),
+        date(2026, 3, 31),
+        senders=["o'brien@example.com", "jo@example.com"],
+        categories=["Matter 'A'"],
+    )
+    assert "([SenderEmailAddress] = 'o''brien@example.com' OR " in filter
+    assert "[Categories] = 'Matter ''A'''" in filter
+
+    received = datetime(2026, 3, 10)
+    emails = [
+        FakeMailItem("both", received, FLAGGED, "O'Brien@example.com", "Matter 'A'"),
+        FakeMailItem(
+            "other category", received, FLAGGED, "jo@example.com", "Matter B"
+        ),
+        FakeMailItem(
+            "one of several",
+            received,
+            FLAGGED,
+            "jo@example.com",
+            "Urgent, Matter 'A'",
+        ),
+        FakeMailItem("other sender", received, FLAGGED, "x@example.com", "Matter 'A'"),
+    ]
+
+    assert matching(filter, emails) == ["both", "one of several"]
+
+
+def test_changed_filter_ignores_flag_state():
+    since = datetime(2026, 3, 20, 9, 30)
+    filter = build_changed_filter(date(2026, 3, 1), date(2026, 3, 31), since)
+    assert "FlagStatus" not in filter
+    assert filter.endswith("[LastModificationTime] > '03/20/2026 09:30 AM'")
+
+    cleared = FakeMailItem("cleared", datetime(2026, 3, 2), 0)
+    cleared.LastModificationTime = since + timedelta(minutes=1)
+    untouched = FakeMailItem("untouched", datetime(2026, 3, 2), FLAGGED)
+    untouched.LastModificationTime = since - timedelta(days=1)
+
+    assert matching(filter, [cleared, untouched]) == ["cleared"]
+
+
+def test_parser_precedence_and_not():
+    emails = [
+        FakeMailItem("a", datetime(2026, 3, 1), FLAGGED, Size=10),
+        FakeMailItem("b", datetime(2026, 3, 1), 0, Size=20),
+        FakeMailItem("c", datetime(2026, 3, 1), 0, Size=30),
+    ]
+
+    # AND binds tighter than OR
+    assert matching("[Size] = 30 OR [FlagStatus] = 2 AND [Size] = 20", emails) == [
+        "c"
+    ]
+    assert matching(
+        "([Size] = 30 OR [FlagStatus] = 2) AND NOT [Size] = 30", emails
+    ) == ["a"]
+    assert matching("[Size] <> 20", emails) == ["a", "c"]
+
+
+@pytest.mark.parametrize(
+    "filter",
+    [
+        "[FlagStatus] == 2",
+        "[FlagStatus] = 2 AND",
+        "([FlagStatus] = 2",
+        "FlagStatus = 2",
+    ],
+)
+def test_parser_rejects_unsupported_syntax(filter):
+    with pytest.raises(ValueError):
+        parse_filter(filter)
+
+
+def test_restrict_and_get_table_use_the_filter():
+    folder = FakeFolder(
+        "Inbox",
+        [
+            FakeMailItem("in", datetime(2026, 3, 31, 18), FLAGGED),
+            FakeMailItem("out", datetime(2026, 4, 1), FLAGGED),
+        ],
+    )
+    filter = build_flagged_filter(date(2026, 3, 1), date(2026, 3, 31))
+
+    assert [email.Subject for email in folder.Items.Restrict(filter)] == ["in"]
+    assert folder.GetTable(filter).GetRowCount() == 1
+
+
+def test_month_ranges_split_at_month_ends():
+    assert month_ranges(date(2026, 1, 15), date(2026, 3, 10)) == [
+        (date(2026, 1, 15), date(2026, 1, 31)),
+        (date(2026, 2, 1), date(2026, 2, 28)),
+        (date(2026, 3, 1), date(2026, 3, 10)),
+    ]
@@ -0,0 +1,125 @@
+import csv
+import random
+import zipfile
+from datetime import datetime, timedelta
+
+from utils import outlook
+from utils.benchmark.common import FIRST_DAY, SENDERS, generate_mailbox
+from utils.benchmark.report import tally_rows
+from utils.fake import FakeFolder, FakeMailItem
+from utils.index import SyncIndex
+from utils.query import build_flagged_filter
+from utils.report import (
+    INTERNAL_CLIENT,
+    REPORT_COLUMNS,
+    build_report,
+    client_of,
+    write_report,
+)
+from utils.table import get_table
+
+FIRM_DOMAIN = "radlawgroup.com"
+
+
+def test_client_is_category_then_sender_then_outside_recipient():
+    assert client_of("Matter 7, Urgent", "a@acme.com", "", FIRM_DOMAIN) == "Matter 7"
+    assert client_of("", "a@Acme.com", "", FIRM_DOMAIN) == "acme.com"
+    assert (
+        client_of(
+            "",
+            "partner@radlawgroup.com",
+            "Associate <associate@radlawgroup.com>; Jo <jo@Client.org>",
+            FIRM_DOMAIN,
+        )
+        == "client.org"
+    )
+    assert (
+        client_of(
+            "", "partner@radlawgroup.com", "associate@radlawgroup.com", FIRM_DOMAIN
+        )
+        == INTERNAL_CLIENT
+    )
+    # Exchange senders have no SMTP address and count as the firm
+    assert client_of("", "/O=FIRM/CN=PARTNER", "", FIRM_DOMAIN) == INTERNAL_CLIENT
+
+
+def test_report_matches_tallying_rows_one_by_one():
+    generator = random.Random(0)
+    folder = generate_mailbox(3000, flag_ratio=1.0, days=365, seed=0)
+    for email in folder.Items:
+        if generator.random() < 1 / 3:
+            email.Categories = f"Matter {generator.randrange(200)}"
+        elif generator.random() < 0.2:
+            email.SenderEmailAddress = SENDERS[-1]
+            email.To = f"Client <{generator.choice(SENDERS[:-2])}>"
+    table = get_table(folder, "", REPORT_COLUMNS)
+
+    report = build_report(table, FIRM_DOMAIN)
+
+    assert report == tally_rows(table, FIRM_DOMAIN)
+    for rows in report.values():
+        assert sum(row[1] for row in rows) == len(table)
+
+
+def test_write_report_writes_csvs_and_a_workbook(tmp_path):
+    folder = FakeFolder(
+        "Inbox",
+        [
+            FakeMailItem("a", datetime(2026, 3, 2, 9), 2, "x@acme.com", Size=2048),
+            FakeMailItem("b", datetime(2026, 3, 2, 17), 2, "y@acme.com", Size=1024),
+            FakeMailItem("c", datetime(2026, 3, 3, 8), 2, "z@other.org", Size=1024),
+        ],
+    )
+    for email in folder.Items:
+        email.To = ""
+    report = build_report(get_table(folder, "", REPORT_COLUMNS), FIRM_DOMAIN)
+
+    paths = write_report(report, str(tmp_path / "March"))
+
+    with open(
+        tmp_path / "March - by client.csv", newline="", encoding="utf-8-sig"
+    ) as report_file:
+        rows = list(csv.reader(report_file))
+    assert rows[0][0] == "Client"
+    assert [row[:3] for row in rows[1:]] == [
+        ["acme.com", "2", "3.0"],
+        ["other.org", "1", "1.0"],
+    ]
+    with zipfile.ZipFile(paths[-1]) as workbook:
+        assert "xl/worksheets/sheet3.xml" in workbook.namelist()
+
+
+def test_report_is_built_from_the_scan_the_export_was_given(tmp_path, monkeypatch):
+    folder = generate_mailbox(500, flag_ratio=0.5, days=30, seed=1)
+    for number, email in enumerate(folder.Items):
+        email.To = f"Client <client{number % 7}@example.org>"
+        email.Categories = f"Matter {number % 3}" if number % 2 else ""
+    last_day = FIRST_DAY + timedelta(days=29)
+    with SyncIndex(str(tmp_path / "sync_index.db")) as index:
+        # Read back from the index, like a synced export's scan
+        outlook.sync_flagged_emails_in_month(index, FIRST_DAY, last_day, folder)
+        flagged_emails, _, _ = outlook.sync_flagged_emails_in_month(
+            index, FIRST_DAY, last_day, folder
+        )
+    # No Outlook session: the report must not scan again
+    monkeypatch.setattr(outlook, "session", None)
+
+    outlook.write_flagged_emails_report(
+        str(tmp_path / "March.pst"),
+        FIRST_DAY,
+        last_day,
+        FIRM_DOMAIN,
+        flagged_emails=flagged_emails,
+    )
+
+    with open(
+        tmp_path / "March - by client.csv", newline="", encoding="utf-8-sig"
+    ) as report_file:
+        rows = list(csv.reader(report_file))[1:]
+    expected = build_report(
+        get_table(folder, build_flagged_filter(FIRST_DAY, last_day), REPORT_COLUMNS),
+        FIRM_DOMAIN,
+    )["client"]
+    assert [(row[0], int(row[1])) for row in rows] == [
+        (client, emails) for client, emails, *_ in expected
+    ]
@@ -0,0 +1,110 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import pytest
+
+import utils.session
+from utils.fake import FakeFolder, FakeMailItem, FakeNamespace
+from utils.fingerprint import fingerprint_row
+from utils.index import SyncIndex
+from utils.query import FLAG_MARKED
+from utils.scheduler import ExportScheduler, ExportTarget
+from utils.session import ThreadSessions
+
+START = date(2026, 3, 1)
+END = date(2026, 3, 31)
+MAILBOXES = [f"partner{number}@radlawgroup.com" for number in range(6)]
+
+
+class FakePythoncom:
+    """Records which threads initialized and uninitialized COM"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = Counter()
+
+    def CoInitialize(self):
+        with self.lock:
+            self.calls[threading.get_ident(), "init"] += 1
+
+    def CoUninitialize(self):
+        with self.lock:
+            self.calls[threading.get_ident(), "uninit"] += 1
+
+
+@pytest.fixture
+def pythoncom(monkeypatch):
+    pythoncom = FakePythoncom()
+    monkeypatch.setattr(utils.session, "pythoncom", pythoncom)
+    return pythoncom
+
+
+def mailbox(name, count):
+    emails = [
+        FakeMailItem(
+            f"{name} {number}", datetime(2026, 3, 1 + number % 28), FLAG_MARKED
+        )
+        for number in range(count)
+    ]
+    clients = FakeFolder("Clients", emails[count // 2 :])
+    inbox = FakeFolder("Inbox", emails[: count // 2], [clients])
+    return FakeFolder(name, folders=[inbox])
+
+
+def test_pool_threads_uninitialize_com_on_exit(pythoncom):
+    sessions = ThreadSessions(lambda: None)
+    started = threading.Barrier(4)
+
+    def work(_):
+        session = sessions.get()
+        # Keep all four threads busy, so each runs exactly one task
+        started.wait(5)
+        assert sessions.get() is session
+        return threading.get_ident(), session
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(work, range(4)))
+
+    assert len({id(session) for _, session in results}) == 4
+    for ident, _ in results:
+        assert pythoncom.calls[ident, "init"] == 1
+        assert pythoncom.calls[ident, "uninit"] == 1
+
+
+def test_session_dropped_on_another_thread_leaves_com_alone(pythoncom):
+    sessions = ThreadSessions(lambda: None)
+    sessions.get()
+    main = threading.get_ident()
+
+    # The thread that made the session still runs; nothing may uninitialize
+    thread = threading.Thread(target=lambda: sessions.__dict__.clear())
+    thread.start()
+    thread.join()
+
+    assert pythoncom.calls[main, "init"] == 1
+    assert pythoncom.calls[main, "uninit"] == 0
+    assert pythoncom.calls[thread.ident, "uninit"] == 0
+
+
+def test_parallel_exports_share_one_index(tmp_path, pythoncom):
+    namespace = FakeNamespace([mailbox(name, 60) for name in MAILBOXES])
+    index_path = str(tmp_path / "sync_index.db")
+    scheduler = ExportScheduler(lambda: namespace, max_workers=6)
+
+    results = scheduler.scan([ExportTarget(name) for name in MAILBOXES], START, END)
+    summaries = scheduler.export(
+        results, str(tmp_path), START, END, index_path=index_path, batch_size=5
+    )
+
+    assert sorted(summary["name"] for summary in summaries) == sorted(MAILBOXES)
+    assert all(summary["copied"] == 60 for summary in summaries)
+    with SyncIndex(index_path) as index:
+        for summary in summaries:
+            pst = next(
+                store for store in namespace.Stores if store.FilePath == summary["path"]
+            )
+            assert set(index.store_fingerprints(summary["path"])) == set(
+                map(fingerprint_row, pst.GetRootFolder().Items)
+            )
@@ -0,0 +1,169 @@
+from datetime import datetime
+
+import pytest
+
+from utils import outlook, search
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeFolder, FakeMailItem, FakeNamespace
+from utils.fingerprint import FingerprintSet, fingerprint_row
+from utils.outlook import get_flagged_emails_in_month
+from utils.pipeline import PstTarget, export_rows
+from utils.search import IndexingTarget, ItemCache, QueryError, SearchIndex
+from utils.session import OutlookSession
+
+EMAILS = {
+    1: ("Retainer for matter 2026-0153", "client@example.com", "Invoice attached"),
+    2: ("Invoice 2026-0153", "billing@example.com", "Statement for March"),
+    3: ("Lunch", "friend@example.com", "Retainer talk later"),
+    4: ("Draft invoice", "client@example.com", "Not final"),
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SearchIndex(str(tmp_path / "search_index.db")) as index:
+        for number, (subject, sender, body) in EMAILS.items():
+            index.add(
+                number,
+                received_time=datetime(2026, 3, number),
+                sender=sender,
+                subject=subject,
+                body=body,
+            )
+        index.commit()
+        yield index
+
+
+def matches(index, query):
+    return sorted(hit.fingerprint for hit in index.search(query))
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("retainer", [1, 3]),
+        ("retainer 2026-0153", [1]),
+        ("retainer AND invoice", [1]),
+        ("lunch OR statement", [2, 3]),
+        ("invoice -draft", [1, 2]),
+        ("invoice NOT draft", [1, 2]),
+        ("NOT invoice", [3]),
+        ("NOT NOT lunch", [3]),
+        ("invoic*", [1, 2, 4]),
+        ("subject:retainer", [1]),
+        ("body:retainer", [3]),
+        ("from:client@example.com invoice", [1, 4]),
+        ("(lunch OR draft) -subject:lunch", [4]),
+        ("-(invoice OR lunch)", []),
+        ('"2026-0153"', [1, 2]),
+        ("Subject:RETAINER", [1]),
+        ("unknown:retainer", []),
+    ],
+)
+def test_query(index, query, expected):
+    assert matches(index, query) == expected
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["", "   ", "(retainer", "retainer)", "OR invoice", "invoice OR", "-", "!!"],
+)
+def test_malformed_query_is_refused(index, query):
+    with pytest.raises(QueryError):
+        index.search(query)
+
+
+def test_prefix_matching_too_many_words_is_refused(index, monkeypatch):
+    monkeypatch.setattr(search, "MAX_PREFIX_TERMS", 1)
+    assert matches(index, "lunc*") == [3]
+
+    # "for" and "final" in the bodies
+    with pytest.raises(QueryError):
+        index.search("f*")
+
+
+def test_date_range(index):
+    hits = index.search(
+        "invoice", start=datetime(2026, 3, 2), end=datetime(2026, 3, 3)
+    )
+    assert [hit.fingerprint for hit in hits] == [2]
+
+
+class FailingIndex(SearchIndex):
+    """Fails to commit the first failures times"""
+
+    failures = 0
+
+    def commit(self):
+        if self.failures:
+            self.failures -= 1
+            self._pending = {}
+            self.connection.rollback()
+            raise OSError("disk I/O error")
+        super().commit()
+
+
+@pytest.fixture
+def mailbox():
+    inbox = generate_mailbox(200, flag_ratio=0.5, days=3)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, FIRST_DAY, folder=inbox
+    )
+    return namespace, flagged_emails
+
+
+def test_indexing_target_indexes_what_the_target_opened(tmp_path, mailbox):
+    namespace, flagged_emails = mailbox
+    opened = []
+
+    def resolve(entry_id):
+        opened.append(entry_id)
+        return namespace.GetItemFromID(entry_id)
+
+    items = ItemCache(resolve)
+    with SearchIndex(str(tmp_path / "search_index.db")) as index:
+        target = IndexingTarget(
+            PstTarget(FakeFolder("Flagged Emails"), items), index, "export.pst", items
+        )
+        export_rows(flagged_emails, target, FingerprintSet(), batch_size=20)
+
+        assert len(index) == len(set(map(fingerprint_row, flagged_emails)))
+    assert len(opened) == len(set(opened))
+    assert items.get(opened[0]) is None
+
+
+def test_emails_whose_indexing_failed_are_indexed_again(tmp_path, mailbox):
+    namespace, flagged_emails = mailbox
+    items = ItemCache(namespace.GetItemFromID)
+    with FailingIndex(str(tmp_path / "search_index.db")) as index:
+        index.failures = 2
+        target = IndexingTarget(
+            PstTarget(FakeFolder("Flagged Emails"), items), index, "export.pst", items
+        )
+        summary = export_rows(
+            flagged_emails, target, FingerprintSet(), batch_size=20
+        )
+
+        assert summary["failed"] == 0
+        assert len(target.unindexed) == 40
+        assert target.reindex() == 0
+        assert len(index) == len(set(map(fingerprint_row, flagged_emails)))
+
+
+def test_search_add_indexes_a_pst(tmp_path, mailbox, monkeypatch):
+    namespace, flagged_emails = mailbox
+    monkeypatch.setattr(outlook, "session", OutlookSession(lambda: namespace, MAILBOX))
+    pst_path = str(tmp_path / "export.pst")
+    root = outlook.open_pst(pst_path)
+    export_rows(
+        flagged_emails, PstTarget(root, namespace.GetItemFromID), FingerprintSet()
+    )
+    root.Items.Add(FakeMailItem("Retainer for 2026-0153", datetime(2026, 1, 1, 9)))
+
+    with SearchIndex(str(tmp_path / "search_index.db")) as index:
+        added = outlook.index_pst(index, pst_path)
+
+        assert added == len(root.Items)
+        assert {hit.store_path for hit in index.search("2026-0153")} == {pst_path}
+        assert outlook.index_pst(index, pst_path) == 0
@@ -0,0 +1,138 @@
+from collections import Counter
+
+import pytest
+
+from utils.fake import FakeComError, FakeFolder, FakeNamespace, SlowProxy, unwrap
+from utils.session import OutlookSession
+
+MAILBOX = "partner@radlawgroup.com"
+RPC_E_DISCONNECTED = -2147417848
+MAPI_E_NOT_FOUND = -2147221233
+
+
+@pytest.fixture
+def namespace():
+    clients = FakeFolder("Clients", folders=[FakeFolder("Acme")])
+    return FakeNamespace(
+        [FakeFolder(MAILBOX, folders=[FakeFolder("Inbox", folders=[clients])])]
+    )
+
+
+class CountingConnect:
+    """Connects to namespace through a SlowProxy counting every round trip"""
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.connects = 0
+        self.calls = Counter()
+
+    def __call__(self):
+        self.connects += 1
+        return SlowProxy(self.namespace, calls=self.calls)
+
+
+def test_folders_are_resolved_once(namespace):
+    connect = CountingConnect(namespace)
+    session = OutlookSession(connect, MAILBOX)
+
+    acme = session.folder(f"{MAILBOX}/Inbox/Clients/Acme")
+    round_trips = sum(connect.calls.values())
+    assert session.folder(f"/{MAILBOX}/Inbox/Clients/Acme/") is acme
+    assert session.folder(f"{MAILBOX}/Inbox") is session.inbox
+
+    assert sum(connect.calls.values()) == round_trips
+    assert acme.Name == "Acme"
+    assert connect.connects == 1
+
+
+def test_invalidate_evicts_only_that_path_and_below(namespace):
+    session = OutlookSession(CountingConnect(namespace), MAILBOX)
+    inbox = session.inbox
+    clients = session.folder(f"{MAILBOX}/Inbox/Clients")
+    acme = session.folder(f"{MAILBOX}/Inbox/Clients/Acme")
+
+    session.invalidate(f"{MAILBOX}/Inbox/Clients")
+
+    assert set(session._folders) == {MAILBOX, f"{MAILBOX}/Inbox"}
+    assert session.inbox is inbox
+    assert session.folder(f"{MAILBOX}/Inbox/Clients") is not clients
+    assert session.folder(f"{MAILBOX}/Inbox/Clients/Acme") is not acme
+    session.invalidate()
+    assert session._folders == {}
+
+
+def test_stores_are_listed_once_until_a_pst_is_added(namespace, tmp_path):
+    connect = CountingConnect(namespace)
+    session = OutlookSession(connect, MAILBOX)
+    march = str(tmp_path / "March.pst")
+
+    assert session.store(march) is None
+    root = session.open_pst(march)
+    stores_read = connect.calls["Stores"]
+
+    assert unwrap(session.open_pst(march)) is unwrap(root)
+    store = session.store(str(tmp_path / "." / "March.pst"))
+    assert unwrap(store.GetRootFolder()) is unwrap(root)
+    assert connect.calls["Stores"] == stores_read
+    assert connect.calls["AddStore"] == 1
+    assert len(namespace.Stores) == 1
+
+
+def test_open_pst_is_quiet_when_the_store_is_open(namespace, tmp_path, capsys):
+    session = OutlookSession(CountingConnect(namespace), MAILBOX)
+    session.open_pst(str(tmp_path / "March.pst"))
+    session.open_pst(str(tmp_path / "March.pst"))
+
+    assert capsys.readouterr().out == ""
+
+
+def test_call_reconnects_once_after_a_disconnect(namespace):
+    connect = CountingConnect(namespace)
+    session = OutlookSession(connect, MAILBOX)
+    inbox = session.inbox
+    namespaces = []
+
+    def folder_count():
+        namespaces.append(session.namespace)
+        if len(namespaces) == 1:
+            raise FakeComError(RPC_E_DISCONNECTED)
+        return session.namespace.Folders.Count
+
+    assert session.call(folder_count) == 1
+    assert connect.connects == 2
+    assert namespaces[0] is not namespaces[1]
+    # Handles of the old connection are dropped
+    assert session.inbox is not inbox
+
+
+def test_call_gives_up_when_the_retry_disconnects_too(namespace):
+    connect = CountingConnect(namespace)
+    session = OutlookSession(connect, MAILBOX)
+    attempts = []
+
+    def disconnected():
+        attempts.append(1)
+        raise FakeComError(RPC_E_DISCONNECTED)
+
+    with pytest.raises(FakeComError):
+        session.call(disconnected)
+    assert len(attempts) == 2
+
+
+def test_call_reraises_other_errors_without_reconnecting(namespace):
+    connect = CountingConnect(namespace)
+    session = OutlookSession(connect, MAILBOX)
+    session.inbox
+    attempts = []
+
+    def not_found():
+        attempts.append(1)
+        raise FakeComError(MAPI_E_NOT_FOUND)
+
+    with pytest.raises(FakeComError):
+        session.call(not_found)
+    with pytest.raises(KeyError):
+        session.folder(f"{MAILBOX}/Outbox")
+
+    assert len(attempts) == 1
+    assert connect.connects == 1
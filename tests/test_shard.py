@@ -0,0 +1,84 @@
+import mailbox
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime
+
+import pytest
+
+from utils.archive import FINGERPRINT_HEADER
+from utils.backend import LocalBackend
+from utils.query import build_flagged_filter
+from utils.shard import MANIFEST_NAME, ShardedExport, plan_shards
+
+START = date(2026, 1, 1)
+END = date(2026, 3, 31)
+
+
+def add_emails(root, count, first, prefix):
+    os.makedirs(root, exist_ok=True)
+    inbox = mailbox.Maildir(os.path.join(root, "Inbox"))
+    for number in range(count):
+        message = EmailMessage()
+        message["Subject"] = f"{prefix} {number}"
+        message["From"] = "client@example.com"
+        message["Date"] = format_datetime(first + timedelta(days=number))
+        message["X-Flagged"] = "yes"
+        message.set_content("Body")
+        inbox.add(message)
+
+
+def export(root, output_folder, shard_by, index_path=None):
+    backend = LocalBackend(root)
+    flagged_emails = backend.fetch("Inbox", build_flagged_filter(START, END))
+    return ShardedExport(
+        lambda: LocalBackend(root), shard_by, 3, index_path
+    ).export(flagged_emails, output_folder, START, END)
+
+
+def archived(output_folder):
+    """Fingerprint -> number of copies across every shard archive"""
+    copies = Counter()
+    for name in os.listdir(output_folder):
+        if name.endswith(".mbox"):
+            archive = mailbox.mbox(os.path.join(output_folder, name))
+            copies.update(message[FINGERPRINT_HEADER] for message in archive)
+    return copies
+
+
+def test_shards_by_month_cover_only_months_with_mail():
+    rows = [
+        type("Row", (), {"ReceivedTime": datetime(2026, month, 10)})()
+        for month in (1, 1, 3)
+    ]
+
+    shards = plan_shards(rows, START, END, "month")
+
+    assert [(shard.start, shard.end, len(shard.rows)) for shard in shards] == [
+        (date(2026, 1, 1), date(2026, 1, 31), 2),
+        (date(2026, 3, 1), date(2026, 3, 31), 1),
+    ]
+
+
+@pytest.mark.parametrize("with_index", [False, True])
+def test_rerun_after_earlier_mail_arrived_copies_only_the_new_mail(
+    tmp_path, with_index
+):
+    root = str(tmp_path / "mail")
+    output_folder = str(tmp_path / "shards")
+    index_path = str(tmp_path / "sync_index.db") if with_index else None
+    add_emails(root, 30, datetime(2026, 2, 1, 9), "February")
+
+    manifest = export(root, output_folder, 10, index_path)
+    assert [shard["copied"] for shard in manifest["shards"]] == [10, 10, 10]
+
+    # Older mail shifts every part boundary of the next run
+    add_emails(root, 5, datetime(2026, 1, 5, 9), "January")
+    manifest = export(root, output_folder, 10, index_path)
+
+    assert sum(shard["copied"] for shard in manifest["shards"]) == 5
+    copies = archived(output_folder)
+    assert len(copies) == 35
+    assert set(copies.values()) == {1}
+    assert os.path.exists(os.path.join(output_folder, MANIFEST_NAME))
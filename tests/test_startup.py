@@ -0,0 +1,61 @@
+import pytest
+
+from utils.benchmark.startup import IMPORT_BUDGET_MS, measure_import
+
+# Defines forest-light as clam, so no theme images are needed
+FAKE_THEME = "ttk::style theme create forest-light -parent clam\n"
+
+
+@pytest.fixture(scope="module")
+def utils_import():
+    return measure_import("utils", runs=5)
+
+
+def test_import_utils_is_within_budget(utils_import):
+    assert utils_import["median_ms"] <= IMPORT_BUDGET_MS
+
+
+def test_import_utils_leaves_heavy_modules_unloaded(utils_import):
+    assert utils_import["excluded_modules_loaded"] == []
+
+
+@pytest.fixture
+def main_window(tk_root, tmp_path, monkeypatch):
+    # forest-light.tcl and config.ini are looked up in the working directory
+    monkeypatch.chdir(tmp_path)
+    import gui
+
+    def make(**options):
+        window = gui.MainWindow(tk_root, **options)
+        windows.append(window)
+        return window
+
+    windows = []
+    yield make
+    for window in windows:
+        window.worker.stop(1)
+
+
+def test_theme_is_applied_before_the_first_paint(main_window, tmp_path):
+    (tmp_path / "forest-light.tcl").write_text(FAKE_THEME)
+
+    window = main_window()
+
+    # No event has been processed yet, so nothing has been drawn
+    assert window.style.theme_use() == "forest-light"
+
+
+def test_missing_theme_falls_back_to_the_default(main_window, capsys):
+    window = main_window()
+
+    assert window.style.theme_use() != "forest-light"
+    assert "forest-light.tcl not found" in capsys.readouterr().out
+
+
+def test_broken_theme_falls_back_to_the_default(main_window, tmp_path, capsys):
+    (tmp_path / "forest-light.tcl").write_text("this is not tcl {\n")
+
+    window = main_window()
+
+    assert window.style.theme_use() != "forest-light"
+    assert "Error loading theme" in capsys.readouterr().out
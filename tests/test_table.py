@@ -0,0 +1,109 @@
+from array import array
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import table
+from utils.fake import FakeAttachment, FakeFolder, FakeMailItem, SlowProxy
+from utils.table import (
+    MAIL_COLUMNS,
+    PR_HAS_ATTACHMENTS,
+    PR_INTERNET_MESSAGE_ID,
+    MailTable,
+    get_table,
+    iter_table,
+    iter_table_batches,
+)
+
+FIRST = datetime(2026, 3, 2, 9)
+
+
+@pytest.fixture
+def folder():
+    emails = [
+        FakeMailItem(
+            f"Email {number}",
+            FIRST + timedelta(minutes=number),
+            2 if number % 2 else 0,
+            f"{number}@example.com",
+            Size=100 + number,
+        )
+        for number in range(25)
+    ]
+    emails[3].Attachments.Add(FakeAttachment("contract.pdf"))
+    # Outlook returns empty integer columns as None
+    emails[4].Size = None
+    return FakeFolder("Inbox", emails)
+
+
+def test_schema_columns_are_aliased(folder):
+    mail_table = get_table(folder)
+
+    row = mail_table[3]
+    assert row.InternetMessageID == folder.Items.Item(4).InternetMessageID
+    assert row.HasAttachments is True
+    assert mail_table[0].HasAttachments is False
+    assert mail_table.column("InternetMessageID") is mail_table.data[
+        PR_INTERNET_MESSAGE_ID
+    ]
+    assert mail_table.column("HasAttachments") is mail_table.data[PR_HAS_ATTACHMENTS]
+    assert mail_table.Row._fields[MAIL_COLUMNS.index(PR_INTERNET_MESSAGE_ID)] == (
+        "InternetMessageID"
+    )
+
+
+def test_integer_columns_are_typed_arrays(folder):
+    mail_table = get_table(folder)
+
+    assert isinstance(mail_table.column("Size"), array)
+    assert mail_table.column("Size").typecode == "q"
+    assert mail_table.column("FlagStatus").typecode == "b"
+    assert mail_table[4].Size == 0
+    assert list(mail_table.column("FlagStatus")) == [
+        number % 2 * 2 for number in range(25)
+    ]
+    assert isinstance(mail_table.column("Subject"), list)
+
+
+def test_batches_follow_fetch_batch_size(folder, monkeypatch):
+    monkeypatch.setattr(table, "FETCH_BATCH_SIZE", 10)
+    proxy = SlowProxy(folder)
+
+    batches = list(iter_table_batches(proxy, "", ("Subject",)))
+
+    assert [len(rows) for rows in batches] == [10, 10, 5]
+    assert batches[2][-1] == ("Email 24",)
+    assert proxy.calls["GetArray"] == 3
+    assert [row.Subject for row in iter_table(folder, "", ("Subject",))] == [
+        f"Email {number}" for number in range(25)
+    ]
+
+
+def test_filter_and_columns(folder):
+    mail_table = get_table(folder, "[FlagStatus] = 2", ("EntryID", "Subject"))
+
+    assert mail_table.columns == ("EntryID", "Subject")
+    assert len(mail_table) == 12
+    assert mail_table[0] == (folder.Items.Item(2).EntryID, "Email 1")
+
+
+def test_take_collect_and_extend(folder):
+    mail_table = get_table(folder)
+
+    taken = mail_table.take([5, 0, 5])
+    assert [row.Subject for row in taken] == ["Email 5", "Email 0", "Email 5"]
+    assert taken.column("Size").typecode == "q"
+    assert list(taken.column("Size")) == [105, 100, 105]
+
+    collected = MailTable()
+    rows = collected.collect(iter_table(folder))
+    assert len(collected) == 0
+    first = next(rows)
+    assert len(collected) == 1
+    assert list(rows)[-1].Subject == "Email 24"
+    assert list(collected) == [first] + list(mail_table)[1:]
+
+    collected.extend([])
+    collected.extend(taken)
+    assert len(collected) == 28
+    assert collected[-1] == taken[2]
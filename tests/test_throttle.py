@@ -0,0 +1,225 @@
+from random import Random
+
+import pytest
+
+from utils.fake import FakeComError
+from utils.throttle import (
+    BATCH_STEP,
+    MIN_BATCH_SIZE,
+    RATE_WINDOW,
+    Throttle,
+    is_transient_error,
+)
+
+RPC_E_CALL_REJECTED = -2147418111
+MAPI_E_BUSY = -2147221237
+MAPI_E_NOT_FOUND = -2147221233
+DISP_E_EXCEPTION = -2147352567
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Highest:
+    """A random whose uniform() always picks the top of the range"""
+
+    def uniform(self, low, high):
+        return high
+
+
+def failing(*errors, result="ok"):
+    """A function raising errors in turn, then returning result"""
+    errors = list(errors)
+    calls = []
+
+    def function():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    function.calls = calls
+    return function
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def throttle(sleeps):
+    return Throttle(random=Random(0), sleep=sleeps.append, clock=Clock())
+
+
+def test_rejected_calls_are_transient_whatever_they_do():
+    rejected = FakeComError(RPC_E_CALL_REJECTED)
+    assert is_transient_error(rejected, "Items")
+    assert is_transient_error(rejected, "Move")
+
+
+def test_busy_errors_are_transient_only_for_calls_that_read():
+    busy = FakeComError(MAPI_E_BUSY)
+    assert is_transient_error(busy, "Items")
+    assert is_transient_error(busy, "GetArray")
+    for name in ("Copy", "Move", "Delete", "AddStore"):
+        assert not is_transient_error(busy, name)
+
+
+def test_errors_raised_inside_a_call_are_classified_by_their_scode():
+    # Outlook wraps its own errors in DISP_E_EXCEPTION
+    raised_inside = FakeComError(DISP_E_EXCEPTION)
+    raised_inside.args = (
+        DISP_E_EXCEPTION,
+        "Exception occurred.",
+        (0, "Outlook", "Busy", None, 0, MAPI_E_BUSY),
+        None,
+    )
+    assert is_transient_error(raised_inside, "Items")
+    assert not is_transient_error(FakeComError(MAPI_E_NOT_FOUND), "Items")
+    assert not is_transient_error(ValueError("bad value"), "Items")
+
+
+def test_transient_errors_are_retried_after_a_jittered_backoff(throttle, sleeps):
+    function = failing(
+        FakeComError(RPC_E_CALL_REJECTED), FakeComError(RPC_E_CALL_REJECTED)
+    )
+
+    assert throttle.call("Items", function) == "ok"
+
+    assert len(function.calls) == 3
+    assert len(sleeps) == 2
+    for attempt, delay in enumerate(sleeps):
+        ceiling = min(throttle.max_delay, throttle.base_delay * 2**attempt)
+        assert ceiling / 2 <= delay <= ceiling
+    assert throttle.retried == 2
+    assert throttle.backoff_seconds == pytest.approx(sum(sleeps))
+
+
+def test_permanent_errors_are_raised_at_once(throttle, sleeps):
+    function = failing(FakeComError(MAPI_E_NOT_FOUND))
+
+    with pytest.raises(FakeComError):
+        throttle.call("Items", function)
+
+    assert len(function.calls) == 1
+    assert sleeps == []
+    assert throttle.transient_errors == 0
+
+
+def test_busy_errors_are_not_retried_for_calls_that_write(throttle, sleeps):
+    move = failing(FakeComError(MAPI_E_BUSY))
+    with pytest.raises(FakeComError):
+        throttle.call("Move", move)
+    assert len(move.calls) == 1
+    assert sleeps == []
+
+    read = failing(FakeComError(MAPI_E_BUSY))
+    assert throttle.call("Items", read) == "ok"
+    assert len(read.calls) == 2
+
+
+def test_gives_up_after_retries(sleeps):
+    throttle = Throttle(retries=3, random=Random(0), sleep=sleeps.append)
+    function = failing(*[FakeComError(RPC_E_CALL_REJECTED)] * 10)
+
+    with pytest.raises(FakeComError):
+        throttle.call("Items", function)
+
+    assert len(function.calls) == 4
+    assert len(sleeps) == 3
+    assert throttle.gave_up == 1
+
+
+def test_backoff_doubles_up_to_max_delay():
+    throttle = Throttle(base_delay=0.1, max_delay=1.0, random=Highest())
+
+    assert [throttle.backoff(attempt) for attempt in range(6)] == pytest.approx(
+        [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+    )
+
+
+def test_rejections_halve_concurrency_once_per_round(sleeps):
+    clock = Clock()
+    throttle = Throttle(max_concurrency=8, retries=0, sleep=sleeps.append, clock=clock)
+
+    def rejected_while_another_call_is_rejected():
+        clock.now += 1
+        with pytest.raises(FakeComError):
+            throttle.call("Items", failing(FakeComError(RPC_E_CALL_REJECTED)))
+        raise FakeComError(RPC_E_CALL_REJECTED)
+
+    with pytest.raises(FakeComError):
+        throttle.call("Items", rejected_while_another_call_is_rejected)
+    # The outer call started under the old limit
+    assert throttle.concurrency == 4
+    assert throttle.decreases == 1
+
+    clock.now += 1
+    with pytest.raises(FakeComError):
+        throttle.call("Items", failing(FakeComError(RPC_E_CALL_REJECTED)))
+    assert throttle.concurrency == 2
+    assert throttle.transient_errors == 3
+
+    for _ in range(3):
+        throttle.call("Items", failing())
+    # One more call in flight for every window of successful calls
+    assert 3 <= throttle.concurrency < 3.5
+    for _ in range(100):
+        throttle.call("Items", failing())
+    assert throttle.concurrency == 8
+
+
+def test_concurrency_never_drops_below_one(throttle):
+    throttle.retries = 0
+    for _ in range(10):
+        throttle.clock.now += 1
+        with pytest.raises(FakeComError):
+            throttle.call("Items", failing(FakeComError(RPC_E_CALL_REJECTED)))
+
+    assert throttle.concurrency == 1
+    assert throttle.call("Items", failing()) == "ok"
+
+
+def test_batch_size_shrinks_on_rejection_and_recovers(throttle):
+    throttle.retries = 0
+    assert throttle.batch_size(100) == 100
+    assert throttle.metrics()["batch_limit"] is None
+
+    decreases = throttle.decreases
+    with pytest.raises(FakeComError):
+        throttle.call("Items", failing(FakeComError(RPC_E_CALL_REJECTED)))
+    throttle.batch_done(decreases)
+    assert throttle.batch_size(100) == 50
+
+    # A clean batch grows the limit a step
+    throttle.batch_done(throttle.decreases)
+    assert throttle.batch_size(100) == 50 + BATCH_STEP
+
+    for _ in range(10):
+        throttle.clock.now += 1
+        throttle.batch_size(100)
+        with pytest.raises(FakeComError):
+            throttle.call("Items", failing(FakeComError(RPC_E_CALL_REJECTED)))
+    assert throttle.batch_size(100) == MIN_BATCH_SIZE
+
+    for _ in range(100):
+        throttle.batch_done(throttle.decreases)
+    assert throttle.batch_size(100) == 100
+    assert throttle.batch_size(20) == 20
+
+
+def test_calls_per_second_uses_the_injected_clock(throttle):
+    for _ in range(10):
+        throttle.call("Items", failing())
+    assert throttle.metrics()["calls_per_second"] == 10 / RATE_WINDOW
+
+    throttle.clock.now += RATE_WINDOW + 1
+    metrics = throttle.metrics()
+    assert metrics["calls_per_second"] == 0
+    assert metrics["calls"] == 10
@@ -0,0 +1,154 @@
+import random
+from datetime import datetime, timedelta
+
+from utils.benchmark.common import FIRST_DAY, generate_mailbox
+from utils.fake import with_events
+from utils.outlook import get_flagged_emails_in_month
+from utils.query import FLAG_MARKED, build_flagged_filter
+from utils.table import get_table
+from utils.watch import FlagWatcher
+
+LAST_DAY = FIRST_DAY + timedelta(days=29)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def flagged_entry_ids(inbox):
+    return set(
+        get_table(inbox, build_flagged_filter(FIRST_DAY, LAST_DAY)).column("EntryID")
+    )
+
+
+def test_watched_set_matches_a_fresh_scan_after_random_changes():
+    generator = random.Random(0)
+    inbox = generate_mailbox(2000, seed=0)
+    emails = list(inbox.Items)
+    flagged_emails, start, end = get_flagged_emails_in_month(
+        FIRST_DAY, LAST_DAY, folder=inbox
+    )
+    clock = Clock()
+    watcher = FlagWatcher(
+        inbox, start, end, flagged_emails, with_events=with_events, clock=clock
+    ).start()
+
+    for _ in range(2000):
+        email = generator.choice(emails)
+        if email.FlagStatus == FLAG_MARKED:
+            email.ClearTaskFlag()
+        else:
+            email.MarkAsTask()
+        clock.now += 0.01
+        watcher.apply_if_due()
+    clock.now += watcher.debounce
+    watcher.apply_if_due()
+    watcher.stop()
+
+    assert watcher.batches > 1
+    assert set(watcher.flagged_emails().column("EntryID")) == flagged_entry_ids(
+        inbox
+    )
+
+
+def toggle(email):
+    if email.FlagStatus == FLAG_MARKED:
+        email.ClearTaskFlag()
+    else:
+        email.MarkAsTask()
+
+
+def test_burst_of_10k_changes_a_minute_is_followed_in_bounded_batches():
+    generator = random.Random(1)
+    inbox = generate_mailbox(5000, seed=1)
+    emails = list(inbox.Items)
+    for email in emails:
+        email.LastModificationTime = email.ReceivedTime
+    scanned_at = datetime.now()
+    flagged_emails, start, end = get_flagged_emails_in_month(
+        FIRST_DAY, LAST_DAY, folder=inbox
+    )
+    clock = Clock()
+    watcher = FlagWatcher(
+        inbox,
+        start,
+        end,
+        flagged_emails,
+        with_events=with_events,
+        clock=clock,
+        scanned_at=scanned_at,
+    ).start()
+    clock.now += watcher.debounce
+    watcher.apply_if_due()
+
+    # A minute of 10,000 changes that never pause long enough to debounce
+    delays = []
+    first_pending = None
+    for _ in range(10_000):
+        clock.now += 0.006
+        toggle(generator.choice(emails))
+        if first_pending is None:
+            first_pending = clock.now
+        if watcher.apply_if_due():
+            delays.append(clock.now - first_pending)
+            first_pending = None
+    clock.now += watcher.debounce
+    watcher.apply_if_due()
+    watcher.stop()
+
+    assert watcher.events == 10_001
+    assert 25 <= len(delays) <= 31
+    assert max(delays) <= watcher.max_delay + 0.006
+    assert set(watcher.flagged_emails().column("EntryID")) == flagged_entry_ids(
+        inbox
+    )
+
+
+def test_stop_unsubscribes_so_rescans_do_not_pile_up():
+    inbox = generate_mailbox(200, seed=2)
+    for _ in range(3):
+        # Every rescan starts a new watcher and stops the previous one
+        watcher = FlagWatcher(
+            inbox, FIRST_DAY, LAST_DAY, with_events=with_events
+        ).start()
+        assert len(inbox.Items.handlers) == 1
+        watcher.stop()
+
+    assert inbox.Items.handlers == []
+    toggle(next(iter(inbox.Items)))
+    assert watcher.events == 0
+
+
+def test_changes_made_while_the_scan_ran_are_caught_up():
+    inbox = generate_mailbox(500, seed=3)
+    for email in inbox.Items:
+        email.LastModificationTime = email.ReceivedTime
+    # A scan that took ten minutes
+    scanned_at = datetime.now() - timedelta(minutes=10)
+    flagged_emails, start, end = get_flagged_emails_in_month(
+        FIRST_DAY, LAST_DAY, folder=inbox
+    )
+    # Flagged after the scan had read past it, before anyone was subscribed
+    email = next(email for email in inbox.Items if email.FlagStatus != FLAG_MARKED)
+    email.MarkAsTask()
+    email.LastModificationTime = scanned_at + timedelta(minutes=5)
+    clock = Clock()
+
+    watcher = FlagWatcher(
+        inbox,
+        start,
+        end,
+        flagged_emails,
+        with_events=with_events,
+        clock=clock,
+        scanned_at=scanned_at,
+    ).start()
+    clock.now += watcher.debounce
+    watcher.apply_if_due()
+    watcher.stop()
+
+    assert email.EntryID in watcher.flagged_emails().column("EntryID")
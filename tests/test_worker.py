@@ -0,0 +1,179 @@
+import threading
+import time
+
+import pytest
+
+from utils.worker import OutlookWorker
+
+
+@pytest.fixture
+def worker():
+    worker = OutlookWorker().start()
+    yield worker
+    worker.stop(timeout=5)
+
+
+def wait_for(worker, *job_ids, timeout=5):
+    """Map each of job_ids to its events, once every one of them has finished"""
+    events = {job_id: [] for job_id in job_ids}
+    pending = set(job_ids)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        for event in worker.poll():
+            if event.job_id in events:
+                events[event.job_id].append(event)
+                if event.kind in ("done", "error", "cancelled"):
+                    pending.discard(event.job_id)
+        time.sleep(0.01)
+    assert not pending, f"jobs {sorted(pending)} did not finish: {events}"
+    return events if len(job_ids) > 1 else events[job_ids[0]]
+
+
+def kinds(events):
+    return [event.kind for event in events]
+
+
+def test_job_result_and_progress(worker):
+    def job_function(job, value):
+        job.report(position=1)
+        return value * 2
+
+    job_id = worker.submit("double", job_function, 21)
+    events = wait_for(worker, job_id)
+
+    assert kinds(events) == ["started", "progress", "done"]
+    assert events[-1].payload == 42
+
+
+def test_cancelling_a_queued_job_drops_it(worker):
+    release = threading.Event()
+    ran = []
+    first = worker.submit("first", lambda job: release.wait(5))
+    second = worker.submit("second", lambda job: ran.append(True))
+
+    worker.cancel(second)
+    release.set()
+
+    events = wait_for(worker, first, second)
+    assert kinds(events[first]) == ["started", "done"]
+    assert kinds(events[second]) == ["cancelled"]
+    assert not ran
+
+
+def test_cancel_only_stops_the_job_it_names(worker):
+    started = threading.Event()
+
+    def until_cancelled(job):
+        started.set()
+        while not job.cancelled:
+            time.sleep(0.01)
+        return "stopped"
+
+    running = worker.submit("running", until_cancelled)
+    queued = worker.submit("queued", lambda job: job.cancelled)
+    started.wait(5)
+
+    worker.cancel(running)
+
+    events = wait_for(worker, running, queued)
+    assert kinds(events[running]) == ["started", "cancelled"]
+    assert events[running][-1].payload == "stopped"
+    # The next job starts with its own, unset flag
+    assert kinds(events[queued]) == ["started", "done"]
+    assert events[queued][-1].payload is False
+
+
+def test_cancelling_a_repeating_job_stops_its_calls(worker):
+    calls = []
+    job_id = worker.every("tick", 0.01, lambda job: calls.append(job.id))
+    while not calls:
+        time.sleep(0.01)
+
+    worker.cancel(job_id)
+
+    assert kinds(wait_for(worker, job_id)) == ["started", "cancelled"]
+    count = len(calls)
+    time.sleep(0.1)
+    assert len(calls) == count
+
+
+def test_stop_cancels_the_running_job():
+    worker = OutlookWorker().start()
+    started = threading.Event()
+    seen = []
+
+    def until_cancelled(job):
+        started.set()
+        while not job.cancelled:
+            time.sleep(0.01)
+        seen.append(True)
+
+    worker.submit("running", until_cancelled)
+    started.wait(5)
+    worker.stop(timeout=5)
+
+    assert seen == [True]
+    assert not worker._thread.is_alive()
+
+
+def test_stop_gives_repeating_jobs_a_last_call():
+    worker = OutlookWorker().start()
+    calls = []
+    job_id = worker.every("tick", 60, lambda job: calls.append(job.cancelled))
+
+    worker.stop(timeout=5)
+
+    assert calls == [True]
+    assert kinds(wait_for(worker, job_id)) == ["started", "cancelled"]
+
+
+def test_quitting_while_watching_unsubscribes(monkeypatch):
+    gui = pytest.importorskip("gui")
+    from utils import outlook
+    from utils.benchmark.common import FIRST_DAY, generate_mailbox
+    from utils.fake import with_events
+
+    inbox = generate_mailbox(100, seed=1)
+    monkeypatch.setattr(
+        outlook,
+        "watch_flagged_emails",
+        lambda flagged_emails, start, end, **options: outlook.FlagWatcher(
+            inbox, start, end, flagged_emails, with_events=with_events
+        ).start(),
+    )
+    worker = OutlookWorker().start()
+    flag_watch = gui.FlagWatchJob(None, FIRST_DAY, FIRST_DAY)
+    worker.every("watch", 0.01, flag_watch)
+    deadline = time.monotonic() + 5
+    while not inbox.Items.handlers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(inbox.Items.handlers) == 1
+
+    # As MainWindow.quit does
+    flag_watch.stop()
+    worker.stop(timeout=5)
+
+    assert inbox.Items.handlers == []
+
+
+def test_rescans_share_the_worker_threads_sync_index(worker, tmp_path, monkeypatch):
+    gui = pytest.importorskip("gui")
+    from utils import outlook
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        outlook,
+        "sync_flagged_emails_in_month",
+        lambda sync_index, start, end: ([], start, end),
+    )
+
+    events = wait_for(
+        worker,
+        worker.submit("scan", gui.scan_flagged_emails),
+        worker.submit("scan", gui.scan_flagged_emails),
+    )
+
+    first, second = (job_events[-1].payload for job_events in events.values())
+    assert first[0] is second[0]
+    # Only the worker thread opened one
+    assert getattr(gui._worker_state, "sync_index", None) is None
@@ -1,9 +1,27 @@
-from .config import get_config, set_config
-from .outlook import (
-    get_flagged_emails_in_month,
-    is_outlook_installed,
-    get_flagged_emails_in_month_pst,
-)
+from importlib import import_module
+
+# Eager: importing the submodule later would otherwise bind utils.fingerprint
+# to the module rather than the function. It only needs hashlib and array.
+from .fingerprint import FingerprintSet, fingerprint
+
+# Exported name -> submodule defining it. Submodules are imported on first
+# attribute access, so "import utils" stays cheap and pulls in neither COM,
+# sqlite3 nor the email package until they are used.
+_EXPORTS = {
+    "get_config": "config",
+    "set_config": "config",
+    "build_flagged_filter": "query",
+    "get_flagged_emails_in_month": "outlook",
+    "is_outlook_installed": "outlook",
+    "get_flagged_emails_in_month_pst": "outlook",
+    "resolve_email": "outlook",
+    "OutlookSession": "session",
+    "MailBackend": "backend",
+    "OutlookBackend": "backend",
+    "LocalBackend": "backend",
+    "MailTable": "table",
+    "get_table": "table",
+}
 
 __all__ = [
     "get_config",
@@ -11,4 +29,28 @@ __all__ = [
     "is_outlook_installed",
     "get_flagged_emails_in_month",
     "get_flagged_emails_in_month_pst",
+    "build_flagged_filter",
+    "resolve_email",
+    "MailTable",
+    "get_table",
+    "FingerprintSet",
+    "fingerprint",
+    "OutlookSession",
+    "MailBackend",
+    "OutlookBackend",
+    "LocalBackend",
 ]
+
+
+def __getattr__(name):
+    try:
+        module_name = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
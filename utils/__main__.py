@@ -0,0 +1,618 @@
+"""Command line entry point for unattended exports.
+
+    python -m utils export --mailbox partner@radlawgroup.com --output D:/Billing
+    python -m utils team-export --mailbox a@x.com --mailbox b@x.com --workers 4
+    python -m utils archive --source ~/Mail --folder INBOX --output flagged.mbox
+    python -m utils search "2026-0153 AND invoice*" --start 2026-03-01
+
+`export` exports flagged mail for each mailbox into its own PST under the
+output folder. `team-export` walks whole folder trees of several mailboxes
+in parallel. `archive` does the same for Maildir/mbox/.eml trees without
+Outlook. All write a JSON run summary with per-phase wall-clock timings;
+With `--profile report.json`, `export` and `team-export` also count and time
+every Outlook call. `export` also indexes what it copies for `search`.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from utils import outlook
+from utils.archive import ARCHIVE_SUFFIX, MailArchive
+from utils.backend import LocalBackend, OutlookBackend, export_folder
+from utils.config import get_config, profile_section
+from utils.index import INDEX_PATH, SyncIndex
+from utils.instrument import Profiler
+from utils.journal import ExportJournal
+from utils.pipeline import DEFAULT_BATCH_SIZE
+from utils.query import default_month_range
+from utils.scheduler import DEFAULT_MAX_WORKERS, ExportScheduler, ExportTarget
+from utils.search import SEARCH_INDEX_PATH, QueryError, SearchIndex
+from utils.shard import ShardedExport
+from utils.table import MailTable
+
+
+@contextmanager
+def timed(phases, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = round(time.perf_counter() - started, 3)
+
+
+def _config_or_none(section, key):
+    try:
+        return get_config(section, key)
+    except (FileNotFoundError, KeyError):
+        return None
+
+
+def export_mailbox(
+    mailbox,
+    start,
+    end,
+    output_folder,
+    index,
+    batch_size,
+    stream=False,
+    sharded=None,
+    journal=None,
+    archive=False,
+    search_index=None,
+    report=True,
+    scan_workers=1,
+    attachments=False,
+):
+    """Connect, scan and export one mailbox, returning its summary dict
+
+    With stream, copying starts with the first batch Outlook returns instead
+    of after the sync scan, and scan and export share one phase. With
+    sharded, a ShardedExport, the mail is split over several archives.
+    Otherwise a journal (an ExportJournal) checkpoints the export so a rerun
+    after a crash resumes it. With archive, the month goes into a compressed
+    .mailarc archive instead of a PST. With search_index, a SearchIndex,
+    copied emails are indexed for full-text search. With report, billing
+    summaries (utils.report) are written next to the PST or archive. With
+    scan_workers above 1, the range is scanned in date partitions on that
+    many Outlook sessions instead of through the sync index. With
+    attachments, the emails' attachments are saved next to the PST too.
+    """
+    phases = {}
+    summary = {"mailbox": mailbox, "phases": phases}
+
+    try:
+        with timed(phases, "connect"):
+            if not outlook.is_outlook_installed(mailbox):
+                raise RuntimeError(f"Could not open mailbox {mailbox} in Outlook")
+
+        if stream:
+            start_of_month, end_of_month = default_month_range(start, end)
+            scan_stats = outlook.ScanStats()
+            # Kept as they stream past for the report and attachments
+            scanned = MailTable()
+            flagged_emails = scanned.collect(
+                outlook.iter_flagged_emails(
+                    start_of_month, end_of_month, stats=scan_stats
+                )
+            )
+        elif scan_workers > 1:
+            with timed(phases, "scan"):
+                flagged_emails, start_of_month, end_of_month, scan = (
+                    outlook.scan_flagged_emails_in_partitions(start, end, scan_workers)
+                )
+            summary["flagged"] = len(flagged_emails)
+            summary["scan_partitions"] = scan["partitions"]
+        else:
+            with timed(phases, "scan"):
+                flagged_emails, start_of_month, end_of_month = (
+                    outlook.sync_flagged_emails_in_month(index, start, end)
+                )
+            summary["flagged"] = len(flagged_emails)
+
+        with timed(phases, "export"):
+            if sharded is not None:
+                manifest = sharded.export(
+                    flagged_emails, output_folder, start_of_month, end_of_month
+                )
+                summary["shards"] = manifest["shards"]
+                for key in ("copied", "skipped", "failed"):
+                    summary[key] = sum(shard[key] for shard in manifest["shards"])
+            elif archive:
+                summary.update(
+                    outlook.export_flagged_emails_to_archive(
+                        flagged_emails,
+                        start_of_month,
+                        end_of_month,
+                        batch_size=batch_size,
+                        output_folder=output_folder,
+                        journal=None if stream else journal,
+                        search_index=search_index,
+                    )
+                )
+            else:
+                summary.update(
+                    outlook.export_flagged_emails_to_pst(
+                        index,
+                        flagged_emails,
+                        start_of_month,
+                        end_of_month,
+                        batch_size=batch_size,
+                        output_folder=output_folder,
+                        # Planning reads the whole scan, which streaming avoids
+                        journal=None if stream else journal,
+                        search_index=search_index,
+                    )
+                )
+        if report and "path" in summary:
+            with timed(phases, "report"):
+                summary["report"] = outlook.write_flagged_emails_report(
+                    summary["path"],
+                    start_of_month,
+                    end_of_month,
+                    flagged_emails=scanned if stream else flagged_emails,
+                )
+        if attachments and "path" in summary:
+            with timed(phases, "attachments"):
+                summary["attachments"] = outlook.export_flagged_attachments(
+                    summary["path"],
+                    start_of_month,
+                    end_of_month,
+                    flagged_emails=scanned if stream else flagged_emails,
+                )
+        if stream:
+            summary["flagged"] = scan_stats.count
+            summary.update(scan_stats.as_dict())
+        summary["ok"] = summary["failed"] == 0
+    except Exception as e:
+        print(f"Error exporting {mailbox}: {e}", file=sys.stderr)
+        summary["ok"] = False
+        summary["error"] = str(e)
+
+    return summary
+
+
+def run_export(args):
+    mailboxes = args.mailbox or [_config_or_none("Email", "primary_email")]
+    if None in mailboxes:
+        raise SystemExit("No --mailbox given and no primary_email in config.ini")
+
+    output_folder = args.output or _config_or_none("Folder", "output_folder")
+    if output_folder is None:
+        raise SystemExit("No --output given and no output_folder in config.ini")
+
+    if args.format == "mailarc" and args.shard_by:
+        raise SystemExit("--shard-by writes PSTs; it cannot be used with --format")
+    if args.stream and args.scan_workers > 1:
+        raise SystemExit("--stream scans as it copies; it cannot use --scan-workers")
+
+    start, end = default_month_range(args.start, args.end)
+    profiler = outlook.enable_profiling() if args.profile else None
+    sharded = None
+    if args.shard_by:
+        # Each shard worker writes through its own Outlook session
+        scheduler = ExportScheduler(
+            outlook.connect_outlook, args.workers, profiler, outlook.throttle
+        )
+        sharded = ShardedExport(
+            lambda: OutlookBackend(scheduler.session()),
+            args.shard_by,
+            args.workers,
+            args.index,
+            args.batch_size,
+        )
+    started_at = datetime.now()
+    started = time.perf_counter()
+
+    results = []
+    with SyncIndex(args.index) as index, ExportJournal(
+        args.index
+    ) as journal, SearchIndex(args.search_index) as search_index:
+        for mailbox in mailboxes:
+            # One PST per mailbox so exports of several people never collide;
+            # a [Folder:<mailbox>] output_folder overrides the shared layout
+            mailbox_folder = None
+            if not args.output:
+                mailbox_folder = _config_or_none(
+                    profile_section("Folder", mailbox), "output_folder"
+                )
+            if mailbox_folder is None:
+                mailbox_folder = os.path.join(output_folder, mailbox)
+            os.makedirs(mailbox_folder, exist_ok=True)
+            results.append(
+                export_mailbox(
+                    mailbox,
+                    start,
+                    end,
+                    mailbox_folder,
+                    index,
+                    args.batch_size,
+                    args.stream,
+                    sharded,
+                    journal,
+                    archive=args.format == "mailarc",
+                    search_index=search_index,
+                    report=not args.no_report,
+                    scan_workers=args.scan_workers,
+                    attachments=args.attachments,
+                )
+            )
+
+    run_summary = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "output": output_folder,
+        "seconds": round(time.perf_counter() - started, 3),
+        "ok": all(result["ok"] for result in results),
+        "throttle": outlook.throttle.metrics(),
+        "mailboxes": results,
+    }
+
+    write_summary(args, run_summary)
+    write_profile(args, profiler)
+    return 0 if run_summary["ok"] else 1
+
+
+def run_team_export(args):
+    output_folder = args.output or _config_or_none("Folder", "output_folder")
+    if output_folder is None:
+        raise SystemExit("No --output given and no output_folder in config.ini")
+
+    start, end = default_month_range(args.start, args.end)
+    targets = [
+        ExportTarget(mailbox, folder, not args.no_recursive)
+        for mailbox in args.mailbox
+        for folder in args.folder or ["Inbox"]
+    ]
+    profiler = Profiler() if args.profile else None
+    scheduler = ExportScheduler(
+        outlook.connect_outlook, args.workers, profiler, outlook.throttle
+    )
+    started_at = datetime.now()
+    started = time.perf_counter()
+    phases = {}
+
+    with timed(phases, "scan"):
+        results = scheduler.scan(targets, start, end)
+    with timed(phases, "export"):
+        exports = scheduler.export(
+            results,
+            output_folder,
+            start,
+            end,
+            combined=args.combined,
+            index_path=args.index,
+            batch_size=args.batch_size,
+        )
+
+    run_summary = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "output": output_folder,
+        "workers": args.workers,
+        "seconds": round(time.perf_counter() - started, 3),
+        "phases": phases,
+        "ok": all(summary["failed"] == 0 for summary in exports),
+        "throttle": outlook.throttle.metrics(),
+        "folders": [
+            {
+                "mailbox": result.mailbox,
+                "folder": result.folder,
+                "flagged": len(result.flagged_emails),
+                "seconds": round(result.seconds, 3),
+            }
+            for result in results
+        ],
+        "exports": exports,
+    }
+
+    write_summary(args, run_summary)
+    write_profile(args, profiler)
+    return 0 if run_summary["ok"] else 1
+
+
+def run_archive(args):
+    start, end = default_month_range(args.start, args.end)
+    backend = LocalBackend(args.source)
+    started_at = datetime.now()
+    started = time.perf_counter()
+    phases = {}
+
+    with timed(phases, "list"):
+        folders = backend.list_folders(args.folder or "")
+    exports = []
+    for folder_path in folders:
+        with timed(phases, f"export {folder_path or '.'}"):
+            summary = export_folder(
+                backend,
+                folder_path,
+                args.output,
+                start,
+                end,
+                batch_size=args.batch_size,
+            )
+        summary["folder"] = folder_path
+        exports.append(summary)
+
+    run_summary = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "source": args.source,
+        "output": args.output,
+        "seconds": round(time.perf_counter() - started, 3),
+        "phases": phases,
+        "ok": all(summary["failed"] == 0 for summary in exports),
+        "exports": exports,
+    }
+
+    write_summary(args, run_summary)
+    return 0 if run_summary["ok"] else 1
+
+
+def run_search(args):
+    with SearchIndex(args.index) as index:
+        for path in args.add or ():
+            if path.lower().endswith(ARCHIVE_SUFFIX):
+                with MailArchive(path) as archive:
+                    added = index.add_archive(archive)
+            else:
+                if outlook.session is None and not outlook.is_outlook_installed(
+                    args.mailbox
+                ):
+                    print("Error: Could not connect to Outlook", file=sys.stderr)
+                    return 1
+                added = outlook.index_pst(index, os.path.abspath(path))
+            print(f"Indexed {added} emails from {path}", file=sys.stderr)
+        if args.query is None:
+            return 0
+        try:
+            hits = index.search(args.query, args.start, args.end, args.limit)
+        except QueryError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    if args.json:
+        json.dump(
+            [
+                {
+                    "received_time": hit.received_time
+                    and hit.received_time.isoformat(),
+                    "sender": hit.sender,
+                    "subject": hit.subject,
+                    "store": hit.store_path,
+                }
+                for hit in hits
+            ],
+            sys.stdout,
+            indent=2,
+        )
+        print()
+    else:
+        for hit in hits:
+            received = (
+                hit.received_time.strftime("%Y-%m-%d %H:%M")
+                if hit.received_time
+                else ""
+            )
+            print(f"{received}\t{hit.sender}\t{hit.subject}\t{hit.store_path}")
+    return 0
+
+
+def write_summary(args, run_summary):
+    text = json.dumps(run_summary, indent=2, default=str)
+    if args.summary:
+        with open(args.summary, "w") as summary_file:
+            summary_file.write(text)
+    else:
+        print(text)
+
+
+def write_profile(args, profiler):
+    if profiler is None:
+        return
+    profiler.dump(args.profile)
+    print(profiler.format_report(), file=sys.stderr)
+
+
+def shard_size(value):
+    if value == "month":
+        return value
+    try:
+        size = int(value)
+    except ValueError:
+        size = 0
+    if size < 1:
+        raise argparse.ArgumentTypeError('expected "month" or a number of emails')
+    return size
+
+
+def add_common_arguments(command):
+    command.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        help="First day, YYYY-MM-DD (default: start of this month)",
+    )
+    command.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        help="Last day, YYYY-MM-DD (default: end of this month)",
+    )
+    command.add_argument(
+        "--output", help="Folder for the PSTs (default: output_folder)"
+    )
+    command.add_argument(
+        "--summary", help="Write the JSON run summary here instead of stdout"
+    )
+    command.add_argument("--index", default=INDEX_PATH, help="Sync index file")
+    command.add_argument(
+        "--profile", help="Count and time every Outlook call, report to this JSON file"
+    )
+    command.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Emails per batch"
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m utils", description="Monthly flagged email exporter"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Export flagged mail to PST")
+    export.add_argument(
+        "--mailbox",
+        action="append",
+        help="Mailbox to export; repeat for several (default: primary_email)",
+    )
+    export_mode = export.add_mutually_exclusive_group()
+    export_mode.add_argument(
+        "--stream",
+        action="store_true",
+        help="Copy while scanning instead of syncing the index first",
+    )
+    export_mode.add_argument(
+        "--shard-by",
+        type=shard_size,
+        help='Split into one PST per "month" or per N emails, written in parallel',
+    )
+    export.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Shards written at once with --shard-by",
+    )
+    export.add_argument(
+        "--scan-workers",
+        type=int,
+        default=1,
+        help="Scan long ranges in date partitions on this many Outlook sessions",
+    )
+    export.add_argument(
+        "--format",
+        choices=("pst", "mailarc"),
+        default="pst",
+        help="Write a PST, or a compressed archive readable without Outlook",
+    )
+    export.add_argument(
+        "--no-report",
+        action="store_true",
+        help="Skip the per-client, per-day and per-sender summaries",
+    )
+    export.add_argument(
+        "--attachments",
+        action="store_true",
+        help="Also save each email's attachments, every distinct file once",
+    )
+    export.add_argument(
+        "--search-index",
+        default=SEARCH_INDEX_PATH,
+        help="Full-text index the copied emails are added to",
+    )
+    add_common_arguments(export)
+    export.set_defaults(run=run_export)
+
+    team_export = commands.add_parser(
+        "team-export", help="Export several mailboxes and folder trees in parallel"
+    )
+    team_export.add_argument(
+        "--mailbox", action="append", required=True, help="Mailbox; repeat for several"
+    )
+    team_export.add_argument(
+        "--folder",
+        action="append",
+        help='Folder path in each mailbox, e.g. "Inbox/Clients" (default: Inbox)',
+    )
+    team_export.add_argument(
+        "--no-recursive", action="store_true", help="Skip subfolders"
+    )
+    team_export.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Outlook sessions scanning at once",
+    )
+    team_export.add_argument(
+        "--combined", action="store_true", help="One PST for everyone"
+    )
+    add_common_arguments(team_export)
+    team_export.set_defaults(run=run_team_export)
+
+    archive = commands.add_parser(
+        "archive", help="Archive flagged mail from Maildir, mbox or .eml files"
+    )
+    archive.add_argument(
+        "--source", required=True, help="Directory of Maildirs, mbox and .eml files"
+    )
+    archive.add_argument(
+        "--folder",
+        help="Folder path below --source, subfolders included (default: all)",
+    )
+    archive.add_argument(
+        "--output",
+        required=True,
+        help="Archive to write: a .mailarc or .mbox file, otherwise a Maildir "
+        "directory",
+    )
+    archive.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        help="First day, YYYY-MM-DD (default: start of this month)",
+    )
+    archive.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        help="Last day, YYYY-MM-DD (default: end of this month)",
+    )
+    archive.add_argument(
+        "--summary", help="Write the JSON run summary here instead of stdout"
+    )
+    archive.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Emails per batch"
+    )
+    archive.set_defaults(run=run_archive)
+
+    search = commands.add_parser("search", help="Search exported flagged mail")
+    search.add_argument(
+        "query",
+        nargs="?",
+        help="Words, OR, NOT, -word, word*, (...) and from:/to:/subject:/body:",
+    )
+    search.add_argument(
+        "--start", type=date.fromisoformat, help="Received on or after, YYYY-MM-DD"
+    )
+    search.add_argument(
+        "--end", type=date.fromisoformat, help="Received on or before, YYYY-MM-DD"
+    )
+    search.add_argument("--limit", type=int, help="Show at most this many emails")
+    search.add_argument("--json", action="store_true", help="Print JSON")
+    search.add_argument(
+        "--index", default=SEARCH_INDEX_PATH, help="Full-text index file"
+    )
+    search.add_argument(
+        "--add",
+        action="append",
+        metavar="PATH",
+        help="Index a .mailarc archive or PST first; repeat for several",
+    )
+    search.add_argument(
+        "--mailbox", help="Outlook mailbox used to open PSTs (default: primary_email)"
+    )
+    search.set_defaults(run=run_search)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+"""Compressed, append-only archive of raw MIME messages with a SQLite index.
+
+An archive is two files: `<name>.mailarc` holds one zlib-compressed frame
+per message, only ever appended to, and `<name>.mailarc.idx` indexes the
+frames by Message-ID, received time, sender and subject. Frames are
+compressed one by one, so a single message is read by slicing it out of a
+memory map of the archive and decompressing just that frame.
+
+Each frame starts with a header holding the message's fingerprint, so the
+index can always be rebuilt from the archive alone. A batch of frames is
+fsync'ed before its index rows are committed; frames written by a run that
+died before committing are indexed (or, if torn, cut off) the next time the
+archive is opened.
+
+No Outlook is needed to write or read an archive:
+
+    with MailArchive("Flagged Emails 01-01-26 - 01-31-26.mailarc") as archive:
+        for entry in archive.search(sender="client3@example.com"):
+            print(entry.subject, archive.message(entry)["Date"])
+
+`ArchiveTarget` copies into such an archive and `MailboxTarget` into an
+mbox or Maildir; both store the MIME copy built by `utils.mime`.
+"""
+
+import mmap
+import os
+import sqlite3
+import struct
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from email import policy
+from email.parser import BytesHeaderParser, BytesParser
+from email.utils import parseaddr
+
+from utils.fingerprint import FingerprintSet, fingerprint_row
+from utils.mime import message_fingerprint, message_from_item
+from utils.pipeline import CopyTarget
+
+ARCHIVE_SUFFIX = ".mailarc"
+INDEX_SUFFIX = ".idx"
+
+# magic, fingerprint, compressed length, raw length, CRC-32 of the raw bytes
+_FRAME = struct.Struct("<4sqIII")
+_MAGIC = b"MARC"
+
+# zlib level; 3 compresses mail about 6.5x at over twice the speed of 6
+COMPRESSION_LEVEL = 3
+
+# Written into every message MailboxTarget adds: the fingerprint of the row
+# it was copied from, which the copy's own headers cannot always reproduce
+FINGERPRINT_HEADER = "X-Flagged-Fingerprint"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    fingerprint INTEGER NOT NULL UNIQUE,
+    message_id TEXT,
+    received_time TEXT,
+    sender TEXT,
+    subject TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_message_id ON messages (message_id);
+CREATE INDEX IF NOT EXISTS messages_received_time ON messages (received_time);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender, received_time);
+CREATE INDEX IF NOT EXISTS messages_subject ON messages (subject);
+"""
+
+# length is the whole frame, header included; size the uncompressed message
+ArchiveEntry = namedtuple(
+    "ArchiveEntry",
+    [
+        "id",
+        "offset",
+        "length",
+        "size",
+        "fingerprint",
+        "message_id",
+        "received_time",
+        "sender",
+        "subject",
+    ],
+)
+
+_ENTRY_COLUMNS = ", ".join(ArchiveEntry._fields)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _normalize_message_id(message_id):
+    return (message_id or "").strip().strip("<>").lower() or None
+
+
+def _format_time(received_time):
+    if received_time is None:
+        return None
+    return received_time.replace(tzinfo=None).isoformat(sep=" ", timespec="seconds")
+
+
+def _header_fields(headers):
+    """(Message-ID, received time, sender, subject) from parsed headers"""
+    try:
+        received_time = headers["Date"].datetime
+    except (AttributeError, TypeError, ValueError):
+        received_time = None
+    if received_time is not None and received_time.tzinfo is not None:
+        # Outlook reports local wall-clock times; match it
+        received_time = received_time.astimezone().replace(tzinfo=None)
+    # The bare address, as add() gets it from SenderEmailAddress
+    sender = str(headers["From"] or "")
+    return (
+        headers["Message-ID"],
+        received_time,
+        parseaddr(sender)[1] or sender,
+        str(headers["Subject"] or ""),
+    )
+
+
+def _entry(row):
+    entry = ArchiveEntry._make(row)
+    if entry.received_time is not None:
+        entry = entry._replace(
+            received_time=datetime.fromisoformat(entry.received_time)
+        )
+    return entry
+
+
+class MailArchive:
+    """Append raw MIME messages to an archive and look them up again
+
+    add() buffers a message and commit() makes the buffered batch durable;
+    a fingerprint already in the archive is not added twice.
+    """
+
+    def __init__(self, path, compression_level=COMPRESSION_LEVEL):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.compression_level = compression_level
+        self._pending = []
+        self._pending_fingerprints = set()
+        self._map = None
+        self._reader = None
+
+        self.connection = sqlite3.connect(self.index_path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(_SCHEMA)
+        # Opened for appending only; frames are never rewritten
+        self._writer = open(path, "ab")
+        self._end = self._writer.seek(0, os.SEEK_END)
+        self.recovered = self._recover()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM messages").fetchone()
+        return count
+
+    def close(self):
+        if self._pending:
+            self.commit()
+        self._unmap()
+        self._writer.close()
+        self.connection.close()
+
+    def _indexed_end(self):
+        (end,) = self.connection.execute(
+            "SELECT COALESCE(MAX(offset + length), 0) FROM messages"
+        ).fetchone()
+        return end
+
+    def _recover(self):
+        """Index frames past the last committed batch, cut off a torn one
+
+        Returns the number of frames indexed.
+        """
+        offset = self._indexed_end()
+        if offset > self._end:
+            raise ArchiveError(f"{self.index_path} indexes more than {self.path} holds")
+        if offset == self._end:
+            return 0
+
+        recovered = []
+        with open(self.path, "rb") as archive_file:
+            archive_file.seek(offset)
+            while offset < self._end:
+                header = archive_file.read(_FRAME.size)
+                if len(header) < _FRAME.size:
+                    break
+                magic, fingerprint, length, size, checksum = _FRAME.unpack(header)
+                compressed = archive_file.read(length)
+                if magic != _MAGIC or len(compressed) < length:
+                    break
+                try:
+                    data = zlib.decompress(compressed)
+                except zlib.error:
+                    break
+                if zlib.crc32(data) != checksum:
+                    break
+                recovered.append(
+                    self._index_row(
+                        offset,
+                        _FRAME.size + length,
+                        size,
+                        fingerprint,
+                        BytesHeaderParser(policy=policy.default).parsebytes(data),
+                    )
+                )
+                offset += _FRAME.size + length
+
+        if offset < self._end:
+            # A frame the crashed run did not finish; nothing indexes it
+            self._writer.truncate(offset)
+            self._end = offset
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO messages (offset, length, size, fingerprint, "
+                "message_id, received_time, sender, subject) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                recovered,
+            )
+        return len(recovered)
+
+    @staticmethod
+    def _index_row(offset, length, size, fingerprint, headers):
+        message_id, received_time, sender, subject = _header_fields(headers)
+        return (
+            offset,
+            length,
+            size,
+            fingerprint,
+            _normalize_message_id(message_id),
+            _format_time(received_time),
+            sender.lower(),
+            subject,
+        )
+
+    def add(
+        self,
+        data,
+        fingerprint,
+        message_id=None,
+        received_time=None,
+        sender="",
+        subject="",
+    ):
+        """Append one message's raw bytes; durable after the next commit()
+
+        Returns False, writing nothing, if the fingerprint is already there.
+        """
+        if fingerprint in self._pending_fingerprints or self.contains(fingerprint):
+            return False
+        compressed = zlib.compress(data, self.compression_level)
+        frame = (
+            _FRAME.pack(
+                _MAGIC, fingerprint, len(compressed), len(data), zlib.crc32(data)
+            )
+            + compressed
+        )
+        self._writer.write(frame)
+        self._pending.append(
+            (
+                self._end,
+                len(frame),
+                len(data),
+                fingerprint,
+                _normalize_message_id(message_id),
+                _format_time(received_time),
+                (sender or "").lower(),
+                subject or "",
+            )
+        )
+        self._pending_fingerprints.add(fingerprint)
+        self._end += len(frame)
+        return True
+
+    def add_message(self, message, fingerprint=None):
+        """add() an email.message.Message, indexed by its own headers"""
+        data = message.as_bytes()
+        if fingerprint is None:
+            fingerprint = message_fingerprint(message)
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(data)
+        return self.add(data, fingerprint, *_header_fields(headers))
+
+    def commit(self):
+        """fsync the frames added since the last commit, then index them"""
+        if not self._pending:
+            return
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO messages (offset, length, size, fingerprint, "
+                "message_id, received_time, sender, subject) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+        self._pending_fingerprints = set()
+
+    def contains(self, fingerprint):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM messages WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            is not None
+        )
+
+    def fingerprints(self):
+        """Every fingerprint in the archive, straight from the index"""
+        return FingerprintSet(
+            fingerprint
+            for (fingerprint,) in self.connection.execute(
+                "SELECT fingerprint FROM messages"
+            )
+        )
+
+    def search(
+        self,
+        message_id=None,
+        sender=None,
+        subject=None,
+        start=None,
+        end=None,
+        limit=None,
+    ):
+        """Entries matching every given criterion, oldest first
+
+        sender matches the whole address case-insensitively, subject any
+        part of the subject; start and end bound the received time.
+        """
+        conditions = []
+        parameters = []
+        if message_id is not None:
+            conditions.append("message_id = ?")
+            parameters.append(_normalize_message_id(message_id))
+        if sender is not None:
+            conditions.append("sender = ?")
+            parameters.append(sender.lower())
+        if subject is not None:
+            conditions.append("subject LIKE ?")
+            parameters.append(f"%{subject}%")
+        if start is not None:
+            conditions.append("received_time >= ?")
+            parameters.append(_format_time(start))
+        if end is not None:
+            conditions.append("received_time <= ?")
+            parameters.append(_format_time(end))
+
+        query = f"SELECT {_ENTRY_COLUMNS} FROM messages"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY received_time, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        return [_entry(row) for row in self.connection.execute(query, parameters)]
+
+    def entry(self, entry_id):
+        row = self.connection.execute(
+            f"SELECT {_ENTRY_COLUMNS} FROM messages WHERE id = ?", (entry_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No message {entry_id} in {self.path}")
+        return _entry(row)
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._reader.close()
+            self._map = None
+            self._reader = None
+
+    def _mapped(self, end):
+        """A read-only map of the archive covering at least end bytes"""
+        if self._map is None or len(self._map) < end:
+            self._unmap()
+            self._writer.flush()
+            self._reader = open(self.path, "rb")
+            self._map = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, entry):
+        """Raw MIME bytes of an ArchiveEntry (or its id)"""
+        if not isinstance(entry, ArchiveEntry):
+            entry = self.entry(entry)
+        archive_map = self._mapped(entry.offset + entry.length)
+        magic, _, length, size, checksum = _FRAME.unpack_from(archive_map, entry.offset)
+        if magic != _MAGIC:
+            raise ArchiveError(f"No frame at offset {entry.offset} in {self.path}")
+        start = entry.offset + _FRAME.size
+        data = zlib.decompress(archive_map[start : start + length])
+        if len(data) != size or zlib.crc32(data) != checksum:
+            raise ArchiveError(f"Frame at offset {entry.offset} is corrupt")
+        return data
+
+    def message(self, entry):
+        """Parsed email.message.EmailMessage of an ArchiveEntry (or its id)"""
+        return BytesParser(policy=policy.default).parsebytes(self.read(entry))
+
+    def rebuild_index(self):
+        """Reindex every frame from the archive itself"""
+        self.commit()
+        with self.connection:
+            self.connection.execute("DELETE FROM messages")
+        return self._recover()
+
+
+class ArchiveTarget(CopyTarget):
+    """Copy emails into a MailArchive as raw MIME, one commit per batch
+
+    resolve(entry_id) returns the item to copy, as for PstTarget; rows are
+    indexed by their own fingerprint, so dedupe agrees with the PST path.
+    """
+
+    def __init__(self, archive, resolve, name=None):
+        self.archive = archive
+        self.resolve = resolve
+        self.name = name or os.path.basename(archive.path)
+
+    def copy_batch(self, rows):
+        failed = []
+        for row in rows:
+            try:
+                message = message_from_item(self.resolve(row.EntryID))
+                self.archive.add(
+                    message.as_bytes(),
+                    fingerprint_row(row),
+                    row.InternetMessageID,
+                    row.ReceivedTime,
+                    row.SenderEmailAddress,
+                    row.Subject,
+                )
+            except Exception as e:
+                failed.append((row, e))
+        self.archive.commit()
+        return failed
+
+    def fingerprints(self):
+        return self.archive.fingerprints()
+
+    def find(self, rows):
+        return {
+            row_fingerprint
+            for row_fingerprint in map(fingerprint_row, rows)
+            if self.archive.contains(row_fingerprint)
+        }
+
+    def close(self):
+        self.archive.close()
+
+
+class MailboxTarget(CopyTarget):
+    """Copy into a local mailbox.Mailbox (mbox, Maildir, ...) as a stand-in
+
+    Each batch is written under one lock and flushed once, which is the
+    local analogue of committing a batch to the PST. Every message is
+    stamped with the fingerprint of the row it came from (FINGERPRINT_HEADER),
+    so a rerun recognizes it even when the source had no Message-ID.
+    """
+
+    def __init__(self, mailbox, resolve, name="mailbox"):
+        self.mailbox = mailbox
+        self.resolve = resolve
+        self.name = name
+
+    def copy_batch(self, rows):
+        failed = []
+        self.mailbox.lock()
+        try:
+            for row in rows:
+                try:
+                    message = message_from_item(self.resolve(row.EntryID))
+                    del message[FINGERPRINT_HEADER]
+                    message[FINGERPRINT_HEADER] = str(fingerprint_row(row))
+                    self.mailbox.add(message)
+                except Exception as e:
+                    failed.append((row, e))
+            self.mailbox.flush()
+        finally:
+            self.mailbox.unlock()
+        return failed
+
+    def fingerprints(self):
+        parser = BytesHeaderParser()
+        existing_fingerprints = FingerprintSet()
+        for key in self.mailbox.iterkeys():
+            headers = parser.parsebytes(self.mailbox.get_bytes(key))
+            try:
+                existing_fingerprints.add(int(headers[FINGERPRINT_HEADER]))
+            except (TypeError, ValueError):
+                # Not written by MailboxTarget
+                existing_fingerprints.add(message_fingerprint(headers))
+        return existing_fingerprints
+
+    def close(self):
+        self.mailbox.close()
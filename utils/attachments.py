@@ -0,0 +1,224 @@
+"""Attachments of flagged mail, saved once each under their SHA-256.
+
+Billing often needs the contracts and invoices attached to flagged mail
+without opening the PST. `extract_attachments` saves every attachment of
+the emails it is given into an `AttachmentStore`:
+
+    Flagged Emails 03-01-26 - 03-31-26 attachments/
+        blobs/3f/3f9a...e1      one file per distinct content
+        manifest.jsonl          one JSON line per email
+
+Outlook writes each attachment with Attachment.SaveAsFile into the store's
+tmp folder, where it is hashed a chunk at a time without being read into
+memory. MIME attachments from local mail arrive inside a message that is
+already parsed in memory, so each is decoded whole and written the same
+way. A file whose hash is already stored is deleted, so the same contract
+attached to 40 emails is kept once. The manifest maps each
+email (EntryID, Message-ID, subject, sender, received time) to the file
+names, hashes and sizes of its attachments; emails already in it are
+skipped when the extraction runs again.
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from email.message import Message
+
+# Bytes read and hashed at a time
+CHUNK_SIZE = 1 << 20
+
+MANIFEST_NAME = "manifest.jsonl"
+
+# OlAttachmentType.olByReference: a link to a file share, no content to save
+OL_BY_REFERENCE = 4
+
+
+class AttachmentStore:
+    """A folder of content-addressed attachment blobs and their manifest
+
+    Use as a context manager; the manifest is appended to one email at a
+    time, so an extraction that stops half way keeps what it saved.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_root = os.path.join(root, "blobs")
+        self.temp_root = os.path.join(root, "tmp")
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        os.makedirs(self.temp_root, exist_ok=True)
+        # Left by an extraction that stopped mid-file
+        for name in os.listdir(self.temp_root):
+            os.remove(os.path.join(self.temp_root, name))
+        # EntryIDs of the emails already in the manifest
+        self.messages = set()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as manifest_file:
+                for line in manifest_file:
+                    if line.strip():
+                        self.messages.add(json.loads(line)["entry_id"])
+        self._manifest = open(self.manifest_path, "a", encoding="utf-8")
+        # Totals since opened
+        self.files = 0
+        self.bytes = 0
+        self.blobs_written = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_root, digest[:2], digest)
+
+    def temp_path(self):
+        """A fresh path in the store's tmp folder, on the blobs' filesystem"""
+        return os.path.join(self.temp_root, uuid.uuid4().hex)
+
+    def _place(self, temp_path, digest, size):
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+            self.blobs_written += 1
+            self.bytes_written += size
+        self.files += 1
+        self.bytes += size
+        return digest, size
+
+    def add_file(self, temp_path):
+        """Hash a file written to temp_path and move it into the store
+
+        Returns (sha256 hex digest, size); the file is gone afterwards.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, "rb") as blob_file:
+            for chunk in iter(lambda: blob_file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        return self._place(temp_path, digest.hexdigest(), size)
+
+    def add_chunks(self, chunks):
+        """Store the bytes chunks yields, hashing them as they are written"""
+        temp_path = self.temp_path()
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, "wb") as blob_file:
+            for chunk in chunks:
+                digest.update(chunk)
+                blob_file.write(chunk)
+                size += len(chunk)
+        return self._place(temp_path, digest.hexdigest(), size)
+
+    def record(self, row, attachments):
+        """Append one email and its attachments to the manifest"""
+        received_time = getattr(row, "ReceivedTime", None)
+        if received_time is not None:
+            received_time = received_time.replace(tzinfo=None).isoformat()
+        self._manifest.write(
+            json.dumps(
+                {
+                    "entry_id": row.EntryID,
+                    "message_id": getattr(row, "InternetMessageID", "") or "",
+                    "subject": str(getattr(row, "Subject", "") or ""),
+                    "sender": str(getattr(row, "SenderEmailAddress", "") or ""),
+                    "received_time": received_time,
+                    "attachments": attachments,
+                }
+            )
+            + "\n"
+        )
+        self._manifest.flush()
+        self.messages.add(row.EntryID)
+
+    def close(self):
+        self._manifest.close()
+
+
+def save_attachments(store, item):
+    """Save the attachments of a MailItem or MIME message into store
+
+    Returns a list of {"file_name", "sha256", "size"} dicts. Attachments
+    that only link to a file share have no content and are left out.
+    """
+    saved = []
+    if isinstance(item, Message):
+        # Backends that hold MIME, e.g. utils.backend.LocalBackend
+        for part in item.walk():
+            file_name = part.get_filename()
+            if part.is_multipart() or not (
+                file_name or part.get_content_disposition() == "attachment"
+            ):
+                continue
+            digest, size = store.add_chunks([part.get_payload(decode=True) or b""])
+            saved.append({"file_name": file_name or "", "sha256": digest, "size": size})
+        return saved
+
+    for attachment in item.Attachments:
+        if attachment.Type == OL_BY_REFERENCE:
+            continue
+        file_name = attachment.FileName
+        temp_path = store.temp_path()
+        try:
+            attachment.SaveAsFile(temp_path)
+            digest, size = store.add_file(temp_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        saved.append({"file_name": file_name, "sha256": digest, "size": size})
+    return saved
+
+
+def extract_attachments(rows, resolve, store, progress=None, cancelled=None):
+    """Save the attachments of every row's email into store
+
+    resolve(entry_id) opens an email, as for a CopyTarget. Emails already in
+    the manifest are skipped; one that fails is reported and left out of the
+    manifest, so the next run tries it again. progress(position, total,
+    subject) is called after every email and cancelled() checked before
+    each one. Returns a summary dict.
+    """
+    rows = list(rows)
+    started = time.perf_counter()
+    totals = (store.files, store.bytes, store.blobs_written, store.bytes_written)
+    summary = {
+        "total": len(rows),
+        "emails": 0,
+        "skipped": 0,
+        "failed": 0,
+        "cancelled": False,
+    }
+
+    for position, row in enumerate(rows, 1):
+        if cancelled is not None and cancelled():
+            summary["cancelled"] = True
+            break
+        if row.EntryID in store.messages:
+            summary["skipped"] += 1
+        else:
+            try:
+                item = resolve(row.EntryID)
+                store.record(row, save_attachments(store, item))
+                summary["emails"] += 1
+            except Exception as e:
+                print(f"Error: {e}")
+                summary["failed"] += 1
+        if progress is not None:
+            progress(position, len(rows), getattr(row, "Subject", ""))
+
+    files, size, blobs_written, bytes_written = totals
+    summary.update(
+        files=store.files - files,
+        bytes=store.bytes - size,
+        blobs_written=store.blobs_written - blobs_written,
+        bytes_written=store.bytes_written - bytes_written,
+        seconds=round(time.perf_counter() - started, 3),
+    )
+    return summary
@@ -0,0 +1,365 @@
+"""Mail backends: where flagged mail is scanned from and archived to.
+
+A backend lists folders by "/" separated path, streams the rows matching a
+Jet filter from `utils.query`, bulk-fetches columns into a MailTable and
+creates archives to copy into. Archives are `utils.pipeline.CopyTarget`s, so
+copying, dedupe and batching are shared by every backend.
+
+`OutlookBackend` drives Outlook over COM. `LocalBackend` reads Maildir, mbox
+and .eml trees with the standard library and archives to mbox or Maildir,
+so the whole scan and export path runs on any platform.
+
+Either backend also archives to a compressed `utils.archive.MailArchive`
+when the archive path ends in ARCHIVE_SUFFIX (".mailarc").
+"""
+
+import abc
+import mailbox
+import os
+from datetime import datetime
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr, parsedate_to_datetime
+from itertools import islice
+
+from utils.archive import ARCHIVE_SUFFIX, ArchiveTarget, MailArchive, MailboxTarget
+from utils.pipeline import DEFAULT_BATCH_SIZE, PstTarget, export_rows
+from utils.query import (
+    FLAG_MARKED,
+    build_flagged_filter,
+    default_month_range,
+    parse_filter,
+)
+from utils.table import (
+    COLUMN_ALIASES,
+    FETCH_BATCH_SIZE,
+    MAIL_COLUMNS,
+    MailTable,
+    get_table,
+    iter_table,
+    row_type,
+)
+
+# Local EntryIDs are "<folder path><separator><key>"; paths never hold \x1f
+ENTRY_ID_SEPARATOR = "\x1f"
+
+
+def walk_folder_paths(folder, folder_path):
+    """Yield the "/" separated path of folder and every folder below it"""
+    yield folder_path
+    for subfolder in folder.Folders:
+        yield from walk_folder_paths(subfolder, f"{folder_path}/{subfolder.Name}")
+
+
+class MailBackend(abc.ABC):
+    """Source of mail and factory for archives
+
+    Subclasses implement list_folders, query and create_archive; fetch
+    collects query results into a MailTable.
+    """
+
+    name = "backend"
+    # Appended to archive names by callers that pick the file name
+    archive_suffix = ""
+
+    @abc.abstractmethod
+    def list_folders(self, folder_path):
+        """Paths of folder_path and every folder below it"""
+
+    @abc.abstractmethod
+    def query(self, folder_path, filter="", columns=MAIL_COLUMNS):
+        """Yield a MailRow for every item in folder_path matching filter"""
+
+    def fetch(self, folder_path, filter="", columns=MAIL_COLUMNS):
+        """Bulk-fetch columns for matching items into a MailTable"""
+        table = MailTable(columns)
+        rows = self.query(folder_path, filter, columns)
+        for batch in iter(lambda: list(islice(rows, FETCH_BATCH_SIZE)), []):
+            table.extend(batch)
+        return table
+
+    @abc.abstractmethod
+    def create_archive(self, archive_path):
+        """Open (creating if needed) an archive and return its CopyTarget"""
+
+    def close(self):
+        pass
+
+
+class OutlookBackend(MailBackend):
+    """Outlook over COM, through an OutlookSession
+
+    Archives are PST files added to the session.
+    """
+
+    name = "outlook"
+    archive_suffix = ".pst"
+
+    def __init__(self, session):
+        self.session = session
+
+    def list_folders(self, folder_path):
+        folder = self.session.folder(folder_path)
+        return list(walk_folder_paths(folder, folder_path.strip("/")))
+
+    def query(self, folder_path, filter="", columns=MAIL_COLUMNS):
+        return iter_table(self.session.folder(folder_path), filter, columns)
+
+    def fetch(self, folder_path, filter="", columns=MAIL_COLUMNS):
+        folder = self.session.folder(folder_path)
+        return self.session.call(get_table, folder, filter, columns)
+
+    def create_archive(self, archive_path):
+        if archive_path.endswith(ARCHIVE_SUFFIX):
+            return ArchiveTarget(MailArchive(archive_path), self.session.get_item)
+        return PstTarget(self.session.open_pst(archive_path), self.session.get_item)
+
+
+def _received_time(headers, path):
+    try:
+        received = parsedate_to_datetime(headers["Date"])
+    except (TypeError, ValueError):
+        received = None
+    if received is None:
+        return datetime.fromtimestamp(os.path.getmtime(path))
+    if received.tzinfo is not None:
+        # Outlook reports local wall-clock times; match it
+        received = received.astimezone().replace(tzinfo=None)
+    return received
+
+
+def _is_flagged(headers):
+    # mutt/Thunderbird write X-Status: F, Outlook's MIME export X-Message-Flag
+    status = (headers.get("X-Status") or "") + (headers.get("Status") or "")
+    return (
+        "F" in status
+        or headers.get("X-Message-Flag") is not None
+        or (headers.get("X-Flagged") or "").lower() in ("1", "yes", "true")
+    )
+
+
+def _address(header):
+    header = str(header or "")
+    return parseaddr(header)[1] or header
+
+
+def _has_attachments(headers):
+    # Only headers are parsed: mail clients send attachments as
+    # multipart/mixed, or as a single part with an attachment disposition.
+    # A false positive only costs opening the message to find none.
+    return (
+        headers.get_content_type() == "multipart/mixed"
+        or headers.get_content_disposition() == "attachment"
+    )
+
+
+class LocalItem:
+    """Header-level view of a message on disk, shaped like a MailItem"""
+
+    def __init__(self, entry_id, headers, size, flagged, path):
+        self.EntryID = entry_id
+        self.InternetMessageID = headers.get("Message-ID") or ""
+        self.Subject = str(headers.get("Subject") or "")
+        # The bare address, as Outlook's SenderEmailAddress holds it
+        self.SenderEmailAddress = _address(headers.get("From"))
+        self.To = str(headers.get("To") or "")
+        self.Categories = str(headers.get("Keywords") or "")
+        self.ReceivedTime = _received_time(headers, path)
+        self.LastModificationTime = datetime.fromtimestamp(os.path.getmtime(path))
+        self.FlagStatus = FLAG_MARKED if flagged else 0
+        self.Size = size
+        self.HasAttachments = _has_attachments(headers)
+
+
+class LocalBackend(MailBackend):
+    """Maildir, mbox and .eml files under a root directory
+
+    Every directory below root is a folder: a Maildir if it has cur/new/tmp,
+    otherwise the .eml files in it. Each *.mbox file is a folder too, named
+    without the extension. Headers are read once per folder and cached until
+    refresh().
+    """
+
+    name = "local"
+    archive_suffix = ".mbox"
+
+    def __init__(self, root):
+        self.root = root
+        self._folders = None
+        self._items = {}
+
+    def refresh(self):
+        self._folders = None
+        self._items = {}
+
+    def _folder_map(self):
+        if self._folders is None:
+            self._folders = {}
+            for directory, subdirectories, files in os.walk(self.root):
+                relative = os.path.relpath(directory, self.root)
+                folder_path = "" if relative == "." else relative.replace(os.sep, "/")
+                if {"cur", "new", "tmp"} <= set(subdirectories):
+                    self._folders[folder_path] = ("maildir", directory)
+                    subdirectories[:] = [
+                        name
+                        for name in subdirectories
+                        if name not in ("cur", "new", "tmp")
+                    ]
+                else:
+                    self._folders[folder_path] = ("eml", directory)
+                for name in files:
+                    if name.endswith(".mbox"):
+                        mbox_path = "/".join(filter(None, (folder_path, name[:-5])))
+                        self._folders[mbox_path] = (
+                            "mbox",
+                            os.path.join(directory, name),
+                        )
+        return self._folders
+
+    def _location(self, folder_path):
+        try:
+            return self._folder_map()[folder_path.strip("/")]
+        except KeyError:
+            raise KeyError(f"Folder {folder_path!r} not found") from None
+
+    def list_folders(self, folder_path=""):
+        folder_path = folder_path.strip("/")
+        return sorted(
+            path
+            for path in self._folder_map()
+            if not folder_path
+            or path == folder_path
+            or path.startswith(folder_path + "/")
+        )
+
+    def _read_maildir(self, folder_path, directory):
+        parser = BytesHeaderParser()
+        for subdirectory in ("new", "cur"):
+            for name in sorted(os.listdir(os.path.join(directory, subdirectory))):
+                path = os.path.join(directory, subdirectory, name)
+                with open(path, "rb") as message_file:
+                    headers = parser.parse(message_file)
+                _, _, info = name.partition(":2,")
+                yield LocalItem(
+                    f"{folder_path}{ENTRY_ID_SEPARATOR}{subdirectory}/{name}",
+                    headers,
+                    os.path.getsize(path),
+                    "F" in info or _is_flagged(headers),
+                    path,
+                )
+
+    def _read_eml(self, folder_path, directory):
+        parser = BytesHeaderParser()
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith(".eml"):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, "rb") as message_file:
+                headers = parser.parse(message_file)
+            yield LocalItem(
+                f"{folder_path}{ENTRY_ID_SEPARATOR}{name}",
+                headers,
+                os.path.getsize(path),
+                _is_flagged(headers),
+                path,
+            )
+
+    def _read_mbox(self, folder_path, path):
+        parser = BytesHeaderParser()
+        mbox = mailbox.mbox(path, create=False)
+        try:
+            for key in mbox.iterkeys():
+                data = mbox.get_bytes(key)
+                headers = parser.parsebytes(data)
+                yield LocalItem(
+                    f"{folder_path}{ENTRY_ID_SEPARATOR}{key}",
+                    headers,
+                    len(data),
+                    _is_flagged(headers),
+                    path,
+                )
+        finally:
+            mbox.close()
+
+    def items(self, folder_path):
+        """Every LocalItem in folder_path"""
+        folder_path = folder_path.strip("/")
+        if folder_path not in self._items:
+            kind, path = self._location(folder_path)
+            reader = {
+                "maildir": self._read_maildir,
+                "eml": self._read_eml,
+                "mbox": self._read_mbox,
+            }[kind]
+            self._items[folder_path] = list(reader(folder_path, path))
+        return self._items[folder_path]
+
+    def query(self, folder_path, filter="", columns=MAIL_COLUMNS):
+        # Same grammar Outlook evaluates, so filters from utils.query carry over
+        predicate = parse_filter(filter) if filter else None
+        Row = row_type(columns)
+        attributes = [COLUMN_ALIASES.get(name, name) for name in columns]
+        for item in self.items(folder_path):
+            if predicate is None or predicate(item):
+                yield Row._make(getattr(item, name, None) for name in attributes)
+
+    def open_message(self, entry_id):
+        """Full email.message.Message for an EntryID from query"""
+        folder_path, _, key = entry_id.partition(ENTRY_ID_SEPARATOR)
+        kind, path = self._location(folder_path)
+        if kind == "mbox":
+            mbox = mailbox.mbox(path, create=False)
+            try:
+                return mbox.get_message(int(key))
+            finally:
+                mbox.close()
+        with open(os.path.join(path, key), "rb") as message_file:
+            return mailbox.Message(message_file)
+
+    def create_archive(self, archive_path):
+        if archive_path.endswith(ARCHIVE_SUFFIX):
+            return ArchiveTarget(MailArchive(archive_path), self.open_message)
+        if archive_path.endswith(".mbox"):
+            archive = mailbox.mbox(archive_path)
+        else:
+            archive = mailbox.Maildir(archive_path)
+        return MailboxTarget(
+            archive, self.open_message, os.path.basename(archive_path.rstrip("/\\"))
+        )
+
+
+def export_folder(
+    backend,
+    folder_path,
+    archive_path,
+    start=None,
+    end=None,
+    senders=None,
+    categories=None,
+    progress=None,
+    cancelled=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """Stream a folder's flagged mail for the range into an archive
+
+    Works the same for any backend; emails already in the archive are
+    skipped. Returns the export_rows summary dict.
+    """
+    start_of_month, end_of_month = default_month_range(start, end)
+    archive = backend.create_archive(archive_path)
+    try:
+        summary = export_rows(
+            backend.query(
+                folder_path,
+                build_flagged_filter(start_of_month, end_of_month, senders, categories),
+            ),
+            archive,
+            archive.fingerprints(),
+            progress=progress,
+            cancelled=cancelled,
+            batch_size=batch_size,
+        )
+    finally:
+        archive.close()
+    summary["backend"] = backend.name
+    summary["path"] = archive_path
+    return summary
@@ -0,0 +1,22 @@
+"""Benchmarks for the scan, dedupe and export path against synthetic mailboxes.
+
+    python -m utils.benchmark --items 1000 10000 100000 --latency 0.0002
+    python -m utils.benchmark --items 100000 --output after.json --compare before.json
+
+Mailboxes are generated deterministically from --seed into `utils.fake`
+folders, and every Outlook call goes through a `SlowProxy` that sleeps
+--latency seconds per round trip, so results reflect how many COM calls each
+phase makes. Connect, store lookup, scan, dedupe-set build and copy are timed
+separately; the results are written as JSON for comparing versions.
+
+    python -m utils.benchmark --startup
+
+instead times "import utils" and the GUI's first paint in fresh
+interpreters, and exits with 1 when the import is over --import-budget-ms or
+loads COM, SQLite, the email package or Tk.
+
+Each area has its own module, mostly named after the utils module it
+times (`utils.benchmark.archive` times `utils.archive`), and `common`
+generates the mailboxes they share. Whether the results are right is
+checked by the tests in tests/; the benchmarks only report it.
+"""
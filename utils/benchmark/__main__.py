@@ -0,0 +1,434 @@
+"""Command line for the benchmarks: python -m utils.benchmark --help"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+
+from utils.benchmark.archive import run_archive_benchmark
+from utils.benchmark.attachments import run_attachment_benchmark
+from utils.benchmark.browse import run_browse_benchmark
+from utils.benchmark.config import run_config_benchmark
+from utils.benchmark.export import compare, run_benchmark
+from utils.benchmark.journal import run_crash_test
+from utils.benchmark.partition import run_partition_benchmark
+from utils.benchmark.report import run_report_benchmark
+from utils.benchmark.search import run_search_benchmark
+from utils.benchmark.shard import run_shard_benchmark
+from utils.benchmark.startup import IMPORT_BUDGET_MS, run_startup_benchmark
+from utils.benchmark.throttle import run_throttle_benchmark
+from utils.benchmark.watch import run_watch_benchmark
+from utils.pipeline import DEFAULT_BATCH_SIZE
+
+
+def save_results(results, path):
+    if path:
+        with open(path, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.benchmark",
+        description="Benchmark scan, dedupe and export on synthetic mailboxes",
+    )
+    parser.add_argument(
+        "--items", type=int, nargs="+", default=[1000, 10000], help="Mailbox sizes"
+    )
+    parser.add_argument("--flag-ratio", type=float, default=0.2)
+    parser.add_argument("--days", type=int, default=30, help="Date spread in days")
+    parser.add_argument(
+        "--collision-rate",
+        type=float,
+        default=0.05,
+        help="Share of emails repeating an earlier subject, sender and time",
+    )
+    parser.add_argument(
+        "--missing-id-rate",
+        type=float,
+        default=0.02,
+        help="Share of emails without a Message-ID",
+    )
+    parser.add_argument(
+        "--existing-ratio",
+        type=float,
+        default=0.1,
+        help="Share of flagged emails already in the PST",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per simulated COM call"
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--profile", action="store_true", help="Include a per-call Outlook profile"
+    )
+    parser.add_argument(
+        "--shard-workers",
+        type=int,
+        nargs="+",
+        help="Also time a sharded export of a year of mail with these worker counts",
+    )
+    parser.add_argument(
+        "--shard-by", default="month", help='"month" or emails per shard'
+    )
+    parser.add_argument(
+        "--scan-workers",
+        type=int,
+        nargs="+",
+        help="Also time a year-long scan read as date partitions on each number "
+        "of sessions, e.g. 1 2 4 8",
+    )
+    parser.add_argument(
+        "--row-latency",
+        type=float,
+        default=0.0005,
+        help="Seconds per row Outlook returns, for --scan-workers",
+    )
+    parser.add_argument(
+        "--attachments",
+        action="store_true",
+        help="Only time extracting attachments, including --attachment-mb ones",
+    )
+    parser.add_argument(
+        "--attachment-mb",
+        type=int,
+        default=300,
+        help="Size of the two largest attachments for --attachments",
+    )
+    parser.add_argument(
+        "--crash-rate",
+        type=float,
+        help="Also export through an Outlook that crashes with this probability "
+        "per call, until done, and check every email arrives exactly once",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Also time writing and looking up emails in a .mailarc archive",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Also time the billing summaries over a year of each mailbox size",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Also time building and querying the full-text search index",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Also follow a burst of flag changes with a FlagWatcher",
+    )
+    parser.add_argument(
+        "--watch-rate", type=int, default=10000, help="Flag changes per minute"
+    )
+    parser.add_argument(
+        "--watch-seconds", type=float, default=60, help="How long the burst lasts"
+    )
+    parser.add_argument(
+        "--throttle",
+        action="store_true",
+        help="Only scan and export through a busy Outlook with and without "
+        "the adaptive throttle",
+    )
+    parser.add_argument(
+        "--browse",
+        action="store_true",
+        help="Only time sorting, filtering and paging the email browser",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="Only time 'import utils' and the GUI's first paint",
+    )
+    parser.add_argument(
+        "--config",
+        action="store_true",
+        help="Only time cached config reads and debounced writes",
+    )
+    parser.add_argument(
+        "--import-budget-ms",
+        type=float,
+        default=IMPORT_BUDGET_MS,
+        help="Fail --startup when 'import utils' takes longer",
+    )
+    parser.add_argument("--output", help="Write the JSON results here")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    if args.config:
+        results["config"] = config = run_config_benchmark()
+        print(
+            f"{config['reads']} config reads: {config['read_seconds']:.3f}s, "
+            f"filesystem calls {config['read_filesystem_calls'] or 0}"
+        )
+        print(
+            f"{config['writes']} config writes: {config['files_written']} file "
+            f"written in {config['write_seconds']:.3f}s"
+        )
+        save_results(results, args.output)
+        return 0
+
+    if args.attachments:
+        results["attachments"] = attachments = run_attachment_benchmark(
+            large_mb=args.attachment_mb, seed=args.seed
+        )
+        print(
+            f"{attachments['attachments']} attachments, "
+            f"{attachments['attachment_mb']}MB: {attachments['mb_per_second']}MB/s, "
+            f"{attachments['blobs']} blobs ({attachments['written_mb']}MB written), "
+            f"peak memory {attachments['peak_memory_mb']}MB"
+        )
+        print(
+            f"reading each whole: {attachments['whole_file_seconds']:.3f}s, "
+            f"peak memory {attachments['whole_file_peak_memory_mb']}MB"
+        )
+        save_results(results, args.output)
+        return 0
+
+    if args.throttle:
+        results["throttle"] = throttle = run_throttle_benchmark(
+            max(args.items),
+            latency=args.latency or 0.0002,
+            batch_size=args.batch_size,
+            seed=args.seed,
+        )
+        for run in throttle["runs"]:
+            label = "throttle" if run["throttle"] else "no throttle"
+            if "scan_error" in run:
+                print(
+                    f"{label}: scan failed after {run['scan_seconds']:.3f}s "
+                    f"({run['scan_error']}), {run['rejected']} calls rejected"
+                )
+                continue
+            print(
+                f"{label}: scan {run['scan_seconds']:.3f}s, copy "
+                f"{run['copy_seconds']:.3f}s ({run['emails_per_second']} emails/s), "
+                f"{run['copied']} copied, {run['failed']} failed, "
+                f"{run['duplicated']} duplicated, {run['rejected']} of "
+                f"{run['round_trips']} calls rejected"
+            )
+            if run["throttle"]:
+                metrics = run["metrics"]
+                print(
+                    f"  concurrency {run['concurrency'][0]}-{run['concurrency'][1]}, "
+                    f"batches {run['batch_sizes'][0]}-{run['batch_sizes'][1]}, "
+                    f"{metrics['retried']} retries, {metrics['gave_up']} gave up, "
+                    f"{metrics['backoff_seconds']}s backing off"
+                )
+        save_results(results, args.output)
+        return 0
+
+    if args.browse:
+        results["browse"] = browse = run_browse_benchmark(
+            max(args.items), seed=args.seed
+        )
+        print(
+            f"{browse['parameters']['items']} emails: open {browse['open_ms']:.1f}ms, "
+            f"filter keystroke {browse['filter_p50_ms']:.1f}ms median "
+            f"({browse['filter_max_ms']:.1f}ms max), page "
+            f"{browse['page_cold_p50_ms']:.3f}ms, COM calls while browsing "
+            f"{browse['browse_calls']}"
+        )
+        print(
+            "sort: "
+            + ", ".join(
+                f"{name} {sort['first_ms']:.1f}ms ({sort['cached_ms']:.1f}ms again)"
+                for name, sort in browse["sort"].items()
+            )
+        )
+        window = browse["window"]
+        if "skipped" in window:
+            print(f"window: skipped ({window['skipped']})")
+        else:
+            print(
+                f"window: scroll {window['scroll_p50_ms']:.2f}ms, jump "
+                f"{window['jump_p50_ms']:.2f}ms, "
+                f"filter {window['filter_p50_ms']:.2f}ms median"
+            )
+        save_results(results, args.output)
+        return 0
+
+    if args.startup:
+        results["startup"] = startup = run_startup_benchmark(
+            import_budget_ms=args.import_budget_ms
+        )
+        imports = startup["import"]
+        print(
+            f"import utils: {imports['median_ms']:.1f}ms median "
+            f"(budget {args.import_budget_ms:g}ms)"
+        )
+        if imports["excluded_modules_loaded"]:
+            print(f"  loaded: {', '.join(imports['excluded_modules_loaded'])}")
+        if "skipped" in startup["gui"]:
+            print(f"gui first paint: skipped ({startup['gui']['skipped']})")
+        else:
+            print(f"gui first paint: {startup['gui']['median_seconds']:.3f}s median")
+        save_results(results, args.output)
+        return 0 if startup["within_budget"] else 1
+
+    for items in args.items:
+        run = run_benchmark(
+            items,
+            args.flag_ratio,
+            args.days,
+            args.collision_rate,
+            args.missing_id_rate,
+            args.existing_ratio,
+            args.latency,
+            args.batch_size,
+            args.seed,
+            args.profile,
+        )
+        results["runs"].append(run)
+        timings = ", ".join(
+            f"{name} {phase['seconds']:.3f}s" for name, phase in run["phases"].items()
+        )
+        print(f"{items} items: {timings}")
+
+    if args.shard_workers:
+        results["shard_runs"] = []
+        for items in args.items:
+            shard_run = run_shard_benchmark(
+                items,
+                args.shard_workers,
+                args.flag_ratio,
+                latency=args.latency or 0.001,
+                shard_by=args.shard_by,
+                batch_size=args.batch_size,
+                seed=args.seed,
+            )
+            results["shard_runs"].append(shard_run)
+            for run in shard_run["runs"]:
+                print(
+                    f"{items} items, {run['workers']} workers: {run['shards']} shards"
+                    f" in {run['seconds']:.3f}s, {run['speedup']}x"
+                )
+
+    if args.scan_workers:
+        results["partition_runs"] = []
+        for items in args.items:
+            partition_run = run_partition_benchmark(
+                items,
+                args.scan_workers,
+                latency=args.latency or 0.0002,
+                row_latency=args.row_latency,
+                seed=args.seed,
+            )
+            results["partition_runs"].append(partition_run)
+            print(
+                f"{items} items: single cursor "
+                f"{partition_run['single_cursor_seconds']:.3f}s"
+            )
+            for run in partition_run["runs"] + [partition_run["with_errors"]]:
+                print(
+                    f"  {run['workers']} workers: {run['partitions']} partitions "
+                    f"in {run['seconds']:.3f}s, {run['speedup']}x, "
+                    f"{run['attempts']} attempts, same emails: {run['same_emails']}"
+                )
+
+    if args.archive:
+        results["archive_runs"] = []
+        for items in args.items:
+            archive_run = run_archive_benchmark(
+                items, batch_size=args.batch_size, seed=args.seed
+            )
+            results["archive_runs"].append(archive_run)
+            write = archive_run["write"]
+            lookup = archive_run["lookup"]
+            print(
+                f"{items} items: archive write {write['emails_per_second']} emails/s "
+                f"({write['compression_ratio']}x smaller), "
+                f"lookup {lookup['lookups_per_second']}/s p99 {lookup['p99_ms']}ms, "
+                f"mbox lookup "
+                f"{archive_run['mbox_baseline']['lookups_per_second']}/s"
+            )
+
+    if args.report:
+        results["report_runs"] = []
+        for items in args.items:
+            report_run = run_report_benchmark(items, seed=args.seed)
+            results["report_runs"].append(report_run)
+            print(
+                f"{items} items: report {report_run['columnar_seconds']:.3f}s, "
+                f"row by row {report_run['row_by_row_seconds']:.3f}s "
+                f"({report_run['speedup']}x), written in "
+                f"{report_run['write_seconds']:.3f}s, "
+                f"same totals: {report_run['same_totals']}"
+            )
+
+    if args.search:
+        results["search_runs"] = []
+        for items in args.items:
+            search_run = run_search_benchmark(
+                items, batch_size=args.batch_size, seed=args.seed
+            )
+            results["search_runs"].append(search_run)
+            build = search_run["build"]
+            latencies = ", ".join(
+                f"{name} {query['p50_ms']}ms"
+                for name, query in search_run["queries"].items()
+            )
+            print(
+                f"{items} items: index build {build['emails_per_second']} emails/s "
+                f"({build['index_mb']}MB), queries p50 {latencies}, "
+                f"scan {search_run['scan_baseline']['ms']}ms"
+            )
+
+    if args.watch:
+        results["watch_runs"] = []
+        for items in args.items:
+            watch_run = run_watch_benchmark(
+                items,
+                args.watch_rate,
+                args.watch_seconds,
+                latency=args.latency,
+                seed=args.seed,
+            )
+            results["watch_runs"].append(watch_run)
+            print(
+                f"{items} items: {watch_run['changes']} flag changes in "
+                f"{watch_run['batches']} batches, visible after p50 "
+                f"{watch_run['p50_ms']}ms p99 {watch_run['p99_ms']}ms, "
+                f"{watch_run['calls_per_change']} COM calls per change, "
+                f"{watch_run['rows_read_per_batch']} rows read per batch "
+                f"(rescan {watch_run['rescan_rows_per_batch']}), "
+                f"matches scan: {watch_run['matches_scan']}"
+            )
+
+    if args.crash_rate:
+        results["crash_tests"] = []
+        for items in args.items:
+            crash_test = run_crash_test(
+                items, args.crash_rate, batch_size=args.batch_size, seed=args.seed
+            )
+            results["crash_tests"].append(crash_test)
+            print(
+                f"{items} items: {crash_test['crashes']} crashes, "
+                f"{crash_test['missing']} missing, "
+                f"{crash_test['duplicated']} duplicated"
+            )
+
+    save_results(results, args.output)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+""".mailarc writes and lookups against an mbox baseline."""
+
+import mailbox
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.archive import MailArchive
+from utils.benchmark.common import (
+    FIRST_DAY,
+    SENDERS,
+    WORDS,
+    generate_mailbox,
+    percentile,
+)
+from utils.fingerprint import fingerprint_row
+from utils.mime import message_from_item
+from utils.pipeline import DEFAULT_BATCH_SIZE
+
+
+def generate_messages(items, seed=0):
+    """Raw MIME bytes and fingerprints of a generated mailbox, with bodies
+
+    Bodies are 1-30 KB of the benchmark's vocabulary, so they compress about
+    as well as real correspondence does.
+    """
+    generator = random.Random(seed)
+    folder = generate_mailbox(items, flag_ratio=1.0, seed=seed)
+    messages = []
+    for email in folder.Items:
+        words = generator.randint(150, 4500)
+        email.Body = " ".join(generator.choices(WORDS + SENDERS, k=words))
+        messages.append(
+            (message_from_item(email).as_bytes(), fingerprint_row(email), email)
+        )
+    return messages
+
+
+def run_archive_benchmark(
+    items, lookups=2000, batch_size=DEFAULT_BATCH_SIZE, seed=0, baseline_lookups=20
+):
+    """Write and look up throughput of MailArchive against an mbox baseline
+
+    Lookups fetch a random email by Message-ID and read its bytes back; the
+    mbox baseline has no index, so it scans headers until it finds one.
+    """
+    messages = generate_messages(items, seed)
+    raw_bytes = sum(len(data) for data, _, _ in messages)
+    generator = random.Random(seed)
+    folder = tempfile.mkdtemp(prefix="archive-")
+    archive_path = os.path.join(folder, "benchmark.mailarc")
+    results = {
+        "parameters": {"items": items, "lookups": lookups, "batch_size": batch_size},
+        "raw_mb": round(raw_bytes / 1e6, 3),
+    }
+    try:
+        started = time.perf_counter()
+        with MailArchive(archive_path) as archive:
+            for offset in range(0, items, batch_size):
+                batch = messages[offset : offset + batch_size]
+                for data, row_fingerprint, email in batch:
+                    archive.add(
+                        data,
+                        row_fingerprint,
+                        email.InternetMessageID,
+                        email.ReceivedTime,
+                        email.SenderEmailAddress,
+                        email.Subject,
+                    )
+                archive.commit()
+        write_seconds = time.perf_counter() - started
+        archive_bytes = os.path.getsize(archive_path)
+        results["write"] = {
+            "seconds": round(write_seconds, 4),
+            "emails_per_second": round(items / write_seconds),
+            "raw_mb_per_second": round(raw_bytes / 1e6 / write_seconds, 2),
+            "archive_mb": round(archive_bytes / 1e6, 3),
+            "index_mb": round(os.path.getsize(archive_path + ".idx") / 1e6, 3),
+            "compression_ratio": round(raw_bytes / archive_bytes, 2),
+        }
+
+        with MailArchive(archive_path) as archive:
+            wanted = [
+                email.InternetMessageID
+                for _, _, email in generator.choices(messages, k=lookups)
+                if email.InternetMessageID
+            ]
+            latencies = []
+            started = time.perf_counter()
+            for message_id in wanted:
+                lookup_started = time.perf_counter()
+                archive.read(archive.search(message_id=message_id)[0])
+                latencies.append(time.perf_counter() - lookup_started)
+            lookup_seconds = time.perf_counter() - started
+
+            first = datetime.combine(FIRST_DAY, datetime.min.time())
+            started = time.perf_counter()
+            matches = archive.search(
+                sender=SENDERS[0], start=first, end=first + timedelta(days=7)
+            )
+            for entry in matches:
+                archive.read(entry)
+            sender_seconds = time.perf_counter() - started
+
+        results["lookup"] = {
+            "lookups": len(wanted),
+            "lookups_per_second": round(len(wanted) / lookup_seconds),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 4),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+            "sender_week_matches": len(matches),
+            "sender_week_seconds": round(sender_seconds, 4),
+        }
+
+        # Baseline: the same mail in an mbox, found by scanning headers
+        mbox_path = os.path.join(folder, "benchmark.mbox")
+        started = time.perf_counter()
+        mbox = mailbox.mbox(mbox_path)
+        mbox.lock()
+        for offset in range(0, items, batch_size):
+            for data, _, _ in messages[offset : offset + batch_size]:
+                mbox.add(data)
+            mbox.flush()
+        mbox.unlock()
+        mbox_write_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for message_id in wanted[:baseline_lookups]:
+            for key in mbox.iterkeys():
+                if mbox.get_message(key)["Message-ID"] == message_id:
+                    mbox.get_bytes(key)
+                    break
+        mbox_lookup_seconds = time.perf_counter() - started
+        mbox.close()
+        baseline_count = len(wanted[:baseline_lookups])
+        results["mbox_baseline"] = {
+            "write_seconds": round(mbox_write_seconds, 4),
+            "mb": round(os.path.getsize(mbox_path) / 1e6, 3),
+            "lookups": baseline_count,
+            "lookups_per_second": round(baseline_count / mbox_lookup_seconds, 2),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
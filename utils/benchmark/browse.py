@@ -0,0 +1,132 @@
+"""Sorting, filtering and paging the email browser."""
+
+import random
+import time
+from collections import Counter
+
+from utils.benchmark.common import generate_mailbox, percentile, timed_ms
+from utils.browse import BROWSE_COLUMNS, MailBrowser
+from utils.fake import SlowProxy
+from utils.table import get_table
+
+
+def measure_browser_window(flagged_emails, steps=200):
+    """Milliseconds to redraw gui.EmailBrowserWindow after a scroll or filter
+
+    Each redraw is timed up to Tk having processed it (update_idletasks).
+    Needs a display; without one the result says why it was skipped.
+    """
+    from tkinter import TclError, Tk
+
+    from gui import BROWSER_ROWS, EmailBrowserWindow
+
+    try:
+        root = Tk()
+    except TclError as e:
+        return {"skipped": str(e)}
+    try:
+        root.withdraw()
+        window = EmailBrowserWindow(
+            root, MailBrowser(flagged_emails), lambda: None, lambda: None
+        )
+        root.update()
+
+        def scroll(rows):
+            window.scroll_by(rows)
+            root.update_idletasks()
+
+        def type_filter(text):
+            window.filter_text.set(text)
+            root.update_idletasks()
+
+        scrolls = [timed_ms(scroll, BROWSER_ROWS) for _ in range(steps)]
+        jumps = []
+        for number in range(steps):
+            jumps.append(
+                timed_ms(window.on_scrollbar, "moveto", str(number / steps))
+            )
+        keystrokes = [timed_ms(type_filter, "deposition"[:end]) for end in range(11)]
+        keystrokes.append(timed_ms(type_filter, ""))
+        window.close()
+        return {
+            "scroll_p50_ms": round(percentile(scrolls, 0.5), 3),
+            "scroll_max_ms": round(max(scrolls), 3),
+            "jump_p50_ms": round(percentile(jumps, 0.5), 3),
+            "jump_max_ms": round(max(jumps), 3),
+            "filter_p50_ms": round(percentile(keystrokes, 0.5), 3),
+            "filter_max_ms": round(max(keystrokes), 3),
+        }
+    finally:
+        root.destroy()
+
+
+def run_browse_benchmark(items=50000, seed=0, steps=200):
+    """Time the email browser's sort, filter and paging over a scanned table
+
+    The table is fetched once through a counting SlowProxy, as a scan
+    would; browsing must not make a single COM call after that. Filtering
+    is timed a keystroke at a time, typing a subject word and clearing it,
+    and paging as BROWSER_ROWS-row windows both in order and at random
+    offsets, cold and from the page cache.
+    """
+    generator = random.Random(seed)
+    inbox = generate_mailbox(items, flag_ratio=1.0, seed=seed)
+    calls = Counter()
+    flagged_emails = get_table(SlowProxy(inbox, 0.0, calls))
+    scan_calls = sum(calls.values())
+    # gui.BROWSER_ROWS, without importing Tk here
+    rows = 20
+
+    started = time.perf_counter()
+    browser = MailBrowser(flagged_emails)
+    open_ms = (time.perf_counter() - started) * 1000
+
+    sorts = {}
+    for name in BROWSE_COLUMNS:
+        first = timed_ms(browser.sort, name, False)
+        again = timed_ms(browser.sort, name, True)
+        sorts[name] = {"first_ms": round(first, 3), "cached_ms": round(again, 3)}
+    browser.sort("ReceivedTime", False)
+
+    text = "deposition"
+    keystrokes = [
+        timed_ms(browser.filter, text[:end]) for end in range(1, len(text) + 1)
+    ]
+    matches = len(browser)
+    clear_ms = timed_ms(browser.filter, "")
+
+    offsets = [generator.randrange(len(browser) - rows) for _ in range(steps)]
+    cold = [timed_ms(browser.rows, offset, rows) for offset in offsets]
+    warm = [timed_ms(browser.rows, offset, rows) for offset in offsets]
+    started = time.perf_counter()
+    for offset in range(0, len(browser), rows):
+        browser.rows(offset, rows)
+    scroll_seconds = time.perf_counter() - started
+
+    browser.filter("exhibit")
+    unchecked = len(browser)
+    uncheck_ms = timed_ms(browser.check_all, False)
+    browser.filter("")
+    started = time.perf_counter()
+    selection = browser.selection()
+    selection_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "parameters": {"items": items, "steps": steps, "seed": seed},
+        "open_ms": round(open_ms, 3),
+        "sort": sorts,
+        "filter_p50_ms": round(percentile(keystrokes, 0.5), 3),
+        "filter_max_ms": round(max(keystrokes), 3),
+        "filter_matches": matches,
+        "clear_filter_ms": round(clear_ms, 3),
+        "page_cold_p50_ms": round(percentile(cold, 0.5), 4),
+        "page_warm_p50_ms": round(percentile(warm, 0.5), 4),
+        "scroll_all_seconds": round(scroll_seconds, 4),
+        "uncheck_ms": round(uncheck_ms, 3),
+        "selection_ms": round(selection_ms, 3),
+        "selected": len(selection),
+        "selection_correct": len(selection) == items - unchecked,
+        "scan_calls": scan_calls,
+        "browse_calls": sum(calls.values()) - scan_calls,
+        "window": measure_browser_window(flagged_emails, steps),
+    }
@@ -0,0 +1,101 @@
+"""Generated mailboxes and timing helpers shared by the benchmarks."""
+
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from utils.fake import FakeFolder, FakeMailItem
+from utils.query import FLAG_MARKED
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MAILBOX = "benchmark@radlawgroup.com"
+
+
+FIRST_DAY = date(2026, 1, 1)
+
+
+SENDERS = [f"client{number}@example.com" for number in range(50)] + [
+    "partner@radlawgroup.com",
+    "associate@radlawgroup.com",
+]
+
+
+WORDS = (
+    "Re: Fwd: Invoice Retainer Deposition Motion Hearing Discovery Settlement "
+    "Draft Agreement Filing Review Call Notes Update Schedule Exhibit"
+).split()
+
+
+def generate_mailbox(
+    items,
+    flag_ratio=0.2,
+    days=30,
+    collision_rate=0.05,
+    missing_id_rate=0.02,
+    seed=0,
+):
+    """A seeded Inbox of items emails spread over days starting FIRST_DAY
+
+    flag_ratio of them are flagged. collision_rate of them reuse the
+    subject, sender and received time of an earlier email, and
+    missing_id_rate have no Message-ID, which exercises the content-hash
+    fingerprint on exactly the emails that are easiest to confuse.
+    """
+    generator = random.Random(seed)
+    span = days * 24 * 60 * 60
+    first = datetime.combine(FIRST_DAY, datetime.min.time())
+    emails = []
+
+    for number in range(items):
+        if emails and generator.random() < collision_rate:
+            original = generator.choice(emails)
+            subject = original.Subject
+            sender = original.SenderEmailAddress
+            received_time = original.ReceivedTime
+        else:
+            subject = " ".join(generator.choices(WORDS, k=generator.randint(2, 6)))
+            sender = generator.choice(SENDERS)
+            received_time = first + timedelta(seconds=generator.randrange(span))
+
+        email = FakeMailItem(
+            subject,
+            received_time,
+            FLAG_MARKED if generator.random() < flag_ratio else 0,
+            sender,
+            Size=generator.randint(2_000, 200_000),
+        )
+        if generator.random() < missing_id_rate:
+            email.InternetMessageID = ""
+        else:
+            email.InternetMessageID = f"<{seed}.{number}@example.com>"
+        emails.append(email)
+
+    return FakeFolder("Inbox", emails)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def timed_ms(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - started) * 1000
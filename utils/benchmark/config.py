@@ -0,0 +1,92 @@
+"""Cached config reads and debounced config writes."""
+
+import builtins
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from utils.config import ConfigStore
+
+
+class FilesystemCalls:
+    """Counts os.stat, os.replace and open calls while active"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._originals = {}
+
+    def __enter__(self):
+        for module, name in ((os, "stat"), (os, "replace"), (builtins, "open")):
+            original = getattr(module, name)
+            self._originals[(module, name)] = original
+            setattr(module, name, self._counting(name, original))
+        return self
+
+    def _counting(self, name, original):
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return original(*args, **kwargs)
+
+        return counted
+
+    def __exit__(self, *exc_info):
+        for (module, name), original in self._originals.items():
+            setattr(module, name, original)
+
+
+def run_config_benchmark(reads=100000, writes=1000):
+    """Time cached config reads and debounced writes on a scratch config.ini
+
+    Counts the filesystem calls each side makes: reads within the check
+    interval should make none, and a burst of writes one file replace.
+    """
+    folder = tempfile.mkdtemp(prefix="config-")
+    path = os.path.join(folder, "config.ini")
+    with open(path, "w") as config_file:
+        config_file.write(
+            "[Folder]\noutput_folder = D:/Billing\n\n"
+            "[Email]\nprimary_email = partner@radlawgroup.com\n\n"
+            "[Export]\nbatch_size = 50\n\n"
+            "[Folder:associate@radlawgroup.com]\noutput_folder = E:/Associate\n"
+        )
+    store = ConfigStore(path, check_interval=60.0, write_delay=60.0)
+    store.refresh()
+    try:
+        with FilesystemCalls() as read_calls:
+            started = time.perf_counter()
+            for number in range(reads):
+                store.get("Email", "primary_email")
+                store.get("Export", "batch_size", int)
+                store.get(
+                    "Folder", "output_folder", profile="associate@radlawgroup.com"
+                )
+            read_seconds = time.perf_counter() - started
+
+        with FilesystemCalls() as write_calls:
+            started = time.perf_counter()
+            for number in range(writes):
+                # Like saving the email field on every <FocusOut>
+                store.set("Email", "primary_email", f"user{number}@radlawgroup.com")
+            set_seconds = time.perf_counter() - started
+            store.flush()
+            write_seconds = time.perf_counter() - started
+
+        reread = ConfigStore(path)
+        saved = reread.get("Email", "primary_email")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        "reads": reads * 3,
+        "read_seconds": round(read_seconds, 6),
+        "reads_per_second": round(reads * 3 / read_seconds),
+        "read_filesystem_calls": dict(read_calls.calls),
+        "writes": writes,
+        "set_seconds": round(set_seconds, 6),
+        "write_seconds": round(write_seconds, 6),
+        "write_filesystem_calls": dict(write_calls.calls),
+        "files_written": store.writes,
+        "saved": saved == f"user{writes - 1}@radlawgroup.com",
+    }
@@ -0,0 +1,171 @@
+"""Per-phase timing of one export: connect, store lookup, scan, dedupe, copy."""
+
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+from utils.benchmark.common import (
+    FIRST_DAY,
+    MAILBOX,
+    generate_mailbox,
+    peak_rss_mb,
+    percentile,
+)
+from utils.fake import FakeFolder, FakeMailItem, FakeNamespace, SlowProxy
+from utils.fingerprint import folder_fingerprints
+from utils.instrument import Profiler
+from utils.outlook import get_flagged_emails_in_month
+from utils.pipeline import DEFAULT_BATCH_SIZE, PstTarget, export_rows
+from utils.session import OutlookSession
+
+
+class TimedPstTarget(PstTarget):
+    """PstTarget that records how long each email took to resolve and copy"""
+
+    def __init__(self, folder, resolve):
+        super().__init__(folder, resolve)
+        self.latencies = []
+
+    def copy_batch(self, rows):
+        failed = []
+        for row in rows:
+            started = time.perf_counter()
+            try:
+                self.copy_item(self.resolve(row.EntryID))
+            except Exception as e:
+                failed.append((row, e))
+            self.latencies.append(time.perf_counter() - started)
+        return failed
+
+
+def run_benchmark(
+    items,
+    flag_ratio=0.2,
+    days=30,
+    collision_rate=0.05,
+    missing_id_rate=0.02,
+    existing_ratio=0.1,
+    latency=0.0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    seed=0,
+    profile=False,
+):
+    """Generate a mailbox, run one export against it and return the results
+
+    existing_ratio of the flagged emails are put in the PST beforehand, so
+    the dedupe set has something to find and the copy skips them. With
+    profile, the results also hold a utils.instrument report of every call.
+    """
+    started = time.perf_counter()
+    inbox = generate_mailbox(
+        items, flag_ratio, days, collision_rate, missing_id_rate, seed
+    )
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    generate_seconds = time.perf_counter() - started
+
+    calls = Counter()
+    profiler = Profiler() if profile else None
+    session = OutlookSession(
+        lambda: SlowProxy(namespace, latency, calls), MAILBOX, profiler
+    )
+    phases = {}
+
+    def phase(name, function, count=None):
+        before = sum(calls.values())
+        phase_started = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - phase_started
+        phases[name] = {
+            "seconds": round(seconds, 6),
+            "round_trips": sum(calls.values()) - before,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        if count is not None:
+            total = count(result)
+            phases[name]["items"] = total
+            phases[name]["items_per_second"] = (
+                round(total / seconds, 1) if seconds else None
+            )
+        return result
+
+    folder = phase("connect", lambda: session.inbox)
+    root = phase("store_lookup", lambda: session.open_pst("benchmark.pst"))
+
+    last_day = FIRST_DAY + timedelta(days=days - 1)
+    flagged_emails, _, _ = phase(
+        "scan",
+        lambda: get_flagged_emails_in_month(FIRST_DAY, last_day, folder=folder),
+        count=lambda result: len(result[0]),
+    )
+
+    # Seed the PST directly, outside the timed phases
+    generator = random.Random(seed)
+    pst_items = namespace.Stores[-1].GetRootFolder().Items
+    for entry_id in flagged_emails.column("EntryID"):
+        if generator.random() < existing_ratio:
+            pst_items.Add(FakeMailItem.Copy(namespace.GetItemFromID(entry_id)))
+
+    existing_fingerprints = phase(
+        "dedupe_build", lambda: folder_fingerprints(root), count=len
+    )
+
+    target = TimedPstTarget(root, session.get_item)
+    summary = phase(
+        "copy",
+        lambda: export_rows(
+            flagged_emails, target, existing_fingerprints, batch_size=batch_size
+        ),
+        count=lambda result: result["copied"],
+    )
+    latencies_ms = [seconds * 1000 for seconds in target.latencies]
+    phases["copy"].update(
+        {
+            "skipped": summary["skipped"],
+            "failed": summary["failed"],
+            "batches": summary["batches"],
+            "p50_ms": round(percentile(latencies_ms, 0.50) or 0, 4),
+            "p99_ms": round(percentile(latencies_ms, 0.99) or 0, 4),
+        }
+    )
+
+    results = {
+        "parameters": {
+            "items": items,
+            "flag_ratio": flag_ratio,
+            "days": days,
+            "collision_rate": collision_rate,
+            "missing_id_rate": missing_id_rate,
+            "existing_ratio": existing_ratio,
+            "latency": latency,
+            "batch_size": batch_size,
+            "seed": seed,
+        },
+        "generate_seconds": round(generate_seconds, 3),
+        "total_seconds": round(sum(result["seconds"] for result in phases.values()), 6),
+        "round_trips": dict(calls.most_common()),
+        "peak_rss_mb": peak_rss_mb(),
+        "phases": phases,
+    }
+    if profiler is not None:
+        results["profile"] = profiler.report()
+    return results
+
+
+def compare(results, baseline):
+    """Print per-phase time changes against an earlier results file"""
+    earlier = {run["parameters"]["items"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        before = earlier.get(run["parameters"]["items"])
+        if before is None:
+            continue
+        print(f"{run['parameters']['items']} items:")
+        for name, phase in run["phases"].items():
+            if name not in before["phases"]:
+                continue
+            old = before["phases"][name]["seconds"]
+            change = (phase["seconds"] - old) / old * 100 if old else 0.0
+            print(
+                f"  {name:<13}{old:>10.3f}s -> {phase['seconds']:>8.3f}s"
+                f"  {change:+6.1f}%"
+            )
@@ -0,0 +1,105 @@
+"""Exports through an Outlook that keeps crashing, resumed from the journal."""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import Crash, FakeFolder, FakeNamespace, SlowProxy
+from utils.fingerprint import fingerprint_row
+from utils.index import SyncIndex
+from utils.journal import ExportJournal, export_with_journal
+from utils.outlook import get_flagged_emails_in_month
+from utils.pipeline import DEFAULT_BATCH_SIZE, PstTarget
+from utils.session import OutlookSession
+from utils.table import get_table
+
+
+def run_crash_test(
+    items,
+    crash_rate=0.002,
+    flag_ratio=0.5,
+    batch_size=DEFAULT_BATCH_SIZE,
+    seed=0,
+    max_runs=1000,
+):
+    """Export through an Outlook that keeps crashing until the job finishes
+
+    Every run opens a fresh session, index and journal, as a restarted app
+    would, and ends at the first injected Crash. Returns the timings of each
+    run and whether every flagged email ended up in the PST exactly once.
+    """
+    inbox = generate_mailbox(items, flag_ratio, 1, seed=seed)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, FIRST_DAY, folder=inbox
+    )
+    expected = {fingerprint_row(row) for row in flagged_emails}
+
+    state_folder = tempfile.mkdtemp(prefix="crash-")
+    index_path = os.path.join(state_folder, "index.db")
+    pst_path = os.path.join(state_folder, "benchmark.pst")
+    generator = random.Random(seed)
+    runs = []
+
+    def pst_contents():
+        if not namespace.Stores:
+            return Counter()
+        return Counter(
+            map(fingerprint_row, get_table(namespace.Stores[0].GetRootFolder()))
+        )
+
+    try:
+        for run_number in range(max_runs):
+            started = time.perf_counter()
+            remaining = len(expected) - len(pst_contents())
+            session = OutlookSession(
+                lambda: SlowProxy(namespace, crash_rate=crash_rate, random=generator),
+                MAILBOX,
+            )
+            run = {"run": run_number + 1, "remaining_before": remaining}
+            runs.append(run)
+            with SyncIndex(index_path) as index, ExportJournal(index_path) as journal:
+                try:
+                    root = session.open_pst(pst_path)
+                    summary = export_with_journal(
+                        journal,
+                        journal.job_for(pst_path),
+                        flagged_emails,
+                        PstTarget(root, session.get_item),
+                        index.store_fingerprints(pst_path),
+                        record=lambda fingerprints: index.add_fingerprints(
+                            pst_path, fingerprints
+                        ),
+                        batch_size=batch_size,
+                    )
+                except Crash as crash:
+                    run["crashed_in"] = str(crash)
+                    run["seconds"] = round(time.perf_counter() - started, 6)
+                    continue
+            run["seconds"] = round(time.perf_counter() - started, 6)
+            run["recovered"] = summary["recovered"]
+            if summary["pending"] == 0:
+                break
+    finally:
+        shutil.rmtree(state_folder, ignore_errors=True)
+
+    copies = pst_contents()
+    return {
+        "parameters": {
+            "items": items,
+            "crash_rate": crash_rate,
+            "flag_ratio": flag_ratio,
+            "batch_size": batch_size,
+            "seed": seed,
+        },
+        "flagged": len(expected),
+        "crashes": sum(1 for run in runs if "crashed_in" in run),
+        "missing": len(expected - set(copies)),
+        "duplicated": sum(1 for count in copies.values() if count > 1),
+        "exactly_once": set(copies) == expected and max(copies.values()) == 1,
+        "runs": runs,
+    }
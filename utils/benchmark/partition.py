@@ -0,0 +1,87 @@
+"""Date-partitioned parallel scans against a single cursor."""
+
+import random
+import time
+from datetime import timedelta
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeFolder, FakeNamespace, SlowProxy
+from utils.outlook import get_flagged_emails_in_month
+from utils.partition import PartitionedScan
+
+
+def run_partition_benchmark(
+    items,
+    workers,
+    days=365,
+    latency=0.0002,
+    row_latency=0.0005,
+    error_rate=0.01,
+    seed=0,
+):
+    """Time a year-long scan read as date partitions for each worker count
+
+    Against one Restrict read through a single cursor, with every GetArray
+    row costing row_latency. A last run at the highest worker count rejects
+    error_rate of all Outlook calls, and every run must return the same
+    emails in the same order as the single cursor. Partitions may be as
+    small as the flagged mail split max(workers) ways, so every worker
+    count reads one partition per worker even at small sizes.
+    """
+    inbox = generate_mailbox(items, days=days, seed=seed)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    last_day = FIRST_DAY + timedelta(days=days - 1)
+
+    started = time.perf_counter()
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY,
+        last_day,
+        folder=SlowProxy(inbox, latency, row_latency=row_latency),
+    )
+    single_seconds = time.perf_counter() - started
+    expected = sorted(flagged_emails, key=lambda row: row.ReceivedTime)
+    expected = [row.EntryID for row in expected]
+    min_partition_size = max(1, len(expected) // max(workers))
+
+    def scan(worker_count, error_rate=0.0):
+        generator = random.Random(seed)
+        flagged_emails, summary = PartitionedScan(
+            lambda: SlowProxy(
+                namespace,
+                latency,
+                random=generator,
+                row_latency=row_latency,
+                error_rate=error_rate,
+            ),
+            f"{MAILBOX}/Inbox",
+            worker_count,
+            retries=10,
+            min_partition_size=min_partition_size,
+        ).scan(FIRST_DAY, last_day)
+        partitions = summary["partitions"]
+        return {
+            "workers": worker_count,
+            "partitions": len(partitions),
+            "largest_partition": max(partition["rows"] for partition in partitions),
+            "attempts": sum(partition["attempts"] for partition in partitions),
+            "plan_seconds": summary["plan_seconds"],
+            "seconds": summary["seconds"],
+            "speedup": round(single_seconds / summary["seconds"], 2),
+            "same_emails": list(flagged_emails.column("EntryID")) == expected,
+        }
+
+    return {
+        "parameters": {
+            "items": items,
+            "days": days,
+            "latency": latency,
+            "row_latency": row_latency,
+            "error_rate": error_rate,
+            "seed": seed,
+            "min_partition_size": min_partition_size,
+        },
+        "flagged": len(expected),
+        "single_cursor_seconds": round(single_seconds, 3),
+        "runs": [scan(worker_count) for worker_count in workers],
+        "with_errors": scan(max(workers), error_rate),
+    }
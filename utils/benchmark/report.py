@@ -0,0 +1,92 @@
+"""Columnar billing summaries against tallying rows one by one."""
+
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from utils.benchmark.common import SENDERS, generate_mailbox
+from utils.report import (
+    REPORT_COLUMNS,
+    SUMMARIES,
+    build_report,
+    client_of,
+    write_report,
+)
+from utils.table import get_table
+
+
+def tally_rows(table, firm_domain=None):
+    """build_report's totals computed the obvious way, one row at a time"""
+    totals = {name: {} for name in SUMMARIES}
+    for row in table:
+        received_time = row.ReceivedTime.replace(tzinfo=None)
+        sender = row.SenderEmailAddress or ""
+        keys = {
+            "client": client_of(row.Categories, sender, row.To, firm_domain),
+            "day": received_time.date(),
+            "sender": sender.lower(),
+        }
+        for name, key in keys.items():
+            total = totals[name].get(key)
+            if total is None:
+                totals[name][key] = [1, row.Size, received_time, received_time]
+            else:
+                total[0] += 1
+                total[1] += row.Size
+                total[2] = min(total[2], received_time)
+                total[3] = max(total[3], received_time)
+    return {
+        name: [(key, *totals[name][key]) for key in sorted(totals[name])]
+        for name in SUMMARIES
+    }
+
+
+def run_report_benchmark(items, seed=0, repeats=5):
+    """Time build_report on a year of flagged mail against tally_rows
+
+    A third of the generated emails carry a client category and a fifth are
+    sent by the firm to a client, so every way of finding the client is
+    exercised. Both must produce the same totals.
+    """
+    generator = random.Random(seed)
+    folder = generate_mailbox(items, flag_ratio=1.0, days=365, seed=seed)
+    for email in folder.Items:
+        if generator.random() < 1 / 3:
+            email.Categories = f"Matter {generator.randrange(200)}"
+        elif generator.random() < 0.2:
+            email.SenderEmailAddress = SENDERS[-1]
+            email.To = f"Client <{generator.choice(SENDERS[:-2])}>"
+    table = get_table(folder, "", REPORT_COLUMNS)
+    firm_domain = "radlawgroup.com"
+
+    timings = {}
+    for name, function in (("columnar", build_report), ("row_by_row", tally_rows)):
+        seconds = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            report = function(table, firm_domain)
+            seconds.append(time.perf_counter() - started)
+        timings[name] = (statistics.median(seconds), report)
+
+    folder_path = tempfile.mkdtemp(prefix="report-")
+    try:
+        started = time.perf_counter()
+        write_report(timings["columnar"][1], os.path.join(folder_path, "benchmark"))
+        write_seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+    columnar_seconds, report = timings["columnar"]
+    row_seconds, row_report = timings["row_by_row"]
+    return {
+        "parameters": {"items": items, "repeats": repeats},
+        "groups": {name: len(rows) for name, rows in report.items()},
+        "columnar_seconds": round(columnar_seconds, 4),
+        "row_by_row_seconds": round(row_seconds, 4),
+        "speedup": round(row_seconds / columnar_seconds, 2),
+        "write_seconds": round(write_seconds, 4),
+        "same_totals": report == row_report,
+    }
@@ -0,0 +1,125 @@
+"""Full-text index build and query latency against a linear scan."""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.benchmark.common import (
+    FIRST_DAY,
+    SENDERS,
+    WORDS,
+    generate_mailbox,
+    percentile,
+)
+from utils.fingerprint import fingerprint_row
+from utils.pipeline import DEFAULT_BATCH_SIZE
+from utils.search import SearchIndex, tokenize
+
+
+def generate_documents(items, matters=500, seed=0):
+    """(email, recipients, body) for a generated mailbox, bodies 20-200 words
+
+    Bodies mix the benchmark's vocabulary with matter numbers such as
+    "2026-0042", the words billing searches most often look for.
+    """
+    generator = random.Random(seed)
+    folder = generate_mailbox(items, flag_ratio=1.0, seed=seed)
+    vocabulary = WORDS + [f"2026-{number:04d}" for number in range(matters)]
+    documents = []
+    for email in folder.Items:
+        words = generator.choices(vocabulary, k=generator.randint(20, 200))
+        documents.append((email, generator.choice(SENDERS[-2:]), " ".join(words)))
+    return documents
+
+
+def run_search_benchmark(
+    items, batch_size=DEFAULT_BATCH_SIZE, seed=0, repeats=20, page=100
+):
+    """Build and query throughput of SearchIndex against a linear scan
+
+    The index is built batch by batch, committing after each one as an export
+    does. Each query fetches its first page of hits repeats times; the
+    baseline tokenizes every stored body per query, which is what searching
+    without an index costs.
+    """
+    documents = generate_documents(items, seed=seed)
+    folder = tempfile.mkdtemp(prefix="search-")
+    index_path = os.path.join(folder, "search_index.db")
+    first = datetime.combine(FIRST_DAY, datetime.min.time())
+    queries = {
+        "common": ("invoice", None, None),
+        "rare": ("2026-0417", None, None),
+        "and": ("retainer 2026-0042", None, None),
+        "or": ("deposition OR settlement", None, None),
+        "prefix": ("sched*", None, None),
+        "not": ("invoice -retainer", None, None),
+        "field": ("from:client7", None, None),
+        "date": ("invoice", first, first + timedelta(days=7)),
+    }
+    results = {
+        "parameters": {"items": items, "batch_size": batch_size, "page": page}
+    }
+    try:
+        started = time.perf_counter()
+        with SearchIndex(index_path) as index:
+            for offset in range(0, items, batch_size):
+                for email, recipients, body in documents[offset : offset + batch_size]:
+                    index.add(
+                        fingerprint_row(email),
+                        "benchmark.pst",
+                        email.ReceivedTime,
+                        email.SenderEmailAddress,
+                        email.Subject,
+                        recipients,
+                        body,
+                    )
+                index.commit()
+            build_seconds = time.perf_counter() - started
+            merges = index.merges
+            postings_bytes, postings_count = index.connection.execute(
+                "SELECT (SELECT SUM(LENGTH(data)) FROM postings), "
+                "(SELECT SUM(documents) FROM terms)"
+            ).fetchone()
+        results["build"] = {
+            "seconds": round(build_seconds, 4),
+            "emails_per_second": round(items / build_seconds),
+            "merges": merges,
+            "index_mb": round(os.path.getsize(index_path) / 1e6, 3),
+            "postings_mb": round(postings_bytes / 1e6, 3),
+            "bytes_per_posting": round(postings_bytes / postings_count, 3),
+        }
+
+        results["queries"] = {}
+        with SearchIndex(index_path) as index:
+            for name, (query, start, end) in queries.items():
+                latencies = []
+                for _ in range(repeats):
+                    query_started = time.perf_counter()
+                    index.search(query, start, end, limit=page)
+                    latencies.append(time.perf_counter() - query_started)
+                results["queries"][name] = {
+                    "query": query,
+                    "hits": len(index.search(query, start, end)),
+                    "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                }
+
+        # Baseline: tokenize every email for the rare query's words
+        query = queries["rare"][0]
+        words = set(tokenize(query))
+        started = time.perf_counter()
+        matches = sum(
+            words <= set(tokenize(f"{email.Subject} {recipients} {body}"))
+            for email, recipients, body in documents
+        )
+        results["scan_baseline"] = {
+            "query": query,
+            "hits": matches,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
@@ -0,0 +1,90 @@
+"""Sharded export scaling with the number of workers."""
+
+import mailbox
+import shutil
+import tempfile
+from datetime import timedelta
+
+from utils.archive import MailboxTarget
+from utils.backend import OutlookBackend
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox
+from utils.fake import FakeFolder, FakeNamespace, SlowProxy
+from utils.outlook import get_flagged_emails_in_month
+from utils.pipeline import DEFAULT_BATCH_SIZE
+from utils.session import OutlookSession
+from utils.shard import ShardedExport
+
+
+class MboxArchiveBackend(OutlookBackend):
+    """Reads through an Outlook session, archives to local mbox files
+
+    A stand-in for PST archives whose write cost does not depend on Outlook,
+    so shard scaling reflects the Outlook round trips being overlapped.
+    """
+
+    archive_suffix = ".mbox"
+
+    def create_archive(self, archive_path):
+        return MailboxTarget(
+            mailbox.mbox(archive_path), self.session.get_item, archive_path
+        )
+
+
+def run_shard_benchmark(
+    items,
+    workers,
+    flag_ratio=0.2,
+    days=365,
+    latency=0.001,
+    shard_by="month",
+    batch_size=DEFAULT_BATCH_SIZE,
+    seed=0,
+):
+    """Time a sharded export of one generated mailbox for each worker count"""
+    inbox = generate_mailbox(items, flag_ratio, days, seed=seed)
+    namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+    last_day = FIRST_DAY + timedelta(days=days - 1)
+    flagged_emails, _, _ = get_flagged_emails_in_month(
+        FIRST_DAY, last_day, folder=inbox
+    )
+
+    runs = []
+    for worker_count in workers:
+        output_folder = tempfile.mkdtemp(prefix="shards-")
+        try:
+            manifest = ShardedExport(
+                lambda: MboxArchiveBackend(
+                    OutlookSession(lambda: SlowProxy(namespace, latency), MAILBOX)
+                ),
+                shard_by,
+                worker_count,
+                batch_size=batch_size,
+            ).export(flagged_emails, output_folder, FIRST_DAY, last_day)
+        finally:
+            shutil.rmtree(output_folder, ignore_errors=True)
+        runs.append(
+            {
+                "workers": worker_count,
+                "shards": len(manifest["shards"]),
+                "copied": sum(shard["copied"] for shard in manifest["shards"]),
+                "seconds": manifest["seconds"],
+            }
+        )
+
+    baseline = runs[0]["seconds"] * runs[0]["workers"]
+    for run in runs:
+        run["speedup"] = round(baseline / run["seconds"], 2) if run["seconds"] else None
+
+    return {
+        "parameters": {
+            "items": items,
+            "flag_ratio": flag_ratio,
+            "days": days,
+            "latency": latency,
+            "shard_by": shard_by,
+            "batch_size": batch_size,
+            "seed": seed,
+        },
+        "flagged": len(flagged_emails),
+        "runs": runs,
+    }
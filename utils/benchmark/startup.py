@@ -0,0 +1,119 @@
+""""import utils" time and the GUI's first paint, in fresh interpreters."""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+REPO_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+# Median milliseconds "import utils" may take in a fresh interpreter
+IMPORT_BUDGET_MS = 40
+
+
+# Top-level modules "import utils" must leave to the code that needs them
+STARTUP_EXCLUDED_MODULES = (
+    "win32com",
+    "pythoncom",
+    "sqlite3",
+    "email",
+    "mailbox",
+    "tkinter",
+)
+
+
+# What "python gui.py" runs up to the first paint of the setup screen
+GUI_STARTUP_SCRIPT = """
+import os
+import gui
+root = gui.Tk()
+gui.MainWindow(root, width=640)
+root.wait_visibility()
+root.update_idletasks()
+print("painted", flush=True)
+os._exit(0)
+"""
+
+
+def measure_import(module="utils", runs=5):
+    """Median cumulative import time of module, each run in a fresh interpreter
+
+    Also lists the STARTUP_EXCLUDED_MODULES the import loaded.
+    """
+    milliseconds = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        for line in completed.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                milliseconds.append(int(fields[1]) / 1000)
+
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(*sys.modules)"],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout.split()
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": round(statistics.median(milliseconds), 3),
+        "max_ms": round(max(milliseconds), 3),
+        "excluded_modules_loaded": sorted(
+            {name.split(".")[0] for name in loaded} & set(STARTUP_EXCLUDED_MODULES)
+        ),
+    }
+
+
+def measure_gui_startup(runs=3, timeout=60):
+    """Seconds from starting a fresh interpreter on gui.py to its first paint
+
+    Needs a display; without one the result says why it was skipped.
+    """
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", GUI_STARTUP_SCRIPT],
+            cwd=REPO_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=timeout,
+        )
+        elapsed = time.perf_counter() - started
+        if "painted" not in completed.stdout:
+            error = completed.stderr.strip().splitlines() or ["no output"]
+            return {"skipped": error[-1]}
+        seconds.append(elapsed)
+    return {
+        "runs": runs,
+        "median_seconds": round(statistics.median(seconds), 4),
+        "max_seconds": round(max(seconds), 4),
+    }
+
+
+def run_startup_benchmark(runs=5, import_budget_ms=IMPORT_BUDGET_MS):
+    """Import-time and first-paint timings, checked against the budget"""
+    imports = measure_import("utils", runs)
+    return {
+        "import": imports,
+        "gui": measure_gui_startup(max(1, runs // 2)),
+        "import_budget_ms": import_budget_ms,
+        "within_budget": imports["median_ms"] <= import_budget_ms
+        and not imports["excluded_modules_loaded"],
+    }
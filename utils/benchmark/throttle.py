@@ -0,0 +1,144 @@
+"""Scans and exports through a busy Outlook, with and without a Throttle."""
+
+import random
+import threading
+import time
+from datetime import timedelta
+
+from utils.benchmark.common import FIRST_DAY, MAILBOX, generate_mailbox, percentile
+from utils.fake import BusyOutlook, FakeComError, FakeFolder, FakeNamespace, SlowProxy
+from utils.fingerprint import FingerprintSet
+from utils.partition import PartitionedScan
+from utils.pipeline import DEFAULT_BATCH_SIZE, PstTarget, export_rows
+from utils.query import build_flagged_filter
+from utils.session import OutlookSession
+from utils.table import get_table
+from utils.throttle import Throttle
+
+
+def run_throttle_benchmark(
+    items,
+    workers=8,
+    capacity=4,
+    latency=0.0002,
+    busy_seconds=0.5,
+    period=2.0,
+    error_rate=0.3,
+    batch_size=DEFAULT_BATCH_SIZE,
+    seed=0,
+):
+    """Scan and export a year of mail through a busy fake Outlook, with and
+    without a Throttle
+
+    The BusyOutlook serves capacity round trips at once and, for
+    busy_seconds of every period, adds latency spikes and rejects
+    error_rate of all calls. The scan reads date partitions on workers
+    sessions; the export copies into a PST from one session. Without a
+    throttle the partition retries and the pipeline's retry passes are all
+    there is. Reports time, rejections, emails that failed or arrived
+    twice, and the limits the throttle moved between, sampled every 50 ms.
+    """
+    inbox = generate_mailbox(items, days=365, seed=seed)
+    last_day = FIRST_DAY + timedelta(days=364)
+    expected = {
+        row.EntryID
+        for row in get_table(inbox, build_flagged_filter(FIRST_DAY, last_day))
+    }
+
+    def run(throttle):
+        namespace = FakeNamespace([FakeFolder(MAILBOX, folders=[inbox])])
+        busy = BusyOutlook(capacity, period, busy_seconds, error_rate=error_rate)
+
+        def connect():
+            return SlowProxy(namespace, latency, busy=busy)
+
+        samples = []
+        sampling = threading.Event()
+
+        def sample():
+            while not sampling.wait(0.05):
+                samples.append(throttle.metrics())
+
+        if throttle is not None:
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+        result = {"throttle": throttle is not None}
+        started = time.perf_counter()
+        try:
+            try:
+                flagged_emails, scan = PartitionedScan(
+                    connect, f"{MAILBOX}/Inbox", workers, throttle=throttle
+                ).scan(FIRST_DAY, last_day)
+            except FakeComError as e:
+                result["scan_error"] = str(e)
+                flagged_emails = None
+            result["scan_seconds"] = round(time.perf_counter() - started, 3)
+            result["scan_rejected"] = busy.rejected
+
+            if flagged_emails is not None:
+                result["scan_partition_attempts"] = sum(
+                    partition["attempts"] for partition in scan["partitions"]
+                )
+                result["scan_complete"] = (
+                    set(flagged_emails.column("EntryID")) == expected
+                )
+                session = OutlookSession(connect, MAILBOX, throttle=throttle)
+                root = session.open_pst("throttle.pst")
+                batch_sizes = []
+                copy_started = time.perf_counter()
+                summary = export_rows(
+                    flagged_emails,
+                    PstTarget(root, session.get_item),
+                    FingerprintSet(),
+                    progress=lambda position, total, subject, stats: (
+                        batch_sizes.append(stats.size)
+                    ),
+                    batch_size=batch_size,
+                    throttle=throttle,
+                )
+                pst_items = namespace.Stores[-1].GetRootFolder().Items
+                result.update(
+                    copy_seconds=round(time.perf_counter() - copy_started, 3),
+                    copied=summary["copied"],
+                    failed=summary["failed"],
+                    # Copies that raised after copying and were made again
+                    duplicated=len(pst_items) - summary["copied"],
+                    emails_per_second=round(
+                        summary["copied"] / (time.perf_counter() - copy_started), 1
+                    ),
+                    batch_sizes=[min(batch_sizes), max(batch_sizes)],
+                )
+        finally:
+            sampling.set()
+            if throttle is not None:
+                sampler.join()
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["round_trips"] = busy.round_trips
+        result["rejected"] = busy.rejected
+        if throttle is not None:
+            concurrency = [metrics["concurrency"] for metrics in samples]
+            result["metrics"] = throttle.metrics()
+            result["concurrency"] = [min(concurrency), max(concurrency)]
+            result["calls_per_second_p50"] = percentile(
+                [metrics["calls_per_second"] for metrics in samples], 0.5
+            )
+        return result
+
+    return {
+        "parameters": {
+            "items": items,
+            "workers": workers,
+            "capacity": capacity,
+            "latency": latency,
+            "busy_seconds": busy_seconds,
+            "period": period,
+            "error_rate": error_rate,
+            "batch_size": batch_size,
+            "seed": seed,
+        },
+        "flagged": len(expected),
+        "runs": [
+            run(None),
+            run(Throttle(max_concurrency=workers, random=random.Random(seed))),
+        ],
+    }
@@ -0,0 +1,109 @@
+"""A FlagWatcher following a burst of flag changes."""
+
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from utils.benchmark.common import FIRST_DAY, generate_mailbox, percentile
+from utils.fake import SlowProxy, with_events
+from utils.outlook import get_flagged_emails_in_month
+from utils.query import FLAG_MARKED, build_flagged_filter
+from utils.table import get_table
+from utils.watch import FlagWatcher
+from utils.worker import PUMP_INTERVAL
+
+
+def run_watch_benchmark(items, rate=10000, seconds=60, latency=0.0002, seed=0):
+    """Toggle flags at rate changes a minute while a FlagWatcher follows them
+
+    A thread flags and unflags random emails of a generated month the way a
+    user in Outlook would, firing the fake Items events, while the main
+    thread drives apply_if_due every PUMP_INTERVAL like the worker does,
+    through a SlowProxy. Reports how long a change took to show up, how many
+    COM round trips each change cost against rescanning the month per batch,
+    and whether the set ends up equal to a full scan.
+    """
+    generator = random.Random(seed)
+    inbox = generate_mailbox(items, seed=seed)
+    emails = list(inbox.Items)
+    # Untouched since received, not since generated a moment ago
+    for email in emails:
+        email.LastModificationTime = email.ReceivedTime
+    last_day = FIRST_DAY + timedelta(days=29)
+    scanned_at = datetime.now()
+    flagged_emails, start, end = get_flagged_emails_in_month(
+        FIRST_DAY, last_day, folder=inbox
+    )
+    calls = Counter()
+    watcher = FlagWatcher(
+        SlowProxy(inbox, latency, calls),
+        start,
+        end,
+        flagged_emails,
+        with_events=with_events,
+        scanned_at=scanned_at,
+    ).start()
+
+    changes = int(rate * seconds / 60)
+    change_times = []
+    lock = threading.Lock()
+
+    def make_changes():
+        began = time.perf_counter()
+        for number in range(changes):
+            delay = began + number * 60 / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            email = generator.choice(emails)
+            if email.FlagStatus == FLAG_MARKED:
+                email.ClearTaskFlag()
+            else:
+                email.MarkAsTask()
+            with lock:
+                change_times.append(time.perf_counter())
+
+    changer = threading.Thread(target=make_changes)
+    changer.start()
+    latencies = []
+    seen = 0
+    while changer.is_alive() or watcher.due() or seen < len(change_times):
+        if watcher.due():
+            # Changes made before the batch starts are visible once it ends
+            with lock:
+                batch_changes = change_times[seen:]
+            watcher.apply()
+            finished = time.perf_counter()
+            latencies.extend(finished - changed for changed in batch_changes)
+            seen += len(batch_changes)
+        time.sleep(PUMP_INTERVAL)
+    changer.join()
+    watcher.stop()
+
+    rescan_calls = Counter()
+    rescanned = get_table(
+        SlowProxy(inbox, 0.0, rescan_calls), build_flagged_filter(start, end)
+    )
+    expected = set(rescanned.column("EntryID"))
+    return {
+        "parameters": {
+            "items": items,
+            "rate_per_minute": rate,
+            "seconds": seconds,
+            "latency": latency,
+            "seed": seed,
+        },
+        "changes": changes,
+        "events": watcher.events,
+        "batches": watcher.batches,
+        "rows_read": watcher.rows_read,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "calls_per_change": round(sum(calls.values()) / changes, 2),
+        "rows_read_per_batch": round(watcher.rows_read / max(watcher.batches, 1)),
+        "rescan_calls_per_batch": sum(rescan_calls.values()),
+        "rescan_rows_per_batch": len(rescanned),
+        "flagged": len(watcher),
+        "matches_scan": set(watcher.flagged_emails().column("EntryID")) == expected,
+    }
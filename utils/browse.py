@@ -0,0 +1,185 @@
+"""Sorting, filtering and checkboxes over the flagged emails, for the GUI browser.
+
+`MailBrowser` works on the MailTable a scan already fetched in bulk, so
+browsing never goes back to Outlook. It keeps the rows in view as a list of
+row numbers into the table's columns: sorting reuses a per-column order
+computed once, filtering tests a lowercased "sender subject" string built
+once per email, and a page of display values is only formatted when the
+window scrolls to it. With 50,000 emails a sort or a keystroke in the
+filter takes milliseconds and a page of 100 rows well under one.
+
+    browser = MailBrowser(flagged_emails)
+    browser.sort("SenderEmailAddress")
+    browser.filter("acme")
+    browser.check_all(False)
+    subset = browser.selection()  # MailTable of the emails still checked
+
+Emails are checked by default and remembered by EntryID when unchecked, so
+load() can swap in a newer table (e.g. from utils.watch) without losing
+what the user unchecked.
+"""
+
+from itertools import compress
+
+# Display values are formatted and cached this many rows at a time
+PAGE_SIZE = 100
+
+# Column -> heading, in display order
+BROWSE_COLUMNS = {
+    "ReceivedTime": "Received",
+    "SenderEmailAddress": "From",
+    "Subject": "Subject",
+    "Size": "Size",
+}
+
+
+def _sort_key(name, value):
+    if name in ("SenderEmailAddress", "Subject"):
+        return (value or "").casefold()
+    return value
+
+
+def _display_values(received_time, sender, subject, size):
+    return (
+        received_time.strftime("%Y-%m-%d %H:%M"),
+        sender or "",
+        subject or "",
+        f"{round(size / 1024):,} KB",
+    )
+
+
+class MailBrowser:
+    """The flagged emails as the browser shows them: sorted, filtered, checked"""
+
+    def __init__(self, flagged_emails, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.sort_column = "ReceivedTime"
+        self.descending = False
+        self.text = ""
+        # EntryIDs of the emails the user unchecked
+        self.unchecked = set()
+        self.load(flagged_emails)
+
+    def load(self, flagged_emails):
+        """Show flagged_emails, keeping the sort, filter and unchecked emails"""
+        self.table = flagged_emails
+        self.entry_ids = flagged_emails.column("EntryID")
+        self.unchecked &= set(self.entry_ids)
+        # Column -> row numbers in ascending order, computed on first sort
+        self._orders = {}
+        self._haystack = None
+        self._matches = None
+        self._apply(self.text)
+
+    def __len__(self):
+        return len(self.view)
+
+    def _order(self, name):
+        order = self._orders.get(name)
+        if order is None:
+            keys = [_sort_key(name, value) for value in self.table.column(name)]
+            order = self._orders[name] = sorted(range(len(keys)), key=keys.__getitem__)
+        return order
+
+    def _apply(self, text):
+        """Recompute the view for the sort and filter text"""
+        text = text.casefold()
+        if not text:
+            self._matches = None
+        else:
+            if self._haystack is None:
+                self._haystack = [
+                    f"{sender or ''}\n{subject or ''}".casefold()
+                    for sender, subject in zip(
+                        self.table.column("SenderEmailAddress"),
+                        self.table.column("Subject"),
+                    )
+                ]
+            if self._matches is not None and text.startswith(self.text):
+                # Typing narrows the filter: only earlier matches can match
+                candidates = compress(range(len(self._matches)), self._matches)
+            else:
+                candidates = range(len(self._haystack))
+            matches = bytearray(len(self._haystack))
+            for index in candidates:
+                if text in self._haystack[index]:
+                    matches[index] = 1
+            self._matches = matches
+        self.text = text
+
+        order = self._order(self.sort_column)
+        if self._matches is not None:
+            order = list(compress(order, map(self._matches.__getitem__, order)))
+        self.view = order[::-1] if self.descending else list(order)
+        self._pages = {}
+
+    def sort(self, name, descending=None):
+        """Sort by column name; descending defaults to flipping a repeat sort"""
+        if descending is None:
+            descending = name == self.sort_column and not self.descending
+        self.sort_column = name
+        self.descending = descending
+        self._apply(self.text)
+
+    def filter(self, text):
+        """Only show emails whose sender or subject contains text, any case"""
+        self._apply(text.strip())
+
+    def page(self, number):
+        """Display values for the view's rows on page number, formatted once"""
+        values = self._pages.get(number)
+        if values is None:
+            indices = self.view[number * self.page_size : (number + 1) * self.page_size]
+            values = self._pages[number] = list(
+                map(
+                    _display_values,
+                    map(self.table.column("ReceivedTime").__getitem__, indices),
+                    map(self.table.column("SenderEmailAddress").__getitem__, indices),
+                    map(self.table.column("Subject").__getitem__, indices),
+                    map(self.table.column("Size").__getitem__, indices),
+                )
+            )
+        return values
+
+    def rows(self, first, count):
+        """(row number, checked, display values) for count rows of the view"""
+        rows = []
+        position = first
+        end = min(first + count, len(self.view))
+        while position < end:
+            number, offset = divmod(position, self.page_size)
+            values = self.page(number)[offset : offset + end - position]
+            for index, display in zip(self.view[position:], values):
+                rows.append((index, self.is_checked(index), display))
+            position += len(values)
+        return rows
+
+    def is_checked(self, index):
+        return self.entry_ids[index] not in self.unchecked
+
+    def toggle(self, index):
+        self.unchecked ^= {self.entry_ids[index]}
+
+    def check_all(self, checked=True):
+        """Check or uncheck every email in view, i.e. matching the filter"""
+        entry_ids = map(self.entry_ids.__getitem__, self.view)
+        if checked:
+            self.unchecked.difference_update(entry_ids)
+        else:
+            self.unchecked.update(entry_ids)
+
+    @property
+    def selected_count(self):
+        return len(self.entry_ids) - len(self.unchecked)
+
+    def selection(self):
+        """MailTable of the checked emails, in the order they were scanned"""
+        if not self.unchecked:
+            return self.table
+        return self.table.take(
+            [
+                index
+                for index, entry_id in enumerate(self.entry_ids)
+                if entry_id not in self.unchecked
+            ]
+        )
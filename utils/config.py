@@ -1,43 +1,241 @@
+"""Settings from config.ini, cached in memory.
+
+Reads are served from memory; the file is stat'ed for outside edits at most
+once every `check_interval` seconds and reparsed only when it changed.
+Writes update memory at once and reach the disk `write_delay` seconds after
+the last one, as one atomic replace of the whole file, so typing in a field
+that saves on every change costs one write.
+
+A section can be overridden per mailbox: with a profile, `[Folder:<profile>]`
+is consulted before `[Folder]`.
+
+Nothing is read or started at import; the shared store is created by the
+first get_config or set_config.
+"""
+
+import atexit
 import configparser
 import os
+import tempfile
+import threading
+import time
+
+CONFIG_PATH = "config.ini"
+
+# Seconds between checks of config.ini for outside edits
+CHECK_INTERVAL = 2.0
+
+# Seconds a change waits for further changes before config.ini is written
+WRITE_DELAY = 0.5
+
+_MISSING = object()
+
+
+def profile_section(section, profile):
+    """Name of section's override for profile, e.g. "Folder:a@x.com" """
+    return f"{section}:{profile}"
+
+
+def _convert(parser, section, key, type):
+    if type is bool:
+        return parser.getboolean(section, key)
+    return type(parser[section][key])
+
+
+class ConfigStore:
+    """In-memory view of an ini file with debounced, atomic writes
+
+    get() raises FileNotFoundError when the file does not exist and KeyError
+    for a missing section or key, like get_config always has. Safe to use
+    from the GUI and worker threads at once.
+    """
+
+    def __init__(
+        self, path=CONFIG_PATH, check_interval=CHECK_INTERVAL, write_delay=WRITE_DELAY
+    ):
+        self.path = path
+        self.check_interval = check_interval
+        self.write_delay = write_delay
+        self.parser = configparser.ConfigParser()
+        self.exists = False
+        self.loads = 0
+        self.writes = 0
+        self._signature = None
+        self._checked = None
+        # (section, key, type) -> converted value
+        self._values = {}
+        # (section, key) -> value not yet on disk
+        self._pending = {}
+        self._timer = None
+        self._write_due = None
+        self._flush_at_exit = False
+        self._lock = threading.RLock()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature):
+        self.parser = configparser.ConfigParser()
+        if signature is not None:
+            self.parser.read(self.path)
+        self.exists = signature is not None
+        self._signature = signature
+        self._values = {}
+        self.loads += 1
+        # Changes still waiting to be written win over the file
+        for (section, key), value in self._pending.items():
+            self._set_in_parser(section, key, value)
+
+    def refresh(self, force=False):
+        """Reparse the file if it changed; only stats it once per interval"""
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._checked is not None
+                and now - self._checked < self.check_interval
+            ):
+                return
+            self._checked = now
+            signature = self._stat()
+            if force or signature != self._signature:
+                self._load(signature)
+
+    def get(self, section, key, type=str, profile=None, default=_MISSING):
+        """section/key converted with type (str, int, float or bool)
+
+        With a profile, the profile's section is looked at first.
+        """
+        with self._lock:
+            self.refresh()
+            if profile is not None:
+                override = profile_section(section, profile)
+                if self.parser.has_option(override, key):
+                    section = override
+
+            cache_key = (section, key, type)
+            if cache_key in self._values:
+                return self._values[cache_key]
+
+            if not self.exists:
+                if default is not _MISSING:
+                    return default
+                raise FileNotFoundError(f"{self.path} file not found")
+            if section not in self.parser:
+                if default is not _MISSING:
+                    return default
+                raise KeyError(f"Section '{section}' not found in {self.path}")
+            if key not in self.parser[section]:
+                if default is not _MISSING:
+                    return default
+                raise KeyError(f"Key '{key}' not found in section '{section}'")
+
+            value = self._values[cache_key] = _convert(self.parser, section, key, type)
+            return value
+
+    def _set_in_parser(self, section, key, value):
+        if section not in self.parser:
+            self.parser[section] = {}
+        self.parser[section][key] = str(value)
+
+    def set(self, section, key, value, profile=None):
+        """Change a value now and schedule writing the file"""
+        with self._lock:
+            self.refresh()
+            if not self.exists:
+                raise FileNotFoundError(f"{self.path} file not found")
+            if profile is not None:
+                section = profile_section(section, profile)
+            if self.parser.get(section, key, fallback=None) == str(value):
+                # Unchanged, e.g. focus left a field nobody edited
+                return
+            self._pending[(section, key)] = str(value)
+            self._set_in_parser(section, key, value)
+            self._values = {}
+            self._schedule_write()
+
+    def _schedule_write(self):
+        # Each change pushes the write back; one timer thread serves a burst
+        self._write_due = time.monotonic() + self.write_delay
+        if self._timer is None:
+            self._start_timer(self.write_delay)
+        if not self._flush_at_exit:
+            atexit.register(self.flush)
+            self._flush_at_exit = True
+
+    def _start_timer(self, delay):
+        self._timer = threading.Timer(delay, self._write_when_due)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _write_when_due(self):
+        with self._lock:
+            if self._write_due is None:
+                return
+            remaining = self._write_due - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+                return
+        self.flush()
+
+    def flush(self):
+        """Write pending changes now, merged into the file as it is on disk"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write_due = None
+            if not self._pending:
+                return
+            # Keep edits made to the file since it was last read
+            if self._stat() != self._signature:
+                self._load(self._stat())
 
-config = configparser.ConfigParser()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            descriptor, temporary_path = tempfile.mkstemp(
+                prefix=".config-", suffix=".tmp", dir=directory
+            )
+            try:
+                with os.fdopen(descriptor, "w") as config_file:
+                    self.parser.write(config_file)
+                os.replace(temporary_path, self.path)
+            except BaseException:
+                os.unlink(temporary_path)
+                raise
 
-# Check if config file exists
-if os.path.exists("config.ini"):
-    config.read("config.ini")
-    print("Config sections:", config.sections())
-    if "Folder" in config and "output_folder" in config["Folder"]:
-        print("Output folder:", config["Folder"]["output_folder"])
-    else:
-        print(
-            "Warning: 'Folder' section or 'output_folder' key not found in config.ini"
-        )
-else:
-    print("Warning: config.ini file not found")
+            self._pending = {}
+            self._signature = self._stat()
+            self._checked = time.monotonic()
+            self.writes += 1
 
 
-def get_config(section, key):
-    if not os.path.exists("config.ini"):
-        raise FileNotFoundError("config.ini file not found")
+_store = None
+_store_lock = threading.Lock()
 
-    if section not in config:
-        raise KeyError(f"Section '{section}' not found in config.ini")
 
-    if key not in config[section]:
-        raise KeyError(f"Key '{key}' not found in section '{section}'")
+def get_store():
+    """The shared ConfigStore for config.ini, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConfigStore()
+    return _store
 
-    return config[section][key]
 
+def get_config(section, key, type=str, profile=None):
+    return get_store().get(section, key, type, profile)
 
-def set_config(section, key, value):
-    if not os.path.exists("config.ini"):
-        raise FileNotFoundError("config.ini file not found")
 
-    if section not in config:
-        config[section] = {}
+def set_config(section, key, value, profile=None):
+    get_store().set(section, key, value, profile)
 
-    config[section][key] = value
 
-    with open("config.ini", "w") as configfile:
-        config.write(configfile)
+def flush_config():
+    """Write any pending set_config changes to config.ini now"""
+    if _store is not None:
+        _store.flush()
@@ -0,0 +1,545 @@
+"""In-memory stand-ins for the Outlook object model.
+
+These mirror just enough of Outlook's `Items`, `Folder`, `Table` and
+`Namespace` objects for the helpers in `utils` to run without Outlook, e.g. on
+Linux. `FakeItems.Restrict` and `FakeFolder.GetTable` evaluate filters with
+`utils.query.parse_filter`, and `with_events` delivers `Items` events the way
+`win32com.client.WithEvents` does.
+"""
+
+import copy
+import inspect
+import itertools
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from utils.instrument import PLAIN_TYPES
+from utils.query import parse_filter
+from utils.table import COLUMN_ALIASES
+
+
+_entry_ids = itertools.count(1)
+
+
+def _next_entry_id():
+    return f"{next(_entry_ids):048X}"
+
+
+class FakeMailItem:
+    def __init__(
+        self,
+        Subject="",
+        ReceivedTime=None,
+        FlagStatus=0,
+        SenderEmailAddress="",
+        Categories="",
+        Size=1024,
+        **properties,
+    ):
+        self.EntryID = _next_entry_id()
+        self.InternetMessageID = f"<{self.EntryID}@fake.invalid>"
+        self.Subject = Subject
+        self.ReceivedTime = ReceivedTime or datetime.now()
+        self.FlagStatus = FlagStatus
+        self.SenderEmailAddress = SenderEmailAddress
+        self.Categories = Categories
+        self.Size = Size
+        self.LastModificationTime = datetime.now()
+        self.Parent = None
+        self.Attachments = FakeAttachments()
+        for name, value in properties.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"FakeMailItem({self.Subject!r}, {self.ReceivedTime!r})"
+
+    @property
+    def HasAttachments(self):
+        return self.Attachments.Count > 0
+
+    def Copy(self):
+        duplicate = copy.copy(self)
+        duplicate.EntryID = _next_entry_id()
+        if self.Parent is not None:
+            self.Parent.Items.Add(duplicate)
+        return duplicate
+
+    def Move(self, folder):
+        if self.Parent is not None:
+            self.Parent.Items.Remove(self)
+        folder.Items.Add(self)
+        return self
+
+    def Delete(self):
+        if self.Parent is not None:
+            self.Parent.Items.Remove(self)
+        self.Parent = None
+
+    def MarkAsTask(self, mark_interval=0):
+        self.FlagStatus = 2
+        self.LastModificationTime = datetime.now()
+        self._changed()
+
+    def ClearTaskFlag(self):
+        self.FlagStatus = 0
+        self.LastModificationTime = datetime.now()
+        self._changed()
+
+    def _changed(self):
+        if self.Parent is not None:
+            self.Parent.Items.Changed(self)
+
+
+class FakeAttachment:
+    """An attachment of Size bytes, generated from seed as it is saved
+
+    Attachments with the same seed and Size have the same content, and
+    SaveAsFile writes it a megabyte at a time, so even attachments of
+    hundreds of MB cost a test or benchmark no memory.
+    """
+
+    # OlAttachmentType.olByValue
+    Type = 1
+
+    def __init__(self, FileName, Size=1024, seed=0):
+        self.FileName = FileName
+        self.Size = Size
+        self.seed = seed
+
+    def chunks(self, chunk_size=1 << 20):
+        generator = random.Random(self.seed)
+        remaining = self.Size
+        while remaining:
+            size = min(remaining, chunk_size)
+            yield generator.getrandbits(size * 8).to_bytes(size, "little")
+            remaining -= size
+
+    def SaveAsFile(self, path):
+        with open(path, "wb") as attachment_file:
+            for chunk in self.chunks():
+                attachment_file.write(chunk)
+
+
+class FakeAttachments:
+    def __init__(self, attachments=None):
+        self._attachments = list(attachments or [])
+
+    def __iter__(self):
+        return iter(list(self._attachments))
+
+    def __len__(self):
+        return len(self._attachments)
+
+    @property
+    def Count(self):
+        return len(self._attachments)
+
+    def Item(self, index):
+        return self._attachments[index - 1]
+
+    def Add(self, attachment):
+        self._attachments.append(attachment)
+        return attachment
+
+
+class FakeItems:
+    def __init__(self, items=None, parent=None):
+        # Insertion-ordered dict so Remove and membership stay O(1)
+        self._items = {}
+        self.Parent = parent
+        # Subscribed through with_events; get ItemAdd, ItemChange, ItemRemove
+        self.handlers = []
+        for item in items or []:
+            self.Add(item)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def Add(self, item):
+        if self.Parent is not None:
+            item.Parent = self.Parent
+        self._items[item] = None
+        for handler in self.handlers:
+            handler.OnItemAdd(item)
+        return item
+
+    def Remove(self, item):
+        del self._items[item]
+        for handler in self.handlers:
+            handler.OnItemRemove()
+
+    def Changed(self, item):
+        """Fire ItemChange, as Outlook does when a property of item is saved"""
+        for handler in self.handlers:
+            handler.OnItemChange(item)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def Restrict(self, filter):
+        predicate = parse_filter(filter)
+        return FakeItems(item for item in self._items if predicate(item))
+
+    def Sort(self, property, descending=False):
+        name = property.strip("[]")
+        ordered = sorted(
+            self._items, key=lambda item: getattr(item, name), reverse=descending
+        )
+        self._items = dict.fromkeys(ordered)
+
+    def Item(self, index):
+        """The item at a 1-based position, as COM collections count"""
+        return next(itertools.islice(self._items, index - 1, None))
+
+
+class FakeColumns:
+    def __init__(self):
+        self.names = []
+
+    def Add(self, name):
+        self.names.append(name)
+
+    def RemoveAll(self):
+        self.names = []
+
+
+class FakeTable:
+    def __init__(self, items):
+        self._items = list(items)
+        self._position = 0
+        self.Columns = FakeColumns()
+
+    @property
+    def EndOfTable(self):
+        return self._position >= len(self._items)
+
+    def GetRowCount(self):
+        return len(self._items)
+
+    def GetArray(self, max_rows):
+        rows = self._items[self._position : self._position + max_rows]
+        self._position += len(rows)
+        return tuple(
+            tuple(
+                getattr(item, COLUMN_ALIASES.get(name, name), None)
+                for name in self.Columns.names
+            )
+            for item in rows
+        )
+
+
+class FakeFolder:
+    def __init__(self, Name, items=None, folders=None):
+        self.Name = Name
+        self.StoreID = ""
+        self.Items = FakeItems(items, parent=self)
+        self.Folders = FakeFolders(folders)
+
+    def __repr__(self):
+        return f"FakeFolder({self.Name!r})"
+
+    def GetTable(self, filter="", table_contents=0):
+        items = self.Items.Restrict(filter) if filter else self.Items
+        return FakeTable(items)
+
+
+class FakeFolders:
+    def __init__(self, folders=None):
+        self._folders = list(folders or [])
+
+    def __iter__(self):
+        return iter(list(self._folders))
+
+    def __len__(self):
+        return len(self._folders)
+
+    def __call__(self, name):
+        for folder in self._folders:
+            if folder.Name.lower() == name.lower():
+                return folder
+        raise KeyError(f"Folder {name!r} not found")
+
+    @property
+    def Count(self):
+        return len(self._folders)
+
+    def Add(self, folder):
+        if isinstance(folder, str):
+            folder = FakeFolder(folder)
+        self._folders.append(folder)
+        return folder
+
+
+class FakeStore:
+    def __init__(self, FilePath, root=None):
+        self.FilePath = FilePath
+        self.StoreID = _next_entry_id()
+        self.DisplayName = os.path.splitext(os.path.basename(FilePath))[0]
+        self._root = root or FakeFolder(self.DisplayName)
+        self._root.StoreID = self.StoreID
+
+    def GetRootFolder(self):
+        return self._root
+
+
+class FakeNamespace:
+    def __init__(self, folders=None):
+        self.Folders = FakeFolders(folders)
+        self.Stores = []
+        self._items_by_id = {}
+
+    def AddStore(self, path):
+        store = FakeStore(path)
+        self.Stores.append(store)
+        self.Folders.Add(store.GetRootFolder())
+
+    def _walk(self, folders):
+        for folder in folders:
+            yield folder
+            yield from self._walk(folder.Folders)
+
+    def GetItemFromID(self, entry_id, store_id=None):
+        item = self._items_by_id.get(entry_id)
+        if item is None or item.Parent is None or item not in item.Parent.Items:
+            # Rebuild the lookup instead of walking every folder per call
+            self._items_by_id = {
+                item.EntryID: item
+                for folder in self._walk(self.Folders)
+                for item in folder.Items
+            }
+            item = self._items_by_id.get(entry_id)
+        if item is None:
+            raise KeyError(f"Item {entry_id!r} not found")
+        return item
+
+
+# HRESULT Outlook answers with while it is too busy to take a call
+RPC_E_CALL_REJECTED = -2147418111
+
+
+class FakeComError(Exception):
+    """Stand-in for pywintypes.com_error; args start with the HRESULT"""
+
+    def __init__(self, hresult, message=""):
+        super().__init__(hresult, message, None, None)
+        self.hresult = hresult
+
+
+class Crash(BaseException):
+    """Injected by SlowProxy to simulate Outlook or the process dying
+
+    A BaseException, so the per-email `except Exception` handlers do not
+    swallow it and the run ends the way a real crash would.
+    """
+
+
+class BusyOutlook:
+    """How busy a fake Outlook is, shared by the SlowProxies of all sessions
+
+    At most capacity round trips are served at once and the rest are
+    rejected with RPC_E_CALL_REJECTED, as Outlook rejects callers queueing
+    on it. For the first busy_seconds of every period seconds Outlook is
+    syncing with Exchange: round trips take spike_latency longer and
+    error_rate of them are rejected too. Rejected round trips still take
+    their latency.
+    """
+
+    def __init__(
+        self,
+        capacity=4,
+        period=2.0,
+        busy_seconds=0.5,
+        spike_latency=0.005,
+        error_rate=0.3,
+        seed=0,
+        clock=time.monotonic,
+    ):
+        self.capacity = capacity
+        self.period = period
+        self.busy_seconds = busy_seconds
+        self.spike_latency = spike_latency
+        self.error_rate = error_rate
+        self.clock = clock
+        self.started = clock()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.round_trips = 0
+        self.rejected = 0
+
+    def is_busy(self):
+        elapsed = self.clock() - self.started
+        return elapsed % self.period < self.busy_seconds
+
+    def round_trip(self, latency):
+        with self._lock:
+            self.in_flight += 1
+            self.round_trips += 1
+            busy = self.is_busy()
+            rejected = self.in_flight > self.capacity or (
+                busy and self._random.random() < self.error_rate
+            )
+        try:
+            time.sleep(latency + (self.spike_latency if busy else 0.0))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.rejected += rejected
+        if rejected:
+            raise FakeComError(RPC_E_CALL_REJECTED, "Call was rejected by callee.")
+
+
+class _SlowIterator:
+    # A class rather than a generator, so a rejected step can be retried
+    # like a COM enumerator's Next without losing or skipping an item
+    _EMPTY = object()
+
+    def __init__(self, proxy, iterator):
+        self.proxy = proxy
+        self.iterator = iterator
+        self.pending = self._EMPTY
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.pending is self._EMPTY:
+            self.pending = next(self.iterator)
+        self.proxy._round_trip("__iter__")
+        value, self.pending = self.pending, self._EMPTY
+        return self.proxy._wrap(value)
+
+
+class SlowProxy:
+    """Wrap a fake object so every attribute read or call costs latency seconds
+
+    Objects reached through the proxy are wrapped too, which makes a fake
+    namespace behave like an out-of-process COM server: the number of round
+    trips, not the work per call, dominates. time.sleep releases the GIL, so
+    parallel sessions overlap the way real RPC waits do. Round trips are
+    tallied by attribute name in calls, a collections.Counter.
+
+    With crash_rate, each round trip raises Crash with that probability,
+    drawn from random (a random.Random), before the call or after a method
+    call already took effect. row_latency adds that many seconds per row a
+    GetArray call returns, the marshalling cost that makes one long table
+    slow to read however few round trips it takes. With error_rate, round
+    trips fail with a FakeComError(RPC_E_CALL_REJECTED) instead, an error
+    the caller is expected to survive. With busy, a BusyOutlook shared by
+    all sessions, round trips take its latency spikes and rejections.
+    """
+
+    def __init__(
+        self,
+        target,
+        latency=0.0,
+        calls=None,
+        crash_rate=0.0,
+        random=None,
+        row_latency=0.0,
+        error_rate=0.0,
+        busy=None,
+    ):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_latency", latency)
+        object.__setattr__(self, "calls", Counter() if calls is None else calls)
+        object.__setattr__(self, "_crash_rate", crash_rate)
+        object.__setattr__(self, "_random", random)
+        object.__setattr__(self, "_row_latency", row_latency)
+        object.__setattr__(self, "_error_rate", error_rate)
+        object.__setattr__(self, "_busy", busy)
+
+    def _wrap(self, value):
+        # Lists stand in for COM collections, so they are wrapped
+        if isinstance(value, PLAIN_TYPES):
+            if self._row_latency and isinstance(value, tuple):
+                time.sleep(self._row_latency * len(value))
+            return value
+        return SlowProxy(
+            value,
+            self._latency,
+            self.calls,
+            self._crash_rate,
+            self._random,
+            self._row_latency,
+            self._error_rate,
+            self._busy,
+        )
+
+    def _maybe_crash(self, name):
+        if self._crash_rate and self._random.random() < self._crash_rate:
+            raise Crash(name)
+
+    def _round_trip(self, name):
+        self.calls[name] += 1
+        if self._busy is not None:
+            self._busy.round_trip(self._latency)
+        elif self._latency:
+            time.sleep(self._latency)
+        self._maybe_crash(name)
+        if self._error_rate and self._random.random() < self._error_rate:
+            raise FakeComError(RPC_E_CALL_REJECTED, "Call was rejected by callee.")
+
+    def __getattr__(self, name):
+        self._round_trip(name)
+        value = getattr(self._target, name)
+        if inspect.isroutine(value):
+
+            def call(*args, **kwargs):
+                args = [unwrap(arg) for arg in args]
+                result = value(*args, **kwargs)
+                self._maybe_crash(name)
+                return self._wrap(result)
+
+            return call
+        return self._wrap(value)
+
+    def __setattr__(self, name, value):
+        self._round_trip(name)
+        setattr(self._target, name, unwrap(value))
+
+    def __call__(self, *args, **kwargs):
+        self._round_trip("__call__")
+        return self._wrap(self._target(*args, **kwargs))
+
+    def __iter__(self):
+        return _SlowIterator(self, iter(self._target))
+
+    def __len__(self):
+        return len(self._target)
+
+
+def with_events(items, handler_class):
+    """Stand-in for win32com.client.WithEvents on a FakeItems collection
+
+    Returns a handler_class instance whose OnItemAdd(item), OnItemChange(item)
+    and OnItemRemove() are called as items are added, changed or removed,
+    until its close() unsubscribes it.
+    """
+    handlers = unwrap(items).handlers
+
+    class Handler(handler_class):
+        def close(self):
+            if self in handlers:
+                handlers.remove(self)
+
+    handler = Handler()
+    handlers.append(handler)
+    return handler
+
+
+def unwrap(value):
+    if isinstance(value, SlowProxy):
+        return object.__getattribute__(value, "_target")
+    return value
@@ -0,0 +1,102 @@
+from array import array
+from hashlib import blake2b
+
+from utils.table import PR_INTERNET_MESSAGE_ID, get_table
+
+# Just what fingerprint_table needs, so a PST can be fingerprinted in bulk
+FINGERPRINT_COLUMNS = (
+    PR_INTERNET_MESSAGE_ID,
+    "Subject",
+    "ReceivedTime",
+    "SenderEmailAddress",
+)
+
+
+def _digest(key):
+    # 64-bit signed so fingerprints fit SQLite INTEGER and array("q")
+    return int.from_bytes(
+        blake2b(key.encode("utf-8", "surrogatepass"), digest_size=8).digest(),
+        "little",
+        signed=True,
+    )
+
+
+def fingerprint(message_id, subject, received_time, sender):
+    """Stable 64-bit identity of an email, independent of the store it is in
+
+    The Internet Message-ID is used when Outlook has one. Drafts and some
+    imported items have none, so those fall back to a hash of their subject,
+    received time and sender. Size is left out: it changes when an email is
+    copied into a PST, so the copy would no longer match its source.
+    """
+    if message_id:
+        return _digest("id:" + message_id.strip().strip("<>").lower())
+
+    received = (
+        received_time.replace(tzinfo=None).isoformat(sep=" ", timespec="seconds")
+        if received_time is not None
+        else ""
+    )
+    return _digest(
+        "\x1f".join(("hash", subject or "", received, (sender or "").lower()))
+    )
+
+
+def fingerprint_row(row):
+    """Fingerprint one MailRow that has FINGERPRINT_COLUMNS"""
+    return fingerprint(
+        row.InternetMessageID,
+        row.Subject,
+        row.ReceivedTime,
+        row.SenderEmailAddress,
+    )
+
+
+def fingerprint_table(table):
+    """Fingerprint every row of a MailTable that has FINGERPRINT_COLUMNS"""
+    return array(
+        "q",
+        map(
+            fingerprint,
+            table.column(PR_INTERNET_MESSAGE_ID),
+            table.column("Subject"),
+            table.column("ReceivedTime"),
+            table.column("SenderEmailAddress"),
+        ),
+    )
+
+
+def folder_fingerprints(folder):
+    """Fingerprints of everything already in folder, from one bulk fetch"""
+    return FingerprintSet(fingerprint_table(get_table(folder, columns=FINGERPRINT_COLUMNS)))
+
+
+class FingerprintSet:
+    """Set of 64-bit fingerprints with a compact serialized form"""
+
+    def __init__(self, fingerprints=()):
+        self._fingerprints = set(fingerprints)
+
+    def __contains__(self, value):
+        return value in self._fingerprints
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def __iter__(self):
+        return iter(self._fingerprints)
+
+    def add(self, value):
+        self._fingerprints.add(value)
+
+    def update(self, values):
+        self._fingerprints.update(values)
+
+    def to_bytes(self):
+        return array("q", sorted(self._fingerprints)).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        fingerprints = array("q")
+        fingerprints.frombytes(data)
+        return cls(fingerprints)
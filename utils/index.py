@@ -0,0 +1,281 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from utils.fingerprint import FingerprintSet
+from utils.query import FLAG_MARKED, build_changed_filter, build_flagged_filter
+from utils.session import normalize_store_path
+from utils.table import MAIL_COLUMNS, MailTable, get_table
+
+# Kept next to config.ini, which is also resolved from the working directory
+INDEX_PATH = "sync_index.db"
+
+# Outlook filters only resolve to the minute, so re-read a little extra
+SYNC_OVERLAP = timedelta(minutes=2)
+
+SYNC_COLUMNS = MAIL_COLUMNS + ("LastModificationTime",)
+
+# Bump when the tables change; everything but fingerprints is a rebuildable cache
+SCHEMA_VERSION = 5
+
+# Fingerprints recorded before this version hashed in Size, which a copy into
+# a PST changes; they are dropped so each store is fingerprinted once again
+FINGERPRINT_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    entry_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    subject TEXT,
+    received_time TEXT NOT NULL,
+    flag_status INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sender TEXT,
+    message_id TEXT,
+    last_modified TEXT,
+    recipients TEXT,
+    categories TEXT,
+    has_attachments INTEGER,
+    PRIMARY KEY (scope, entry_id)
+);
+CREATE INDEX IF NOT EXISTS items_scope ON items (scope, received_time);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    store_path TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    PRIMARY KEY (store_path, fingerprint)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stores (
+    store_path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    scope TEXT PRIMARY KEY,
+    synced_at TEXT NOT NULL
+);
+"""
+
+_DROP_CACHE = """
+DROP TABLE IF EXISTS items;
+DROP TABLE IF EXISTS exports;
+DROP TABLE IF EXISTS watermarks;
+"""
+
+_DROP_FINGERPRINTS = """
+DROP TABLE IF EXISTS fingerprints;
+DROP TABLE IF EXISTS stores;
+"""
+
+
+def _timestamp(value):
+    # COM datetimes carry a tzinfo that does not mean anything; store local time
+    if value is None:
+        return None
+    return value.replace(tzinfo=None).isoformat(sep=" ")
+
+
+def _execute_script(connection, script):
+    # executescript() would commit the open transaction first
+    for statement in script.split(";"):
+        if statement.strip():
+            connection.execute(statement)
+
+
+class SyncIndex:
+    """On-disk record of flagged mail and of what has been exported where
+
+    Items are tracked per scope (a folder and date range). `sync` only asks
+    Outlook for items modified since that scope's last watermark. Deleted
+    items leave no such trace, so it also counts the flagged items in the
+    range, and only when that count differs from the index does it fetch
+    their EntryIDs to find which ones are gone. A deletion hidden by a
+    flagged item moved in unchanged from another folder is only noticed
+    once the counts differ again.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+
+        # One transaction, so a connection opened at the same time, e.g. by
+        # another export thread, never drops tables this one just created
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                _execute_script(self.connection, _DROP_CACHE)
+                if version < FINGERPRINT_VERSION:
+                    _execute_script(self.connection, _DROP_FINGERPRINTS)
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            _execute_script(self.connection, _SCHEMA)
+        except BaseException:
+            self.connection.rollback()
+            self.connection.close()
+            raise
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def scope_for(folder, start, end):
+        folder_path = getattr(folder, "FolderPath", None) or folder.Name
+        return f"{folder_path}|{start.isoformat()}|{end.isoformat()}"
+
+    def watermark(self, scope):
+        row = self.connection.execute(
+            "SELECT synced_at FROM watermarks WHERE scope = ?", (scope,)
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def sync(self, folder, start, end, now=None):
+        """Bring the index for folder/start/end up to date
+
+        Returns a dict with the number of items added or updated, cleared
+        (flag removed) and deleted since the previous sync.
+        """
+        scope = self.scope_for(folder, start, end)
+        since = self.watermark(scope)
+        synced_at = (now or datetime.now()) - SYNC_OVERLAP
+
+        if since is None:
+            changed = get_table(
+                folder, build_flagged_filter(start, end), SYNC_COLUMNS
+            )
+        else:
+            changed = get_table(
+                folder, build_changed_filter(start, end, since), SYNC_COLUMNS
+            )
+
+        updated = 0
+        cleared = 0
+        with self.connection:
+            for row in changed:
+                if row.FlagStatus == FLAG_MARKED:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO items "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            row.EntryID,
+                            scope,
+                            row.Subject,
+                            _timestamp(row.ReceivedTime),
+                            row.FlagStatus,
+                            row.Size,
+                            row.SenderEmailAddress,
+                            row.InternetMessageID,
+                            _timestamp(row.LastModificationTime),
+                            row.To,
+                            row.Categories,
+                            row.HasAttachments,
+                        ),
+                    )
+                    updated += 1
+                else:
+                    cleared += self.connection.execute(
+                        "DELETE FROM items WHERE entry_id = ? AND scope = ?",
+                        (row.EntryID, scope),
+                    ).rowcount
+
+            deleted = 0
+            if since is not None:
+                deleted = self._remove_deleted(folder, scope, start, end)
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?)",
+                (scope, _timestamp(synced_at)),
+            )
+
+        return {"updated": updated, "cleared": cleared, "deleted": deleted}
+
+    def _remove_deleted(self, folder, scope, start, end):
+        """Drop indexed items no longer flagged in folder; returns how many
+
+        Counting the flagged items transfers no rows, so the EntryIDs are
+        only fetched when the count differs from the index's.
+        """
+        filter = build_flagged_filter(start, end)
+        (known_count,) = self.connection.execute(
+            "SELECT COUNT(*) FROM items WHERE scope = ?", (scope,)
+        ).fetchone()
+        if folder.Items.Restrict(filter).Count == known_count:
+            return 0
+
+        flagged_now = set(get_table(folder, filter, ("EntryID",)).column("EntryID"))
+        known = [
+            entry_id
+            for (entry_id,) in self.connection.execute(
+                "SELECT entry_id FROM items WHERE scope = ?", (scope,)
+            )
+        ]
+        deleted = 0
+        for entry_id in known:
+            if entry_id not in flagged_now:
+                self.connection.execute(
+                    "DELETE FROM items WHERE entry_id = ? AND scope = ?",
+                    (entry_id, scope),
+                )
+                deleted += 1
+        return deleted
+
+    def flagged_emails(self, folder, start, end):
+        """Return the indexed flagged mail for a scope as a MailTable"""
+        scope = self.scope_for(folder, start, end)
+        flagged_emails = MailTable()
+        flagged_emails.extend(
+            [
+                (entry_id, subject, datetime.fromisoformat(received), *rest)
+                for entry_id, subject, received, *rest in self.connection.execute(
+                    "SELECT entry_id, subject, received_time, flag_status, size, "
+                    "sender, message_id, recipients, categories, has_attachments "
+                    "FROM items "
+                    "WHERE scope = ? ORDER BY received_time",
+                    (scope,),
+                )
+            ]
+        )
+        return flagged_emails
+
+    def has_store(self, store_path):
+        """Whether the store's fingerprints are known, even if there are none"""
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM stores WHERE store_path = ?",
+                (normalize_store_path(store_path),),
+            ).fetchone()
+            is not None
+        )
+
+    def store_fingerprints(self, store_path):
+        """Fingerprints of every email known to be in the store at store_path"""
+        return FingerprintSet(
+            fingerprint
+            for (fingerprint,) in self.connection.execute(
+                "SELECT fingerprint FROM fingerprints WHERE store_path = ?",
+                (normalize_store_path(store_path),),
+            )
+        )
+
+    def add_fingerprints(self, store_path, fingerprints):
+        """Record fingerprints as in the store, which is then known to the index"""
+        store_path = normalize_store_path(store_path)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO stores VALUES (?)", (store_path,)
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO fingerprints VALUES (?, ?)",
+                ((store_path, fingerprint) for fingerprint in fingerprints),
+            )
+
+    def forget_store(self, store_path):
+        """Drop a store's fingerprints, e.g. after the PST file was deleted"""
+        with self.connection:
+            for table in ("fingerprints", "stores"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE store_path = ?",
+                    (normalize_store_path(store_path),),
+                )
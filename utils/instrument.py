@@ -0,0 +1,225 @@
+"""Opt-in timing of every Outlook round trip.
+
+`Profiler.wrap(namespace)` returns a proxy that counts and times each
+property read and method call made through it, and through every object
+reached from it (folders, tables, items, ...). Reads are recorded under the
+property name ("ReceivedTime", "Stores"), calls with "()" appended
+("Restrict()", "Move()") and each step of iterating a collection with "[]"
+appended ("Stores[]"). Nothing is wrapped unless a Profiler is passed to
+`utils.session.OutlookSession`, so an unprofiled run pays nothing.
+
+The same proxy works over `utils.fake` objects, so round trips can be
+asserted without Outlook:
+
+    profiler = Profiler()
+    session = OutlookSession(lambda: namespace, mailbox, profiler=profiler)
+    ...
+    assert profiler.round_trips() <= 10
+"""
+
+import heapq
+import inspect
+import json
+import threading
+import time
+from datetime import datetime
+
+SLOWEST_KEPT = 5
+
+# COM returns these as values; anything else is an object worth wrapping.
+# Tuples are GetArray results. pywintypes datetimes subclass datetime.
+PLAIN_TYPES = (str, bytes, int, float, bool, type(None), datetime, tuple)
+
+
+class CallStats:
+    __slots__ = ("calls", "seconds", "slowest")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        # Min-heap of the SLOWEST_KEPT longest durations
+        self.slowest = []
+
+    def add(self, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, seconds)
+        elif seconds > self.slowest[0]:
+            heapq.heapreplace(self.slowest, seconds)
+
+
+class Profiler:
+    """Call counts, cumulative and slowest times per Outlook property/method
+
+    Safe to share between the per-thread sessions of an ExportScheduler.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def wrap(self, target, name=""):
+        if isinstance(target, PLAIN_TYPES) or isinstance(target, InstrumentedProxy):
+            return target
+        return InstrumentedProxy(target, self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = CallStats()
+            stats.add(seconds)
+
+    def calls(self, name):
+        stats = self.stats.get(name)
+        return stats.calls if stats is not None else 0
+
+    def round_trips(self):
+        return sum(stats.calls for stats in self.stats.values())
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.started = time.perf_counter()
+
+    def report(self):
+        """Per-name totals, most expensive first"""
+        with self._lock:
+            items = sorted(
+                self.stats.items(), key=lambda item: item[1].seconds, reverse=True
+            )
+            return {
+                "seconds": round(time.perf_counter() - self.started, 3),
+                "round_trips": sum(stats.calls for _, stats in items),
+                "com_seconds": round(sum(stats.seconds for _, stats in items), 6),
+                "calls": {
+                    name: {
+                        "calls": stats.calls,
+                        "seconds": round(stats.seconds, 6),
+                        "mean_ms": round(stats.seconds / stats.calls * 1000, 4),
+                        "slowest_ms": [
+                            round(seconds * 1000, 4)
+                            for seconds in sorted(stats.slowest, reverse=True)
+                        ],
+                    }
+                    for name, stats in items
+                },
+            }
+
+    def format_report(self, limit=20):
+        report = self.report()
+        lines = [
+            f"{report['round_trips']} Outlook calls, {report['com_seconds']:.3f}s "
+            f"of {report['seconds']:.3f}s",
+            f"{'call':<32}{'count':>10}{'total s':>10}{'mean ms':>10}{'max ms':>10}",
+        ]
+        for name, stats in list(report["calls"].items())[:limit]:
+            lines.append(
+                f"{name:<32}{stats['calls']:>10}{stats['seconds']:>10.3f}"
+                f"{stats['mean_ms']:>10.3f}{stats['slowest_ms'][0]:>10.3f}"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write the report to path as JSON"""
+        with open(path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+
+class InstrumentedProxy:
+    """Forwards to an Outlook object, timing each round trip
+
+    name is the property the object was read from, so calling a collection
+    (Folders("Inbox")) is recorded as "Folders()".
+    """
+
+    __slots__ = ("_target", "_profiler", "_name")
+
+    def __init__(self, target, profiler, name=""):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_profiler", profiler)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, name):
+        profiler = self._profiler
+        started = time.perf_counter()
+        try:
+            value = getattr(self._target, name)
+        finally:
+            elapsed = time.perf_counter() - started
+
+        if not inspect.isroutine(value):
+            profiler.record(name, elapsed)
+            return profiler.wrap(value, name)
+
+        call_name = name + "()"
+
+        def call(*args, **kwargs):
+            args = [unwrap(arg) for arg in args]
+            call_started = time.perf_counter()
+            try:
+                result = value(*args, **kwargs)
+            finally:
+                profiler.record(call_name, time.perf_counter() - call_started)
+            return profiler.wrap(result)
+
+        return call
+
+    def __setattr__(self, name, value):
+        started = time.perf_counter()
+        try:
+            setattr(self._target, name, unwrap(value))
+        finally:
+            self._profiler.record(f"{name}=", time.perf_counter() - started)
+
+    def __call__(self, *args, **kwargs):
+        # Collections are called to index them, e.g. Folders("Inbox")
+        started = time.perf_counter()
+        try:
+            result = self._target(*args, **kwargs)
+        finally:
+            self._profiler.record(self._name + "()", time.perf_counter() - started)
+        return self._profiler.wrap(result)
+
+    def __iter__(self):
+        return _InstrumentedIterator(iter(self._target), self._profiler, self._name)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"InstrumentedProxy({self._target!r})"
+
+
+class _InstrumentedIterator:
+    # A class rather than a generator, so a step that raised, e.g. a call
+    # Outlook rejected, can be retried by utils.throttle
+    def __init__(self, iterator, profiler, name):
+        self.iterator = iterator
+        self.profiler = profiler
+        self.name = name + "[]"
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            value = next(self.iterator)
+        finally:
+            self.profiler.record(self.name, time.perf_counter() - started)
+        return self.profiler.wrap(value)
+
+
+def unwrap(value):
+    if isinstance(value, InstrumentedProxy):
+        return object.__getattribute__(value, "_target")
+    return value
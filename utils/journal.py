@@ -0,0 +1,317 @@
+"""Checkpoint journal that makes exports resumable after a crash.
+
+Every email an export intends to copy is written to the journal first, then
+marked in flight while its batch is copied and committed once the copy
+returned, each step in its own SQLite transaction (WAL mode). After Outlook
+hangs or the process dies, the next run
+
+- asks the target about the emails that were in flight, and only those,
+- and continues with the emails still pending,
+
+so neither the destination nor the source has to be rescanned and recovery
+time depends on what is left, not on the size of the export. Committed
+entries are never copied again, so every email lands in the target once.
+"""
+
+import sqlite3
+from datetime import datetime
+
+from utils.fingerprint import fingerprint_row
+from utils.index import INDEX_PATH
+from utils.pipeline import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RETRY_DELAY,
+    CopyTarget,
+    export_rows,
+)
+from utils.query import FLAG_MARKED
+from utils.session import normalize_store_path
+from utils.table import PR_INTERNET_MESSAGE_ID, row_type
+
+PENDING = 0
+IN_FLIGHT = 1
+COMMITTED = 2
+# Planned by an earlier run but no longer in the export's input, e.g. unflagged
+SKIPPED = 3
+
+# Pending entries are read back this many at a time
+PAGE_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    entry_id TEXT NOT NULL,
+    subject TEXT,
+    received_time TEXT,
+    size INTEGER,
+    sender TEXT,
+    message_id TEXT,
+    PRIMARY KEY (job_id, position)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS journal_fingerprint
+    ON journal (job_id, fingerprint);
+CREATE INDEX IF NOT EXISTS journal_state ON journal (job_id, state, position);
+"""
+
+# What the journal keeps of a row: enough to copy and fingerprint it
+_Row = row_type(
+    (
+        "EntryID",
+        "Subject",
+        "ReceivedTime",
+        "FlagStatus",
+        "Size",
+        "SenderEmailAddress",
+        PR_INTERNET_MESSAGE_ID,
+    )
+)
+
+
+class ExportJournal:
+    """Per-job state of each email: pending, in flight, committed or skipped
+
+    A job is one destination, e.g. a PST path; rows are keyed by
+    fingerprint, so planning the same email twice is a no-op.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = FULL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def job_for(store_path):
+        return normalize_store_path(store_path)
+
+    def counts(self, job_id):
+        """{state: number of entries} for a job"""
+        return dict(
+            self.connection.execute(
+                "SELECT state, COUNT(*) FROM journal WHERE job_id = ? GROUP BY state",
+                (job_id,),
+            ).fetchall()
+        )
+
+    def plan(self, job_id, rows, existing_fingerprints):
+        """Journal rows not in existing_fingerprints and not journaled yet
+
+        rows is the export's whole input. Pending entries of an earlier run
+        that are not among rows any more are marked SKIPPED, and skipped
+        entries that are back are pending again. Returns (planned, skipped,
+        dropped) counts; rows still pending from an earlier run are none of
+        those, they are copied as part of the job's pending entries.
+        """
+        (position,) = self.connection.execute(
+            "SELECT COALESCE(MAX(position), -1) FROM journal WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        planned = 0
+        skipped = 0
+        current_fingerprints = set()
+        with self.connection:
+            for row in rows:
+                row_fingerprint = fingerprint_row(row)
+                current_fingerprints.add(row_fingerprint)
+                if row_fingerprint in existing_fingerprints:
+                    skipped += 1
+                    continue
+                position += 1
+                inserted = self.connection.execute(
+                    "INSERT OR IGNORE INTO journal VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        job_id,
+                        position,
+                        row_fingerprint,
+                        PENDING,
+                        row.EntryID,
+                        row.Subject,
+                        row.ReceivedTime.replace(tzinfo=None).isoformat(sep=" "),
+                        row.Size,
+                        row.SenderEmailAddress,
+                        row.InternetMessageID,
+                    ),
+                ).rowcount
+                if not inserted:
+                    inserted = self.connection.execute(
+                        "UPDATE journal SET state = ? "
+                        "WHERE job_id = ? AND fingerprint = ? AND state = ?",
+                        (PENDING, job_id, row_fingerprint, SKIPPED),
+                    ).rowcount
+                planned += inserted
+
+            dropped = [
+                fingerprint
+                for (fingerprint,) in self.connection.execute(
+                    "SELECT fingerprint FROM journal WHERE job_id = ? AND state = ?",
+                    (job_id, PENDING),
+                )
+                if fingerprint not in current_fingerprints
+            ]
+            self.connection.executemany(
+                "UPDATE journal SET state = ? WHERE job_id = ? AND fingerprint = ?",
+                ((SKIPPED, job_id, fingerprint) for fingerprint in dropped),
+            )
+        return planned, skipped, len(dropped)
+
+    def _rows(self, job_id, state, after=-1, limit=None):
+        query = (
+            "SELECT position, entry_id, subject, received_time, size, sender, "
+            "message_id FROM journal WHERE job_id = ? AND state = ? AND position > ? "
+            "ORDER BY position"
+        )
+        parameters = (job_id, state, after)
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters += (limit,)
+        return [
+            (
+                position,
+                _Row(
+                    entry_id,
+                    subject,
+                    datetime.fromisoformat(received),
+                    FLAG_MARKED,
+                    size,
+                    sender,
+                    message_id,
+                ),
+            )
+            for position, entry_id, subject, received, size, sender, message_id in (
+                self.connection.execute(query, parameters)
+            )
+        ]
+
+    def pending(self, job_id):
+        """Yield the job's pending rows in planned order, a page at a time"""
+        after = -1
+        while True:
+            page = self._rows(job_id, PENDING, after, PAGE_SIZE)
+            if not page:
+                return
+            for position, row in page:
+                yield row
+            after = page[-1][0]
+
+    def mark(self, job_id, rows, state):
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE journal SET state = ? WHERE job_id = ? AND fingerprint = ?",
+                ((state, job_id, fingerprint_row(row)) for row in rows),
+            )
+
+    def recover(self, job_id, target):
+        """Settle entries left in flight by a crash; returns the committed rows"""
+        in_flight = [row for _, row in self._rows(job_id, IN_FLIGHT)]
+        if not in_flight:
+            return []
+        found = target.find(in_flight)
+        committed = [row for row in in_flight if fingerprint_row(row) in found]
+        self.mark(job_id, committed, COMMITTED)
+        self.mark(
+            job_id,
+            [row for row in in_flight if fingerprint_row(row) not in found],
+            PENDING,
+        )
+        return committed
+
+    def forget(self, job_id):
+        """Drop a job, e.g. after its PST file was deleted"""
+        with self.connection:
+            self.connection.execute("DELETE FROM journal WHERE job_id = ?", (job_id,))
+
+
+class JournaledTarget(CopyTarget):
+    """Wraps a CopyTarget so each batch is checkpointed around the copy"""
+
+    def __init__(self, target, journal, job_id):
+        self.target = target
+        self.journal = journal
+        self.job_id = job_id
+        self.name = target.name
+
+    def copy_batch(self, rows):
+        self.journal.mark(self.job_id, rows, IN_FLIGHT)
+        failed = self.target.copy_batch(rows)
+        failed_rows = {id(row) for row, _ in failed}
+        self.journal.mark(
+            self.job_id, [row for row in rows if id(row) not in failed_rows], COMMITTED
+        )
+        # Failures are retried by the pipeline, or by the next run
+        self.journal.mark(self.job_id, [row for row, _ in failed], PENDING)
+        return failed
+
+    def fingerprints(self):
+        return self.target.fingerprints()
+
+    def find(self, rows):
+        return self.target.find(rows)
+
+    def close(self):
+        self.target.close()
+
+
+def export_with_journal(
+    journal,
+    job_id,
+    flagged_emails,
+    target,
+    existing_fingerprints,
+    record=None,
+    progress=None,
+    cancelled=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_retries=DEFAULT_MAX_RETRIES,
+    throttle=None,
+    retry_delay=DEFAULT_RETRY_DELAY,
+):
+    """export_rows with a checkpoint journal; resumes an interrupted job first
+
+    Arguments and the summary dict are those of export_rows; the summary
+    also counts the in-flight emails found committed ("recovered"), the
+    emails left over from an earlier run ("resumed") and those left over
+    but no longer in flagged_emails, which are not copied ("dropped").
+    """
+    recovered = journal.recover(job_id, target)
+    if recovered and record is not None:
+        record([fingerprint_row(row) for row in recovered])
+    left_over = journal.counts(job_id).get(PENDING, 0)
+
+    planned, skipped, dropped = journal.plan(
+        job_id, flagged_emails, existing_fingerprints
+    )
+
+    summary = export_rows(
+        journal.pending(job_id),
+        JournaledTarget(target, journal, job_id),
+        existing_fingerprints,
+        record=record,
+        progress=progress,
+        cancelled=cancelled,
+        batch_size=batch_size,
+        max_retries=max_retries,
+        throttle=throttle,
+        retry_delay=retry_delay,
+    )
+    summary["total"] = summary["total"] + skipped
+    summary["skipped"] += skipped
+    summary["recovered"] = len(recovered)
+    summary["resumed"] = left_over - dropped
+    summary["dropped"] = dropped
+    summary["pending"] = journal.counts(job_id).get(PENDING, 0)
+    return summary
@@ -0,0 +1,104 @@
+"""MIME copies of Outlook mail items, for archives written without Outlook.
+
+`message_from_item` turns a MailItem (or anything shaped like one, such as
+a `utils.fake.FakeMailItem`) into an `email.message.EmailMessage` with its
+recipients, bodies and attachments; `message_fingerprint` fingerprints a
+MIME message the way `utils.fingerprint.fingerprint_row` does a table row.
+"""
+
+import mimetypes
+import os
+import tempfile
+from email.message import EmailMessage, Message
+from email.utils import format_datetime, formataddr, parseaddr, parsedate_to_datetime
+
+from utils.attachments import OL_BY_REFERENCE
+from utils.fingerprint import fingerprint
+
+# OlMailRecipientType values of To and Cc recipients
+OL_TO = 1
+OL_CC = 2
+
+
+def _recipients(item, recipient_type):
+    """Addresses of one type of recipient, as a To or Cc header value"""
+    recipients = getattr(item, "Recipients", None)
+    if recipients is None:
+        # Only the display names Outlook joins with "; "
+        names = getattr(item, "To" if recipient_type == OL_TO else "CC", "") or ""
+        return ", ".join(name.strip() for name in names.split(";") if name.strip())
+    return ", ".join(
+        formataddr((recipient.Name or "", recipient.Address or ""))
+        for recipient in recipients
+        if recipient.Type == recipient_type
+    )
+
+
+def _add_attachments(message, item):
+    attachments = [
+        attachment
+        for attachment in getattr(item, "Attachments", ())
+        if attachment.Type != OL_BY_REFERENCE
+    ]
+    if not attachments:
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        for number, attachment in enumerate(attachments):
+            # SaveAsFile is the only way to get at an attachment's content
+            path = os.path.join(directory, str(number))
+            attachment.SaveAsFile(path)
+            with open(path, "rb") as attachment_file:
+                data = attachment_file.read()
+            content_type, _ = mimetypes.guess_type(attachment.FileName or "")
+            maintype, _, subtype = (
+                content_type or "application/octet-stream"
+            ).partition("/")
+            message.add_attachment(
+                data, maintype, subtype, filename=attachment.FileName or None
+            )
+
+
+def message_from_item(item):
+    """Build a MIME message from a MailItem
+
+    Keeps the subject, sender, To and Cc recipients, date, Message-ID, the
+    plain-text and HTML bodies and every attachment with content.
+    """
+    if isinstance(item, Message):
+        # Backends that already hold MIME, e.g. utils.backend.LocalBackend
+        return item
+    message = EmailMessage()
+    message["Subject"] = item.Subject or ""
+    message["From"] = getattr(item, "SenderEmailAddress", "") or ""
+    for header, recipient_type in (("To", OL_TO), ("Cc", OL_CC)):
+        addresses = _recipients(item, recipient_type)
+        if addresses:
+            message[header] = addresses
+    if getattr(item, "ReceivedTime", None) is not None:
+        message["Date"] = format_datetime(item.ReceivedTime)
+    if getattr(item, "InternetMessageID", None):
+        message["Message-ID"] = item.InternetMessageID
+    message.set_content(getattr(item, "Body", "") or "")
+    html_body = getattr(item, "HTMLBody", "") or ""
+    if html_body:
+        message.add_alternative(html_body, subtype="html")
+    _add_attachments(message, item)
+    return message
+
+
+def message_fingerprint(message):
+    """Fingerprint a MIME message the way fingerprint_row does a table row"""
+    try:
+        received_time = parsedate_to_datetime(message["Date"])
+    except (TypeError, ValueError):
+        received_time = None
+    if received_time is not None and received_time.tzinfo is not None:
+        received_time = received_time.astimezone().replace(tzinfo=None)
+    # The bare address, as rows get it from SenderEmailAddress
+    sender = str(message["From"] or "")
+    return fingerprint(
+        message["Message-ID"],
+        str(message["Subject"] or ""),
+        received_time,
+        parseaddr(sender)[1] or sender,
+    )
@@ -1,26 +1,75 @@
-import win32com.client
 from datetime import date
-import calendar
 import os
-from utils import get_config
-
-outlook = None
-emails = None
-main_folder = None
-inbox = None
-
-
-def is_outlook_installed():
-    global outlook, main_folder, inbox, emails
-    primary_email = get_config("Email", "primary_email")
+import time
+from itertools import islice
+from utils.archive import ARCHIVE_SUFFIX, ArchiveTarget, MailArchive
+from utils.attachments import AttachmentStore, extract_attachments
+from utils.config import get_config
+from utils.query import build_flagged_filter, default_month_range
+from utils.search import IndexingTarget, ItemCache
+from utils.fingerprint import (
+    FingerprintSet,
+    fingerprint_row,
+    fingerprint_table,
+    folder_fingerprints,
+)
+from utils.instrument import Profiler
+from utils.journal import export_with_journal
+from utils.partition import DEFAULT_SCAN_WORKERS, PartitionedScan
+from utils.pipeline import DEFAULT_BATCH_SIZE, PstTarget, export_rows
+from utils.report import REPORT_COLUMNS, build_report, domain_of, write_report
+from utils.session import OutlookSession, connect_outlook
+from utils.table import (
+    FETCH_BATCH_SIZE,
+    MailTable,
+    get_table,
+    iter_table,
+)
+from utils.throttle import Throttle
+from utils.watch import FlagWatcher
+
+# Shared by the GUI and CLI and reused across exports; set by is_outlook_installed
+session = None
+
+# Set by enable_profiling; the session is instrumented when it is created
+profiler = None
+
+# Paces every Outlook call of the session and of the parallel sessions
+# started from it, so they all back off together while Outlook is busy
+throttle = Throttle()
+
+
+def enable_profiling():
+    """Time every Outlook call from now on and return the Profiler"""
+    global profiler
+    if profiler is None:
+        profiler = Profiler()
+        if session is not None:
+            session.profiler = profiler
+            session.reconnect()
+    return profiler
+
+
+def get_session():
+    if session is None:
+        raise RuntimeError("Not connected to Outlook, call is_outlook_installed first")
+    return session
+
+
+def is_outlook_installed(primary_email=None):
+    global session
+    if primary_email is None:
+        primary_email = get_config("Email", "primary_email")
     try:
-        outlook = win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+        if session is None:
+            session = OutlookSession(
+                connect_outlook, profiler=profiler, throttle=throttle
+            )
 
-        main_folder = outlook.Folders(primary_email)
+        session.mailbox = primary_email
 
-        inbox = main_folder.Folders("Inbox")
-
-        emails = inbox.Items
+        # Resolves (and caches) the mailbox and its Inbox
+        session.inbox
 
         return True
     except Exception as e:
@@ -28,108 +77,469 @@ def is_outlook_installed():
         return False
 
 
-def get_flagged_emails_in_month(start: date = None, end: date = None):
-    global emails
-
-    restricted_emails = (
-        emails
-        if start is None and end is None
-        else emails.Restrict(
-            "[ReceivedTime] >= '"
-            + start.strftime("%m/%d/%Y")
-            + "' AND [ReceivedTime] <= '"
-            + end.strftime("%m/%d/%Y")
-            + "'"
+def _in_folder(folder, function):
+    """Run function(folder), defaulting to the session's Inbox
+
+    Without an explicit folder the call goes through the session, so a
+    dropped Outlook connection is re-established and the call retried.
+    """
+    if folder is not None:
+        return function(folder)
+    current_session = get_session()
+    return current_session.call(lambda: function(current_session.inbox))
+
+
+class ScanStats:
+    """How far a streaming scan has got, filled in while it is consumed"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_item_seconds = None
+        self.count = 0
+        self.seconds = None
+
+    def as_dict(self):
+        return {
+            "scanned": self.count,
+            "first_item_seconds": self.first_item_seconds,
+            "scan_seconds": self.seconds,
+        }
+
+
+def iter_flagged_emails(
+    start: date = None,
+    end: date = None,
+    senders=None,
+    categories=None,
+    folder=None,
+    stats=None,
+):
+    """Yield flagged emails as lightweight MailRows while Outlook finds them
+
+    Rows arrive a GetArray batch at a time, so memory stays at one batch and
+    the first row is available long before a year-long scan completes; pass
+    the generator straight to export_flagged_emails_to_pst to copy while
+    scanning. stats, a ScanStats, records the first-item latency.
+    """
+    start_of_month, end_of_month = default_month_range(start, end)
+    if folder is None:
+        folder = get_session().inbox
+    if stats is None:
+        stats = ScanStats()
+
+    for row in iter_table(
+        folder, build_flagged_filter(start_of_month, end_of_month, senders, categories)
+    ):
+        if stats.first_item_seconds is None:
+            stats.first_item_seconds = time.perf_counter() - stats.started
+        stats.count += 1
+        yield row
+
+    stats.seconds = time.perf_counter() - stats.started
+
+
+def get_flagged_emails_in_month(
+    start: date = None, end: date = None, senders=None, categories=None, folder=None
+):
+    # Any Outlook-style folder works here, e.g. utils.fake.FakeFolder
+    start_of_month, end_of_month = default_month_range(start, end)
+
+    # Flag, date and sender/category checks all happen inside Outlook, and the
+    # matching rows come back as columns instead of live MailItem proxies
+    def collect(folder):
+        flagged_emails = MailTable()
+        rows = iter_flagged_emails(
+            start_of_month, end_of_month, senders, categories, folder
         )
-    )
+        for batch in iter(lambda: list(islice(rows, FETCH_BATCH_SIZE)), []):
+            flagged_emails.extend(batch)
+        return flagged_emails
 
-    # Use provided dates or default to current month
-    if start is None:
-        start_of_month = date.today().replace(day=1)
-    else:
-        start_of_month = start
+    flagged_emails_in_month = _in_folder(folder, collect)
 
-    if end is None:
-        _, num_days = calendar.monthrange(date.today().year, date.today().month)
-        end_of_month = date.today().replace(day=num_days)
-    else:
-        end_of_month = end
-
-    flagged_emails_in_month = []
-
-    timeframe_start = start_of_month
-    timeframe_end = end_of_month
-
-    for email in restricted_emails:
-        try:
-            received_date = email.ReceivedTime.date()
-            if (
-                received_date >= timeframe_start
-                and received_date <= timeframe_end
-                and email.FlagStatus == 2
-            ):
-                flagged_emails_in_month.append(email)
-        except Exception as e:
-            print(f"Error: {e}")
-            continue
+    return flagged_emails_in_month, start_of_month, end_of_month
+
+
+def scan_flagged_emails_in_partitions(
+    start: date = None,
+    end: date = None,
+    max_workers=DEFAULT_SCAN_WORKERS,
+    senders=None,
+    categories=None,
+):
+    """Like get_flagged_emails_in_month for long ranges such as a quarter
+
+    The session's Inbox is read as date partitions on max_workers Outlook
+    sessions at once (see utils.partition). Returns the MailTable, the
+    bounds and the scan summary, which lists every partition.
+    """
+    start_of_month, end_of_month = default_month_range(start, end)
+    current_session = get_session()
+    flagged_emails, summary = PartitionedScan(
+        current_session.connect,
+        f"{current_session.mailbox}/Inbox",
+        max_workers,
+        profiler=profiler,
+        throttle=throttle,
+    ).scan(start_of_month, end_of_month, senders, categories)
+    return flagged_emails, start_of_month, end_of_month, summary
+
+
+def sync_flagged_emails_in_month(
+    index, start: date = None, end: date = None, folder=None
+):
+    """Like get_flagged_emails_in_month, but only re-reads mail changed since
+    the last sync recorded in index (a utils.index.SyncIndex)"""
+    start_of_month, end_of_month = default_month_range(start, end)
+
+    def sync(folder):
+        index.sync(folder, start_of_month, end_of_month)
+        return index.flagged_emails(folder, start_of_month, end_of_month)
+
+    flagged_emails_in_month = _in_folder(folder, sync)
 
     return flagged_emails_in_month, start_of_month, end_of_month
 
 
-def _does_store_exist(store_path):
-    for store in outlook.Stores:
-        if store.FilePath.lower() == store_path.lower():
-            return True
-    return False
+def watch_flagged_emails(flagged_emails, start, end, folder=None, **options):
+    """A started FlagWatcher keeping flagged_emails, a scan of start-end,
+    current from the Items events of folder (default: the session's Inbox)
 
+    Pass scanned_at, when the scan started, in options so changes made
+    while it ran are caught up on.
 
-def get_flagged_emails_in_month_pst(start_of_month, end_of_month):
-    flagged_emails_folder_name = f"Flagged Emails {start_of_month.strftime("%m-%d-%y")} - {end_of_month.strftime("%m-%d-%y")}"
+    Must be called, and the watcher driven, on the thread that talks to
+    Outlook, e.g. through OutlookWorker.every.
+    """
+    if folder is None:
+        folder = get_session().inbox
+    return FlagWatcher(folder, start, end, flagged_emails, **options).start()
 
-    path_from_config = get_config("Folder", "output_folder")
-    parsed_path = path_from_config.rstrip("/")
 
-    billing_path = os.path.join(parsed_path, flagged_emails_folder_name) + ".pst"
+def resolve_email(entry_id):
+    """Open the full MailItem for a row, only when it is actually needed"""
+    return get_session().get_item(entry_id)
 
-    # Only create the folder if it doesn't exist
-    if not _does_store_exist(billing_path):
-        outlook.AddStore(billing_path)
-    else:
-        print(f"Folder {flagged_emails_folder_name} already exists")
 
-    # Get the store with the path
-    flagged_emails_store = None
+def get_store_fingerprints(index, billing_path, flagged_emails_root, is_new_store):
+    """Fingerprints of emails already in the PST at billing_path
+
+    Stores known to the index are answered from it; a PST the index has not
+    seen yet is fingerprinted once in bulk and remembered from then on.
+    """
+    if is_new_store:
+        # The PST was deleted or never existed; old fingerprints are stale
+        index.forget_store(billing_path)
+        index.add_fingerprints(billing_path, ())
+        return FingerprintSet()
+
+    if index.has_store(billing_path):
+        return index.store_fingerprints(billing_path)
+
+    existing_fingerprints = folder_fingerprints(flagged_emails_root)
+    index.add_fingerprints(billing_path, existing_fingerprints)
+    return existing_fingerprints
+
+
+def get_flagged_emails_pst_path(start_of_month, end_of_month, output_folder=None):
+    flagged_emails_folder_name = f"Flagged Emails {start_of_month.strftime('%m-%d-%y')} - {end_of_month.strftime('%m-%d-%y')}"
+
+    if output_folder is None:
+        output_folder = get_config("Folder", "output_folder")
+    parsed_path = output_folder.rstrip("/")
+
+    return os.path.join(parsed_path, flagged_emails_folder_name) + ".pst"
 
-    for store in outlook.Stores:
-        # Normalize paths to handle different separators
-        normalized_store_path = os.path.normpath(store.FilePath).lower()
-        normalized_billing_path = os.path.normpath(billing_path).lower()
-        if normalized_store_path == normalized_billing_path:
-            flagged_emails_store = store
 
-    return flagged_emails_store.GetRootFolder()
+def open_pst(billing_path, outlook_session=None):
+    """Add the PST at billing_path to the session if needed, return its root"""
+    if outlook_session is None:
+        outlook_session = get_session()
+    return outlook_session.open_pst(billing_path)
 
 
-def copy_flagged_emails_to_pst(flagged_emails_in_month):
-    flagged_emails_root = get_flagged_emails_in_month_pst()
+def get_flagged_emails_in_month_pst(start_of_month, end_of_month, output_folder=None):
+    billing_path = get_flagged_emails_pst_path(
+        start_of_month, end_of_month, output_folder
+    )
+    return open_pst(billing_path)
+
+
+def export_flagged_emails_to_pst(
+    index,
+    flagged_emails_in_month,
+    start_of_month,
+    end_of_month,
+    progress=None,
+    cancelled=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    output_folder=None,
+    journal=None,
+    search_index=None,
+):
+    """Copy flagged emails into the month's PST, skipping ones already there
+
+    flagged_emails_in_month is a MailTable or a generator such as
+    iter_flagged_emails. Emails are copied in batches of batch_size;
+    progress(position, total, subject, stats) is called after each batch and
+    cancelled() is checked before each one. With journal, a
+    utils.journal.ExportJournal, every batch is checkpointed and an export
+    that crashed or was cancelled resumes where it stopped. With
+    search_index, a utils.search.SearchIndex, every email copied is indexed
+    for full-text search. Returns a summary dict.
+    """
+    billing_path = get_flagged_emails_pst_path(
+        start_of_month, end_of_month, output_folder
+    )
+    is_new_store = not os.path.exists(billing_path)
+
+    # Get the flagged emails PST folder
+    flagged_emails_root = get_flagged_emails_in_month_pst(
+        start_of_month, end_of_month, output_folder
+    )
+
+    # Change name
+    flagged_emails_root.Name = f"Flagged Emails {start_of_month.strftime('%m-%d-%y')} - {end_of_month.strftime('%m-%d-%y')}.pst"
+
+    # Get existing emails from the sync index, or fingerprint PSTs it has not
+    # seen yet
+    existing_emails_in_store = get_store_fingerprints(
+        index, billing_path, flagged_emails_root, is_new_store
+    )
+
+    def record(fingerprints):
+        # Committed batches are recorded right away, so a failed export is
+        # not redone
+        index.add_fingerprints(billing_path, fingerprints)
+
+    resolve = _resolver(search_index)
+    summary = _export_to_target(
+        PstTarget(flagged_emails_root, resolve),
+        billing_path,
+        is_new_store,
+        flagged_emails_in_month,
+        existing_emails_in_store,
+        record,
+        progress,
+        cancelled,
+        batch_size,
+        journal,
+        search_index,
+        resolve,
+    )
+    summary["pst"] = flagged_emails_root.Name
+    summary["path"] = billing_path
+    return summary
+
+
+def _resolver(search_index):
+    # Indexing reads the items the export opens, so they are kept per batch
+    return resolve_email if search_index is None else ItemCache(resolve_email)
+
+
+def _export_to_target(
+    target,
+    store_path,
+    is_new_store,
+    flagged_emails,
+    existing_fingerprints,
+    record,
+    progress,
+    cancelled,
+    batch_size,
+    journal,
+    search_index,
+    items,
+):
+    if search_index is not None:
+        target = IndexingTarget(target, search_index, store_path, items)
+    if journal is None:
+        summary = export_rows(
+            flagged_emails,
+            target,
+            existing_fingerprints,
+            record=record,
+            progress=progress,
+            cancelled=cancelled,
+            batch_size=batch_size,
+            throttle=throttle,
+        )
+    else:
+        job_id = journal.job_for(store_path)
+        if is_new_store:
+            journal.forget(job_id)
+        summary = export_with_journal(
+            journal,
+            job_id,
+            flagged_emails,
+            target,
+            existing_fingerprints,
+            record=record,
+            progress=progress,
+            cancelled=cancelled,
+            batch_size=batch_size,
+            throttle=throttle,
+        )
+    if search_index is not None:
+        # Emails copied while the index failed get one more try; any still
+        # missing can be added later with `python -m utils search --add`
+        summary["unindexed"] = target.reindex()
+    return summary
+
+
+def get_flagged_emails_archive_path(start_of_month, end_of_month, output_folder=None):
+    pst_path = get_flagged_emails_pst_path(start_of_month, end_of_month, output_folder)
+    return os.path.splitext(pst_path)[0] + ARCHIVE_SUFFIX
+
+
+def export_flagged_emails_to_archive(
+    flagged_emails_in_month,
+    start_of_month,
+    end_of_month,
+    progress=None,
+    cancelled=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    output_folder=None,
+    journal=None,
+    search_index=None,
+):
+    """Like export_flagged_emails_to_pst, into the month's compressed archive
+
+    The archive (utils.archive.MailArchive) keeps its own index of what it
+    holds, so neither a PST nor the sync index is involved. Returns a
+    summary dict.
+    """
+    archive_path = get_flagged_emails_archive_path(
+        start_of_month, end_of_month, output_folder
+    )
+    is_new_store = not os.path.exists(archive_path)
+    resolve = _resolver(search_index)
+    target = ArchiveTarget(MailArchive(archive_path), resolve)
+    try:
+        summary = _export_to_target(
+            target,
+            archive_path,
+            is_new_store,
+            flagged_emails_in_month,
+            target.fingerprints(),
+            None,
+            progress,
+            cancelled,
+            batch_size,
+            journal,
+            search_index,
+            resolve,
+        )
+    finally:
+        target.close()
+    summary["archive"] = os.path.basename(archive_path)
+    summary["path"] = archive_path
+    return summary
+
+
+def index_pst(search_index, store_path):
+    """Add every email in the PST at store_path to search_index, e.g. one
+    exported before the index existed; returns how many were added"""
+    root = open_pst(store_path)
+    current_session = get_session()
+    added = 0
+    for row in iter_table(root):
+        if search_index.contains(fingerprint_row(row)):
+            continue
+        item = current_session.get_item(row.EntryID, root.StoreID)
+        added += search_index.add_row(row, item, store_path)
+    search_index.commit()
+    return added
+
+
+def write_flagged_emails_report(
+    store_path,
+    start: date = None,
+    end: date = None,
+    firm_domain=None,
+    folder=None,
+    flagged_emails=None,
+):
+    """Write billing summaries of the month's flagged mail next to store_path
+
+    flagged_emails is the MailTable the export was given, whose scan already
+    carries sender, recipients, received time, categories and size; without
+    it they come from one bulk GetTable pass. See utils.report. firm_domain
+    defaults to the session mailbox's domain. Returns the paths written.
+    """
+    start_of_month, end_of_month = default_month_range(start, end)
+
+    def fetch(folder):
+        return get_table(
+            folder, build_flagged_filter(start_of_month, end_of_month), REPORT_COLUMNS
+        )
+
+    table = flagged_emails
+    if table is None:
+        table = _in_folder(folder, fetch)
+    if firm_domain is None and session is not None and session.mailbox:
+        firm_domain = domain_of(session.mailbox)
+    report = build_report(table, firm_domain)
+    return write_report(report, os.path.splitext(store_path)[0])
+
+
+def get_flagged_emails_attachments_path(store_path):
+    return os.path.splitext(store_path)[0] + " attachments"
+
+
+def export_flagged_attachments(
+    store_path,
+    start: date = None,
+    end: date = None,
+    progress=None,
+    cancelled=None,
+    folder=None,
+    resolve=None,
+    flagged_emails=None,
+):
+    """Save the attachments of the month's flagged mail next to store_path
+
+    Into a folder of blobs named by SHA-256 plus a manifest, see
+    utils.attachments. flagged_emails is the MailTable the export was
+    given; its scan says which emails have attachments, so only those are
+    opened. Without it the month is fetched in one bulk GetTable pass.
+    Emails saved by an earlier run are skipped. resolve opens an email by
+    EntryID and defaults to resolve_email. Returns a summary dict.
+    """
+    start_of_month, end_of_month = default_month_range(start, end)
+
+    def fetch(folder):
+        return get_table(folder, build_flagged_filter(start_of_month, end_of_month))
+
+    if flagged_emails is None:
+        flagged_emails = _in_folder(folder, fetch)
+    rows = [row for row in flagged_emails if row.HasAttachments]
+    attachments_path = get_flagged_emails_attachments_path(store_path)
+    with AttachmentStore(attachments_path) as store:
+        summary = extract_attachments(
+            rows, resolve or resolve_email, store, progress, cancelled
+        )
+    summary["path"] = attachments_path
+    return summary
+
 
-    existing_emails_in_store = set()
+def copy_flagged_emails_to_pst(flagged_emails_in_month, start_of_month, end_of_month):
+    flagged_emails_root = get_flagged_emails_in_month_pst(start_of_month, end_of_month)
 
-    for email in flagged_emails_root.Items:
-        # Create a unique identifier using Subject and ReceivedTime for more reliable duplicate detection
-        email_id = f"{email.Subject}_{email.ReceivedTime.strftime('%Y-%m-%d %H:%M:%S')}"
-        existing_emails_in_store.add(email_id)
+    existing_emails_in_store = folder_fingerprints(flagged_emails_root)
 
     copy_count = 0
 
-    for flagged_email in flagged_emails_in_month:
-        flagged_email_id = f"{flagged_email.Subject}_{flagged_email.ReceivedTime.strftime('%Y-%m-%d %H:%M:%S')}"
-        if flagged_email_id in existing_emails_in_store:
+    for flagged_email, flagged_fingerprint in zip(
+        flagged_emails_in_month, fingerprint_table(flagged_emails_in_month)
+    ):
+        if flagged_fingerprint in existing_emails_in_store:
             print(f"Skipping {flagged_email.Subject}: Already exists!")
             continue
 
         print(f"Copying {flagged_email.Subject} to {flagged_emails_root.Name}")
-        flagged_email.Copy().Move(flagged_emails_root)
+        resolve_email(flagged_email.EntryID).Copy().Move(flagged_emails_root)
+        existing_emails_in_store.add(flagged_fingerprint)
         copy_count += 1
 
     print(f"Copied {copy_count} emails to {flagged_emails_root.Name}")
@@ -0,0 +1,236 @@
+"""Scan a long date range as day partitions read on parallel Outlook sessions.
+
+One Restrict over a quarter or a year is read through a single table cursor,
+and Outlook hands its rows over one GetArray batch at a time, so the scan
+takes as long as marshalling every row in turn. `PartitionedScan` instead
+samples where the flagged mail falls in the range (a sorted Restrict and a
+few single-item reads), cuts the range into runs of whole days holding
+about the same number of emails, and reads the runs on max_workers sessions
+at once. Runs are disjoint, so the merged result is every row exactly once,
+in ReceivedTime order; a run that fails is read again on its own.
+
+    scan = PartitionedScan(connect_outlook, "partner@radlawgroup.com/Inbox", 4)
+    flagged_emails, summary = scan.scan(date(2026, 1, 1), date(2026, 12, 31))
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from operator import attrgetter
+
+from utils.query import build_flagged_filter, default_month_range
+from utils.session import ThreadSessions
+from utils.table import MAIL_COLUMNS, MailTable, get_table
+
+DEFAULT_SCAN_WORKERS = 4
+
+# Smaller partitions cost more in per-table round trips than they save
+MIN_PARTITION_SIZE = 1000
+
+# Times a failed partition is read again before the scan gives up
+PARTITION_RETRIES = 3
+
+# start and end are inclusive dates; estimate is the expected email count
+Partition = namedtuple("Partition", ["start", "end", "estimate"])
+
+
+def sample_received_times(
+    folder, start, end, samples, senders=None, categories=None
+):
+    """(count, ReceivedTimes) of the flagged mail in start..end
+
+    The times are those of the emails at samples evenly spaced positions of
+    the mail sorted by ReceivedTime, the quantiles of the range, read one
+    item each from a sorted Restrict rather than by reading all the mail.
+    """
+    items = folder.Items.Restrict(
+        build_flagged_filter(start, end, senders, categories)
+    )
+    items.Sort("[ReceivedTime]")
+    count = items.Count
+    if not count:
+        return 0, []
+    return count, [
+        items.Item(1 + count * number // (samples + 1)).ReceivedTime
+        for number in range(1, samples + 1)
+    ]
+
+
+def plan_partitions(
+    start, end, count, received_times, min_size=MIN_PARTITION_SIZE
+):
+    """Cut start..end into Partitions holding about equal numbers of emails
+
+    received_times are sample_received_times quantiles, and every partition
+    but the first starts on the day of one of them, so partitions are runs
+    of whole days that together cover start..end: mail that arrives after
+    sampling is still scanned. A day holding more than a partition's share
+    of the mail is a partition of its own.
+    """
+    samples = len(received_times)
+    partition_count = max(1, min(samples + 1, count // min_size))
+    first_days = [start]
+    # Share of the mail received before each partition's first day
+    shares = [0.0]
+    for number in range(1, partition_count):
+        day = received_times[number * (samples + 1) // partition_count - 1].date()
+        if first_days[-1] < day <= end:
+            first_days.append(day)
+            shares.append(number / partition_count)
+    last_days = [day - timedelta(days=1) for day in first_days[1:]] + [end]
+    shares.append(1.0)
+    return [
+        Partition(first, last, round(count * (share_after - share_before)))
+        for first, last, share_before, share_after in zip(
+            first_days, last_days, shares, shares[1:]
+        )
+    ]
+
+
+class PartitionedScan:
+    """Read the flagged mail of one folder in date partitions, concurrently
+
+    Like ExportScheduler, every pool thread opens its own OutlookSession
+    through connect() and finds the folder by path ("mailbox/Inbox"). Each
+    partition is an independent Restrict, so a partition whose read fails
+    is simply submitted again, up to retries times, after its session
+    forgets its cached folder handles. A throttle (utils.throttle.Throttle)
+    is shared by all sessions, so they back off together. No partition is
+    planned smaller than min_partition_size emails.
+    """
+
+    def __init__(
+        self,
+        connect,
+        folder_path,
+        max_workers=DEFAULT_SCAN_WORKERS,
+        retries=PARTITION_RETRIES,
+        profiler=None,
+        throttle=None,
+        min_partition_size=MIN_PARTITION_SIZE,
+    ):
+        self.connect = connect
+        self.folder_path = folder_path
+        self.max_workers = max(1, max_workers)
+        self.retries = retries
+        self.profiler = profiler
+        self.throttle = throttle
+        self.min_partition_size = max(1, min_partition_size)
+        self._sessions = ThreadSessions(connect, profiler=profiler, throttle=throttle)
+
+    def session(self):
+        """The calling thread's OutlookSession"""
+        return self._sessions.get()
+
+    def plan(self, start, end, senders=None, categories=None):
+        outlook_session = self.session()
+        count, received_times = outlook_session.call(
+            lambda: sample_received_times(
+                outlook_session.folder(self.folder_path),
+                start,
+                end,
+                # One partition per worker; equal sizes keep them all busy
+                self.max_workers - 1,
+                senders,
+                categories,
+            )
+        )
+        return plan_partitions(
+            start, end, count, received_times, self.min_partition_size
+        )
+
+    def _scan_partition(self, partition, senders, categories):
+        """(rows sorted by ReceivedTime, seconds taken) for one partition"""
+        started = time.perf_counter()
+        outlook_session = self.session()
+        try:
+            folder = outlook_session.folder(self.folder_path)
+            flagged_emails = outlook_session.call(
+                get_table,
+                folder,
+                build_flagged_filter(
+                    partition.start, partition.end, senders, categories
+                ),
+            )
+        except Exception:
+            # The next attempt on this thread looks the folder up again
+            outlook_session.invalidate()
+            raise
+        return (
+            sorted(flagged_emails, key=attrgetter("ReceivedTime")),
+            time.perf_counter() - started,
+        )
+
+    def scan(self, start=None, end=None, senders=None, categories=None):
+        """Return (MailTable of flagged mail, summary dict) for start..end
+
+        The summary lists every partition with its estimate, the rows read,
+        attempts and seconds. Raises the last error of a partition that
+        still fails after retries.
+        """
+        start, end = default_month_range(start, end)
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                partitions = self.plan(start, end, senders, categories)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                print(f"Error: planning the scan failed ({e}), retrying")
+                self.session().invalidate()
+        plan_seconds = time.perf_counter() - started
+
+        rows = {}
+        attempts = dict.fromkeys(partitions, 0)
+        seconds = {}
+        with ThreadPoolExecutor(self.max_workers) as pool:
+
+            def submit(partition):
+                attempts[partition] += 1
+                return pool.submit(self._scan_partition, partition, senders, categories)
+
+            pending = {submit(partition): partition for partition in partitions}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    partition = pending.pop(future)
+                    try:
+                        rows[partition], seconds[partition] = future.result()
+                    except Exception as e:
+                        if attempts[partition] > self.retries:
+                            for other in pending:
+                                other.cancel()
+                            raise
+                        print(
+                            f"Error: scanning {partition.start} to {partition.end} "
+                            f"failed ({e}), retrying"
+                        )
+                        pending[submit(partition)] = partition
+
+        # Partitions are in date order and disjoint, so appending them in
+        # order is the merge
+        flagged_emails = MailTable(MAIL_COLUMNS)
+        for partition in partitions:
+            flagged_emails.extend(rows[partition])
+
+        summary = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "workers": self.max_workers,
+            "plan_seconds": round(plan_seconds, 3),
+            "seconds": round(time.perf_counter() - started, 3),
+            "partitions": [
+                {
+                    "start": partition.start.isoformat(),
+                    "end": partition.end.isoformat(),
+                    "estimate": partition.estimate,
+                    "rows": len(rows[partition]),
+                    "attempts": attempts[partition],
+                    "seconds": round(seconds[partition], 3),
+                }
+                for partition in partitions
+            ],
+        }
+        return flagged_emails, summary
@@ -0,0 +1,279 @@
+import abc
+import time
+from collections import namedtuple
+from itertools import islice
+
+from utils.fingerprint import (
+    FINGERPRINT_COLUMNS,
+    FingerprintSet,
+    fingerprint_row,
+    fingerprint_table,
+    folder_fingerprints,
+)
+from utils.query import build_received_window_filter
+from utils.table import get_table
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_RETRIES = 2
+# Seconds before the first retry pass, doubling for each one after it
+DEFAULT_RETRY_DELAY = 1.0
+
+# attempt is 0 for the first pass and counts up for retry passes
+BatchStats = namedtuple(
+    "BatchStats", ["number", "attempt", "size", "copied", "failed", "seconds"]
+)
+
+
+def items_per_second(stats):
+    return stats.copied / stats.seconds if stats.seconds else float(stats.copied)
+
+
+class CopyTarget(abc.ABC):
+    """Somewhere emails can be copied to, a batch at a time
+
+    copy_batch receives table rows (anything with an EntryID) and returns the
+    rows that could not be copied, paired with the error for each.
+    """
+
+    name = "target"
+
+    @abc.abstractmethod
+    def copy_batch(self, rows):
+        pass
+
+    def fingerprints(self):
+        """FingerprintSet of the emails already in the target"""
+        return FingerprintSet()
+
+    def find(self, rows):
+        """Fingerprints of those rows that are already in the target
+
+        Used after a crash to settle the few emails whose copy may or may not
+        have happened; targets override it with something cheaper than
+        fingerprinting all of their contents.
+        """
+        existing_fingerprints = self.fingerprints()
+        return {
+            row_fingerprint
+            for row_fingerprint in map(fingerprint_row, rows)
+            if row_fingerprint in existing_fingerprints
+        }
+
+    def close(self):
+        pass
+
+
+class PstTarget(CopyTarget):
+    """Copy into an Outlook folder, e.g. the root of the month's PST"""
+
+    def __init__(self, folder, resolve):
+        self.folder = folder
+        self.name = folder.Name
+        self.resolve = resolve
+
+    def copy_item(self, item):
+        # Copy() leaves the duplicate in the source folder until it is moved
+        item.Copy().Move(self.folder)
+
+    def fingerprints(self):
+        return folder_fingerprints(self.folder)
+
+    def find(self, rows):
+        # Only the stretch of the PST the rows were received in; batches are
+        # copied in received order, so that is a small table
+        if not rows:
+            return set()
+        received_times = [row.ReceivedTime.replace(tzinfo=None) for row in rows]
+        nearby = get_table(
+            self.folder,
+            build_received_window_filter(min(received_times), max(received_times)),
+            FINGERPRINT_COLUMNS,
+        )
+        present = set(fingerprint_table(nearby))
+        return {
+            row_fingerprint
+            for row_fingerprint in map(fingerprint_row, rows)
+            if row_fingerprint in present
+        }
+
+    def copy_batch(self, rows):
+        failed = []
+        for row in rows:
+            try:
+                self.copy_item(self.resolve(row.EntryID))
+            except Exception as e:
+                failed.append((row, e))
+        return failed
+
+
+class CopyPipeline:
+    """Copy rows to a target in batches, retrying failures at the end
+
+    on_batch(stats, rows_copied) runs after every batch so callers can
+    persist progress and update a GUI between batches rather than per email.
+    With a utils.throttle.Throttle, batches shrink below batch_size while
+    Outlook rejects calls and grow back once it keeps up. Retry passes wait
+    retry_delay seconds, doubling each pass, so Outlook has time to recover
+    from whatever failed the emails.
+    """
+
+    def __init__(
+        self,
+        target,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_retries=DEFAULT_MAX_RETRIES,
+        on_batch=None,
+        throttle=None,
+        retry_delay=DEFAULT_RETRY_DELAY,
+        sleep=time.sleep,
+    ):
+        self.target = target
+        self.batch_size = max(1, int(batch_size))
+        self.max_retries = max_retries
+        self.on_batch = on_batch
+        self.throttle = throttle
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.batches = []
+        self.failed = []
+
+    def _run_pass(self, rows, attempt, cancelled):
+        failed = []
+        rows = iter(rows)
+        while True:
+            if cancelled is not None and cancelled():
+                # Unattempted rows are neither copied nor failed
+                return failed, True
+
+            batch_size = self.batch_size
+            if self.throttle is not None:
+                batch_size = self.throttle.batch_size(batch_size)
+                decreases = self.throttle.decreases
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            started = time.perf_counter()
+            batch_failed = self.target.copy_batch(batch)
+            seconds = time.perf_counter() - started
+            if self.throttle is not None:
+                self.throttle.batch_done(decreases)
+
+            failed_rows = {id(row) for row, _ in batch_failed}
+            copied = [row for row in batch if id(row) not in failed_rows]
+            failed.extend(batch_failed)
+
+            stats = BatchStats(
+                len(self.batches) + 1,
+                attempt,
+                len(batch),
+                len(copied),
+                len(batch_failed),
+                seconds,
+            )
+            self.batches.append(stats)
+            if self.on_batch is not None:
+                self.on_batch(stats, copied)
+
+        return failed, False
+
+    def run(self, rows, cancelled=None):
+        """Copy rows and return (copied count, cancelled flag)
+
+        rows can be any iterable, including a generator that is still
+        scanning; only the current batch and the failures are kept.
+        """
+        pending = rows
+        copied = 0
+        was_cancelled = False
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.sleep(self.retry_delay * 2 ** (attempt - 1))
+            failed, was_cancelled = self._run_pass(pending, attempt, cancelled)
+            copied += sum(stats.copied for stats in self.batches if stats.attempt == attempt)
+            if was_cancelled or not failed:
+                break
+            print(f"Retrying {len(failed)} emails after error: {failed[-1][1]}")
+            pending = [row for row, _ in failed]
+
+        self.failed = failed
+        return copied, was_cancelled
+
+
+def export_rows(
+    flagged_emails,
+    target,
+    existing_fingerprints,
+    record=None,
+    progress=None,
+    cancelled=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_retries=DEFAULT_MAX_RETRIES,
+    throttle=None,
+    retry_delay=DEFAULT_RETRY_DELAY,
+):
+    """Copy the rows that are not in existing_fingerprints
+
+    flagged_emails is a MailTable or any iterable of rows, e.g. a scan that
+    is still running; rows are fingerprinted and copied as they arrive.
+    record(fingerprints) is called after each batch with the fingerprints
+    that were committed, progress(position, total, subject, stats) after each
+    batch, with total None when flagged_emails has no length. With throttle,
+    the utils.throttle.Throttle of the session copying, batch sizes adapt
+    to how busy Outlook is and the summary includes its metrics. Returns a
+    summary dict.
+    """
+    total_emails = len(flagged_emails) if hasattr(flagged_emails, "__len__") else None
+    seen_count = 0
+    skip_count = 0
+
+    def to_copy():
+        nonlocal seen_count, skip_count
+        for row in flagged_emails:
+            seen_count += 1
+            # Fingerprints come straight from the fetched columns, no COM calls
+            row_fingerprint = fingerprint_row(row)
+            if row_fingerprint in existing_fingerprints:
+                skip_count += 1
+                continue
+            # Also catches the same email showing up twice in the range
+            existing_fingerprints.add(row_fingerprint)
+            yield row
+
+    attempted = 0
+    first_batch_seconds = None
+
+    def on_batch(stats, copied):
+        nonlocal attempted, first_batch_seconds
+        if first_batch_seconds is None:
+            first_batch_seconds = time.perf_counter() - started
+        if record is not None and copied:
+            record([fingerprint_row(row) for row in copied])
+        if stats.attempt == 0:
+            attempted += stats.size
+        if progress is not None:
+            subject = copied[-1].Subject if copied else ""
+            progress(skip_count + attempted, total_emails, subject, stats)
+
+    pipeline = CopyPipeline(
+        target, batch_size, max_retries, on_batch, throttle, retry_delay
+    )
+    started = time.perf_counter()
+    copy_count, was_cancelled = pipeline.run(to_copy(), cancelled)
+    seconds = time.perf_counter() - started
+
+    summary = {
+        "target": target.name,
+        "total": seen_count if total_emails is None else total_emails,
+        "copied": copy_count,
+        "skipped": skip_count,
+        "failed": len(pipeline.failed),
+        "cancelled": was_cancelled,
+        "batches": len(pipeline.batches),
+        "seconds": seconds,
+        "first_batch_seconds": first_batch_seconds,
+        "items_per_second": copy_count / seconds if seconds else float(copy_count),
+    }
+    if throttle is not None:
+        summary["throttle"] = throttle.metrics()
+    return summary
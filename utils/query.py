@@ -0,0 +1,293 @@
+import calendar
+import operator
+import re
+from datetime import date, datetime, time, timedelta
+
+# OlFlagStatus.olFlagMarked
+FLAG_MARKED = 2
+
+# Restrict() wants dates in the user's locale; Outlook always accepts this form
+FILTER_DATE_FORMAT = "%m/%d/%Y %I:%M %p"
+
+
+def default_month_range(start: date = None, end: date = None):
+    """Fill in missing bounds with the first/last day of the current month"""
+    today = date.today()
+
+    if start is None:
+        start = today.replace(day=1)
+
+    if end is None:
+        _, num_days = calendar.monthrange(today.year, today.month)
+        end = today.replace(day=num_days)
+
+    return start, end
+
+
+def month_ranges(start, end):
+    """(first, last) day of every calendar month overlapping start..end"""
+    ranges = []
+    first = start
+    while first <= end:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        ranges.append((first, last))
+        first = next_month
+    return ranges
+
+
+def quote(value):
+    """Quote a string literal for a Restrict filter"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def format_filter_date(value):
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    return quote(value.strftime(FILTER_DATE_FORMAT))
+
+
+def _any_of(prop, values):
+    clauses = [f"[{prop}] = {quote(value)}" for value in values]
+    if len(clauses) == 1:
+        return clauses[0]
+    return "(" + " OR ".join(clauses) + ")"
+
+
+def _received_clauses(start, end):
+    clauses = []
+
+    if start is not None:
+        clauses.append(f"[ReceivedTime] >= {format_filter_date(start)}")
+
+    if end is not None:
+        clauses.append(
+            f"[ReceivedTime] < {format_filter_date(end + timedelta(days=1))}"
+        )
+
+    return clauses
+
+
+def build_flagged_filter(
+    start: date = None, end: date = None, senders=None, categories=None
+):
+    """Build one Restrict filter for flagged mail received between start and end
+
+    Both bounds are inclusive whole days: the end bound is expressed as
+    "before midnight of the following day" so mail received on the last day
+    is not dropped.
+    """
+    clauses = [f"[FlagStatus] = {FLAG_MARKED}"] + _received_clauses(start, end)
+
+    if senders:
+        clauses.append(_any_of("SenderEmailAddress", senders))
+
+    if categories:
+        clauses.append(_any_of("Categories", categories))
+
+    return " AND ".join(clauses)
+
+
+def build_changed_filter(start: date = None, end: date = None, since=None):
+    """Build a filter for any mail in the range modified after since
+
+    Flag state is deliberately not part of the filter so that items whose
+    flag was cleared since the last sync are returned too.
+    """
+    clauses = _received_clauses(start, end)
+
+    if since is not None:
+        clauses.append(f"[LastModificationTime] > {format_filter_date(since)}")
+
+    return " AND ".join(clauses)
+
+
+def build_received_window_filter(first, last=None, slack=timedelta(minutes=1)):
+    """Filter for items received between first and last, give or take slack
+
+    Used to look up a handful of specific emails in a large folder; filters
+    only resolve to the minute, so callers compare fingerprints afterwards.
+    """
+    first = first.replace(tzinfo=None)
+    last = first if last is None else last.replace(tzinfo=None)
+    return (
+        f"[ReceivedTime] >= {format_filter_date(first - slack)} AND "
+        f"[ReceivedTime] <= {format_filter_date(last + slack)}"
+    )
+
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<prop>\[[^\]]+\])
+      | (?P<string>'(?:[^']|'')*')
+      | (?P<number>-?\d+)
+      | (?P<op><>|<=|>=|=|<|>)
+      | (?P<paren>[()])
+      | (?P<word>AND|OR|NOT)\b
+    )""",
+    re.VERBOSE | re.IGNORECASE,
+)
+
+
+def _tokenize(filter):
+    tokens = []
+    position = 0
+    filter = filter.strip()
+    while position < len(filter):
+        match = _TOKEN_RE.match(filter, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unsupported filter syntax at: {filter[position:]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "prop":
+            tokens.append(("prop", text[1:-1]))
+        elif kind == "string":
+            tokens.append(("value", text[1:-1].replace("''", "'")))
+        elif kind == "number":
+            tokens.append(("value", int(text)))
+        elif kind == "word":
+            tokens.append(("word", text.upper()))
+        else:
+            tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+
+def _coerce(current, literal):
+    """Convert a filter literal to the type of the property it is compared to"""
+    if isinstance(current, datetime) and isinstance(literal, str):
+        literal = datetime.strptime(literal, FILTER_DATE_FORMAT)
+        if current.tzinfo is not None:
+            literal = literal.replace(tzinfo=current.tzinfo)
+        return literal
+    if isinstance(current, int) and isinstance(literal, str):
+        return int(literal)
+    if isinstance(current, str):
+        return str(literal)
+    return literal
+
+
+_OPERATORS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _compare(prop, op, literal):
+    if prop == "Categories" and op in ("=", "<>"):
+
+        def has_category(item):
+            current = getattr(item, prop, None)
+            if current is None:
+                return False
+            # Categories is a comma separated keyword list; = tests membership
+            names = [name.strip().lower() for name in current.split(",")]
+            found = str(literal).lower() in names
+            return found if op == "=" else not found
+
+        return has_category
+
+    compare = _OPERATORS[op]
+    # (type, tzinfo) of the property -> literal converted to match; filters
+    # run over whole folders, so the conversion is done once per type
+    coerced = {}
+
+    def predicate(item):
+        current = getattr(item, prop, None)
+        if current is None:
+            return False
+        value_type = (type(current), getattr(current, "tzinfo", None))
+        value = coerced.get(value_type)
+        if value is None:
+            value = _coerce(current, literal)
+            if isinstance(current, str):
+                value = value.lower()
+            coerced[value_type] = value
+        if isinstance(current, str):
+            current = current.lower()
+        return compare(current, value)
+
+    return predicate
+
+
+def _all_of(predicates):
+    def conjunction(item):
+        for predicate in predicates:
+            if not predicate(item):
+                return False
+        return True
+
+    return conjunction
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, kind=None, text=None):
+        token = self.peek()
+        if (kind and token[0] != kind) or (text and token[1] != text):
+            raise ValueError(f"Unexpected token {token[1]!r} in filter")
+        self.position += 1
+        return token
+
+    def parse(self):
+        predicate = self.parse_or()
+        if self.peek()[0] is not None:
+            raise ValueError(f"Unexpected token {self.peek()[1]!r} in filter")
+        return predicate
+
+    def parse_or(self):
+        predicates = [self.parse_and()]
+        while self.peek() == ("word", "OR"):
+            self.take()
+            predicates.append(self.parse_and())
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda item: any(predicate(item) for predicate in predicates)
+
+    def parse_and(self):
+        predicates = [self.parse_not()]
+        while self.peek() == ("word", "AND"):
+            self.take()
+            predicates.append(self.parse_not())
+        if len(predicates) == 1:
+            return predicates[0]
+        return _all_of(predicates)
+
+    def parse_not(self):
+        if self.peek() == ("word", "NOT"):
+            self.take()
+            inner = self.parse_not()
+            return lambda item: not inner(item)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.peek() == ("paren", "("):
+            self.take()
+            predicate = self.parse_or()
+            self.take("paren", ")")
+            return predicate
+        _, prop = self.take("prop")
+        _, op = self.take("op")
+        _, literal = self.take("value")
+        return _compare(prop, op, literal)
+
+
+def parse_filter(filter):
+    """Compile a Jet Restrict filter into a predicate over item-like objects
+
+    Evaluates the grammar the build_*_filter functions produce, for
+    backends and fakes that have no Outlook to run Restrict for them.
+    """
+    return _Parser(_tokenize(filter)).parse()
@@ -0,0 +1,267 @@
+"""Billing summaries of flagged mail: emails and size per client, day and sender.
+
+The summaries are computed from a MailTable, the column-per-list snapshot a
+GetTable scan returns, one column at a time: each grouping sorts the rows
+once and reduces every run of equal keys with builtins, and the client is
+worked out once per distinct sender, recipients and categories rather than
+per email, so no Python code runs per email. A year of flagged mail takes a
+fraction of a second.
+
+    table = get_table(inbox, build_flagged_filter(start, end), REPORT_COLUMNS)
+    paths = write_report(build_report(table, "radlawgroup.com"), "March")
+
+writes "March - by client.csv", "... by day.csv", "... by sender.csv" and
+"March - summary.xlsx" with one sheet per summary.
+"""
+
+import csv
+import re
+import zipfile
+from collections import Counter
+from datetime import datetime
+from itertools import accumulate
+from xml.sax.saxutils import escape
+
+# Columns a report needs, fetched in the same bulk GetTable pass as a scan
+REPORT_COLUMNS = ("SenderEmailAddress", "To", "ReceivedTime", "Categories", "Size")
+
+# Summary name -> title of its key column
+SUMMARIES = {"client": "Client", "day": "Day", "sender": "Sender"}
+
+HEADER = ("Emails", "Size (KB)", "First received", "Last received")
+
+# Mail the firm sent whose recipients name no outside address
+INTERNAL_CLIENT = "(internal)"
+
+_ADDRESS = re.compile(r"[\w.+'-]+@([\w-]+(?:\.[\w-]+)+)")
+
+
+def domain_of(address):
+    return address.rpartition("@")[2].lower() if "@" in address else ""
+
+
+def client_of(categories, sender, recipients, firm_domain=None):
+    """Who an email is billed to
+
+    Its first Outlook category when it has one, as categories usually name
+    the client or matter; otherwise the sender's domain, or for mail the
+    firm sent, the domain of the first outside recipient. Exchange senders
+    without an SMTP address count as the firm.
+    """
+    if categories:
+        return categories.split(",")[0].strip()
+    domain = domain_of(sender or "")
+    if domain and domain != firm_domain:
+        return domain
+    for recipient_domain in _ADDRESS.findall(recipients or ""):
+        if recipient_domain.lower() != firm_domain:
+            return recipient_domain.lower()
+    return INTERNAL_CLIENT
+
+
+def group_totals(keys, sizes, received_times):
+    """(key, emails, bytes, first, last) for each distinct key, in key order
+
+    Sorts the row numbers by key once; each key's rows are then one slice of
+    the sorted columns, counted, summed and min/maxed without a Python loop
+    over the rows.
+    """
+    counts = Counter(keys)
+    group_keys = sorted(counts)
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    ends = list(accumulate(map(counts.__getitem__, group_keys)))
+    runs = list(map(slice, [0] + ends[:-1], ends))
+    sorted_sizes = list(map(sizes.__getitem__, order))
+    sorted_times = list(map(received_times.__getitem__, order))
+    return list(
+        zip(
+            group_keys,
+            map(counts.__getitem__, group_keys),
+            map(sum, map(sorted_sizes.__getitem__, runs)),
+            map(min, map(sorted_times.__getitem__, runs)),
+            map(max, map(sorted_times.__getitem__, runs)),
+        )
+    )
+
+
+def build_report(table, firm_domain=None):
+    """Summary name -> group_totals rows for a MailTable of flagged mail
+
+    The table needs SenderEmailAddress, ReceivedTime and Size; To and
+    Categories are used for the client when present. firm_domain is the
+    firm's own mail domain, which is never a client.
+    """
+    firm_domain = firm_domain.lower() if firm_domain else None
+    count = len(table)
+    senders = table.column("SenderEmailAddress")
+    received_times = table.column("ReceivedTime")
+    # Boxed once here rather than once per grouping
+    sizes = list(table.column("Size"))
+    empty = [""] * count
+    categories = (
+        table.column("Categories") if "Categories" in table.columns else empty
+    )
+    recipients = table.column("To") if "To" in table.columns else empty
+
+    client_columns = list(zip(categories, senders, recipients))
+    clients = {
+        columns: client_of(*columns, firm_domain) for columns in set(client_columns)
+    }
+    senders_lower = {sender: (sender or "").lower() for sender in set(senders)}
+    keys = {
+        "client": list(map(clients.__getitem__, client_columns)),
+        "day": list(map(datetime.date, received_times)),
+        "sender": list(map(senders_lower.__getitem__, senders)),
+    }
+    # COM datetimes carry a meaningless tzinfo; the report is in local time
+    return {
+        name: [
+            (key, emails, size, first.replace(tzinfo=None), last.replace(tzinfo=None))
+            for key, emails, size, first, last in group_totals(
+                keys[name], sizes, received_times
+            )
+        ]
+        for name in SUMMARIES
+    }
+
+
+def _formatted(row):
+    key, emails, size, first, last = row
+    return (
+        str(key),
+        emails,
+        round(size / 1024, 1),
+        first.isoformat(sep=" ", timespec="minutes"),
+        last.isoformat(sep=" ", timespec="minutes"),
+    )
+
+
+def write_csv(path, title, rows):
+    with open(path, "w", newline="", encoding="utf-8-sig") as report_file:
+        writer = csv.writer(report_file)
+        writer.writerow((title,) + HEADER)
+        writer.writerows(map(_formatted, rows))
+
+
+def _column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _cell(reference, value):
+    if isinstance(value, (int, float)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    return (
+        f'<c r="{reference}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+    )
+
+
+def _sheet_xml(rows):
+    lines = []
+    for row_number, row in enumerate(rows, 1):
+        cells = "".join(
+            _cell(f"{_column_letter(column)}{row_number}", value)
+            for column, value in enumerate(row)
+        )
+        lines.append(f'<row r="{row_number}">{cells}</row>')
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f"<sheetData>{''.join(lines)}</sheetData></worksheet>"
+    )
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    "{sheets}</Types>"
+)
+
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{number}.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+
+_ROOT_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+    'officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+
+def write_xlsx(path, sheets):
+    """Write sheets, (name, rows) pairs, as a minimal Excel workbook
+
+    Strings are stored inline and there is no styling, which keeps the
+    writer a few lines of XML instead of a dependency.
+    """
+    numbers = range(1, len(sheets) + 1)
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships"><sheets>'
+        + "".join(
+            f'<sheet name="{escape(name)}" sheetId="{number}" r:id="rId{number}"/>'
+            for number, (name, _) in zip(numbers, sheets)
+        )
+        + "</sheets></workbook>"
+    )
+    relationships = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships">'
+        + "".join(
+            f'<Relationship Id="rId{number}" Type="http://schemas.openxmlformats.org/'
+            'officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{number}.xml"/>'
+            for number in numbers
+        )
+        + "</Relationships>"
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as workbook_file:
+        workbook_file.writestr(
+            "[Content_Types].xml",
+            _CONTENT_TYPES.format(
+                sheets="".join(
+                    _SHEET_CONTENT_TYPE.format(number=number) for number in numbers
+                )
+            ),
+        )
+        workbook_file.writestr("_rels/.rels", _ROOT_RELATIONSHIPS)
+        workbook_file.writestr("xl/workbook.xml", workbook)
+        workbook_file.writestr("xl/_rels/workbook.xml.rels", relationships)
+        for number, (_, rows) in zip(numbers, sheets):
+            workbook_file.writestr(f"xl/worksheets/sheet{number}.xml", _sheet_xml(rows))
+
+
+def write_report(report, base_path):
+    """Write a build_report result as CSVs and a workbook; returns their paths
+
+    base_path is the PST or archive path without its extension, so the
+    summaries sit next to the mail they describe.
+    """
+    paths = []
+    sheets = []
+    for name, title in SUMMARIES.items():
+        path = f"{base_path} - by {name}.csv"
+        write_csv(path, title, report[name])
+        paths.append(path)
+        sheets.append(
+            (f"By {name}", [(title,) + HEADER] + list(map(_formatted, report[name])))
+        )
+    path = f"{base_path} - summary.xlsx"
+    write_xlsx(path, sheets)
+    paths.append(path)
+    return paths
@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+
+from utils.backend import walk_folder_paths
+from utils.index import INDEX_PATH, SyncIndex
+from utils.outlook import (
+    get_flagged_emails_pst_path,
+    get_store_fingerprints,
+    open_pst,
+)
+from utils.pipeline import DEFAULT_BATCH_SIZE, PstTarget, export_rows
+from utils.query import build_flagged_filter, default_month_range
+from utils.session import ThreadSessions
+from utils.table import MAIL_COLUMNS, MailTable, get_table
+
+DEFAULT_MAX_WORKERS = 4
+
+# folder is a "/" separated path below the mailbox, e.g. "Inbox/Clients"
+ExportTarget = namedtuple(
+    "ExportTarget", ["mailbox", "folder", "recursive"], defaults=("Inbox", True)
+)
+
+ScanResult = namedtuple(
+    "ScanResult", ["mailbox", "folder", "store_id", "flagged_emails", "seconds"]
+)
+
+
+def interleave(groups):
+    """Round-robin across groups so no single target hogs the pool"""
+    return [
+        value
+        for values in zip_longest(*groups, fillvalue=None)
+        for value in values
+        if value is not None
+    ]
+
+
+class ExportScheduler:
+    """Scan many mailboxes and folder trees concurrently, then merge to PSTs
+
+    Every pool thread opens its own OutlookSession through connect(), since
+    COM objects cannot be shared between threads; work items therefore carry
+    folder paths, not folder objects. At most max_workers calls run at once,
+    and folder scans are queued round-robin across targets so a mailbox with
+    hundreds of folders does not delay the others. A profiler and a
+    throttle (utils.throttle.Throttle), if given, are shared by all
+    sessions. The threads share one sync index file, so its writes are made
+    one at a time.
+    """
+
+    def __init__(
+        self, connect, max_workers=DEFAULT_MAX_WORKERS, profiler=None, throttle=None
+    ):
+        self.connect = connect
+        self.max_workers = max(1, max_workers)
+        self.profiler = profiler
+        self.throttle = throttle
+        self._sessions = ThreadSessions(connect, profiler=profiler, throttle=throttle)
+        self._index_lock = threading.Lock()
+
+    def session(self):
+        """The calling thread's OutlookSession"""
+        return self._sessions.get()
+
+    def _add_fingerprints(self, index, billing_path, fingerprints):
+        with self._index_lock:
+            index.add_fingerprints(billing_path, fingerprints)
+
+    def _discover(self, target):
+        folder = self.session().folder(f"{target.mailbox}/{target.folder}")
+        if not target.recursive:
+            return [(target.mailbox, target.folder)]
+        return [
+            (target.mailbox, folder_path)
+            for folder_path in walk_folder_paths(folder, target.folder)
+        ]
+
+    def _scan(self, mailbox, folder_path, filter):
+        started = time.perf_counter()
+        outlook_session = self.session()
+        folder = outlook_session.folder(f"{mailbox}/{folder_path}")
+        flagged_emails = outlook_session.call(get_table, folder, filter)
+        return ScanResult(
+            mailbox,
+            folder_path,
+            folder.StoreID,
+            flagged_emails,
+            time.perf_counter() - started,
+        )
+
+    def scan(self, targets, start=None, end=None, senders=None, categories=None):
+        """Return a ScanResult for every folder under targets"""
+        start, end = default_month_range(start, end)
+        filter = build_flagged_filter(start, end, senders, categories)
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            folder_groups = list(pool.map(self._discover, targets))
+            work = interleave(folder_groups)
+            return list(
+                pool.map(lambda folder: self._scan(*folder, filter), work)
+            )
+
+    def _export(self, name, results, start, end, output_folder, index_path, batch_size):
+        outlook_session = self.session()
+
+        # Merge every folder's rows, remembering which store each came from
+        flagged_emails = MailTable(MAIL_COLUMNS)
+        store_of = {}
+        for result in results:
+            flagged_emails.extend(list(result.flagged_emails))
+            for entry_id in result.flagged_emails.column("EntryID"):
+                store_of[entry_id] = result.store_id
+
+        folder = os.path.join(output_folder, name)
+        os.makedirs(folder, exist_ok=True)
+        billing_path = get_flagged_emails_pst_path(start, end, folder)
+        is_new_store = not os.path.exists(billing_path)
+        flagged_emails_root = open_pst(billing_path, outlook_session)
+
+        with SyncIndex(index_path) as index:
+            with self._index_lock:
+                existing_emails_in_store = get_store_fingerprints(
+                    index, billing_path, flagged_emails_root, is_new_store
+                )
+            summary = export_rows(
+                flagged_emails,
+                PstTarget(
+                    flagged_emails_root,
+                    lambda entry_id: outlook_session.get_item(
+                        entry_id, store_of[entry_id]
+                    ),
+                ),
+                existing_emails_in_store,
+                record=lambda fingerprints: self._add_fingerprints(
+                    index, billing_path, fingerprints
+                ),
+                batch_size=batch_size,
+                throttle=self.throttle,
+            )
+
+        summary["name"] = name
+        summary["path"] = billing_path
+        summary["folders"] = len(results)
+        return summary
+
+    def export(
+        self,
+        results,
+        output_folder,
+        start=None,
+        end=None,
+        combined=False,
+        combined_name="Combined",
+        index_path=INDEX_PATH,
+        batch_size=DEFAULT_BATCH_SIZE,
+    ):
+        """Write scan results to one PST per mailbox, or one combined PST
+
+        Separate PSTs are written in parallel; a combined PST is written by a
+        single worker since a store only takes one writer at a time.
+        """
+        start, end = default_month_range(start, end)
+
+        groups = {}
+        for result in results:
+            groups.setdefault(combined_name if combined else result.mailbox, []).append(
+                result
+            )
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            return list(
+                pool.map(
+                    lambda group: self._export(
+                        group[0],
+                        group[1],
+                        start,
+                        end,
+                        output_folder,
+                        index_path,
+                        batch_size,
+                    ),
+                    groups.items(),
+                )
+            )
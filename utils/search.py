@@ -0,0 +1,630 @@
+"""Full-text index over exported flagged mail.
+
+Every email an export copies is indexed by the words of its subject, sender,
+recipients and body, so billing lookups such as "all flagged mail mentioning
+matter 2026-0153 in March" are answered without opening a PST:
+
+    with SearchIndex() as index:
+        for hit in index.search("2026-0153 AND (retainer OR invoice*)",
+                                start=datetime(2026, 3, 1)):
+            print(hit.received_time, hit.sender, hit.subject, hit.store_path)
+
+Queries are words, implicitly ANDed; `OR`, `NOT` (or a leading `-`) and
+parentheses combine them, `word*` matches every word starting with "word"
+and `subject:`, `from:`, `to:` or `body:` limits a word to one field.
+
+Postings are stored per word as delta-encoded document numbers, deflated
+when that makes them smaller. Each committed batch adds one segment per
+word it contains. Once a word has more than MAX_SEGMENTS, its newest
+segments are merged into one, taking in each older segment no larger than
+what is being merged, so a document number is only ever rewritten into a
+segment at least twice as large: the index grows batch by batch during an
+export without rewriting what it already holds over and over.
+"""
+
+import operator
+import re
+import sqlite3
+import zlib
+from array import array
+from collections import namedtuple
+from datetime import datetime, time
+from email.message import Message
+from itertools import accumulate, chain
+
+from utils.fingerprint import fingerprint_row
+from utils.pipeline import CopyTarget
+
+SEARCH_INDEX_PATH = "search_index.db"
+
+# A word's newest segments are merged when it has more than this many
+MAX_SEGMENTS = 32
+
+# Prefix queries matching more words than this in a field are refused
+MAX_PREFIX_TERMS = 2000
+
+# Query field name -> prefix of the indexed terms
+FIELDS = {"subject": "s", "from": "f", "to": "t", "body": "b"}
+
+_WORD = re.compile(r"[0-9a-z]+")
+_TAG = re.compile(r"<[^>]*>")
+_QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"|[^\s()]+')
+
+_COMPRESSED = b"z"
+_PLAIN = b"p"
+# Postings shorter than this are not worth deflating
+_COMPRESS_MIN = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    fingerprint INTEGER NOT NULL UNIQUE,
+    store_path TEXT,
+    received_time TEXT,
+    sender TEXT,
+    subject TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_received_time
+    ON documents (received_time);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    documents INTEGER NOT NULL,
+    segments INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS terms_segments ON terms (segments);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    first_document INTEGER NOT NULL,
+    documents INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (term, first_document)
+) WITHOUT ROWID;
+"""
+
+SearchHit = namedtuple(
+    "SearchHit",
+    ["id", "fingerprint", "store_path", "received_time", "sender", "subject"],
+)
+
+
+class QueryError(ValueError):
+    pass
+
+
+def tokenize(text):
+    """Lowercase words and numbers of text; "2026-0153" is "2026", "0153" """
+    return _WORD.findall(text.lower()) if text else []
+
+
+def encode_postings(document_ids):
+    """Ascending document numbers -> compact bytes"""
+    deltas = array("I", map(operator.sub, document_ids, chain((0,), document_ids)))
+    data = deltas.tobytes()
+    if len(data) >= _COMPRESS_MIN:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return _COMPRESSED + compressed
+    return _PLAIN + data
+
+
+def decode_postings(data):
+    """encode_postings' bytes -> iterator of ascending document numbers"""
+    deltas = array("I")
+    payload = data[1:]
+    deltas.frombytes(zlib.decompress(payload) if data[:1] == _COMPRESSED else payload)
+    return accumulate(deltas)
+
+
+def _text_of_message(message):
+    parts = []
+    for part in message.walk():
+        if part.get_content_maintype() != "text" or part.get_filename():
+            continue
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            continue
+        text = payload.decode(part.get_content_charset() or "utf-8", "replace")
+        if part.get_content_subtype() == "html":
+            text = _TAG.sub(" ", text)
+        parts.append(text)
+    return "\n".join(parts)
+
+
+def item_text(item):
+    """(recipients, body) of a MailItem or an email.message.Message"""
+    if isinstance(item, Message):
+        recipients = " ".join(
+            str(value)
+            for name in ("To", "Cc")
+            for value in (item.get_all(name) or [])
+        )
+        return recipients, _text_of_message(item)
+    recipients = " ".join(getattr(item, name, "") or "" for name in ("To", "CC"))
+    return recipients, getattr(item, "Body", "") or ""
+
+
+def _time_bound(value, time_of_day):
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time_of_day)
+    return value.replace(tzinfo=None).isoformat(sep=" ", timespec="seconds")
+
+
+def _upper_bound(prefix):
+    # Smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SearchIndex:
+    """Inverted index of exported emails, kept in a SQLite file
+
+    add() indexes one email and commit() makes everything added since the
+    last commit durable and searchable. An email (by fingerprint) is only
+    indexed once, whichever export copies it first.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_PATH, max_segments=MAX_SEGMENTS):
+        self.path = path
+        self.max_segments = max_segments
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(_SCHEMA)
+        # term -> document numbers added since the last commit
+        self._pending = {}
+        self.merges = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()
+        return count
+
+    def contains(self, fingerprint):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM documents WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            is not None
+        )
+
+    def add(
+        self,
+        fingerprint,
+        store_path="",
+        received_time=None,
+        sender="",
+        subject="",
+        recipients="",
+        body="",
+    ):
+        """Index one email; returns False if it was indexed before"""
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO documents "
+            "(fingerprint, store_path, received_time, sender, subject) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                fingerprint,
+                store_path,
+                _time_bound(received_time, time.min) if received_time else None,
+                sender or "",
+                subject or "",
+            ),
+        )
+        if not cursor.rowcount:
+            return False
+
+        document_id = cursor.lastrowid
+        for field, text in (
+            ("s", subject),
+            ("f", sender),
+            ("t", recipients),
+            ("b", body),
+        ):
+            for word in set(tokenize(text)):
+                self._pending.setdefault(f"{field}:{word}", []).append(document_id)
+        return True
+
+    def add_row(self, row, item, store_path=""):
+        """Index a MailRow using the resolved item for recipients and body"""
+        recipients, body = item_text(item) if item is not None else ("", "")
+        return self.add(
+            fingerprint_row(row),
+            store_path,
+            row.ReceivedTime,
+            row.SenderEmailAddress,
+            row.Subject,
+            recipients,
+            body,
+        )
+
+    def add_archive(self, archive, store_path=None):
+        """Index every email in a utils.archive.MailArchive; returns the count"""
+        added = 0
+        for entry in archive.search():
+            if self.contains(entry.fingerprint):
+                continue
+            message = archive.message(entry)
+            recipients, body = item_text(message)
+            added += self.add(
+                entry.fingerprint,
+                store_path or archive.path,
+                entry.received_time,
+                str(message["From"] or ""),
+                entry.subject,
+                recipients,
+                body,
+            )
+        self.commit()
+        return added
+
+    def commit(self):
+        """Write one postings segment per word added, then merge long chains"""
+        pending, self._pending = self._pending, {}
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        term,
+                        document_ids[0],
+                        len(document_ids),
+                        encode_postings(document_ids),
+                    )
+                    for term, document_ids in pending.items()
+                ),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO terms VALUES (?, 0, 0)",
+                ((term,) for term in pending),
+            )
+            self.connection.executemany(
+                "UPDATE terms SET documents = documents + ?, segments = segments + 1 "
+                "WHERE term = ?",
+                ((len(document_ids), term) for term, document_ids in pending.items()),
+            )
+            for (term,) in self.connection.execute(
+                "SELECT term FROM terms WHERE segments > ?", (self.max_segments,)
+            ).fetchall():
+                # The newest segments, and each older one no larger than
+                # what they add up to
+                segments = self._segments(term)
+                run = 1
+                merged = segments[-1][1]
+                while run < len(segments) and (
+                    run < 2 or segments[-run - 1][1] <= merged
+                ):
+                    run += 1
+                    merged += segments[-run][1]
+                self._merge(term, segments[-run:])
+
+    def _segments(self, term):
+        return self.connection.execute(
+            "SELECT first_document, documents FROM postings WHERE term = ? "
+            "ORDER BY first_document",
+            (term,),
+        ).fetchall()
+
+    def _merge(self, term, segments):
+        """Rewrite adjacent (first_document, documents) segments as one"""
+        bounds = (term, segments[0][0], segments[-1][0])
+        document_ids = array("I")
+        for (data,) in self.connection.execute(
+            "SELECT data FROM postings WHERE term = ? "
+            "AND first_document BETWEEN ? AND ? ORDER BY first_document",
+            bounds,
+        ):
+            document_ids.extend(decode_postings(data))
+        self.connection.execute(
+            "DELETE FROM postings WHERE term = ? AND first_document BETWEEN ? AND ?",
+            bounds,
+        )
+        self.connection.execute(
+            "INSERT INTO postings VALUES (?, ?, ?, ?)",
+            (term, document_ids[0], len(document_ids), encode_postings(document_ids)),
+        )
+        self.connection.execute(
+            "UPDATE terms SET segments = segments - ? WHERE term = ?",
+            (len(segments) - 1, term),
+        )
+        self.merges += 1
+
+    def optimize(self):
+        """Merge every word's segments into one"""
+        self.commit()
+        with self.connection:
+            for (term,) in self.connection.execute(
+                "SELECT term FROM terms WHERE segments > 1"
+            ).fetchall():
+                self._merge(term, self._segments(term))
+        self.connection.execute("VACUUM")
+
+    def _postings(self, term):
+        for (data,) in self.connection.execute(
+            "SELECT data FROM postings WHERE term = ? ORDER BY first_document",
+            (term,),
+        ):
+            yield from decode_postings(data)
+
+    def _terms(self, fields, word, prefix):
+        if not prefix:
+            return [f"{field}:{word}" for field in fields]
+        terms = []
+        for field in fields:
+            low = f"{field}:{word}"
+            matching = [
+                term
+                for (term,) in self.connection.execute(
+                    "SELECT term FROM terms WHERE term >= ? AND term < ? LIMIT ?",
+                    (low, _upper_bound(low), MAX_PREFIX_TERMS + 1),
+                )
+            ]
+            if len(matching) > MAX_PREFIX_TERMS:
+                raise QueryError(
+                    f"{word}* matches more than {MAX_PREFIX_TERMS} words, "
+                    "use a longer prefix"
+                )
+            terms.extend(matching)
+        return terms
+
+    def _documents_matching(self, field, word):
+        fields = [FIELDS[field]] if field else list(FIELDS.values())
+        prefix = word.endswith("*")
+        words = tokenize(word)
+        if not words:
+            raise QueryError(f"Nothing to search for in {word!r}")
+        # "2026-0153" is two words; each must be there
+        matches = None
+        for position, part in enumerate(words):
+            part_matches = set()
+            last = position == len(words) - 1
+            for term in self._terms(fields, part, prefix and last):
+                part_matches.update(self._postings(term))
+            matches = part_matches if matches is None else matches & part_matches
+        return matches
+
+    def _all_documents(self):
+        return {
+            document_id
+            for (document_id,) in self.connection.execute("SELECT id FROM documents")
+        }
+
+    def match(self, query):
+        """Set of document numbers matching a query string"""
+        return _QueryParser(query, self).parse()
+
+    def search(self, query, start=None, end=None, limit=None):
+        """SearchHits for query received between start and end, oldest first
+
+        start and end are datetimes, or dates covering the whole day.
+        """
+        low = _time_bound(start, time.min) if start is not None else ""
+        high = _time_bound(end, time.max) if end is not None else None
+        # Filter and order on the stored ISO times; only the hits returned
+        # are read in full
+        ordered = sorted(
+            (received_time or "", document_id)
+            for document_id, received_time in self._select(
+                "id, received_time", self.match(query)
+            )
+            if (received_time or "") >= low
+            and (high is None or (received_time or "") <= high)
+        )
+        if limit is not None:
+            ordered = ordered[:limit]
+
+        rows = {
+            row[0]: row
+            for row in self._select(
+                "id, fingerprint, store_path, received_time, sender, subject",
+                [document_id for _, document_id in ordered],
+            )
+        }
+        hits = []
+        for received_time, document_id in ordered:
+            hit = SearchHit._make(rows[document_id])
+            if received_time:
+                hit = hit._replace(received_time=datetime.fromisoformat(received_time))
+            hits.append(hit)
+        return hits
+
+    def _select(self, columns, document_ids):
+        document_ids = list(document_ids)
+        # SQLite limits the number of parameters per statement
+        for offset in range(0, len(document_ids), 500):
+            chunk = document_ids[offset : offset + 500]
+            placeholders = ",".join("?" * len(chunk))
+            yield from self.connection.execute(
+                f"SELECT {columns} FROM documents WHERE id IN ({placeholders})", chunk
+            )
+
+
+def _and(left, right):
+    # (negated, documents) pairs; NOT is kept symbolic so "a -b" never needs
+    # the set of all documents
+    left_negated, left_documents = left
+    right_negated, right_documents = right
+    if left_negated and right_negated:
+        return (True, left_documents | right_documents)
+    if left_negated:
+        return (False, right_documents - left_documents)
+    if right_negated:
+        return (False, left_documents - right_documents)
+    return (False, left_documents & right_documents)
+
+
+class _QueryParser:
+    """Recursive descent over: or := and ("OR" and)*; and := not ("AND"? not)*;
+    not := ("NOT" | "-") not | "(" or ")" | word
+    """
+
+    def __init__(self, query, index):
+        self.tokens = _QUERY_TOKEN.findall(query)
+        self.position = 0
+        self.index = index
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Empty query")
+        result = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"Unexpected {self.peek()!r} in query")
+        return self.resolve(result)
+
+    def resolve(self, result):
+        negated, documents = result
+        if negated:
+            return self.index._all_documents() - documents
+        return documents
+
+    def parse_or(self):
+        result = self.parse_and()
+        while self.peek() == "OR":
+            self.take()
+            result = (False, self.resolve(result) | self.resolve(self.parse_and()))
+        return result
+
+    def parse_and(self):
+        result = self.parse_not()
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.take()
+            result = _and(result, self.parse_not())
+        return result
+
+    def parse_not(self):
+        token = self.peek()
+        if token is None:
+            raise QueryError("Query ends too early")
+        if token in ("NOT", "-"):
+            self.take()
+            negated, documents = self.parse_not()
+            return (not negated, documents)
+        if token.startswith("-"):
+            self.take()
+            return (True, self.word(token[1:]))
+        if token == "(":
+            self.take()
+            result = self.parse_or()
+            if self.take() != ")":
+                raise QueryError("Missing ) in query")
+            return result
+        if token in (")", "AND", "OR"):
+            raise QueryError(f"Unexpected {token!r} in query")
+        self.take()
+        return (False, self.word(token))
+
+    def word(self, token):
+        field = None
+        name, separator, rest = token.partition(":")
+        if separator and name.lower() in FIELDS and rest:
+            field, token = name.lower(), rest
+        return self.index._documents_matching(field, token.strip('"'))
+
+
+class ItemCache:
+    """A resolve function that keeps every item it opens until clear()
+
+    Given to a CopyTarget as its resolve function and to IndexingTarget, so
+    the items the target opens to copy are indexed without opening them a
+    second time.
+    """
+
+    def __init__(self, resolve):
+        self.resolve = resolve
+        self._items = {}
+
+    def __call__(self, entry_id):
+        item = self._items[entry_id] = self.resolve(entry_id)
+        return item
+
+    def get(self, entry_id):
+        return self._items.get(entry_id)
+
+    def clear(self):
+        self._items = {}
+
+
+class IndexingTarget(CopyTarget):
+    """Wraps a CopyTarget so every email it copies is added to a SearchIndex
+
+    items is the ItemCache the wrapped target resolves through. Emails that
+    were copied but could not be indexed are kept in unindexed for reindex().
+    """
+
+    def __init__(self, target, index, store_path, items):
+        self.target = target
+        self.index = index
+        self.store_path = store_path
+        self.items = items
+        self.name = target.name
+        self.unindexed = []
+
+    def copy_batch(self, rows):
+        failed = self.target.copy_batch(rows)
+        failed_rows = {id(row) for row, _ in failed}
+        try:
+            self._index([row for row in rows if id(row) not in failed_rows])
+        finally:
+            self.items.clear()
+        return failed
+
+    def _index(self, rows):
+        # The copy succeeded; a search index problem must not undo it
+        unindexed = []
+        for row in rows:
+            try:
+                self.index.add_row(row, self.items.get(row.EntryID), self.store_path)
+            except Exception as e:
+                print(f"Error: {e}")
+                unindexed.append(row)
+        try:
+            self.index.commit()
+        except Exception as e:
+            print(f"Error: {e}")
+            # Rolled back; nothing since the last commit is indexed
+            unindexed = rows
+        self.unindexed.extend(unindexed)
+
+    def reindex(self):
+        """Index the emails that failed to index again; returns how many
+        still could not be"""
+        rows, self.unindexed = self.unindexed, []
+        opened = []
+        try:
+            for row in rows:
+                try:
+                    self.items(row.EntryID)
+                    opened.append(row)
+                except Exception as e:
+                    print(f"Error: {e}")
+                    self.unindexed.append(row)
+            self._index(opened)
+        finally:
+            self.items.clear()
+        return len(self.unindexed)
+
+    def fingerprints(self):
+        return self.target.fingerprints()
+
+    def find(self, rows):
+        return self.target.find(rows)
+
+    def close(self):
+        self.target.close()
@@ -0,0 +1,192 @@
+import os
+import threading
+
+try:
+    import pythoncom
+except ImportError:  # Not on Windows, e.g. when driven against utils.fake
+    pythoncom = None
+
+# HRESULTs Outlook returns once the out-of-process server went away, e.g.
+# after Outlook was restarted or crashed underneath us
+DISCONNECT_HRESULTS = {
+    -2147417848,  # RPC_E_DISCONNECTED
+    -2147417855,  # RPC_E_SERVER_DIED
+    -2147417842,  # RPC_E_SERVER_DIED_DNE
+    -2147023174,  # RPC_S_SERVER_UNAVAILABLE
+    -2147221251,  # CO_E_OBJNOTCONNECTED
+}
+
+
+def connect_outlook():
+    """Open a MAPI session for the calling thread"""
+    import win32com.client
+
+    return win32com.client.Dispatch("Outlook.Application").GetNamespace("MAPI")
+
+
+def is_disconnect_error(error):
+    hresult = getattr(error, "hresult", None)
+    if hresult is None and error.args and isinstance(error.args[0], int):
+        hresult = error.args[0]
+    return hresult in DISCONNECT_HRESULTS
+
+
+def normalize_store_path(store_path):
+    return os.path.normcase(os.path.normpath(store_path)).replace("\\", "/").lower()
+
+
+class OutlookSession:
+    """A reusable MAPI session with cached folder and store handles
+
+    Folders are looked up by "/" separated path ("mailbox/Inbox/Clients")
+    and stores by PST file path; both are resolved once and cached until
+    invalidated. When Outlook drops the connection, the session reconnects
+    and retries the call once. Like any COM object, a session must only be
+    used on the thread that created it. With a utils.instrument.Profiler,
+    every Outlook call made through the session is counted and timed; with
+    a utils.throttle.Throttle, calls Outlook rejects while busy are retried
+    and paced.
+    """
+
+    def __init__(
+        self, connect=connect_outlook, mailbox=None, profiler=None, throttle=None
+    ):
+        self.connect = connect
+        self.mailbox = mailbox
+        self.profiler = profiler
+        self.throttle = throttle
+        self._namespace = None
+        self._folders = {}
+        self._stores = None
+
+    @property
+    def namespace(self):
+        if self._namespace is None:
+            namespace = self.connect()
+            if self.profiler is not None:
+                namespace = self.profiler.wrap(namespace)
+            if self.throttle is not None:
+                namespace = self.throttle.wrap(namespace)
+            self._namespace = namespace
+        return self._namespace
+
+    def invalidate(self, path=None):
+        """Forget cached handles: one folder path (and below), or everything"""
+        if path is None:
+            self._folders = {}
+            self._stores = None
+            return
+        self._folders = {
+            cached: folder
+            for cached, folder in self._folders.items()
+            if cached != path and not cached.startswith(path + "/")
+        }
+
+    def reconnect(self):
+        self.invalidate()
+        self._namespace = None
+        return self.namespace
+
+    def call(self, function, *args):
+        """Run function(*args), reconnecting once if Outlook went away"""
+        try:
+            return function(*args)
+        except Exception as e:
+            if not is_disconnect_error(e):
+                raise
+            print(f"Outlook disconnected ({e}), reconnecting")
+            self.reconnect()
+            return function(*args)
+
+    def _resolve_folder(self, path):
+        parent_path, _, name = path.rpartition("/")
+        if not parent_path:
+            return self.namespace.Folders(name)
+        return self.folder(parent_path).Folders(name)
+
+    def folder(self, path):
+        """Folder at path, e.g. "partner@radlawgroup.com/Inbox" """
+        path = path.strip("/")
+        folder = self._folders.get(path)
+        if folder is None:
+            folder = self._folders[path] = self.call(self._resolve_folder, path)
+        return folder
+
+    @property
+    def inbox(self):
+        return self.folder(f"{self.mailbox}/Inbox")
+
+    def _store_map(self):
+        if self._stores is None:
+            self._stores = {
+                normalize_store_path(store.FilePath): store
+                for store in self.call(lambda: list(self.namespace.Stores))
+                if store.FilePath
+            }
+        return self._stores
+
+    def store(self, store_path):
+        """The store for a PST file path, or None if it is not open"""
+        return self._store_map().get(normalize_store_path(store_path))
+
+    def open_pst(self, store_path):
+        """Add the PST at store_path to the session if needed, return its root"""
+        store = self.store(store_path)
+        if store is None:
+            self.call(lambda: self.namespace.AddStore(store_path))
+            self._stores = None
+            store = self.store(store_path)
+        return store.GetRootFolder()
+
+    def get_item(self, entry_id, store_id=None):
+        if store_id:
+            return self.call(lambda: self.namespace.GetItemFromID(entry_id, store_id))
+        return self.call(lambda: self.namespace.GetItemFromID(entry_id))
+
+
+class _Apartment:
+    """COM initialized on the creating thread, for as long as this object lives
+
+    Kept in a threading.local, so it is collected on its own thread when
+    that thread exits, which releases the session's COM objects before COM
+    is uninitialized.
+    """
+
+    def __init__(self, make_session):
+        self.thread_id = threading.get_ident()
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        self.session = make_session()
+
+    def __del__(self):
+        self.session = None
+        # Collected elsewhere when the threading.local itself goes away; COM
+        # can only be uninitialized by the thread that initialized it
+        if pythoncom is not None and threading.get_ident() == self.thread_id:
+            pythoncom.CoUninitialize()
+
+
+class ThreadSessions:
+    """One OutlookSession per thread, e.g. per thread of a ThreadPoolExecutor
+
+    get() opens the calling thread's session on first use, initializing COM
+    for that thread; COM is uninitialized again when the thread exits.
+    Every session shares connect, mailbox, profiler and throttle.
+    """
+
+    def __init__(self, connect, mailbox=None, profiler=None, throttle=None):
+        self.connect = connect
+        self.mailbox = mailbox
+        self.profiler = profiler
+        self.throttle = throttle
+        self._local = threading.local()
+
+    def get(self):
+        apartment = getattr(self._local, "apartment", None)
+        if apartment is None:
+            apartment = self._local.apartment = _Apartment(
+                lambda: OutlookSession(
+                    self.connect, self.mailbox, self.profiler, self.throttle
+                )
+            )
+        return apartment.session
@@ -0,0 +1,244 @@
+"""Split a long export into several archives written in parallel.
+
+Year-end runs produce one very large PST that is slow to open and to write.
+`ShardedExport` instead cuts the flagged mail into shards, one per month or
+one per N emails, and builds each shard's archive on its own worker. A
+`manifest.json` next to the archives lists every shard.
+
+Shards of N emails are numbered by position, so mail that arrives later
+moves the boundaries of every part after it. Each shard is therefore
+deduped against all the shards already written, not just its own archive.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from utils.fingerprint import FingerprintSet
+from utils.index import SyncIndex
+from utils.pipeline import DEFAULT_BATCH_SIZE, export_rows
+from utils.query import default_month_range, month_ranges
+from utils.scheduler import DEFAULT_MAX_WORKERS
+
+MANIFEST_NAME = "manifest.json"
+
+# rows is a list of MailRows; start and end are the dates the shard covers
+Shard = namedtuple("Shard", ["name", "start", "end", "rows"])
+
+
+def shard_name(start, end, part=None):
+    name = f"Flagged Emails {start.strftime('%m-%d-%y')} - {end.strftime('%m-%d-%y')}"
+    return name if part is None else f"{name} part {part:03d}"
+
+
+def _received_date(row):
+    received_time = row.ReceivedTime
+    if isinstance(received_time, datetime):
+        return received_time.date()
+    return received_time
+
+
+def plan_shards(flagged_emails, start, end, shard_by="month"):
+    """Split rows into Shards, by "month" or into groups of shard_by emails
+
+    Empty months get no shard. Groups of N are cut in received order, so
+    each shard still covers a contiguous stretch of dates.
+    """
+    rows = sorted(flagged_emails, key=_received_date)
+
+    if shard_by == "month":
+        by_month = {}
+        for row in rows:
+            received = _received_date(row)
+            by_month.setdefault((received.year, received.month), []).append(row)
+        shards = []
+        for first, last in month_ranges(start, end):
+            month_rows = by_month.get((first.year, first.month))
+            if month_rows:
+                shards.append(Shard(shard_name(first, last), first, last, month_rows))
+        return shards
+
+    size = int(shard_by)
+    if size < 1:
+        raise ValueError(f"Shard size must be at least 1, not {size}")
+    return [
+        Shard(
+            shard_name(start, end, number + 1),
+            _received_date(rows[offset]),
+            _received_date(rows[min(offset + size, len(rows)) - 1]),
+            rows[offset : offset + size],
+        )
+        for number, offset in enumerate(range(0, len(rows), size))
+    ]
+
+
+def shard_fingerprints(index, archive_path, target, is_new_store):
+    """What is already in one shard's archive, from the index when known
+
+    Like utils.outlook.get_store_fingerprints, but for any CopyTarget.
+    """
+    if is_new_store:
+        index.forget_store(archive_path)
+    elif index.has_store(archive_path):
+        return index.store_fingerprints(archive_path)
+    existing_fingerprints = target.fingerprints()
+    index.add_fingerprints(archive_path, existing_fingerprints)
+    return existing_fingerprints
+
+
+def read_manifest(output_folder):
+    """The manifest an earlier export left in output_folder, if any"""
+    try:
+        with open(os.path.join(output_folder, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {"shards": []}
+
+
+class ShardedExport:
+    """Write Shards to separate archives, max_workers at a time
+
+    make_backend() is called once on each worker thread and returns the
+    MailBackend that thread opens archives with; for Outlook that is an
+    OutlookBackend over a per-thread session, e.g. from
+    ExportScheduler.session. shard_by is "month" or a number of emails per
+    shard. Every shard keeps its own fingerprints in the index, keyed by its
+    archive path, and skips the emails already in any shard of the output
+    folder, whichever part they were written to.
+    """
+
+    def __init__(
+        self,
+        make_backend,
+        shard_by="month",
+        max_workers=DEFAULT_MAX_WORKERS,
+        index_path=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+    ):
+        self.make_backend = make_backend
+        self.shard_by = shard_by
+        self.max_workers = max(1, max_workers)
+        self.index_path = index_path
+        self.batch_size = batch_size
+        self._local = threading.local()
+
+    def backend(self):
+        backend = getattr(self._local, "backend", None)
+        if backend is None:
+            backend = self._local.backend = self.make_backend()
+        return backend
+
+    def _archive_path(self, output_folder, name):
+        return os.path.join(output_folder, name + self.backend().archive_suffix)
+
+    def _written_fingerprints(self, output_folder, name):
+        """Fingerprints in shard name's archive, if an earlier run wrote one"""
+        archive_path = self._archive_path(output_folder, name)
+        if not os.path.exists(archive_path):
+            return FingerprintSet()
+        target = self.backend().create_archive(archive_path)
+        try:
+            if self.index_path is None:
+                return target.fingerprints()
+            with SyncIndex(self.index_path) as index:
+                return shard_fingerprints(index, archive_path, target, False)
+        finally:
+            target.close()
+
+    def _export_shard(self, shard, output_folder, written):
+        started = time.perf_counter()
+        archive_path = self._archive_path(output_folder, shard.name)
+        is_new_store = not os.path.exists(archive_path)
+        target = self.backend().create_archive(archive_path)
+        # Rows a rerun moved here from a neighbouring shard are skipped too
+        existing_fingerprints = FingerprintSet(written)
+
+        try:
+            if self.index_path is None:
+                existing_fingerprints.update(target.fingerprints())
+                summary = export_rows(
+                    shard.rows,
+                    target,
+                    existing_fingerprints,
+                    batch_size=self.batch_size,
+                )
+            else:
+                # One connection per shard; SQLite objects stay on their thread
+                with SyncIndex(self.index_path) as index:
+                    existing_fingerprints.update(
+                        shard_fingerprints(index, archive_path, target, is_new_store)
+                    )
+                    summary = export_rows(
+                        shard.rows,
+                        target,
+                        existing_fingerprints,
+                        record=lambda fingerprints: index.add_fingerprints(
+                            archive_path, fingerprints
+                        ),
+                        batch_size=self.batch_size,
+                    )
+        finally:
+            target.close()
+
+        return {
+            "name": shard.name,
+            "path": archive_path,
+            "start": shard.start.isoformat(),
+            "end": shard.end.isoformat(),
+            "items": len(shard.rows),
+            "copied": summary["copied"],
+            "skipped": summary["skipped"],
+            "failed": summary["failed"],
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def export(
+        self,
+        flagged_emails,
+        output_folder,
+        start: date = None,
+        end: date = None,
+    ):
+        """Export flagged_emails in shards and write the manifest
+
+        Returns the manifest dict, which is also saved as MANIFEST_NAME in
+        output_folder.
+        """
+        start, end = default_month_range(start, end)
+        os.makedirs(output_folder, exist_ok=True)
+        shards = plan_shards(flagged_emails, start, end, self.shard_by)
+
+        started = time.perf_counter()
+        names = {shard.name for shard in shards}
+        names.update(shard["name"] for shard in read_manifest(output_folder)["shards"])
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            written = FingerprintSet()
+            for fingerprints in pool.map(
+                lambda name: self._written_fingerprints(output_folder, name),
+                sorted(names),
+            ):
+                written.update(fingerprints)
+            results = list(
+                pool.map(
+                    lambda shard: self._export_shard(shard, output_folder, written),
+                    shards,
+                )
+            )
+
+        manifest = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "shard_by": self.shard_by,
+            "workers": self.max_workers,
+            "seconds": round(time.perf_counter() - started, 3),
+            "ok": all(result["failed"] == 0 for result in results),
+            "shards": results,
+        }
+        with open(os.path.join(output_folder, MANIFEST_NAME), "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        return manifest
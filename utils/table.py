@@ -0,0 +1,134 @@
+from array import array
+from collections import namedtuple
+
+# OlTableContents.olUserItems
+OL_USER_ITEMS = 0
+
+# PR_INTERNET_MESSAGE_ID, which survives copies between stores unlike EntryID
+PR_INTERNET_MESSAGE_ID = "http://schemas.microsoft.com/mapi/proptag/0x1035001F"
+
+# PR_HASATTACH, so mail with attachments can be told apart from a table
+PR_HAS_ATTACHMENTS = "http://schemas.microsoft.com/mapi/proptag/0x0E1B000B"
+
+# Columns needed to list, dedupe, copy and bill flagged mail and to find the
+# ones with attachments without touching items; a scan carries everything
+# utils.report.REPORT_COLUMNS names
+MAIL_COLUMNS = (
+    "EntryID",
+    "Subject",
+    "ReceivedTime",
+    "FlagStatus",
+    "Size",
+    "SenderEmailAddress",
+    PR_INTERNET_MESSAGE_ID,
+    "To",
+    "Categories",
+    PR_HAS_ATTACHMENTS,
+)
+
+# Row attribute names for columns requested by schema name
+COLUMN_ALIASES = {
+    PR_INTERNET_MESSAGE_ID: "InternetMessageID",
+    PR_HAS_ATTACHMENTS: "HasAttachments",
+}
+
+# Integer columns are kept in typed arrays instead of lists of COM variants
+INTEGER_COLUMNS = {"FlagStatus": "b", "Size": "q"}
+
+# Rows fetched per Table.GetArray round trip
+FETCH_BATCH_SIZE = 1000
+
+
+def row_type(columns):
+    """Namedtuple for one row of columns, with schema names aliased"""
+    return namedtuple(
+        "MailRow", [COLUMN_ALIASES.get(name, name) for name in columns], rename=True
+    )
+
+
+class MailTable:
+    """Column-oriented snapshot of a folder's items
+
+    Each column is stored as one list (or typed array for integer columns),
+    so a folder of N items costs N / FETCH_BATCH_SIZE round trips to build
+    instead of N * len(columns) property reads.
+    """
+
+    def __init__(self, columns=MAIL_COLUMNS):
+        self.columns = tuple(columns)
+        self.data = {
+            name: array(INTEGER_COLUMNS[name]) if name in INTEGER_COLUMNS else []
+            for name in self.columns
+        }
+        self.Row = row_type(self.columns)
+
+    def __len__(self):
+        return len(self.data[self.columns[0]])
+
+    def __iter__(self):
+        return map(self.Row._make, zip(*(self.data[name] for name in self.columns)))
+
+    def __getitem__(self, index):
+        return self.Row._make(self.data[name][index] for name in self.columns)
+
+    def column(self, name):
+        for column_name, alias in COLUMN_ALIASES.items():
+            if name == alias:
+                name = column_name
+        return self.data[name]
+
+    def take(self, indices):
+        """A new MailTable of the rows at indices, in that order"""
+        mail_table = MailTable(self.columns)
+        for name in self.columns:
+            mail_table.data[name].extend(map(self.data[name].__getitem__, indices))
+        return mail_table
+
+    def collect(self, rows):
+        """Yield rows as they come while appending them to the table, so a
+        streamed scan is still at hand once it has been consumed"""
+        for row in rows:
+            self.extend((row,))
+            yield row
+
+    def extend(self, rows):
+        """Append rows as returned by Table.GetArray"""
+        for index, name in enumerate(self.columns):
+            values = [row[index] for row in rows]
+            if name in INTEGER_COLUMNS:
+                values = [value or 0 for value in values]
+            self.data[name].extend(values)
+
+
+def iter_table_batches(folder, filter="", columns=MAIL_COLUMNS):
+    """Yield the raw GetArray batches for items in folder matching filter
+
+    Only one batch is held at a time, so callers can start working on the
+    first rows while Outlook is still producing the rest.
+    """
+    table = folder.GetTable(filter, OL_USER_ITEMS)
+
+    table.Columns.RemoveAll()
+    for name in columns:
+        table.Columns.Add(name)
+
+    while not table.EndOfTable:
+        rows = table.GetArray(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        yield rows
+
+
+def iter_table(folder, filter="", columns=MAIL_COLUMNS):
+    """Yield one MailRow per item in folder matching filter, as fetched"""
+    Row = row_type(columns)
+    for rows in iter_table_batches(folder, filter, columns):
+        yield from map(Row._make, rows)
+
+
+def get_table(folder, filter="", columns=MAIL_COLUMNS):
+    """Bulk-fetch the given columns for every item in folder matching filter"""
+    mail_table = MailTable(columns)
+    for rows in iter_table_batches(folder, filter, columns):
+        mail_table.extend(rows)
+    return mail_table
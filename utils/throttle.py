@@ -0,0 +1,322 @@
+"""Adaptive pacing of Outlook calls while Outlook is busy.
+
+While Outlook syncs with Exchange it rejects calls ("Call was rejected by
+callee", RPC_E_CALL_REJECTED) or answers with MAPI busy and network errors.
+Left alone, these fail single emails or abort a whole scan. `Throttle` sits
+between our code and Outlook as a proxy, the same way
+`utils.instrument.Profiler` does. Pass one to `utils.session.OutlookSession`
+and every round trip through that session goes through `Throttle.call`:
+
+- A transient error is retried after a jittered exponential backoff.
+  Permanent errors and disconnects are raised at once; the session
+  reconnects after a disconnect.
+- The number of calls in flight at once, across every session sharing the
+  throttle, is limited AIMD style, like TCP congestion control. The limit
+  grows by one for every window of calls that succeed and halves when a
+  call is rejected.
+- `CopyPipeline` asks `batch_size()` how many emails the next batch should
+  hold. That also halves when a call is rejected and grows a step after
+  every clean batch, so progress and checkpoints stay frequent while
+  Outlook struggles.
+
+`metrics()` reports calls per second, errors, retries, the current limits
+and the time spent backing off, live from any thread.
+
+    throttle = Throttle(max_concurrency=4)
+    session = OutlookSession(connect_outlook, mailbox, throttle=throttle)
+"""
+
+import inspect
+import math
+import threading
+import time
+from collections import deque
+from random import Random
+
+from utils.instrument import PLAIN_TYPES
+from utils.instrument import unwrap as unwrap_instrumented
+
+# Refused by Outlook's message filter before the call ran, so any call,
+# even one that changes the store, can be made again
+REJECTED_HRESULTS = {
+    -2147418111,  # RPC_E_CALL_REJECTED
+    -2147418110,  # RPC_E_CALL_CANCELED
+    -2147417846,  # RPC_E_SERVERCALL_RETRYLATER
+}
+
+# Exchange busy or out of reach; the call may have run, so only calls that
+# read are made again
+BUSY_HRESULTS = {
+    -2147221237,  # MAPI_E_BUSY
+    -2147220479,  # MAPI_E_TIMEOUT
+    -2147221227,  # MAPI_E_NETWORK_ERROR
+}
+
+# Calls that change a store; a repeated one could copy an email twice
+WRITE_CALLS = {"Copy", "CopyTo", "Move", "Delete", "AddStore"}
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Times a call is retried before its error is raised
+DEFAULT_RETRIES = 6
+
+# Backoff before retry number n is between half and all of
+# min(MAX_DELAY, BASE_DELAY * 2 ** n) seconds
+BASE_DELAY = 0.05
+MAX_DELAY = 5.0
+
+# Emails a shrunken batch grows by after each batch without rejections
+BATCH_STEP = 5
+MIN_BATCH_SIZE = 5
+
+# Seconds of calls that calls_per_second is averaged over
+RATE_WINDOW = 5.0
+
+
+def error_hresults(error):
+    """HRESULTs carried by a COM error: its own and, if set, the scode
+
+    Errors Outlook raises inside a call arrive as DISP_E_EXCEPTION with the
+    real code in the scode of the exception info.
+    """
+    hresults = set()
+    hresult = getattr(error, "hresult", None)
+    if hresult is None and error.args and isinstance(error.args[0], int):
+        hresult = error.args[0]
+    if hresult is not None:
+        hresults.add(hresult)
+    if len(error.args) > 2 and isinstance(error.args[2], tuple):
+        excepinfo = error.args[2]
+        if len(excepinfo) > 5 and isinstance(excepinfo[5], int):
+            hresults.add(excepinfo[5])
+    return hresults
+
+
+def is_transient_error(error, name=""):
+    """Whether the call name that raised error is worth making again"""
+    hresults = error_hresults(error)
+    if hresults & REJECTED_HRESULTS:
+        return True
+    return bool(hresults & BUSY_HRESULTS) and name not in WRITE_CALLS
+
+
+class Throttle:
+    """Retries, backoff and AIMD limits for the Outlook calls made through it
+
+    Safe to share between the per-thread sessions of an ExportScheduler or
+    PartitionedScan; the concurrency limit then applies to all of them.
+    random, sleep and clock can be replaced for tests.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        retries=DEFAULT_RETRIES,
+        base_delay=BASE_DELAY,
+        max_delay=MAX_DELAY,
+        random=None,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random or Random()
+        self.sleep = sleep
+        self.clock = clock
+        self._condition = threading.Condition()
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        # No limit until the first rejection
+        self._batch_limit = math.inf
+        self._last_batch_size = None
+        self._last_decrease = None
+        self._completed = deque()
+        # Totals since created
+        self.calls = 0
+        self.transient_errors = 0
+        self.retried = 0
+        self.gave_up = 0
+        self.decreases = 0
+        self.backoff_seconds = 0.0
+
+    def wrap(self, target, name=""):
+        if isinstance(target, PLAIN_TYPES) or isinstance(target, ThrottledProxy):
+            return target
+        return ThrottledProxy(target, self, name)
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (0 for the first)"""
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay / 2 + self.random.uniform(0, delay / 2)
+
+    def _acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.concurrency):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def _release(self, succeeded):
+        with self._condition:
+            self.in_flight -= 1
+            if succeeded:
+                self.calls += 1
+                now = self.clock()
+                self._completed.append(now)
+                while self._completed[0] < now - RATE_WINDOW:
+                    self._completed.popleft()
+                # Additive increase: one more call in flight per window
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + 1 / self.concurrency
+                )
+            self._condition.notify_all()
+
+    def _decrease(self, started):
+        """Multiplicative decrease, once for all the calls in flight together
+
+        Calls that started before the last decrease were made under the old
+        limit, so their rejections are not a reason to halve it again.
+        """
+        with self._condition:
+            self.transient_errors += 1
+            if self._last_decrease is not None and started < self._last_decrease:
+                return
+            self._last_decrease = self.clock()
+            self.decreases += 1
+            self.concurrency = max(1.0, self.concurrency / 2)
+            if self._last_batch_size is not None:
+                self._batch_limit = max(
+                    MIN_BATCH_SIZE, min(self._batch_limit, self._last_batch_size) / 2
+                )
+
+    def call(self, name, function, *args, **kwargs):
+        """function(*args, **kwargs), retried while Outlook is busy
+
+        name is the Outlook property or method being used, which decides
+        whether a busy error may be retried (see WRITE_CALLS).
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            started = self.clock()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self._release(False)
+                if not is_transient_error(e, name):
+                    raise
+                self._decrease(started)
+                if attempt >= self.retries:
+                    with self._condition:
+                        self.gave_up += 1
+                    raise
+                delay = self.backoff(attempt)
+                with self._condition:
+                    self.retried += 1
+                    self.backoff_seconds += delay
+                self.sleep(delay)
+                attempt += 1
+                continue
+            self._release(True)
+            return result
+
+    def batch_size(self, requested):
+        """Emails the next batch should hold, at most requested"""
+        with self._condition:
+            size = max(1, int(min(requested, self._batch_limit)))
+            self._last_batch_size = size
+            return size
+
+    def batch_done(self, decreases_before):
+        """Grow the batch limit if no call was rejected since decreases_before
+
+        decreases_before is the value of `decreases` when the batch started.
+        """
+        with self._condition:
+            if self.decreases == decreases_before and self._batch_limit < math.inf:
+                self._batch_limit += BATCH_STEP
+
+    def metrics(self):
+        """A snapshot of the rates, totals and current limits"""
+        with self._condition:
+            now = self.clock()
+            while self._completed and self._completed[0] < now - RATE_WINDOW:
+                self._completed.popleft()
+            return {
+                "calls": self.calls,
+                "calls_per_second": round(len(self._completed) / RATE_WINDOW, 1),
+                "transient_errors": self.transient_errors,
+                "retried": self.retried,
+                "gave_up": self.gave_up,
+                "decreases": self.decreases,
+                "concurrency": round(self.concurrency, 2),
+                "in_flight": self.in_flight,
+                "batch_limit": (
+                    int(self._batch_limit) if self._batch_limit < math.inf else None
+                ),
+                "backoff_seconds": round(self.backoff_seconds, 3),
+            }
+
+
+class ThrottledProxy:
+    """Forwards to an Outlook object, making each round trip through a Throttle
+
+    name is the property the object was read from, so calling a collection
+    (Folders("Inbox")) is throttled as a read of "Folders".
+    """
+
+    __slots__ = ("_target", "_throttle", "_name")
+
+    def __init__(self, target, throttle, name=""):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_throttle", throttle)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, name):
+        throttle = self._throttle
+        value = throttle.call(name, getattr, self._target, name)
+        if not inspect.isroutine(value):
+            return throttle.wrap(value, name)
+
+        def call(*args, **kwargs):
+            args = [unwrap(arg) for arg in args]
+            return throttle.wrap(throttle.call(name, value, *args, **kwargs))
+
+        return call
+
+    def __setattr__(self, name, value):
+        self._throttle.call(f"{name}=", setattr, self._target, name, unwrap(value))
+
+    def __call__(self, *args, **kwargs):
+        return self._throttle.wrap(
+            self._throttle.call(self._name, self._target, *args, **kwargs)
+        )
+
+    def __iter__(self):
+        iterator = iter(self._target)
+        sentinel = object()
+        while True:
+            value = self._throttle.call(self._name, next, iterator, sentinel)
+            if value is sentinel:
+                return
+            yield self._throttle.wrap(value)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"ThrottledProxy({self._target!r})"
+
+
+def unwrap(value):
+    """The object under any ThrottledProxy and InstrumentedProxy layers"""
+    if isinstance(value, ThrottledProxy):
+        value = object.__getattribute__(value, "_target")
+    return unwrap_instrumented(value)
@@ -0,0 +1,220 @@
+"""Live tracking of flagged mail through the Inbox's Items events.
+
+Instead of rescanning the date range, a FlagWatcher subscribes to the
+folder's `Items.ItemAdd`, `ItemChange` and `ItemRemove` events and keeps the
+set of flagged emails in memory. An event only marks the set stale, without
+touching the item; apply() then catches up with one GetTable of the items
+modified since the previous apply, however many events arrived, plus an
+EntryID-only pass when something was deleted. Bursts are debounced: apply
+is due `debounce` seconds after the last event, or `max_delay` seconds after
+the first one if the events never pause.
+
+Outlook delivers events while the thread that subscribed pumps COM
+messages, so a watcher lives on the OutlookWorker and is driven with
+`OutlookWorker.every`:
+
+    watcher = FlagWatcher(inbox, start, end, flagged_emails).start()
+    worker.every("watch", 0.25, lambda job: watcher.apply_if_due())
+"""
+
+import threading
+import time
+from datetime import datetime
+from operator import attrgetter
+
+from utils.index import SYNC_OVERLAP
+from utils.query import FLAG_MARKED, build_changed_filter, build_flagged_filter
+from utils.table import MailTable, get_table
+from utils.throttle import unwrap
+
+# Seconds without events before a burst is applied
+DEBOUNCE = 0.5
+
+# Seconds a burst that never pauses waits at most before it is applied
+MAX_DELAY = 2.0
+
+
+def _com_with_events(items, handler_class):
+    import win32com.client
+
+    return win32com.client.WithEvents(items, handler_class)
+
+
+class _ItemsEvents:
+    # Set right after WithEvents creates the handler; None once stopped
+    watcher = None
+
+    def OnItemAdd(self, item):
+        if self.watcher is not None:
+            self.watcher.changed()
+
+    def OnItemChange(self, item):
+        if self.watcher is not None:
+            self.watcher.changed()
+
+    def OnItemRemove(self):
+        if self.watcher is not None:
+            self.watcher.changed(removed=True)
+
+
+class FlagWatcher:
+    """The flagged emails of one folder and date range, kept current by events
+
+    flagged_emails, a MailTable from a scan made just before, seeds the set;
+    without it start() reads the range once. scanned_at is when that scan
+    started: start() catches up on everything modified since, so changes
+    made while the scan ran are not lost. with_events subscribes a handler
+    class to an Items collection (win32com.client.WithEvents by default,
+    utils.fake.with_events against the fakes); stop() closes it again.
+    """
+
+    def __init__(
+        self,
+        folder,
+        start,
+        end,
+        flagged_emails=None,
+        debounce=DEBOUNCE,
+        max_delay=MAX_DELAY,
+        with_events=None,
+        clock=time.monotonic,
+        scanned_at=None,
+    ):
+        self.folder = folder
+        self.start_date = start
+        self.end_date = end
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.with_events = with_events or _com_with_events
+        self.clock = clock
+        # EntryID -> MailRow
+        self._rows = {}
+        if flagged_emails is not None:
+            self._rows = {row.EntryID: row for row in flagged_emails}
+        self._seeded = flagged_emails is not None
+        self.scanned_at = scanned_at
+        self._items = None
+        self._handler = None
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._removed = False
+        self._first_event = None
+        self._last_event = None
+        # Totals since start, for progress reports and benchmarks
+        self.events = 0
+        self.batches = 0
+        self.rows_read = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def start(self):
+        """Subscribe to the folder's events, then load the range if not seeded"""
+        self._synced_at = datetime.now()
+        if self._seeded and self.scanned_at is not None:
+            self._synced_at = self.scanned_at
+        # The collection must stay referenced or Outlook stops sending events;
+        # events are delivered to the COM object itself, not a proxy of it
+        self._items = unwrap(self.folder.Items)
+        self._handler = self.with_events(self._items, _ItemsEvents)
+        self._handler.watcher = self
+        if not self._seeded:
+            flagged = get_table(
+                self.folder, build_flagged_filter(self.start_date, self.end_date)
+            )
+            self._rows = {row.EntryID: row for row in flagged}
+            self.rows_read += len(flagged)
+        else:
+            # Catch up on whatever changed between the scan and subscribing
+            self.changed()
+        return self
+
+    def stop(self):
+        """Unsubscribe; the set stays as it was last applied"""
+        if self._handler is not None:
+            self._handler.watcher = None
+            # Otherwise Outlook keeps the connection, one per watcher started
+            self._handler.close()
+        self._handler = None
+        self._items = None
+
+    def changed(self, removed=False):
+        """Record an event; cheap enough to call from the event handler"""
+        now = self.clock()
+        with self._lock:
+            self.events += 1
+            self._pending += 1
+            self._removed = self._removed or removed
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+
+    def due(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            now = self.clock()
+            return (
+                now - self._last_event >= self.debounce
+                or now - self._first_event >= self.max_delay
+            )
+
+    def apply(self):
+        """Bring the set up to date; returns counts of what the batch changed"""
+        with self._lock:
+            events, self._pending = self._pending, 0
+            removed, self._removed = self._removed, False
+            self._first_event = self._last_event = None
+
+        synced_at = datetime.now()
+        # LastModificationTime only filters to the minute; re-read a little
+        changed = get_table(
+            self.folder,
+            build_changed_filter(
+                self.start_date, self.end_date, self._synced_at - SYNC_OVERLAP
+            ),
+        )
+        self.rows_read += len(changed)
+        added = cleared = deleted = 0
+        for row in changed:
+            if row.FlagStatus == FLAG_MARKED:
+                added += row.EntryID not in self._rows
+                self._rows[row.EntryID] = row
+            elif self._rows.pop(row.EntryID, None) is not None:
+                cleared += 1
+
+        if removed:
+            flagged_now = set(
+                get_table(
+                    self.folder,
+                    build_flagged_filter(self.start_date, self.end_date),
+                    ("EntryID",),
+                ).column("EntryID")
+            )
+            for entry_id in list(self._rows):
+                if entry_id not in flagged_now:
+                    del self._rows[entry_id]
+                    deleted += 1
+
+        self._synced_at = synced_at
+        self.batches += 1
+        return {
+            "events": events,
+            "added": added,
+            "cleared": cleared,
+            "deleted": deleted,
+            "flagged": len(self._rows),
+        }
+
+    def apply_if_due(self):
+        """apply() if a debounced batch is due, else None"""
+        return self.apply() if self.due() else None
+
+    def flagged_emails(self):
+        """The current set as a MailTable, oldest first, like a scan returns"""
+        flagged_emails = MailTable()
+        flagged_emails.extend(
+            sorted(self._rows.values(), key=attrgetter("ReceivedTime"))
+        )
+        return flagged_emails
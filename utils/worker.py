@@ -0,0 +1,222 @@
+import itertools
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# kind is one of "started", "progress", "done", "error" or "cancelled"
+WorkerEvent = namedtuple("WorkerEvent", ["job_id", "name", "kind", "payload"])
+
+# Seconds between pumps of COM messages while no job is running
+PUMP_INTERVAL = 0.1
+
+
+def _import_pythoncom():
+    # Imported on the worker thread, so loading COM never delays the GUI
+    try:
+        import pythoncom
+    except ImportError:  # Not on Windows, e.g. when driven against utils.fake
+        return None
+    return pythoncom
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """Handle passed to a job function to report progress and see cancellation
+
+    Each job has its own cancel flag, so cancelling one never affects the
+    jobs queued behind it; stopping the worker cancels them all.
+    """
+
+    def __init__(self, worker, job_id, name):
+        self.worker = worker
+        self.id = job_id
+        self.name = name
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set() or self.worker._stopping.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, **payload):
+        self.worker._emit(self, "progress", payload)
+
+
+class _Repeating:
+    def __init__(self, job, interval, function, args):
+        self.job = job
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.due = time.monotonic() + interval
+
+
+class OutlookWorker:
+    """Run Outlook jobs one at a time on a dedicated, COM-initialized thread
+
+    COM proxies must stay on the thread that created them, so every job that
+    touches Outlook (connect, scan, export) has to go through the same worker.
+    Results come back as WorkerEvents on `events`, which a GUI can drain with
+    `poll` from its own event loop. Between jobs the worker pumps COM
+    messages, which is when Outlook delivers events, and runs the functions
+    registered with `every`.
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self._jobs = queue.Queue()
+        self._stopping = threading.Event()
+        # job id -> Job, from submit until the job has finished
+        self._active = {}
+        self._ids = itertools.count(1)
+        self._repeating = []
+        self._repeating_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="OutlookWorker", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Cancel every job and wait up to timeout seconds for the thread"""
+        self._stopping.set()
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+    def _new_job(self, name):
+        job = Job(self, next(self._ids), name)
+        self._active[job.id] = job
+        return job
+
+    def submit(self, name, function, *args, **kwargs):
+        """Queue function(job, *args, **kwargs) and return the job id"""
+        job = self._new_job(name)
+        self._jobs.put((job, function, args, kwargs))
+        return job.id
+
+    def every(self, name, interval, function, *args):
+        """Call function(job, *args) about every interval seconds between jobs
+
+        Keeps going until function returns False ("done") or raises
+        ("error"); job.report() sends progress as for any job. When the
+        worker stops, function is called once more with job.cancelled set,
+        so it can release what it holds on this thread, e.g. an event
+        subscription. Returns the job id.
+        """
+        job = self._new_job(name)
+        with self._repeating_lock:
+            self._repeating.append(_Repeating(job, interval, function, args))
+        self._emit(job, "started")
+        return job.id
+
+    def cancel(self, job_id):
+        """Ask job job_id to stop
+
+        A running job stops at its next check, a queued one is dropped when
+        its turn comes and a repeating one is not called again; each is then
+        reported "cancelled". Unknown or finished jobs are ignored.
+        """
+        job = self._active.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def poll(self, limit=None):
+        """Return up to limit (default all) pending events without blocking"""
+        events = []
+        while limit is None or len(events) < limit:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def _emit(self, job, kind, payload=None):
+        if kind in ("done", "error", "cancelled"):
+            self._active.pop(job.id, None)
+        self.events.put(WorkerEvent(job.id, job.name, kind, payload))
+
+    def _run_repeating(self, pythoncom):
+        if pythoncom is not None:
+            pythoncom.PumpWaitingMessages()
+        now = time.monotonic()
+        with self._repeating_lock:
+            due = [repeating for repeating in self._repeating if repeating.due <= now]
+        for repeating in due:
+            if repeating.job.cancelled:
+                with self._repeating_lock:
+                    self._repeating.remove(repeating)
+                self._emit(repeating.job, "cancelled")
+                continue
+            try:
+                finished = repeating.function(repeating.job, *repeating.args) is False
+            except Exception as e:
+                print(f"Error: {e}")
+                self._emit(repeating.job, "error", e)
+                finished = True
+            else:
+                if finished:
+                    self._emit(repeating.job, "done")
+            if finished:
+                with self._repeating_lock:
+                    self._repeating.remove(repeating)
+            else:
+                repeating.due = time.monotonic() + repeating.interval
+
+    def _finish_repeating(self):
+        with self._repeating_lock:
+            repeating_jobs, self._repeating = self._repeating, []
+        for repeating in repeating_jobs:
+            try:
+                repeating.function(repeating.job, *repeating.args)
+            except Exception as e:
+                print(f"Error: {e}")
+            self._emit(repeating.job, "cancelled")
+
+    def _run(self):
+        pythoncom = _import_pythoncom()
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        try:
+            while True:
+                self._run_repeating(pythoncom)
+                try:
+                    work = self._jobs.get(timeout=PUMP_INTERVAL)
+                except queue.Empty:
+                    continue
+                if work is None:
+                    break
+
+                job, function, args, kwargs = work
+                if job.cancelled:
+                    # Cancelled while it was still queued
+                    self._emit(job, "cancelled")
+                    continue
+                self._emit(job, "started")
+                try:
+                    result = function(job, *args, **kwargs)
+                except JobCancelled:
+                    self._emit(job, "cancelled")
+                except Exception as e:
+                    print(f"Error: {e}")
+                    self._emit(job, "error", e)
+                else:
+                    if job.cancelled:
+                        self._emit(job, "cancelled", result)
+                    else:
+                        self._emit(job, "done", result)
+        finally:
+            self._finish_repeating()
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()